@@ -0,0 +1,135 @@
+"""
+命令行冷启动基准：用 python -X importtime 测量各入口模块的导入耗时，并检查重量级依赖是否被提前导入
+
+whisper (torch)、openai、google.genai 等依赖应在首次使用时才导入；只执行 --help 或只需生成摘要的运行
+不应为它们付出数秒的导入时间。指定基线文件时与基线比较，超出容差则以非零状态退出 (可用于CI回归检查)。
+
+用法:
+    python -m benchmarks.bench_import_time [--repeat 5] [--baseline benchmarks/import_time_baseline.json]
+                                           [--update-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 各命令行入口模块
+ENTRY_MODULES = ('src.main', 'src.batch', 'src.worker', 'src.server')
+
+# 导入入口模块时不应加载的重量级依赖 (首次使用时才导入)
+HEAVY_MODULES = ('whisper', 'torch', 'openai', 'google.genai', 'numpy', 'tqdm', 'httpx')
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    Args:
+        stderr (str): 子进程的标准错误输出
+
+    Returns:
+        dict: 模块名 -> 累计导入耗时（微秒）
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, fields = line.partition(':')
+        self_us, total_us, name = (field.strip() for field in fields.split('|', 2))
+        cumulative[name] = int(total_us)
+    return cumulative
+
+
+def measure_import(module, repeat):
+    """
+    在全新的解释器中导入模块，返回最佳累计耗时与加载的重量级依赖
+
+    Args:
+        module (str): 模块名
+        repeat (int): 重复次数 (取最佳)
+
+    Returns:
+        dict: import_ms (最佳导入耗时，毫秒) 与 heavy_imports (被加载的重量级依赖)
+    """
+    best = None
+    heavy = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=ROOT, capture_output=True, text=True, check=True)
+        cumulative = parse_importtime(result.stderr)
+        elapsed = cumulative.get(module, 0) / 1000
+        best = elapsed if best is None else min(best, elapsed)
+        heavy = [name for name in HEAVY_MODULES if name in cumulative]
+    return {'import_ms': best, 'heavy_imports': heavy}
+
+
+def measure_help(module, repeat):
+    """返回 python -m <module> --help 的最佳墙钟时间（毫秒），包括解释器启动"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', module, '--help'], cwd=ROOT, capture_output=True, check=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare(report, baseline, tolerance, slack_ms):
+    """
+    与基线比较，返回回归描述列表
+
+    导入耗时超过 基线 * (1 + tolerance) + slack_ms 视为回归；slack_ms 吸收小模块上的计时抖动。
+    """
+    regressions = []
+    for module, result in report['modules'].items():
+        base = baseline.get('modules', {}).get(module)
+        if not base:
+            continue
+        for metric in ('import_ms', 'help_ms'):
+            limit = base[metric] * (1 + tolerance) + slack_ms
+            if result[metric] > limit:
+                regressions.append(f"{module} {metric}: {result[metric]:.1f} ms > 基线 {base[metric]:.1f} ms 的上限 {limit:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='命令行冷启动 (导入耗时) 基准')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数 (取最佳)')
+    parser.add_argument('--modules', nargs='+', default=list(ENTRY_MODULES), help='要测量的入口模块')
+    parser.add_argument('--baseline', default=None, help='基线JSON文件路径')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基线文件')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='相对基线允许的增幅')
+    parser.add_argument('--slack-ms', type=float, default=20.0, help='额外允许的绝对增量（毫秒）')
+    args = parser.parse_args()
+
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat, 'modules': {}}
+    for module in args.modules:
+        result = measure_import(module, args.repeat)
+        result['help_ms'] = measure_help(module, args.repeat)
+        report['modules'][module] = result
+        heavy = ', '.join(result['heavy_imports']) or '无'
+        print(f"{module:>12}: 导入 {result['import_ms']:8.1f} ms  --help {result['help_ms']:8.1f} ms  重量级依赖: {heavy}")
+
+    failures = [f"{module} 在导入时加载了 {', '.join(result['heavy_imports'])}"
+                for module, result in report['modules'].items() if result['heavy_imports']]
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            failures += compare(report, json.load(f), args.tolerance, args.slack_ms)
+
+    print(json.dumps(report, ensure_ascii=False))
+    for failure in failures:
+        print(f"回归: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
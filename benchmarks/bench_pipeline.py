@@ -0,0 +1,423 @@
+"""
+端到端流程基准：用 ffmpeg lavfi 生成确定性的合成视频 (testsrc2画面、drawtext烧录字幕、正弦音或静音音轨)，
+以可配置延迟的模拟AI服务运行完整的 process_video 流程，报告不同视频时长与帧率下各阶段的吞吐量
+
+模拟AI服务按正常流程构建 AIService 后只替换 QwenAPI / GeminiAPI 客户端，文本路由、视觉熔断、指标与剖析逻辑照常执行；
+字幕提取按帧号换算的时间返回该时刻烧录的字幕，因此字幕去重与合并处理的是真实规模的数据。
+未安装Whisper时 (或指定 --transcriber fake) 转录由按实时率休眠的模拟转录器代替。
+
+用法:
+    python -m benchmarks.bench_pipeline [--lengths 30 120] [--frame-rates 1 5] [--vision-latency fixed:0.05]
+                                        [--text-latency fixed:0.5] [--audio tone] [--transcriber auto]
+                                        [--output bench_report.json] [--baseline benchmarks/pipeline_baseline.json]
+                                        [--update-baseline] [--tolerance 0.25]
+"""
+
+import argparse
+import base64
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+from benchmarks.mock_ai_server import parse_latency
+from src import config
+from src import metrics
+from src import profiling
+from src.ai_service import AIService
+from src.audio_transcriber import AudioTranscriber
+from src.main import clean_output_directory, configure_video, process_video
+from src.summarizer import Summarizer
+from src.visual_extractor import VisualExtractor
+
+NO_SUBTITLE = "无字幕"
+
+
+def make_captions(seconds, interval=4.0, duration=3.0):
+    """
+    生成确定性的字幕时间表：每interval秒出现一条、持续duration秒
+
+    Args:
+        seconds (float): 视频时长（秒）
+        interval (float, optional): 相邻字幕的起始间隔（秒）
+        duration (float, optional): 每条字幕的持续时间（秒）
+
+    Returns:
+        list: 字幕列表，每项包含 start, end, text
+    """
+    captions = []
+    start = 0.5
+    while start + duration <= seconds:
+        index = len(captions) + 1
+        captions.append({'start': start, 'end': start + duration,
+                         'text': f"Line {index} the quick brown fox jumps over lazy dog {index * 7 % 100}"})
+        start += interval
+    return captions
+
+
+def synthetic_video_command(path, seconds, fps=25, size='640x360', audio='tone', captions=(), font=None):
+    """
+    构建生成合成视频的 ffmpeg 命令
+
+    画面为 testsrc2 测试图案，字幕用 drawtext 按时间烧录在底部；音轨为440Hz正弦音 (tone) 或静音 (silence)。
+    使用内置的 mpeg4/aac 编码器与 bitexact 标志，同一参数在同一版本的ffmpeg上生成相同的文件。
+
+    Args:
+        path (str): 输出视频路径
+        seconds (float): 视频时长（秒）
+        fps (int, optional): 源视频帧率
+        size (str, optional): 分辨率
+        audio (str, optional): 'tone' 或 'silence'
+        captions (list, optional): make_captions 返回的字幕列表
+        font (str, optional): drawtext 使用的字体文件，默认由fontconfig选择
+
+    Returns:
+        list: 命令参数列表
+    """
+    if audio not in ('tone', 'silence'):
+        raise ValueError(f"无效的音轨类型: {audio}")
+    video_source = f"testsrc2=size={size}:rate={fps}:duration={seconds}"
+    if audio == 'tone':
+        audio_source = f"sine=frequency=440:sample_rate=16000:duration={seconds}"
+    else:
+        audio_source = "anullsrc=channel_layout=mono:sample_rate=16000"
+
+    font_option = f"fontfile={font}:" if font else ""
+    filters = [
+        f"drawtext={font_option}text='{caption['text']}':fontsize=28:fontcolor=white:box=1:boxcolor=black@0.6:"
+        f"x=(w-text_w)/2:y=h-60:enable='between(t,{caption['start']:.3f},{caption['end']:.3f})'"
+        for caption in captions
+    ]
+    command = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+               '-f', 'lavfi', '-i', video_source, '-f', 'lavfi', '-i', audio_source]
+    if filters:
+        command += ['-vf', ','.join(filters)]
+    command += ['-t', str(seconds), '-c:v', 'mpeg4', '-q:v', '5', '-c:a', 'aac', '-threads', '1',
+                '-fflags', '+bitexact', '-flags:v', '+bitexact', '-flags:a', '+bitexact', path]
+    return command
+
+
+def synthetic_video_name(seconds, fps=25, size='640x360', audio='tone', font=None):
+    """
+    合成视频的文件名：包含所有影响画面与编码的参数，参数不同的视频不会被误当作缓存复用
+
+    Returns:
+        str: 文件名，如 synthetic_30s_25fps_640x360_tone.mp4
+    """
+    font_tag = f"_font{hashlib.sha1(os.path.abspath(font).encode('utf-8')).hexdigest()[:8]}" if font else ""
+    return f"synthetic_{seconds}s_{fps}fps_{size}_{audio}{font_tag}.mp4"
+
+
+def generate_video(path, seconds, fps=25, size='640x360', audio='tone', captions=(), font=None):
+    """生成合成视频 (已存在时直接复用，路径应由 synthetic_video_name 生成)，返回视频路径"""
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{os.path.splitext(path)[0]}.tmp.mp4"
+    try:
+        subprocess.run(synthetic_video_command(temp_path, seconds, fps, size, audio, captions, font), check=True)
+    except FileNotFoundError:
+        raise RuntimeError("FFmpeg未安装或不在系统路径中")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"生成合成视频失败: {e}")
+    os.replace(temp_path, path)
+    return path
+
+
+def caption_at(captions, timestamp):
+    """返回该时刻显示的字幕文本，没有时返回None"""
+    for caption in captions:
+        if caption['start'] <= timestamp < caption['end']:
+            return caption['text']
+    return None
+
+
+class _LatencySampler:
+    """线程安全的延迟采样器"""
+
+    def __init__(self, spec, seed):
+        self._sample = parse_latency(spec)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self):
+        with self._lock:
+            delay = self._sample(self._rng)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _EncodedImage(str):
+    """base64编码的图像，附带原始路径 (模拟字幕提取据此查找烧录的字幕)"""
+
+    path = None
+
+
+class FakeTextAPI:
+    """模拟的 GeminiAPI：按延迟返回固定格式的摘要"""
+
+    def __init__(self, latency='fixed:0', seed=0, provider='gemini', stream_chunks=8):
+        self.provider = provider
+        self.model_name = 'gemini-2.5-pro'
+        self.temperature = 0.2
+        self.stream_chunks = stream_chunks
+        self._latency = _LatencySampler(latency, seed)
+
+    def _summary(self, prompt):
+        return f"合成视频摘要：输入 {len(prompt)} 字符。" + "视频展示了测试图案与按时间出现的字幕。" * 4
+
+    def generate_text(self, prompt):
+        elapsed = metrics.timer()
+        self._latency.sleep()
+        result = self._summary(prompt)
+        metrics.observe_text_call(self.provider, elapsed(), True, len(prompt) // 2, len(result) // 2)
+        return result
+
+    def generate_text_stream(self, prompt):
+        elapsed = metrics.timer()
+        self._latency.sleep()
+        result = self._summary(prompt)
+        size = max(1, len(result) // self.stream_chunks)
+        for start in range(0, len(result), size):
+            yield result[start:start + size]
+        metrics.observe_text_call(self.provider, elapsed(), True, len(prompt) // 2, len(result) // 2)
+
+
+class FakeVisionAPI(FakeTextAPI):
+    """模拟的 QwenAPI：真实读取并编码图像，按帧时间返回烧录的字幕；文本生成与 FakeTextAPI 相同"""
+
+    SUBTITLE_PROMPT = "benchmark"
+
+    def __init__(self, captions, frame_rate, latency='fixed:0', text_latency='fixed:0', seed=0):
+        super().__init__(text_latency, seed + 2, provider='qwen')
+        self.captions = captions
+        self.frame_rate = frame_rate
+        self.vision_model = 'fake-vision'
+        self.text_model = 'qwen-plus'
+        self._vision_latency = _LatencySampler(latency, seed)
+
+    def image_to_base64(self, image_path):
+        with open(image_path, 'rb') as f:
+            encoded = _EncodedImage(base64.b64encode(f.read()).decode('utf-8'))
+        encoded.path = image_path
+        return encoded
+
+    def extract_subtitles(self, image_base64):
+        self._vision_latency.sleep()
+        match = re.search(r'frame_(\d+)', os.path.basename(image_base64.path))
+        timestamp = (int(match.group(1)) - 1) / self.frame_rate if match else -1
+        return caption_at(self.captions, timestamp) or NO_SUBTITLE
+
+
+class FakeAIService(AIService):
+    """
+    模拟的AI服务：按正常流程构建 AIService (文本路由器、视觉熔断器随config创建)，
+    再把 QwenAPI / GeminiAPI 客户端替换为 FakeVisionAPI / FakeTextAPI
+    """
+
+    def __init__(self, captions, frame_rate, vision_latency='fixed:0', text_latency='fixed:0', seed=0):
+        """
+        Args:
+            captions (list): make_captions 返回的字幕列表
+            frame_rate (float): 流程的输出帧率 (帧号换算为时间)
+            vision_latency (str, optional): 字幕提取调用的延迟分布，见 mock_ai_server.parse_latency
+            text_latency (str, optional): 文本生成调用的延迟分布
+            seed (int, optional): 延迟采样的随机种子
+        """
+        # 真实客户端在首次请求时才创建，这里的密钥不会被使用
+        super().__init__({'qwen': 'benchmark', 'gemini': 'benchmark'})
+        # 路由器按属性调用 self.qwen_api / self.gemini_api，替换后同样经过路由
+        self.qwen_api = FakeVisionAPI(captions, frame_rate, vision_latency, text_latency, seed)
+        self.gemini_api = FakeTextAPI(text_latency, seed + 1)
+        # 基准每次都重新生成摘要，不读写用户的摘要缓存
+        self.summary_cache = None
+
+
+class FakeTranscriber:
+    """模拟的转录器：按 音频时长 × 实时率 休眠，有音调时以字幕时间表作为语音分段"""
+
+    def __init__(self, captions, audio='tone', real_time_factor=0.05):
+        self.captions = captions
+        self.audio = audio
+        self.real_time_factor = real_time_factor
+        self.model_size = 'fake'
+
+    def transcribe(self, audio_path, output_path=None, on_segments=None):
+        with wave.open(audio_path, 'rb') as audio:
+            duration = audio.getnframes() / float(audio.getframerate())
+        time.sleep(duration * self.real_time_factor)
+        segments = [] if self.audio == 'silence' else [
+            {'id': index, 'start': caption['start'], 'end': caption['end'], 'text': caption['text']}
+            for index, caption in enumerate(self.captions)
+        ]
+        result = {'text': ' '.join(segment['text'] for segment in segments), 'segments': segments}
+        if on_segments:
+            on_segments(segments, float('inf'))
+        if output_path:
+            AudioTranscriber.save_transcription(result, output_path)
+        return result
+
+
+def run_case(work_dir, seconds, frame_rate, args):
+    """
+    生成一个合成视频并运行完整流程
+
+    Args:
+        work_dir (str): 工作目录 (视频与输出)
+        seconds (float): 视频时长（秒）
+        frame_rate (int): 流程的输出帧率
+        args (argparse.Namespace): 命令行参数
+
+    Returns:
+        dict: 该用例的总耗时、各阶段耗时与吞吐量、外部调用延迟
+    """
+    captions = make_captions(seconds)
+    video_name = synthetic_video_name(seconds, args.source_fps, args.size, args.audio, args.font)
+    video_path = generate_video(os.path.join(work_dir, 'videos', video_name), seconds,
+                                args.source_fps, args.size, args.audio, captions, args.font)
+    output_dir = os.path.join(work_dir, f"{seconds}s_{frame_rate}fps")
+    clean_output_directory(output_dir)
+    context = configure_video(video_path, output_dir, os.path.join(output_dir, 'final_summary.txt'), frame_rate)
+
+    ai_service = FakeAIService(captions, frame_rate, args.vision_latency, args.text_latency, args.seed)
+    if args.transcriber == 'whisper':
+        transcriber = AudioTranscriber(args.whisper_model)
+        transcriber.load_model() # 模型加载不计入转录阶段
+    else:
+        transcriber = FakeTranscriber(captions, args.audio, args.fake_rtf)
+    visual_extractor = VisualExtractor(ai_service)
+    summarizer = Summarizer(ai_service)
+
+    selected_before = metrics.FRAMES_SELECTED.value()
+    profiler = profiling.start(cprofile=False, trace_memory=False)
+    start = time.perf_counter()
+    try:
+        process_video(context, ai_service, transcriber, visual_extractor, summarizer)
+    finally:
+        wall = time.perf_counter() - start
+        profiling.stop()
+        ai_service.close()
+    report = profiler.report(video_path)
+
+    frames = len([name for name in os.listdir(context.frames_dir) if name.endswith('.png')])
+    analyzed = metrics.FRAMES_SELECTED.value() - selected_before
+    units = {'frames': (frames, 'frames'), 'audio': (seconds, 'video_seconds'),
+             'transcribe': (seconds, 'video_seconds'), 'vision': (analyzed, 'frames'), 'summary': (1, 'summaries')}
+    stages = {}
+    for stage in report['stages']:
+        amount, unit = units.get(stage['name'], (None, None))
+        stages[stage['name']] = {
+            'wall_seconds': stage['wall_seconds'],
+            'cpu_thread_seconds': stage['cpu_thread_seconds'],
+            'throughput': amount / stage['wall_seconds'] if amount is not None and stage['wall_seconds'] else None,
+            'unit': f"{unit}/s" if unit else None
+        }
+    return {
+        'video_seconds': seconds,
+        'frame_rate': frame_rate,
+        'frames_decoded': frames,
+        'frames_analyzed': analyzed,
+        'wall_seconds': wall,
+        'speed_vs_realtime': seconds / wall if wall else None,
+        'stages': stages,
+        'external_calls': report['external_calls']
+    }
+
+
+def compare(report, baseline, tolerance, slack_seconds):
+    """
+    与基线比较各用例的总耗时与阶段耗时，返回回归描述列表
+
+    耗时超过 基线 * (1 + tolerance) + slack_seconds 视为回归。
+    """
+    regressions = []
+    for case, result in report['cases'].items():
+        base = baseline.get('cases', {}).get(case)
+        if not base:
+            continue
+        pairs = [('total', result['wall_seconds'], base['wall_seconds'])]
+        pairs += [(name, stage['wall_seconds'], base['stages'][name]['wall_seconds'])
+                  for name, stage in result['stages'].items() if name in base.get('stages', {})]
+        for name, current, previous in pairs:
+            limit = previous * (1 + tolerance) + slack_seconds
+            if current > limit:
+                regressions.append(f"{case} {name}: {current:.2f}s > 基线 {previous:.2f}s 的上限 {limit:.2f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端流程基准 (合成视频 + 模拟AI服务)')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[30, 120], help='视频时长（秒）')
+    parser.add_argument('--frame-rates', type=int, nargs='+', default=[1, 5], help='流程的输出帧率')
+    parser.add_argument('--source-fps', type=int, default=25, help='合成视频的源帧率')
+    parser.add_argument('--size', default='640x360', help='合成视频的分辨率')
+    parser.add_argument('--audio', choices=['tone', 'silence'], default='tone', help='音轨类型')
+    parser.add_argument('--font', default=None, help='drawtext使用的字体文件')
+    parser.add_argument('--vision-latency', default='fixed:0.05', help='字幕提取调用的延迟分布')
+    parser.add_argument('--text-latency', default='fixed:0.5', help='文本生成调用的延迟分布')
+    parser.add_argument('--transcriber', choices=['auto', 'whisper', 'fake'], default='auto',
+                        help='转录方式 (auto: 安装了Whisper时使用Whisper)')
+    parser.add_argument('--whisper-model', default='tiny', help='Whisper模型大小')
+    parser.add_argument('--fake-rtf', type=float, default=0.05, help='模拟转录器的实时率')
+    parser.add_argument('--seed', type=int, default=0, help='延迟采样的随机种子')
+    parser.add_argument('--work-dir', default=os.path.join('output', 'bench_pipeline'), help='工作目录')
+    parser.add_argument('--output', default=None, help='将结果写入该JSON文件')
+    parser.add_argument('--baseline', default=None, help='基线JSON文件路径')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果覆盖基线文件')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='相对基线允许的增幅')
+    parser.add_argument('--slack-seconds', type=float, default=0.5, help='额外允许的绝对增量（秒）')
+    args = parser.parse_args()
+    if args.transcriber == 'auto':
+        args.transcriber = 'whisper' if importlib.util.find_spec('whisper') else 'fake'
+
+    # 每次运行都重新计算所有阶段，不读取任何缓存
+    config.ARTIFACT_CACHE_ENABLED = False
+    config.SUMMARY_CACHE_ENABLED = False
+
+    report = {
+        'python': sys.version.split()[0],
+        'ffmpeg': shutil.which('ffmpeg'),
+        'settings': {key: getattr(args, key) for key in ('audio', 'source_fps', 'size', 'vision_latency',
+                                                         'text_latency', 'transcriber', 'fake_rtf', 'seed')},
+        'vision_workers': config.VISUAL_EXTRACTION_MAX_WORKERS,
+        'cases': {}
+    }
+    for seconds in args.lengths:
+        for frame_rate in args.frame_rates:
+            case = f"{seconds}s@{frame_rate}fps"
+            result = run_case(args.work_dir, seconds, frame_rate, args)
+            report['cases'][case] = result
+            print(f"{case:>14}: 总耗时 {result['wall_seconds']:7.2f}s  ({result['speed_vs_realtime']:.1f}x 实时)  "
+                  f"解码 {result['frames_decoded']} 帧，分析 {result['frames_analyzed']} 帧")
+            for name, stage in result['stages'].items():
+                throughput = f"{stage['throughput']:.1f} {stage['unit']}" if stage['throughput'] is not None else '-'
+                print(f"{'':>16}{name:<12}{stage['wall_seconds']:7.2f}s  {throughput}")
+
+    failures = []
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            failures = compare(report, json.load(f), args.tolerance, args.slack_seconds)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至: {args.output}")
+
+    for failure in failures:
+        print(f"回归: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+字幕相似度微基准：对比原 difflib.SequenceMatcher 实现与 text_similarity 各后端
+
+用法:
+    python -m benchmarks.bench_similarity [--pairs 2000] [--length 120] [--threshold 0.95]
+"""
+
+import argparse
+import json
+import random
+import time
+from difflib import SequenceMatcher
+
+from src import text_similarity
+
+# 生成测试文本使用的字符集 (中英文混合，模拟VLM输出)
+_ALPHABET = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞 ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def legacy_is_similar(text1, text2, threshold):
+    """原实现：直接调用 SequenceMatcher(...).ratio()"""
+    if text1 == text2:
+        return True
+    if not text1 or not text2:
+        return False
+    return SequenceMatcher(None, text1, text2).ratio() >= threshold
+
+
+def make_pairs(count, length, seed=42):
+    """
+    生成相邻字幕对：约一半为轻微改动的近重复，另一半为不相关文本
+    """
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        base = ''.join(rng.choice(_ALPHABET) for _ in range(length))
+        if rng.random() < 0.5:
+            chars = list(base)
+            for _ in range(rng.randint(0, max(1, length // 20))):
+                chars[rng.randrange(len(chars))] = rng.choice(_ALPHABET)
+            other = ''.join(chars)
+        else:
+            other = ''.join(rng.choice(_ALPHABET) for _ in range(rng.randint(length // 2, length * 2)))
+        pairs.append((base, other))
+    return pairs
+
+
+def time_it(func, pairs, threshold, repeat):
+    """返回最佳耗时 (秒) 与判定结果列表"""
+    best = float('inf')
+    decisions = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decisions = [func(a, b, threshold) for a, b in pairs]
+        best = min(best, time.perf_counter() - start)
+    return best, decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕相似度微基准')
+    parser.add_argument('--pairs', type=int, default=2000, help='字幕对数量')
+    parser.add_argument('--length', type=int, default=120, help='单条字幕的平均字符数')
+    parser.add_argument('--threshold', type=float, default=0.95, help='相似度阈值')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数 (取最佳)')
+    args = parser.parse_args()
+
+    pairs = make_pairs(args.pairs, args.length)
+    report = {'pairs': args.pairs, 'length': args.length, 'threshold': args.threshold, 'results': {}}
+
+    legacy_time, legacy_decisions = time_it(legacy_is_similar, pairs, args.threshold, args.repeat)
+    report['results']['legacy_difflib'] = {'seconds': legacy_time, 'speedup': 1.0, 'agreement': 1.0}
+
+    for backend in text_similarity.available_backends():
+        func = lambda a, b, t, backend=backend: text_similarity.is_similar(a, b, t, backend)
+        elapsed, decisions = time_it(func, pairs, args.threshold, args.repeat)
+        agreement = sum(1 for x, y in zip(decisions, legacy_decisions) if x == y) / len(pairs)
+        report['results'][backend] = {
+            'seconds': elapsed,
+            'speedup': legacy_time / elapsed if elapsed else float('inf'),
+            'agreement': agreement
+        }
+
+    for name, result in report['results'].items():
+        print(f"{name:>16}: {result['seconds'] * 1000:9.2f} ms  加速 {result['speedup']:6.2f}x  判定一致率 {result['agreement']:.4f}")
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+本地AI服务模拟器：实现QwenAPI (OpenAI兼容 chat/completions) 与 GeminiAPI (generateContent) 使用的接口，
+用于离线压测与端到端测试，不消耗真实配额
+
+用法:
+    python -m benchmarks.mock_ai_server [--port 8765] [--latency lognormal:-0.7,0.5] [--rate-429 0.05] [--response echo]
+
+然后将客户端指向模拟器:
+    QWEN_BASE_URL=http://127.0.0.1:8765/v1 GEMINI_BASE_URL=http://127.0.0.1:8765 python -m src.main <video>
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SUBTITLE = "无字幕"
+DEFAULT_TEXT = "这是模拟器生成的视频内容摘要。"
+
+_GEMINI_PATH = re.compile(r'^/(?P<version>v1(?:beta|alpha)?)/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$')
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布描述并返回采样函数
+
+    支持:
+        fixed:0.2            固定0.2秒
+        uniform:0.1,0.5      [0.1, 0.5] 均匀分布
+        normal:0.3,0.05      正态分布 (均值, 标准差)，截断到0以上
+        lognormal:-1.0,0.5   对数正态分布 (对数均值, 对数标准差)，适合模拟长尾延迟
+
+    Args:
+        spec (str): 延迟分布描述
+
+    Returns:
+        callable: 接收random.Random实例、返回延迟秒数的函数
+    """
+    kind, _, params = spec.partition(':')
+    try:
+        values = [float(v) for v in params.split(',')] if params else []
+    except ValueError:
+        raise ValueError(f"无效的延迟参数: {spec}")
+
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal' and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"无效的延迟分布: {spec}")
+
+
+class MockAIServer:
+    """
+    在后台线程中运行的模拟AI服务
+
+    - POST {prefix}/chat/completions: OpenAI兼容接口 (含 stream=true 的SSE流)；带图片的请求视为字幕提取
+    - POST /v1beta/models/{model}:generateContent 与 :streamGenerateContent?alt=sse: Gemini接口
+    - GET /stats: 返回请求计数统计
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency='fixed:0', rate_429=0.0, response='canned',
+                 canned_text=DEFAULT_TEXT, canned_subtitle=DEFAULT_SUBTITLE, stream_chunks=8, seed=None):
+        """
+        Args:
+            host (str, optional): 监听地址
+            port (int, optional): 监听端口，0表示自动分配
+            latency (str, optional): 延迟分布描述，见 parse_latency
+            rate_429 (float, optional): 返回429 (Too Many Requests) 的概率
+            response (str, optional): 'canned' 返回固定文本，'echo' 回显提示词
+            canned_text (str, optional): 文本生成请求的固定返回内容
+            canned_subtitle (str, optional): 字幕提取 (带图片) 请求的固定返回内容
+            stream_chunks (int, optional): 流式响应拆分的片段数
+            seed (int, optional): 随机种子
+        """
+        if response not in ('canned', 'echo'):
+            raise ValueError(f"未知的响应模式: {response}")
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.response = response
+        self.canned_text = canned_text
+        self.canned_subtitle = canned_subtitle
+        self.stream_chunks = max(1, stream_chunks)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.stats = {'requests': 0, 'throttled': 0, 'openai': 0, 'gemini': 0, 'vision': 0, 'stream': 0}
+        self._stats_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self):
+        """供 QWEN_BASE_URL 使用的地址"""
+        return f"{self.url}/v1"
+
+    def start(self):
+        """在后台线程中启动服务，返回自身"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-ai-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- 请求处理 ---
+
+    def _count(self, *keys):
+        with self._stats_lock:
+            for key in keys:
+                self.stats[key] += 1
+
+    def _draw(self):
+        """采样本次请求的 (延迟, 是否限流)"""
+        with self._rng_lock:
+            return self.sample_latency(self._rng), self._rng.random() < self.rate_429
+
+    def _reply_text(self, prompt, vision):
+        if vision:
+            return self.canned_subtitle
+        return prompt if self.response == 'echo' else self.canned_text
+
+    def _split(self, text):
+        """将文本拆分为流式片段"""
+        size = max(1, -(-len(text) // self.stream_chunks))
+        return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass # 压测时避免大量访问日志
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_sse(self, events, delay):
+                """发送SSE事件流，总延迟平均分摊到各事件之间"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for event in events:
+                    time.sleep(delay)
+                    data = event if isinstance(event, str) else json.dumps(event, ensure_ascii=False)
+                    self.wfile.write(f"data: {data}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                self.close_connection = True
+
+            def _throttle(self, gemini):
+                server._count('throttled')
+                if gemini:
+                    payload = {'error': {'code': 429, 'message': 'Resource has been exhausted (mock)', 'status': 'RESOURCE_EXHAUSTED'}}
+                else:
+                    payload = {'error': {'message': 'Rate limit exceeded (mock)', 'type': 'rate_limit_error', 'code': 'rate_limit_exceeded'}}
+                self._send_json(429, payload, {'Retry-After': '1'})
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/stats':
+                    with server._stats_lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {'error': {'message': f"未知路径: {self.path}"}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._send_json(400, {'error': {'message': '请求体不是有效的JSON'}})
+                    return
+
+                path, _, _ = self.path.partition('?')
+                server._count('requests')
+                if path.endswith('/chat/completions'):
+                    self._handle_openai(body)
+                    return
+                match = _GEMINI_PATH.match(path)
+                if match:
+                    self._handle_gemini(body, match.group('model'), match.group('method') == 'streamGenerateContent')
+                    return
+                self._send_json(404, {'error': {'message': f"未知路径: {self.path}"}})
+
+            def _handle_openai(self, body):
+                server._count('openai')
+                latency, throttled = server._draw()
+                if throttled:
+                    self._throttle(False)
+                    return
+
+                prompt, vision = '', False
+                for message in body.get('messages', []):
+                    content = message.get('content')
+                    if isinstance(content, list):
+                        for part in content:
+                            if part.get('type') == 'image_url':
+                                vision = True
+                            elif part.get('type') == 'text':
+                                prompt = part.get('text', '')
+                    elif message.get('role') == 'user':
+                        prompt = content or ''
+                if vision:
+                    server._count('vision')
+                text = server._reply_text(prompt, vision)
+                model = body.get('model', 'mock')
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                created = int(time.time())
+
+                if body.get('stream'):
+                    server._count('stream')
+                    pieces = server._split(text)
+                    events = [{
+                        'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': piece}, 'finish_reason': None}]
+                    } for piece in pieces]
+                    events.append({
+                        'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                        'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+                    })
+                    events.append('[DONE]')
+                    self._send_sse(events, latency / len(events))
+                    return
+
+                time.sleep(latency)
+                self._send_json(200, {
+                    'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': len(prompt), 'completion_tokens': len(text), 'total_tokens': len(prompt) + len(text)}
+                })
+
+            def _handle_gemini(self, body, model, stream):
+                server._count('gemini')
+                latency, throttled = server._draw()
+                if throttled:
+                    self._throttle(True)
+                    return
+
+                prompt = ''.join(
+                    part.get('text', '')
+                    for content in body.get('contents', [])
+                    for part in content.get('parts', [])
+                )
+                text = server._reply_text(prompt, False)
+
+                def response(piece, finished):
+                    candidate = {'content': {'role': 'model', 'parts': [{'text': piece}]}, 'index': 0}
+                    if finished:
+                        candidate['finishReason'] = 'STOP'
+                    return {
+                        'candidates': [candidate],
+                        'usageMetadata': {'promptTokenCount': len(prompt), 'candidatesTokenCount': len(text)},
+                        'modelVersion': model
+                    }
+
+                if stream:
+                    server._count('stream')
+                    pieces = server._split(text)
+                    events = [response(piece, i == len(pieces) - 1) for i, piece in enumerate(pieces)]
+                    self._send_sse(events, latency / len(events))
+                    return
+
+                time.sleep(latency)
+                self._send_json(200, response(text, True))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地OpenAI/Gemini兼容模拟服务 (离线压测)')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--latency', default='fixed:0', help='延迟分布: fixed:S / uniform:A,B / normal:MU,SIGMA / lognormal:MU,SIGMA')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='返回429的概率 (0~1)')
+    parser.add_argument('--response', choices=['canned', 'echo'], default='canned', help='固定文本或回显提示词')
+    parser.add_argument('--canned-text', default=DEFAULT_TEXT, help='文本生成请求的固定返回内容')
+    parser.add_argument('--canned-subtitle', default=DEFAULT_SUBTITLE, help='字幕提取请求的固定返回内容')
+    parser.add_argument('--stream-chunks', type=int, default=8, help='流式响应拆分的片段数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    server = MockAIServer(
+        args.host, args.port, args.latency, args.rate_429, args.response,
+        args.canned_text, args.canned_subtitle, args.stream_chunks, args.seed
+    )
+    print(f"模拟AI服务已启动: {server.url}")
+    print(f"  QWEN_BASE_URL={server.openai_base_url}")
+    print(f"  GEMINI_BASE_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,23 @@
 """
 AI服务模块：封装Qwen和Gemini API调用
+
+openai 与 google.genai 的导入各需数百毫秒，推迟到首次创建SDK客户端时进行；
+环境变量 (.env) 由 config 模块导入时加载一次。
 """
 
 import os
 import base64
+import threading
 from io import BytesIO
-from openai import OpenAI
-from dotenv import load_dotenv
-from google import genai  # 使用新的导入方式
-from google.genai import types
+
+from . import config
+from . import http_transport
+from .provider_router import ProviderRouter
+from .token_budget import estimate_tokens
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from . import summary_cache
+from . import profiling
+from . import metrics
 
 
 class AIService:
@@ -21,9 +30,6 @@ class AIService:
         Args:
             api_keys (dict, optional): 包含不同AI服务的API密钥
         """
-        # 加载环境变量
-        load_dotenv()
-
         self.api_keys = api_keys or {}
         self.qwen_api = None
         self.gemini_api = None
@@ -48,6 +54,20 @@ class AIService:
                 # 如果环境变量中没有Gemini API密钥，则不初始化GeminiAPI
                 print(f"注意: {e}")
 
+        # 同时配置了Gemini和Qwen时，文本生成经由延迟感知路由器 (择优、对冲、故障切换)
+        self.text_router = None
+        if config.TEXT_PROVIDER_ROUTING and self.gemini_api and self.qwen_api:
+            self.text_router = ProviderRouter([
+                ('gemini', lambda prompt: self.gemini_api.generate_text(prompt)),
+                ('qwen', lambda prompt: self.qwen_api.generate_text(prompt))
+            ])
+
+        # 文本生成 (摘要) 结果缓存，可通过config.SUMMARY_CACHE_ENABLED或--no-summary-cache关闭
+        self.summary_cache = summary_cache.SummaryCache() if config.SUMMARY_CACHE_ENABLED else None
+
+        # 视觉调用熔断器：服务故障时快速失败，避免每一帧都等待超时
+        self.vision_breaker = CircuitBreaker("vision") if config.CIRCUIT_BREAKER_ENABLED else None
+
     def describe_image(self, image_path):
         """
         描述图像内容
@@ -57,23 +77,52 @@ class AIService:
 
         Returns:
             str: 图像描述文本
+
+        Raises:
+            CircuitOpenError: 视觉服务熔断期间直接抛出，不发送请求
         """
         if self.qwen_api:
             # 将图像转为base64
             image_base64 = self.qwen_api.image_to_base64(image_path)
-            return self.qwen_api.extract_subtitles(image_base64)
+            elapsed = metrics.timer()
+            outcome = 'error'
+            try:
+                with profiling.external_call('vision'):
+                    if self.vision_breaker is None:
+                        subtitle = self.qwen_api.extract_subtitles(image_base64)
+                    else:
+                        subtitle = self.vision_breaker.call(self.qwen_api.extract_subtitles, image_base64)
+                outcome = 'success'
+                return subtitle
+            except CircuitOpenError:
+                outcome = 'rejected' # 熔断期间未发送请求
+                raise
+            finally:
+                metrics.VISION_CALLS.observe(elapsed(), outcome=outcome)
         else:
             raise ValueError("未配置Qwen API密钥，无法提取图像字幕")
 
-    def summarize_text(self, text, use_gemini=True):
+    def vision_signature(self):
+        """
+        返回决定字幕提取结果的模型与提示词 (用于逐帧视觉结果缓存的键)
+
+        Returns:
+            dict: 包含视觉模型名称和提示词
+        """
+        if not self.qwen_api:
+            return None
+        return {'model': self.qwen_api.vision_model, 'prompt': self.qwen_api.SUBTITLE_PROMPT}
+
+    def summarize_text(self, text, use_gemini=True, stream=False):
         """
         摘要文本内容
 
         Args:
             text (str): 需要摘要的文本
+            stream (bool, optional): 是否流式返回
 
         Returns:
-            str: 摘要文本
+            str: 摘要文本 (stream为True时返回逐块产出文本的生成器)
         """
         # 构建提示词
         prompt = f"""请对以下游戏视频字幕内容进行摘要总结：
@@ -90,30 +139,168 @@ class AIService:
 """
 
         # 调用 generate_text 方法，使用 Gemini 模型
+        return self.generate_text(prompt, use_gemini, stream)
+
+    def summarize_chunk(self, text, index, total, use_gemini=True):
+        """
+        摘要长视频中的一个时间分段 (map-reduce摘要的map阶段)
+
+        Args:
+            text (str): 该分段的文本
+            index (int): 分段序号 (从1开始)
+            total (int): 分段总数
+
+        Returns:
+            str: 分段摘要
+        """
+        prompt = f"""以下是一段游戏视频内容的第 {index}/{total} 部分（按时间顺序），包含语音转录和/或字幕：
+
+{text}
+
+请对这一部分进行摘要，保留其中的关键事件、人物、结论和数字，按时间顺序叙述。
+
+重要说明：
+1. 直接提供摘要内容，不要加上"以下是总结"、"总结如下"等引导语
+2. 不要评价视频或自己的摘要
+3. 不要添加任何元描述或说明
+"""
         return self.generate_text(prompt, use_gemini)
 
-    def generate_text(self, prompt, use_gemini=True):
+    def combine_summaries(self, summaries, final=True, use_gemini=True, stream=False):
+        """
+        合并多个按时间顺序排列的分段摘要 (map-reduce摘要的reduce阶段)
+
+        Args:
+            summaries (list): 分段摘要列表 (按时间顺序)
+            final (bool, optional): 是否为最后一层合并，最后一层输出完整的视频总结
+            stream (bool, optional): 是否流式返回
+
+        Returns:
+            str: 合并后的摘要 (stream为True时返回逐块产出文本的生成器)
+        """
+        numbered = "\n\n".join(f"第{i}部分：\n{summary}" for i, summary in enumerate(summaries, 1))
+        if final:
+            requirement = """请将这些分段摘要整合成对整个视频的一个简洁、全面的总结，概括视频的主要内容和关键点。
+总结应该保持连贯、逻辑清晰，并提取内容中最重要的信息。"""
+        else:
+            requirement = "请将这些连续分段的摘要合并为一段按时间顺序叙述的摘要，保留关键事件和细节。"
+
+        prompt = f"""以下是一段游戏视频按时间顺序排列的分段摘要：
+
+{numbered}
+
+{requirement}
+
+重要说明：
+1. 直接提供总结内容，不要加上"以下是总结"、"总结如下"等引导语
+2. 不要在回答中评价自己的总结
+3. 不要添加任何元描述或说明
+"""
+        return self.generate_text(prompt, use_gemini, stream)
+
+    def text_models(self, use_gemini=True):
+        """
+        返回可能处理文本生成请求的模型名称列表 (用于计算token预算)
+
+        Args:
+            use_gemini (bool, optional): 与 generate_text 的同名参数含义相同
+
+        Returns:
+            list: 模型名称列表
+        """
+        if use_gemini and self.text_router:
+            return [self.gemini_api.model_name, self.qwen_api.text_model]
+        if use_gemini and self.gemini_api:
+            return [self.gemini_api.model_name]
+        if self.qwen_api:
+            return [self.qwen_api.text_model]
+        return []
+
+    def _text_model_params(self, use_gemini=True):
+        """返回可能处理请求的 (模型名称, 温度) 列表，作为摘要缓存键的一部分"""
+        params = []
+        if use_gemini and self.gemini_api:
+            params.append((self.gemini_api.model_name, self.gemini_api.temperature))
+        if self.qwen_api and (not params or self.text_router):
+            params.append((self.qwen_api.text_model, None)) # Qwen文本请求使用服务端默认温度
+        return params
+
+    def generate_text(self, prompt, use_gemini=True, stream=False, use_cache=True):
         """
         使用文本生成模型生成内容
 
+        启用摘要缓存时，相同的 (规范化提示词, 模型, 温度) 直接返回缓存结果，未命中时生成后写回缓存。
+
         Args:
             prompt (str): 提示词
-            use_gemini (bool, optional): 是否使用Gemini模型，默认为True
+            use_gemini (bool, optional): 是否使用Gemini模型，默认为True；
+                                         启用路由时表示由路由器在Gemini与Qwen之间选择
+            stream (bool, optional): 是否使用流式接口，默认为False
+            use_cache (bool, optional): 是否使用摘要缓存，默认为True
 
         Returns:
-            str: 生成的文本
+            str: 生成的文本 (stream为True时返回逐块产出文本的生成器)
         """
-        if use_gemini and self.gemini_api:
-            return self.gemini_api.generate_text(prompt)
+        if not use_cache or self.summary_cache is None:
+            return self._generate_text(prompt, use_gemini, stream)
+
+        models = self._text_model_params(use_gemini)
+        key = summary_cache.make_key(prompt, models)
+        # --force-stage summary: 不读取缓存，重新生成后覆盖写入
+        cached = None if 'summary' in config.FORCE_STAGES else self.summary_cache.get(key)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+
+        if not stream:
+            result = self._generate_text(prompt, use_gemini)
+            self.summary_cache.set(key, result, models)
+            return result
+        return self._stream_and_cache(self._generate_text(prompt, use_gemini, True), key, models)
+
+    def _stream_and_cache(self, chunks, key, models):
+        """透传流式片段，完整生成后写入缓存 (中途中断则不写入)"""
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+        self.summary_cache.set(key, ''.join(collected), models)
+
+    def _generate_text(self, prompt, use_gemini=True, stream=False):
+        """选择服务并生成文本 (不经过缓存)"""
+        if use_gemini and self.text_router:
+            if not stream:
+                with profiling.external_call('text'):
+                    return self.text_router.call(prompt)
+            # 流式请求无法对冲，直接发往当前最快的健康服务
+            api = self.gemini_api if self.text_router.ordered_providers()[0] == 'gemini' else self.qwen_api
+        elif use_gemini and self.gemini_api:
+            api = self.gemini_api
         elif self.qwen_api:
-            return self.qwen_api.generate_text(prompt)
+            api = self.qwen_api
         else:
             raise ValueError("未配置可用的文本生成API")
+        if stream:
+            return profiling.track_stream('text', api.generate_text_stream(prompt))
+        with profiling.external_call('text'):
+            return api.generate_text(prompt)
+
 
+    def close(self):
+        """释放文本路由器的请求线程池 (服务不再使用时调用)"""
+        if self.text_router is not None:
+            self.text_router.close()
 
 class QwenAPI:
     """通义千问API封装"""
 
+    # 字幕提取提示词 (修改后逐帧视觉结果的缓存自动失效)
+    SUBTITLE_PROMPT = """请识别并提取这张截图中的字幕文本内容。
+字幕是指视频或游戏画面中作为内容解说或对话的文本，通常与画面内容紧密相关。
+需要区分字幕与UI界面元素（如菜单、状态栏、计分板、玩家名称等）不同。
+只返回真正的字幕文本，忽略所有界面UI元素中的文本。
+不要添加任何解释或描述，只输出字幕内容本身。
+如果没有识别到任何字幕，请回复'无字幕'。"""
+
     def __init__(self, api_key=None, model=None):
         """
         初始化通义千问API
@@ -122,9 +309,6 @@ class QwenAPI:
             api_key (str, optional): API密钥，如果为None则从环境变量中读取
             model (str, optional): 模型名称，如果为None则使用默认模型
         """
-        # 加载环境变量
-        load_dotenv()
-
         # 如果没有提供API密钥，则从环境变量中读取
         self.api_key = api_key or os.getenv('QWEN_API_KEY')
 
@@ -135,13 +319,31 @@ class QwenAPI:
         self.vision_model = "qwen-vl-max-latest"  # 默认视觉模型
         self.text_model = model or "qwen-plus"  # 默认文本模型
 
-        self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-
-        # 初始化OpenAI客户端，配置为使用通义千问的API
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
+        # 可通过环境变量 QWEN_BASE_URL 指向代理或本地模拟服务 (benchmarks/mock_ai_server.py)
+        self.base_url = os.environ.get('QWEN_BASE_URL') or "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+        # OpenAI客户端在首次调用时创建 (见 client 属性)
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI兼容SDK客户端，首次访问时导入openai并创建"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    # 使用进程内共享的连接池 (keep-alive / HTTP/2)，避免多线程下反复建立连接和TLS握手
+                    self._client = OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url,
+                        http_client=http_transport.get_openai_http_client()
+                    )
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
 
     def extract_subtitles(self, image_base64):
         """
@@ -155,12 +357,7 @@ class QwenAPI:
         """
         try:
             # 构建提示词，明确指示模型提取字幕
-            prompt = """请识别并提取这张截图中的字幕文本内容。
-字幕是指视频或游戏画面中作为内容解说或对话的文本，通常与画面内容紧密相关。
-需要区分字幕与UI界面元素（如菜单、状态栏、计分板、玩家名称等）不同。
-只返回真正的字幕文本，忽略所有界面UI元素中的文本。
-不要添加任何解释或描述，只输出字幕内容本身。
-如果没有识别到任何字幕，请回复'无字幕'。"""
+            prompt = self.SUBTITLE_PROMPT
 
             # 使用OpenAI兼容接口调用通义千问VL模型
             response = self.client.chat.completions.create(
@@ -177,7 +374,8 @@ class QwenAPI:
                             {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}}
                         ]
                     }
-                ]
+                ],
+                timeout=config.VISION_REQUEST_TIMEOUT
             )
 
             # 提取结果
@@ -200,8 +398,9 @@ class QwenAPI:
         Returns:
             str: 生成的文本
         """
+        elapsed = metrics.timer()
         try:
-            print(f"使用通义千问模型生成文本: {prompt}")
+            print(f"使用通义千问模型生成文本 (提示词 {len(prompt)} 字符，约 {estimate_tokens(prompt)} tokens)")
             # 使用OpenAI兼容接口调用通义千问文本模型
             response = self.client.chat.completions.create(
                 model=self.text_model,
@@ -209,16 +408,57 @@ class QwenAPI:
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": prompt}
                 ],
+                timeout=config.TEXT_REQUEST_TIMEOUT
             )
 
             # 提取结果
             if response.choices and len(response.choices) > 0:
                 result = response.choices[0].message.content
+                usage = getattr(response, 'usage', None)
+                metrics.observe_text_call('qwen', elapsed(), True,
+                                          getattr(usage, 'prompt_tokens', None) or estimate_tokens(prompt),
+                                          getattr(usage, 'completion_tokens', None) or estimate_tokens(result or ''))
                 return result
             else:
                 raise RuntimeError("API返回结果格式异常")
 
         except Exception as e:
+            metrics.observe_text_call('qwen', elapsed(), False)
+            raise RuntimeError(f"文本生成失败: {str(e)}")
+
+    def generate_text_stream(self, prompt):
+        """
+        使用通义千问模型流式生成文本
+
+        Args:
+            prompt (str): 提示词
+
+        Yields:
+            str: 按到达顺序产出的文本片段
+        """
+        elapsed = metrics.timer()
+        generated = []
+        try:
+            print(f"使用通义千问模型流式生成文本 (提示词 {len(prompt)} 字符，约 {estimate_tokens(prompt)} tokens)")
+            response = self.client.chat.completions.create(
+                model=self.text_model,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                stream=True,
+                timeout=config.TEXT_REQUEST_TIMEOUT
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    generated.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            # 流式响应默认不返回用量，按字符估算
+            metrics.observe_text_call('qwen', elapsed(), True, estimate_tokens(prompt),
+                                      estimate_tokens(''.join(generated)))
+
+        except Exception as e:
+            metrics.observe_text_call('qwen', elapsed(), False)
             raise RuntimeError(f"文本生成失败: {str(e)}")
 
     def image_to_base64(self, image_path):
@@ -253,9 +493,6 @@ class GeminiAPI:
         Args:
             api_key (str, optional): API密钥，如果为None则从环境变量中读取
         """
-        # 加载环境变量
-        load_dotenv()
-
         # 从环境变量或参数获取API密钥
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
         if not self.api_key:
@@ -265,18 +502,42 @@ class GeminiAPI:
         self.model_name = "gemini-2.5-pro-exp-03-25"
         self.temperature = 0.7  # 默认温度参数
 
-        # 设置API选项并初始化客户端
-        self._configure_gemini_api()
+        # 客户端在首次调用时创建 (见 client 属性)
+        self._client = None
+        self._client_lock = threading.Lock()
 
+    @property
+    def client(self):
+        """Google Gen AI SDK客户端，首次访问时导入google.genai并创建"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._configure_gemini_api()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
 
     def _configure_gemini_api(self):
         """配置Google Gemini API客户端"""
+        from google import genai
         # 创建客户端实例
         proxy_url = os.getenv('GEMINI_BASE_URL')
-        self.client = genai.Client(api_key=self.api_key, http_options=types.HttpOptions(api_version='v1beta', base_url=proxy_url))
+        # 使用进程内共享的连接池 (keep-alive / HTTP/2)
+        http_options = http_transport.genai_http_options(api_version='v1beta', base_url=proxy_url)
+        self._client = genai.Client(api_key=self.api_key, http_options=http_options)
 
         print(f"已初始化Gemini API客户端，使用模型: {self.model_name}")
 
+    def _generate_config(self):
+        """文本生成请求的配置 (温度与超时)"""
+        from google.genai import types
+        return types.GenerateContentConfig(
+            temperature=self.temperature,
+            http_options=types.HttpOptions(timeout=http_transport.timeout_ms(config.TEXT_REQUEST_TIMEOUT))
+        )
+
     def generate_text(self, prompt):
         """
         使用Gemini API生成文本
@@ -287,23 +548,66 @@ class GeminiAPI:
         Returns:
             str: 生成的文本
         """
+        elapsed = metrics.timer()
         try:
-            print(f"使用Gemini API生成文本: {prompt}")
+            print(f"使用Gemini API生成文本 (提示词 {len(prompt)} 字符，约 {estimate_tokens(prompt)} tokens)")
 
             # 使用新的SDK调用方式
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
-                config=types.GenerateContentConfig(temperature= self.temperature)
+                config=self._generate_config()
             )
 
             # 提取并返回生成的文本
             if hasattr(response, 'text'):
-                return response.text
+                result = response.text
             elif hasattr(response, 'parts'):
-                return ''.join([part.text for part in response.parts if hasattr(part, 'text')])
+                result = ''.join([part.text for part in response.parts if hasattr(part, 'text')])
             else:
                 raise RuntimeError("API响应格式异常，无法提取生成的文本")
+            self._observe_call(elapsed(), prompt, result, getattr(response, 'usage_metadata', None))
+            return result
+
+        except Exception as e:
+            metrics.observe_text_call('gemini', elapsed(), False)
+            raise RuntimeError(f"Gemini API调用失败: {str(e)}")
+
+    def generate_text_stream(self, prompt):
+        """
+        使用Gemini API流式生成文本
+
+        Args:
+            prompt (str): 提示词
+
+        Yields:
+            str: 按到达顺序产出的文本片段
+        """
+        elapsed = metrics.timer()
+        generated = []
+        usage = None
+        try:
+            print(f"使用Gemini API流式生成文本 (提示词 {len(prompt)} 字符，约 {estimate_tokens(prompt)} tokens)")
+            response = self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=prompt,
+                config=self._generate_config()
+            )
+            for chunk in response:
+                usage = getattr(chunk, 'usage_metadata', None) or usage # 用量随最后的片段返回
+                text = getattr(chunk, 'text', None)
+                if text:
+                    generated.append(text)
+                    yield text
+            self._observe_call(elapsed(), prompt, ''.join(generated), usage)
 
         except Exception as e:
-            raise RuntimeError(f"Gemini API调用失败: {str(e)}")
\ No newline at end of file
+            metrics.observe_text_call('gemini', elapsed(), False)
+            raise RuntimeError(f"Gemini API调用失败: {str(e)}")
+
+    @staticmethod
+    def _observe_call(seconds, prompt, result, usage):
+        """记录成功的调用与token用量 (响应未包含用量时按字符估算)"""
+        metrics.observe_text_call('gemini', seconds, True,
+                                  getattr(usage, 'prompt_token_count', None) or estimate_tokens(prompt),
+                                  getattr(usage, 'candidates_token_count', None) or estimate_tokens(result or ''))
@@ -0,0 +1,320 @@
+"""
+阶段产物存储模块：以阶段输入与参数的摘要值为键 (内容寻址)，持久化保存各处理阶段的输出文件
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+
+from . import config
+
+ARTIFACT_VERSION = 1
+_CHUNK_SIZE = 1024 * 1024
+_EVICT_LOW_WATER = 0.9 # 淘汰到上限的90%为止，避免接近上限时每次保存都触发淘汰
+
+
+def file_digest(path):
+    """
+    计算文件内容的SHA-256摘要
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(stage, params):
+    """
+    计算阶段产物的键
+
+    Args:
+        stage (str): 阶段名称
+        params (dict): 决定阶段输出的全部输入与参数 (如视频摘要、帧率、模型、上游阶段的键)，须可JSON序列化
+
+    Returns:
+        str: SHA-256十六进制摘要
+    """
+    material = json.dumps({'version': ARTIFACT_VERSION, 'stage': stage, 'params': params},
+                          ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _link_or_copy(src, dst):
+    """优先创建硬链接 (不占用额外空间)，跨文件系统等情况下退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def remove_outputs(outputs):
+    """
+    删除阶段的旧输出 (阶段重新计算前调用，避免通过硬链接改写已保存的产物)
+
+    Args:
+        outputs (dict): 输出名称 -> 输出位置
+    """
+    for dest in outputs.values():
+        _remove_path(dest)
+
+
+def _tree_size(path):
+    """文件或目录的总字节数"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(dirpath, filename))
+               for dirpath, _, filenames in os.walk(path) for filename in filenames)
+
+
+def _remove_path(path):
+    """删除文件或目录 (不存在时忽略)"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ArtifactStore:
+    """
+    基于文件的内容寻址产物存储
+
+    每个产物保存为 <存储目录>/<键前两位>/<键>/ 目录，其中 manifest.json 记录输出名称与元数据，
+    输出文件或目录按名称保存在 files/ 下。恢复时以硬链接放回输出位置，写入前会先删除输出位置的旧文件，
+    因此不会通过共享的硬链接改动已保存的产物。超过总大小上限时按最近使用时间淘汰 (LRU)。
+
+    总大小由进程内的索引增量维护：首次保存时扫描一次存储目录，之后 save / put_value / restore 只更新索引，
+    只有索引显示超过上限时才重新扫描 (纳入其他进程的写入) 并淘汰到上限的90%。
+
+    另提供 get_value / put_value 保存小型JSON值 (如逐帧视觉分析结果)。
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        """
+        Args:
+            root (str, optional): 存储目录，默认为config.ARTIFACT_CACHE_DIR
+            max_bytes (int, optional): 最大总字节数，默认为config.ARTIFACT_CACHE_MAX_BYTES
+        """
+        self.root = root or config.ARTIFACT_CACHE_DIR
+        self.max_bytes = max_bytes or config.ARTIFACT_CACHE_MAX_BYTES
+        self.logger = logging.getLogger("ArtifactStore")
+        self._lock = threading.Lock()
+        self._digests = {} # (路径, 大小, 修改时间) -> 文件摘要，避免同一进程内重复读取大文件
+        self._index = None # 产物或缓存值路径 -> [最近使用时间, 大小]，首次需要时扫描存储目录建立
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def digest(self, path):
+        """
+        计算文件摘要 (按路径、大小和修改时间在进程内缓存)
+
+        Args:
+            path (str): 文件路径
+
+        Returns:
+            str: 十六进制摘要
+        """
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._digests:
+            self._digests[memo_key] = file_digest(path)
+        return self._digests[memo_key]
+
+    def restore(self, key, outputs):
+        """
+        将已保存的产物恢复到输出位置
+
+        Args:
+            key (str): make_key 计算的键
+            outputs (dict): 输出名称 -> 输出位置 (文件或目录路径)
+
+        Returns:
+            dict: 保存时的元数据，未命中或产物不完整时返回None
+        """
+        artifact_dir = self._path(key)
+        try:
+            with open(os.path.join(artifact_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        files_dir = os.path.join(artifact_dir, 'files')
+        if set(manifest.get('outputs', [])) != set(outputs) or \
+                not all(os.path.exists(os.path.join(files_dir, name)) for name in outputs):
+            self.misses += 1
+            return None
+
+        for name, dest in outputs.items():
+            src = os.path.join(files_dir, name)
+            _remove_path(dest)
+            if os.path.dirname(dest):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+            if os.path.isdir(src):
+                shutil.copytree(src, dest, copy_function=_link_or_copy)
+            else:
+                _link_or_copy(src, dest)
+
+        try:
+            os.utime(artifact_dir, None) # 刷新最近使用时间，供LRU淘汰
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and artifact_dir in self._index:
+                self._index[artifact_dir][0] = time.time()
+        self.hits += 1
+        self.logger.info(f"阶段产物命中: {manifest.get('stage')} ({key[:12]})")
+        return manifest.get('metadata') or {}
+
+    def save(self, key, stage, outputs, metadata=None):
+        """
+        保存阶段产物 (先写入临时目录再重命名)，并按上限淘汰旧产物
+
+        Args:
+            key (str): make_key 计算的键
+            stage (str): 阶段名称 (仅作为元数据记录)
+            outputs (dict): 输出名称 -> 输出位置 (文件或目录路径)
+            metadata (dict, optional): 恢复时需要的附加信息，须可JSON序列化
+        """
+        artifact_dir = self._path(key)
+        tmp_dir = f"{artifact_dir}.{threading.get_ident()}.tmp"
+        try:
+            _remove_path(tmp_dir)
+            files_dir = os.path.join(tmp_dir, 'files')
+            os.makedirs(files_dir)
+            for name, src in outputs.items():
+                if os.path.isdir(src):
+                    shutil.copytree(src, os.path.join(files_dir, name), copy_function=_link_or_copy)
+                else:
+                    _link_or_copy(src, os.path.join(files_dir, name))
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump({'stage': stage, 'created_at': time.time(), 'outputs': sorted(outputs),
+                           'metadata': metadata or {}}, f, ensure_ascii=False, indent=2)
+            size = _tree_size(tmp_dir)
+            _remove_path(artifact_dir)
+            os.replace(tmp_dir, artifact_dir)
+        except OSError as e:
+            self.logger.warning(f"保存阶段产物失败 ({stage}): {e}")
+            _remove_path(tmp_dir)
+            return
+        if self._track(artifact_dir, size):
+            self._evict()
+
+    def get_value(self, key):
+        """
+        读取小型JSON值
+
+        Args:
+            key (str): make_key 计算的键
+
+        Returns:
+            保存的值，未命中时返回None
+        """
+        path = f"{self._path(key)}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_value(self, key, value):
+        """
+        保存小型JSON值 (只计入总大小，不触发淘汰，由下一次 save 统一淘汰)
+
+        Args:
+            key (str): make_key 计算的键
+            value: 可JSON序列化的值
+        """
+        path = f"{self._path(key)}.json"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"保存缓存值失败: {e}")
+            return
+        self._track(path, size)
+
+    def _track(self, path, size):
+        """
+        在索引中记录新写入的产物或缓存值
+
+        Returns:
+            bool: 索引中的总大小是否超过上限
+        """
+        with self._lock:
+            if self._index is None:
+                self._load_index() # 扫描结果已包含刚写入的路径
+            else:
+                previous = self._index.get(path)
+                self._total_bytes += size - (previous[1] if previous else 0)
+                self._index[path] = [time.time(), size]
+            return self._total_bytes > self.max_bytes
+
+    def _load_index(self):
+        """扫描存储目录重建索引 (调用方须持有锁)"""
+        self._index = {path: [mtime, size] for path, mtime, size in self._entries()}
+        self._total_bytes = sum(size for _, size in self._index.values())
+
+    def _entries(self):
+        """列出所有产物与缓存值 (路径, 最近使用时间, 大小)"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    mtime = os.stat(path).st_mtime
+                    size = _tree_size(path)
+                except OSError:
+                    continue
+                entries.append((path, mtime, size))
+        return entries
+
+    def _evict(self):
+        """超过大小上限时淘汰最久未使用的产物，直到总大小降到上限的90%"""
+        with self._lock:
+            self._load_index() # 重新扫描，纳入其他进程写入或删除的产物
+            if self._total_bytes <= self.max_bytes:
+                return
+            target = self.max_bytes * _EVICT_LOW_WATER
+            for path, (_, size) in sorted(self._index.items(), key=lambda item: item[1][0]):
+                if self._total_bytes <= target:
+                    break
+                _remove_path(path)
+                del self._index[path]
+                self._total_bytes -= size
+
+    def clear(self):
+        """清空存储"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                _remove_path(path)
+            self._index = {}
+            self._total_bytes = 0
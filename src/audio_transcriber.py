@@ -4,8 +4,19 @@
 
 import os
 import json
-import whisper
+import wave
+import threading
 from src import config
+from src import profiling
+from src import metrics
+
+_SAMPLE_RATE = 16000 # Whisper的输入采样率 (VideoProcessor.extract_audio 输出16kHz单声道WAV)
+
+
+def _load_whisper_model(model_size):
+    """加载Whisper模型 (whisper依赖torch，导入需要数秒，推迟到首次加载模型时进行)"""
+    import whisper
+    return whisper.load_model(model_size)
 
 
 class AudioTranscriber:
@@ -20,6 +31,8 @@ class AudioTranscriber:
         """
         self.model_size = model_size
         self.model = None
+        # 共享的模型不支持并发转录 (解码时会在模型上注册kv-cache钩子)，多个视频并发处理时逐个转录
+        self._lock = threading.Lock()
 
     def load_model(self):
         """
@@ -28,43 +41,63 @@ class AudioTranscriber:
         Returns:
             object: 加载的Whisper模型
         """
+        with self._lock:
+            return self._load_model()
+
+    def _load_model(self):
+        """加载Whisper模型 (调用方需持有锁)"""
         if self.model is None:
             try:
-                self.model = whisper.load_model(self.model_size)
+                self.model = _load_whisper_model(self.model_size)
                 print(f"Whisper {self.model_size} 模型加载成功")
             except Exception as e:
                 raise RuntimeError(f"加载 Whisper 模型 '{self.model_size}' 失败: {e}")
         return self.model
 
-    def transcribe(self, audio_path):
+    def transcribe(self, audio_path, output_path=None, on_segments=None, window_seconds=None):
         """
         将音频文件转录为文本
 
         Args:
             audio_path (str): 音频文件路径
-            output_path (str, optional): 输出文件路径，如果提供则保存转录结果到文件
+            output_path (str, optional): 转录JSON文件路径 (通常为RunContext.transcript_path)，默认为config.TRANSCRIPT_PATH
+            on_segments (callable, optional): 分段回调 (segments, upto)，见 transcribe_audio
+            window_seconds (float, optional): 窗口转录的窗口时长（秒），默认为config.TRANSCRIBE_WINDOW_SECONDS
 
         Returns:
             dict: 转录结果，包含文本和时间戳
         """
-        # 使用静态方法进行转录
-        result = self.transcribe_audio(audio_path, self.model_size)
+        # 复用已加载的模型 (批量处理多个视频时只加载一次)
+        with self._lock:
+            result = self.transcribe_audio(audio_path, self.model_size, model=self._load_model(), output_path=output_path,
+                                           on_segments=on_segments, window_seconds=window_seconds)
         return result
 
     @staticmethod
-    def transcribe_audio(audio_path, model_size="tiny"):
+    def transcribe_audio(audio_path, model_size="tiny", model=None, output_path=None, on_segments=None,
+                         window_seconds=None):
         """
         使用Whisper模型将音频转录为文本
 
+        提供on_segments且窗口时长大于0时按时间窗口逐段转录 (上一窗口的文本作为下一窗口的initial_prompt，
+        窗口末尾可能被截断的分段留到下一窗口重新转录)，每完成一个窗口即以该窗口的分段回调，
+        下游 (如视觉阶段的帧选择) 不必等待整段音频转录结束。
+        音频不是16kHz单声道16位WAV时退回整段转录。
+
         Args:
             audio_path (str): 音频文件路径
             model_size (str): Whisper模型大小，默认为"tiny"
+            model (object, optional): 已加载的Whisper模型，为None时按model_size加载
+            output_path (str, optional): 转录JSON文件路径，默认为config.TRANSCRIPT_PATH
+            on_segments (callable, optional): 分段回调 (segments, upto)：segments为新转录的分段 (整段音频中的绝对时间)，
+                                              upto为已转录到的时间（秒）；整段转录时在结束后以全部分段调用一次
+            window_seconds (float, optional): 窗口时长（秒），默认为config.TRANSCRIBE_WINDOW_SECONDS，0表示整段转录
 
         Returns:
             dict: 转录结果，包含文本和时间戳等信息
         """
 
-        output_path = config.TRANSCRIPT_PATH
+        output_path = output_path or config.TRANSCRIPT_PATH
         # 输入校验：检查音频文件是否存在
         if not os.path.isfile(audio_path):
             raise FileNotFoundError(f"音频文件不存在: {audio_path}")
@@ -76,14 +109,25 @@ class AudioTranscriber:
                 os.makedirs(output_dir, exist_ok=True)
 
         # 加载Whisper模型
-        try:
-            model = whisper.load_model(model_size)
-        except Exception as e:
-            raise RuntimeError(f"加载 Whisper 模型 '{model_size}' 失败: {e}")
+        if model is None:
+            try:
+                model = _load_whisper_model(model_size)
+            except Exception as e:
+                raise RuntimeError(f"加载 Whisper 模型 '{model_size}' 失败: {e}")
 
         # 执行转录
         try:
-            result = model.transcribe(audio_path, fp16=False)  # fp16=False 可能在某些CPU上更稳定
+            elapsed = metrics.timer()
+            window_seconds = config.TRANSCRIBE_WINDOW_SECONDS if window_seconds is None else window_seconds
+            samples = AudioTranscriber._read_samples(audio_path) if on_segments and window_seconds else None
+            if samples is not None:
+                result = AudioTranscriber._transcribe_windows(model, samples, window_seconds, on_segments)
+            else:
+                with profiling.external_call('whisper'):
+                    result = model.transcribe(audio_path, fp16=False)  # fp16=False 可能在某些CPU上更稳定
+                if on_segments:
+                    on_segments(result.get('segments', []), float('inf'))
+            AudioTranscriber._observe_transcription(audio_path, elapsed())
 
             # 如果提供了输出路径，保存转录结果到文件
             if output_path:
@@ -93,6 +137,73 @@ class AudioTranscriber:
         except Exception as e:
             raise RuntimeError(f"Whisper 转录失败: {e}")
 
+    @staticmethod
+    def _read_samples(audio_path):
+        """读取16kHz单声道16位WAV为float32采样 (与whisper.load_audio的输出一致)，格式不符时返回None"""
+        try:
+            with wave.open(audio_path, 'rb') as audio:
+                if (audio.getnchannels(), audio.getsampwidth(), audio.getframerate()) != (1, 2, _SAMPLE_RATE):
+                    return None
+                frames = audio.readframes(audio.getnframes())
+        except (wave.Error, EOFError, OSError):
+            return None
+        import numpy as np
+        return np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+
+    @staticmethod
+    def _transcribe_windows(model, samples, window_seconds, on_segments):
+        """
+        按时间窗口逐段转录，分段时间换算为整段音频中的绝对时间，返回与整段转录相同结构的结果
+
+        窗口边界不一定落在停顿处，非最后一个窗口的最后一个分段可能被截断：丢弃该分段，
+        下一窗口从它的起点开始 (与本窗口重叠) 重新转录，使跨越边界的语句完整出现在下一窗口中；
+        早于已确认分段结束时间的分段视为重叠部分的重复，按时间戳丢弃。
+        最后一个分段从窗口前半开始时 (如整个窗口只有一个长分段) 回退无法推进，整窗接受。
+        """
+        window = max(1, int(window_seconds * _SAMPLE_RATE))
+        segments = []
+        language = None
+        prompt = None
+        offset = 0
+        while offset < len(samples):
+            chunk = samples[offset:offset + window]
+            with profiling.external_call('whisper'):
+                part = model.transcribe(chunk, fp16=False, initial_prompt=prompt)
+            start = offset / _SAMPLE_RATE
+            window_segments = [
+                dict(segment, start=segment['start'] + start, end=segment['end'] + start)
+                for segment in part.get('segments', [])
+            ]
+            next_offset = offset + len(chunk)
+            if next_offset < len(samples) and window_segments:
+                resume = int(window_segments[-1]['start'] * _SAMPLE_RATE)
+                if resume - offset >= window // 2:
+                    window_segments.pop()
+                    next_offset = resume
+            if segments:
+                window_segments = [segment for segment in window_segments if segment['end'] > segments[-1]['end']]
+            for segment in window_segments:
+                segment['id'] = len(segments)
+                segments.append(segment)
+            language = language or part.get('language')
+            prompt = ''.join(segment.get('text', '') for segment in window_segments).strip() or prompt
+            on_segments(window_segments, next_offset / _SAMPLE_RATE)
+            offset = next_offset
+        return {'text': ''.join(segment.get('text', '') for segment in segments), 'segments': segments,
+                'language': language}
+
+    @staticmethod
+    def _observe_transcription(audio_path, seconds):
+        """记录转录的实时率 (转录耗时 / 音频时长)；无法读取WAV时长时不记录"""
+        try:
+            with wave.open(audio_path, 'rb') as audio:
+                duration = audio.getnframes() / float(audio.getframerate())
+        except (wave.Error, EOFError, OSError):
+            return
+        if duration > 0:
+            metrics.WHISPER_REAL_TIME_FACTOR.observe(seconds / duration)
+            metrics.AUDIO_TRANSCRIBED.inc(duration)
+
     @staticmethod
     def get_text_from_result(result):
         """
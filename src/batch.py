@@ -0,0 +1,205 @@
+"""
+批量处理入口：在同一个预热的进程中处理一个目录或清单中的多个视频
+
+用法:
+    python -m src.batch <视频目录或清单文件> [--output output] [--vision-workers 16] [--video-workers 2] [其他与 src.main 相同的参数]
+
+清单文件可以是每行一个视频路径的文本文件 (#开头为注释)，
+也可以是JSON列表，元素为路径字符串或 {"path": ..., "description": ...}；相对路径相对于清单所在目录。
+"""
+
+import argparse
+import os
+import json
+import time
+import concurrent.futures
+
+from src.audio_transcriber import AudioTranscriber
+from src.visual_extractor import VisualExtractor
+from src.summarizer import Summarizer
+from src.main import (
+    add_common_arguments, apply_common_args, clean_output_directory,
+    configure_video, create_ai_service, create_artifact_store, process_video
+)
+from src import config
+from src import metrics
+
+
+def discover_videos(source):
+    """
+    从目录或清单文件中获取待处理的视频列表
+
+    Args:
+        source (str): 视频目录 (按文件名排序，只取config.BATCH_VIDEO_EXTENSIONS中的扩展名) 或清单文件路径
+
+    Returns:
+        list: 条目列表，每项为 {"path": 视频路径, "description": 视频描述或None}
+    """
+    if os.path.isdir(source):
+        return [
+            {'path': os.path.join(source, name), 'description': None}
+            for name in sorted(os.listdir(source))
+            if os.path.splitext(name)[1].lower() in config.BATCH_VIDEO_EXTENSIONS
+            and os.path.isfile(os.path.join(source, name))
+        ]
+
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"视频目录或清单文件不存在: {source}")
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    if source.lower().endswith('.json'):
+        items = json.loads(content)
+        if not isinstance(items, list):
+            raise ValueError(f"JSON清单必须是列表: {source}")
+    else:
+        items = [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+    entries = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'path': item}
+        if not isinstance(item, dict) or not item.get('path'):
+            raise ValueError(f"无效的清单条目: {item}")
+        path = item['path'] if os.path.isabs(item['path']) else os.path.join(base_dir, item['path'])
+        entries.append({'path': path, 'description': item.get('description')})
+    return entries
+
+
+def video_output_dirs(entries, output_root):
+    """
+    为每个视频分配输出子目录 (视频名相同时追加序号)
+
+    Args:
+        entries (list): discover_videos 返回的条目
+        output_root (str): 输出根目录
+
+    Returns:
+        list: 与entries一一对应的输出目录
+    """
+    used = set()
+    dirs = []
+    for entry in entries:
+        name = os.path.splitext(os.path.basename(entry['path']))[0]
+        candidate, suffix = name, 2
+        while candidate in used:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        used.add(candidate)
+        dirs.append(os.path.join(output_root, candidate))
+    return dirs
+
+
+def run_batch(entries, output_root, vision_workers=None, video_workers=None):
+    """
+    处理多个视频，Whisper模型、AI客户端 (连接池) 和视觉调用线程池在所有视频之间共享
+
+    每个视频使用独立的运行上下文 (RunContext)，不改写config中的全局状态，因此 video_workers > 1 时
+    多个视频在同一进程中并发处理 (转录按模型逐个进行，解码、视觉调用与摘要相互重叠)。
+    各视频的输出写入 output_root/<视频名>/，单个视频失败不影响其余视频。
+
+    Args:
+        entries (list): discover_videos 返回的条目
+        output_root (str): 输出根目录
+        vision_workers (int, optional): 共享视觉线程池大小，默认为config.BATCH_VISION_MAX_WORKERS
+        video_workers (int, optional): 同时处理的视频数，默认为config.BATCH_VIDEO_WORKERS
+
+    Returns:
+        dict: 批量报告，包含每个视频的状态与耗时，以及总耗时和吞吐量 (videos_per_hour)
+    """
+    vision_workers = vision_workers or config.BATCH_VISION_MAX_WORKERS
+    video_workers = max(1, video_workers or config.BATCH_VIDEO_WORKERS)
+    batch_start = time.perf_counter()
+
+    # 预热：模型与客户端只创建一次
+    ai_service = create_ai_service()
+    artifact_store = create_artifact_store()
+    audio_transcriber = AudioTranscriber()
+    audio_transcriber.load_model()
+    summarizer = Summarizer(ai_service)
+    jobs = list(zip(entries, video_output_dirs(entries, output_root)))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=vision_workers, thread_name_prefix="vision") as vision_pool:
+        visual_extractor = VisualExtractor(ai_service, executor=vision_pool, artifact_store=artifact_store)
+
+        def process_entry(index, entry, output_dir):
+            print(f"\n=== [{index}/{len(entries)}] 处理视频: {entry['path']} ===")
+            video_start = time.perf_counter()
+            result = {'video': entry['path'], 'output_dir': output_dir}
+            try:
+                # 每个视频只清理自己的输出子目录 (启用产物缓存时由各阶段替换自己的输出)
+                if artifact_store is None:
+                    clean_output_directory(output_dir)
+                context = configure_video(entry['path'], output_dir, os.path.join(output_dir, 'final_summary.txt'),
+                                          description=entry['description'])
+                summary = process_video(context, ai_service, audio_transcriber, visual_extractor, summarizer,
+                                        artifact_store)
+                result['status'] = 'success'
+                result['summary_path'] = context.summary_output_path if summary is not None else None
+            except Exception as e:
+                print(f"处理视频 {entry['path']} 时出错: {e}")
+                result['status'] = 'failed'
+                result['error'] = str(e)
+            result['seconds'] = round(time.perf_counter() - video_start, 3)
+            return result
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=video_workers, thread_name_prefix="video") as video_pool:
+            futures = [video_pool.submit(process_entry, index, entry, output_dir)
+                       for index, (entry, output_dir) in enumerate(jobs, 1)]
+            results = [future.result() for future in futures]
+    ai_service.close() # 单个视频的错误已在process_entry中捕获，所有视频处理完毕后释放服务
+
+    total_seconds = time.perf_counter() - batch_start
+    succeeded = sum(1 for r in results if r['status'] == 'success')
+    return {
+        'videos': results,
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'total_seconds': round(total_seconds, 3),
+        'videos_per_hour': round(succeeded * 3600 / total_seconds, 2) if total_seconds > 0 else 0.0
+    }
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='AI视频理解与摘要工具 (批量模式)')
+    parser.add_argument('source', help='视频目录或清单文件 (.txt 每行一个路径，或 .json 列表)')
+    parser.add_argument('--output', '-o', default='output', help='输出根目录，每个视频写入其中的 <视频名>/ 子目录')
+    parser.add_argument('--vision-workers', type=int, default=None, help='所有视频共享的视觉调用线程数')
+    parser.add_argument('--video-workers', type=int, default=None, help='同时处理的视频数 (默认逐个处理)')
+    add_common_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    """批量处理入口"""
+    args = parse_args()
+    apply_common_args(args)
+
+    entries = discover_videos(args.source)
+    if not entries:
+        print(f"未找到待处理的视频: {args.source}")
+        return
+    print(f"共 {len(entries)} 个视频待处理")
+
+    os.makedirs(args.output, exist_ok=True)
+    textfile_writer = metrics.TextfileWriter().start() if config.METRICS_TEXTFILE else None
+    try:
+        report = run_batch(entries, args.output, args.vision_workers, args.video_workers)
+    finally:
+        if textfile_writer is not None:
+            textfile_writer.stop()
+
+    report_path = os.path.join(args.output, 'batch_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n批量处理完成: 成功 {report['succeeded']}/{report['total']}，"
+          f"总耗时 {report['total_seconds']:.1f} 秒，吞吐量 {report['videos_per_hour']:.2f} 视频/小时")
+    print(f"批量报告已保存至: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
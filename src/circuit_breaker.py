@@ -0,0 +1,117 @@
+"""
+熔断器模块：服务连续失败时快速失败，并在冷却后用单个探测请求检查服务是否恢复
+"""
+
+import time
+import logging
+import threading
+
+from . import config
+
+# 熔断器状态
+STATE_CLOSED = 'closed' # 正常放行
+STATE_OPEN = 'open' # 熔断中，直接失败
+STATE_HALF_OPEN = 'half_open' # 冷却结束，只放行一个探测请求
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态时拒绝调用"""
+
+
+class CircuitBreaker:
+    """
+    线程安全的熔断器
+
+    - closed: 正常调用；连续失败达到 failure_threshold 次后转为 open
+    - open: 直接抛出 CircuitOpenError；经过 reset_timeout 秒后转为 half_open
+    - half_open: 只放行一个探测请求，成功则恢复 closed，失败则重新 open；探测期间其他调用仍快速失败
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        """
+        Args:
+            name (str): 熔断器名称 (用于日志)
+            failure_threshold (int, optional): 触发熔断的连续失败次数，默认为config.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+            reset_timeout (float, optional): 熔断后进入半开状态前的冷却时间（秒），默认为config.CIRCUIT_BREAKER_RESET_TIMEOUT
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or config.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = config.CIRCUIT_BREAKER_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.logger = logging.getLogger("CircuitBreaker")
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected_count = 0 # 被快速拒绝的调用数
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        """返回当前状态 (调用方需持有锁)；冷却结束时由 open 转为 half_open"""
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _before_call(self):
+        """判断是否放行本次调用，返回是否为探测请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return False
+            if state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self.logger.info(f"熔断器 {self.name} 半开，发送探测请求")
+                return True
+            self.rejected_count += 1
+            raise CircuitOpenError(f"熔断器 {self.name} 已打开，暂停调用 (连续失败 {self._consecutive_failures} 次)")
+
+    def _on_success(self, probe):
+        with self._lock:
+            if probe:
+                self.logger.info(f"熔断器 {self.name} 探测成功，恢复正常")
+                self._state = STATE_CLOSED
+                self._probe_in_flight = False
+            elif self._state != STATE_CLOSED:
+                # 熔断前发出的请求迟到的成功不代表服务已恢复，只有探测请求可以关闭熔断器
+                return
+            self._consecutive_failures = 0
+
+    def _on_failure(self, probe):
+        with self._lock:
+            self._consecutive_failures += 1
+            if probe or (self._state == STATE_CLOSED and self._consecutive_failures >= self.failure_threshold):
+                if self._state == STATE_CLOSED:
+                    self.logger.warning(f"熔断器 {self.name} 连续失败 {self._consecutive_failures} 次，打开熔断 {self.reset_timeout:.0f} 秒")
+                else:
+                    self.logger.warning(f"熔断器 {self.name} 探测失败，继续熔断 {self.reset_timeout:.0f} 秒")
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        """
+        通过熔断器调用函数
+
+        Args:
+            func (callable): 被保护的调用
+            *args, **kwargs: 传给func的参数
+
+        Returns:
+            func的返回值
+
+        Raises:
+            CircuitOpenError: 熔断器打开时直接抛出，不调用func
+        """
+        probe = self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._on_failure(probe)
+            raise
+        self._on_success(probe)
+        return result
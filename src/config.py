@@ -5,6 +5,7 @@
 import os
 from dotenv import load_dotenv
 
+# 进程中唯一一次加载 .env (各模块通过导入config获得环境变量，不再重复调用)
 load_dotenv()
 
 # --- 基本路径配置 ---
@@ -13,9 +14,9 @@ FRAMES_DIR = os.path.join(OUTPUT_DIR, "frames")
 AUDIO_DIR = os.path.join(OUTPUT_DIR, "audio")
 SUBTITLES_DIR = os.path.join(OUTPUT_DIR, "subtitles")
 
-# --- 动态配置变量 (将在main.py中设置) ---
+# --- 单次运行的默认值 (实际运行时的值保存在 run_context.RunContext 中，不再在运行中改写) ---
 VIDEO_NAME = None # 视频文件名 (无扩展名)
-OUTPUT_FRAME_RATE = 1 # 默认每秒提取1帧，会被命令行参数覆盖
+OUTPUT_FRAME_RATE = 1 # 默认每秒提取1帧，命令行参数 --frame-rate 写入RunContext
 TRANSCRIPT_PATH = None # 转录JSON文件路径
 SUBTITLES_JSON_PATH = None # 字幕JSON文件路径
 SUBTITLES_SRT_PATH = None # 字幕SRT文件路径
@@ -26,9 +27,126 @@ SUMMARY_OUTPUT_PATH = os.path.join(OUTPUT_DIR, "final_summary.txt") # 摘要文
 SUBTITLE_MERGE_THRESHOLD_SIMILARITY = 0.95 # 字幕合并相似度阈值
 SUBTITLE_MERGE_THRESHOLD_TIME = 1.0       # 字幕合并时间间隔阈值（秒）
 MIN_VALID_SUBTITLE_LENGTH = 50 # 字幕内容有效性的最小总长度阈值（字符数）
+SUBTITLE_SIMILARITY_BACKEND = 'auto' # 字幕相似度后端: 'auto'(优先rapidfuzz), 'rapidfuzz', 'difflib'
+SUBTITLE_GLOBAL_DEDUP = False # 是否对全部字幕做全局近重复抑制 (MinHash/LSH)
+SUBTITLE_GLOBAL_DEDUP_THRESHOLD = 0.8 # 全局近重复的字符n-gram Jaccard相似度阈值
+SUBTITLE_GLOBAL_DEDUP_NUM_PERM = 64 # MinHash签名长度
+SUBTITLE_GLOBAL_DEDUP_BANDS = 16 # LSH分带数 (需整除签名长度)
+SUBTITLE_SPEECH_DEDUP = True # 生成摘要前是否去除与语音转录重复的字幕 (只保留画面独有的文字)
+SUBTITLE_SPEECH_DEDUP_THRESHOLD = 0.6 # 字幕字符n-gram被重叠语音包含的比例达到该值即视为重复 (容忍ASR误差)
+SUBTITLE_SPEECH_DEDUP_TOLERANCE = 1.0 # 字幕与语音分段时间对齐的容差（秒）
+RAW_RESULT_FORMAT = 'json' # 逐帧原始分析结果的保存格式: 'json' 或 'columnar' (列式存储，见 result_store.py)
 
 # --- 视频元数据配置 ---
 VIDEO_DESCRIPTION = ''
 
+# --- 摘要配置 ---
+SUMMARY_MODE = 'auto' # 摘要模式: 'auto'(超过阈值时使用map-reduce), 'single', 'map_reduce'
+SUMMARY_MAP_REDUCE_THRESHOLD = 20000 # auto模式下启用map-reduce的输入长度阈值（字符数）
+SUMMARY_CHUNK_SIZE = 8000 # map-reduce每个分段的最大字符数
+SUMMARY_REDUCE_FAN_OUT = 8 # 每次合并的分段摘要数
+SUMMARY_MAX_WORKERS = 4 # 并行摘要的最大线程数
+SUMMARY_STREAMING = False # 是否使用流式接口生成摘要 (边生成边写入SUMMARY_OUTPUT_PATH)
+
+# --- Token预算配置 (摘要输入裁剪) ---
+SUMMARY_INPUT_TOKEN_BUDGET = 100000 # 摘要输入的token上限 (控制成本与延迟)，None表示只受模型上下文限制
+MODEL_CONTEXT_TOKENS = { # 模型上下文窗口 (按名称前缀匹配)
+    'qwen-plus': 131072,
+    'qwen-max': 32768,
+    'qwen-turbo': 1000000,
+    'gemini-2.5': 1048576,
+    'gemini-2.0': 1048576,
+    'gemini-1.5': 1048576,
+}
+DEFAULT_CONTEXT_TOKENS = 32768 # 未知模型的上下文窗口
+PROMPT_RESERVED_TOKENS = 8192 # 为提示词模板和模型输出预留的token数
+PROMPT_RECENCY_WEIGHT = 0.5 # 裁剪时越靠后的内容权重越高 (0表示不考虑时间位置)
+
+# --- 摘要缓存配置 ---
+SUMMARY_CACHE_ENABLED = True # 是否缓存文本生成 (摘要) 结果，命令行 --no-summary-cache 可关闭
+SUMMARY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-video-understanding", "summaries") # 缓存目录 (不放在每次运行都会清空的输出目录中)
+SUMMARY_CACHE_TTL = 7 * 24 * 3600 # 缓存有效期（秒），None表示永不过期
+SUMMARY_CACHE_MAX_ENTRIES = 1000 # 最大缓存条目数
+SUMMARY_CACHE_MAX_BYTES = 100 * 1024 * 1024 # 缓存最大总大小（字节）
+
+# --- 阶段产物缓存配置 ---
+ARTIFACT_CACHE_ENABLED = False # 是否按输入摘要缓存各阶段输出 (帧、音频、转录、逐帧视觉结果)，启用时不再清空输出目录；默认关闭，命令行 --artifact-cache 开启
+ARTIFACT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-video-understanding", "artifacts") # 产物存储目录
+ARTIFACT_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024 # 产物存储最大总大小（字节）
+FORCE_STAGES = () # 强制重新计算 (忽略已有产物) 的阶段，命令行 --force-stage 设置
+
+# --- 文本生成服务路由配置 (同时配置Gemini与Qwen时生效) ---
+TEXT_PROVIDER_ROUTING = True # 是否按延迟与错误率在Gemini/Qwen之间路由文本生成请求 (含故障切换)
+ROUTER_HEDGING = True # 首个请求超过p95延迟时是否向另一服务发起对冲请求
+ROUTER_EWMA_ALPHA = 0.3 # 延迟与错误率EWMA的平滑系数
+ROUTER_ERROR_RATE_THRESHOLD = 0.5 # 错误率EWMA达到该值的服务视为不健康，排在最后
+ROUTER_LATENCY_WINDOW = 50 # 用于估计p95延迟的最近成功请求数
+ROUTER_HEDGE_MIN_SAMPLES = 5 # 样本数达到该值后才使用p95作为对冲等待时间
+ROUTER_DEFAULT_HEDGE_DELAY = 60.0 # 样本不足时的对冲等待时间（秒）
+ROUTER_MAX_WORKERS = 8 # 路由器执行请求的最大线程数 (应不小于SUMMARY_MAX_WORKERS的两倍)
+
 # --- 多线程配置 ---
 VISUAL_EXTRACTION_MAX_WORKERS = 8 # 视觉内容提取的最大线程数
+VISUAL_EXTRACTION_REORDER_WINDOW = 32 # analyze_iter 的重排序窗口 (同时在途的最大帧数)
+
+# --- 流程调度配置 ---
+PIPELINE_CONCURRENT_STAGES = True # 是否并发执行互不依赖的阶段 (解码帧 与 提取音频→转录)，False时按顺序逐个执行
+TRANSCRIBE_WINDOW_SECONDS = 120 # 流程中按该时长 (秒) 的窗口逐段转录并发布语音分段 (跨越窗口边界的分段在下一窗口重新转录)，视觉阶段边转录边选择和分析帧；0表示整段转录后一次发布
+
+# --- 时间分片配置 (单个长视频切分为多个分片并行处理，命令行 --shards / --shard-seconds) ---
+VIDEO_SHARDS = 1 # 分片数，1表示不分片
+SHARD_SECONDS = None # 每个分片的时长（秒），设置时优先于VIDEO_SHARDS
+SHARD_MIN_SECONDS = 60 # 分片的最短时长（秒），视频较短时自动减少分片数
+SHARD_OVERLAP_SECONDS = 3.0 # 相邻分片向两侧各扩展的重叠时长（秒），保证边界处的语音与字幕在某一分片中完整出现
+SHARD_STITCH_GAP_SECONDS = 2.0 # 缝合跨越分片边界的相似字幕时允许的最大时间间隔（秒）
+SHARD_LOCAL_WORKERS = 4 # 本进程中同时处理的分片数 (未使用 --shard-queue 时)
+
+# --- 批量处理配置 (python -m src.batch) ---
+BATCH_VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi', '.flv', '.webm') # 目录模式下识别为视频的扩展名
+BATCH_VISION_MAX_WORKERS = 16 # 所有视频共享的视觉调用线程数
+BATCH_VIDEO_WORKERS = 1 # 同时处理的视频数 (各视频使用独立的RunContext，可在同一进程中并发)
+
+# --- 任务服务配置 (python -m src.server) ---
+SERVER_HOST = "127.0.0.1" # HTTP监听地址 (仅本机)
+SERVER_PORT = 8780 # HTTP监听端口
+SERVER_UNIX_SOCKET = None # Unix套接字路径，设置后代替TCP端口监听；命令行 --unix-socket 设置
+SERVER_DB_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ai-video-understanding", "jobs.sqlite3") # 任务队列数据库路径
+SERVER_OUTPUT_DIR = "output/jobs" # 任务输出根目录，每个任务写入其中的 <视频名>_<任务ID前8位>/ 子目录
+SERVER_WORKERS = 1 # 同时执行的任务数
+SERVER_VISION_MAX_WORKERS = 16 # 所有任务共享的视觉调用线程数
+SERVER_POLL_INTERVAL = 1.0 # 队列为空时工作线程的轮询间隔（秒）
+
+# --- 分布式工作节点配置 (python -m src.worker) ---
+WORKER_ID = os.getenv("WORKER_ID") # 工作者标识，默认为 <主机名>:<进程号>
+JOB_LEASE_SECONDS = 120 # 任务租约时长（秒），到期未续约的任务由其他节点重新领取 (应远大于主机之间的时钟偏差)
+JOB_HEARTBEAT_INTERVAL = 20 # 续约间隔（秒），应明显小于JOB_LEASE_SECONDS
+JOB_MAX_ATTEMPTS = 3 # 单个任务最多领取次数，租约到期次数达到上限后标记为失败
+JOB_QUEUE_JOURNAL_MODE = "WAL" # SQLite日志模式；数据库位于NFS等网络文件系统上时改为 "DELETE" (WAL依赖共享内存，不能跨主机)
+
+# --- 性能剖析配置 (命令行 --profile) ---
+PROFILE_ENABLED = False # 是否记录各阶段与外部调用的耗时、CPU、内存与I/O，并在摘要旁写入JSON剖析报告
+PROFILE_CPROFILE = False # 是否额外用cProfile剖析各阶段 (开销较大；原始数据另存为 .prof 文件)
+PROFILE_TRACE_MALLOC = True # 剖析时是否用tracemalloc跟踪Python内存分配 (会使分配密集的代码变慢)
+PROFILE_TOP_FUNCTIONS = 20 # 报告中每个阶段列出的cProfile累计耗时最多的函数数
+PROFILE_REPORT_SUFFIX = "_profile.json" # 剖析报告文件名后缀，写入摘要所在目录的 <视频名><后缀>
+
+# --- 运行指标配置 (Prometheus) ---
+METRICS_HOST = "127.0.0.1" # 工作节点指标接口的监听地址
+METRICS_PORT = None # 工作节点指标接口端口 (GET /metrics)，None表示不启动；命令行 --metrics-port 设置。任务服务始终在自身接口上提供 /metrics
+METRICS_TEXTFILE = None # textfile collector文件路径 (应以 .prom 结尾)；命令行 --metrics-textfile 设置
+METRICS_TEXTFILE_INTERVAL = 15.0 # 常驻进程 (任务服务、工作节点) 写入textfile的间隔（秒）
+
+# --- 熔断配置 (视觉调用) ---
+CIRCUIT_BREAKER_ENABLED = True # 是否为视觉(字幕提取)调用启用熔断器
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5 # 连续失败多少次后打开熔断
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30.0 # 熔断后等待多久（秒）发送一个探测请求
+
+# --- HTTP传输配置 (所有AI客户端共享的连接池) ---
+HTTP_MAX_CONNECTIONS = 32 # 连接池最大连接数 (应不小于视觉提取线程数)
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16 # 保持空闲keep-alive的最大连接数
+HTTP_KEEPALIVE_EXPIRY = 60.0 # 空闲连接保持时间（秒）
+HTTP_ENABLE_HTTP2 = True # 是否启用HTTP/2 (需要安装h2，否则自动回退HTTP/1.1)
+HTTP_CONNECT_TIMEOUT = 10.0 # 建立连接超时（秒）
+HTTP_TIMEOUT = 120.0 # 默认读写超时（秒）
+VISION_REQUEST_TIMEOUT = 60.0 # 单次视觉(字幕提取)请求超时（秒）
+TEXT_REQUEST_TIMEOUT = 300.0 # 单次文本生成请求超时（秒）
@@ -0,0 +1,144 @@
+"""
+HTTP传输层模块：为所有AI客户端提供进程内共享的连接池 (keep-alive、HTTP/2、超时)
+"""
+
+import sys
+import logging
+import threading
+
+from . import config
+
+logger = logging.getLogger("HttpTransport")
+
+_lock = threading.Lock()
+_openai_http_client = None # 所有QwenAPI (OpenAI兼容SDK) 共享的连接池
+_genai_http_client = None # 所有GeminiAPI (Google Gen AI SDK) 共享的连接池
+
+
+def http2_available():
+    """HTTP/2 需要可选依赖 h2 (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _client_kwargs(http_module):
+    """
+    根据config构建HTTP客户端参数
+
+    Args:
+        http_module: 客户端所用的HTTP库模块 (httpx 或SDK自带的兼容实现)，用于构造其 Limits / Timeout
+
+    Returns:
+        dict: 传给 Client(...) 的参数
+    """
+    use_http2 = config.HTTP_ENABLE_HTTP2
+    if use_http2 and not http2_available():
+        logger.warning("未安装 h2，HTTP/2 不可用，回退到 HTTP/1.1 keep-alive")
+        use_http2 = False
+
+    return {
+        'limits': http_module.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+        ),
+        'timeout': http_module.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        'http2': use_http2
+    }
+
+
+def _sdk_http_module(client_class):
+    """
+    SDK HTTP客户端基类所在的HTTP库模块
+
+    较新的openai SDK基于自带的兼容实现 (而非httpx)，Limits / Timeout 必须取自同一个库：
+    传入httpx.Timeout时默认超时会被再包装一层，不指定单次超时的请求会抛出TypeError。
+
+    Args:
+        client_class (type): SDK的HTTP客户端类 (如 openai.DefaultHttpxClient)
+
+    Returns:
+        module: 提供 Limits / Timeout 的HTTP库模块
+    """
+    for base in client_class.__mro__[1:]:
+        module = sys.modules.get(base.__module__.split('.')[0])
+        if module is not None and hasattr(module, 'Limits') and hasattr(module, 'Timeout'):
+            return module
+    import httpx
+    return httpx
+
+
+def get_openai_http_client():
+    """
+    获取进程内共享的OpenAI SDK HTTP客户端 (首次调用时创建)
+
+    使用 openai.DefaultHttpxClient 以保留SDK自身的默认设置，Limits / Timeout 取自其基类所在的HTTP库。
+
+    Returns:
+        openai.DefaultHttpxClient: 共享的HTTP客户端
+    """
+    global _openai_http_client
+    with _lock:
+        if _openai_http_client is None:
+            from openai import DefaultHttpxClient
+            _openai_http_client = DefaultHttpxClient(**_client_kwargs(_sdk_http_module(DefaultHttpxClient)))
+            logger.info(f"已创建共享的OpenAI兼容HTTP连接池 (最大连接数 {config.HTTP_MAX_CONNECTIONS})")
+        return _openai_http_client
+
+
+def get_genai_http_client():
+    """
+    获取进程内共享的Google Gen AI SDK HTTP客户端 (首次调用时创建)
+
+    Returns:
+        httpx.Client: 共享的HTTP客户端
+    """
+    import httpx
+    global _genai_http_client
+    with _lock:
+        if _genai_http_client is None:
+            _genai_http_client = httpx.Client(**_client_kwargs(httpx))
+            logger.info(f"已创建共享的Gemini HTTP连接池 (最大连接数 {config.HTTP_MAX_CONNECTIONS})")
+        return _genai_http_client
+
+
+def genai_http_options(**kwargs):
+    """
+    构建带有共享连接池的 genai types.HttpOptions
+
+    较新的SDK支持直接传入 httpx_client，所有GeminiAPI共用同一个连接池；
+    较旧的SDK只支持 client_args，此时每个 genai.Client 使用相同配置的独立连接池。
+
+    Args:
+        **kwargs: 其他 HttpOptions 参数 (如 api_version、base_url)
+
+    Returns:
+        types.HttpOptions: HTTP选项
+    """
+    import httpx
+    from google.genai import types
+    if 'httpx_client' in types.HttpOptions.model_fields:
+        kwargs['httpx_client'] = get_genai_http_client()
+    else:
+        kwargs['client_args'] = _client_kwargs(httpx)
+    kwargs.setdefault('timeout', timeout_ms(config.HTTP_TIMEOUT))
+    return types.HttpOptions(**kwargs)
+
+
+def timeout_ms(seconds):
+    """将秒转换为 genai HttpOptions 使用的毫秒整数"""
+    return int(seconds * 1000) if seconds else None
+
+
+def close_shared_clients():
+    """关闭共享的HTTP客户端 (进程退出或需要重建连接池时调用)"""
+    global _openai_http_client, _genai_http_client
+    with _lock:
+        for client in (_openai_http_client, _genai_http_client):
+            if client is not None:
+                client.close()
+        _openai_http_client = None
+        _genai_http_client = None
@@ -0,0 +1,364 @@
+"""
+任务队列模块：基于SQLite的持久化任务队列，供常驻任务服务 (src.server) 与分布式工作节点 (src.worker) 使用
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import contextlib
+
+from . import config
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    video_path TEXT NOT NULL,
+    output_dir TEXT,
+    description TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+# 在已有数据库上追加的列 (列名, 定义)，打开队列时自动补齐
+_MIGRATIONS = (
+    ('worker_id', 'TEXT'), # 持有租约的工作者
+    ('lease_expires_at', 'REAL'), # 租约到期时间，到期未续约的运行中任务重新排队
+    ('heartbeat_at', 'REAL'), # 最近一次心跳时间
+    ('attempts', 'INTEGER NOT NULL DEFAULT 0'), # 已领取次数
+    ('params', 'TEXT'), # 任务参数 (JSON)，如时间分片任务的分片范围与帧率
+)
+
+
+class JobQueue:
+    """
+    SQLite任务队列
+
+    任务状态: queued -> running -> succeeded / failed / cancelled。
+    每次操作使用独立连接，可在多个线程之间共享同一个实例；服务重启后队列内容保留。
+
+    领取任务时获得一段时间的租约，执行者须定期调用 heartbeat 续约。执行者所在节点崩溃或失联时租约到期，
+    任务在下一次 claim 时重新排队 (最多领取config.JOB_MAX_ATTEMPTS次)，因此多台主机可以通过共享文件系统上的
+    同一个数据库文件协同处理任务。租约时间按各主机的系统时钟计算，应远大于主机之间的时钟偏差。
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str, optional): 数据库文件路径，默认为config.SERVER_DB_PATH
+        """
+        self.db_path = db_path or config.SERVER_DB_PATH
+        self.logger = logging.getLogger("JobQueue")
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(f"PRAGMA journal_mode={config.JOB_QUEUE_JOURNAL_MODE}")
+            conn.executescript(_SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _MIGRATIONS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """打开连接 (自动提交模式，需要事务时显式BEGIN)，退出时关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row):
+        """将数据库行转换为任务字典 (result与params字段解析为JSON)"""
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['params'] = json.loads(job['params']) if job['params'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def submit(self, video_path, output_dir=None, description=None, params=None):
+        """
+        提交任务
+
+        Args:
+            video_path (str): 视频文件路径
+            output_dir (str, optional): 输出目录，为空时由服务分配
+            description (str, optional): 视频描述
+            params (dict, optional): 任务参数 (须可JSON序列化)，如 {"shard": 分片, "frame_rate": 帧率}
+
+        Returns:
+            dict: 新建的任务
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, video_path, output_dir, description, created_at, params) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, video_path, output_dir, description, time.time(),
+                 json.dumps(params, ensure_ascii=False) if params is not None else None)
+            )
+        self.logger.info(f"任务已提交: {job_id} ({video_path})")
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """
+        查询任务
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            dict: 任务，不存在时返回None
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def list(self, status=None, limit=100):
+        """
+        列出任务 (按提交时间倒序)
+
+        Args:
+            status (str, optional): 只列出该状态的任务
+            limit (int): 最多返回的任务数
+
+        Returns:
+            list: 任务列表
+        """
+        if status is not None and status not in JOB_STATUSES:
+            raise ValueError(f"未知的任务状态: {status}")
+        query, params = "SELECT * FROM jobs", []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(int(limit))
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self, status):
+        """
+        统计某一状态的任务数
+
+        Args:
+            status (str): 任务状态
+
+        Returns:
+            int: 任务数
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """在写事务中执行 (BEGIN IMMEDIATE，多个进程并发写入时串行化)"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _requeue_expired(self, conn, now):
+        """将租约已到期的运行中任务重新排队，超过最大领取次数的标记为失败"""
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ?, worker_id = NULL, lease_expires_at = NULL "
+            "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+            (now, f"租约到期 {config.JOB_MAX_ATTEMPTS} 次，任务放弃", now, config.JOB_MAX_ATTEMPTS)
+        )
+        count = conn.execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END, "
+            "finished_at = CASE WHEN cancel_requested THEN ? END, started_at = NULL, "
+            "worker_id = NULL, lease_expires_at = NULL "
+            "WHERE status = 'running' AND lease_expires_at < ?",
+            (now, now)
+        ).rowcount
+        if count:
+            self.logger.warning(f"{count} 个任务的租约已到期，重新排队")
+        return count
+
+    def requeue_expired(self):
+        """
+        将租约已到期的运行中任务重新排队 (claim 会自动执行)
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        with self._transaction() as conn:
+            return self._requeue_expired(conn, time.time())
+
+    def claim(self, worker_id=None, lease_seconds=None):
+        """
+        领取最早提交的排队任务并标记为运行中 (多个工作者并发领取时每个任务只会被领取一次)
+
+        Args:
+            worker_id (str, optional): 工作者标识，之后的心跳与结果提交须使用同一标识
+            lease_seconds (float, optional): 租约时长（秒），默认为config.JOB_LEASE_SECONDS
+
+        Returns:
+            dict: 领取的任务，队列为空时返回None
+        """
+        lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        with self._transaction() as conn:
+            now = time.time()
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, worker_id = ?, lease_expires_at = ?, "
+                    "heartbeat_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (now, worker_id, now + lease_seconds, now, row['id'])
+                )
+        return self.get(row['id']) if row is not None else None
+
+    def heartbeat(self, job_id, worker_id=None, lease_seconds=None):
+        """
+        续约运行中的任务
+
+        Args:
+            job_id (str): 任务ID
+            worker_id (str, optional): 领取任务时使用的工作者标识
+            lease_seconds (float, optional): 新的租约时长（秒），默认为config.JOB_LEASE_SECONDS
+
+        Returns:
+            dict: 续约后的任务 (可据此检查cancel_requested)，租约已失效 (到期后被其他工作者领取或任务已结束) 时返回None
+        """
+        lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        now = time.time()
+        with self._connect() as conn:
+            count = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, heartbeat_at = ? "
+                "WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (now + lease_seconds, now, job_id, worker_id)
+            ).rowcount
+        return self.get(job_id) if count else None
+
+    def _finish(self, job_id, status, result=None, error=None, worker_id=None):
+        """将运行中的任务标记为结束状态 (只有仍持有租约的工作者可以提交)"""
+        with self._connect() as conn:
+            count = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (status, time.time(), json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, job_id, worker_id)
+            ).rowcount
+        if not count:
+            self.logger.warning(f"任务 {job_id} 的租约已失效，忽略提交的结果 ({status})")
+        return bool(count)
+
+    def complete(self, job_id, result=None, worker_id=None):
+        """
+        标记任务成功
+
+        Args:
+            job_id (str): 任务ID
+            result (dict, optional): 任务结果 (须可JSON序列化)
+            worker_id (str, optional): 领取任务时使用的工作者标识
+
+        Returns:
+            bool: 是否提交成功 (租约已失效时为False)
+        """
+        return self._finish(job_id, 'succeeded', result=result, worker_id=worker_id)
+
+    def fail(self, job_id, error, worker_id=None):
+        """
+        标记任务失败
+
+        Args:
+            job_id (str): 任务ID
+            error (str): 错误信息
+            worker_id (str, optional): 领取任务时使用的工作者标识
+
+        Returns:
+            bool: 是否提交成功 (租约已失效时为False)
+        """
+        return self._finish(job_id, 'failed', error=error, worker_id=worker_id)
+
+    def mark_cancelled(self, job_id, worker_id=None):
+        """
+        将已响应取消请求的运行中任务标记为已取消
+
+        Args:
+            job_id (str): 任务ID
+            worker_id (str, optional): 领取任务时使用的工作者标识
+
+        Returns:
+            bool: 是否提交成功 (租约已失效时为False)
+        """
+        return self._finish(job_id, 'cancelled', error="任务已取消", worker_id=worker_id)
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的任务直接取消，运行中的任务记录取消请求，由执行者在阶段之间响应
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            dict: 更新后的任务，不存在时返回None
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, error = '任务已取消' "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id):
+        """
+        查询运行中的任务是否被请求取消
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            bool: 是否已请求取消
+        """
+        job = self.get(job_id)
+        return bool(job and job['cancel_requested'])
+
+    def recover_running(self):
+        """
+        将所有运行中的任务立即重新放回队列 (已请求取消的直接标记为取消)
+
+        仅适用于确认没有其他工作者在运行的单机部署；多节点部署中由租约到期自动重新排队。
+
+        Returns:
+            int: 重新排队的任务数
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, error = '任务已取消' "
+                "WHERE status = 'running' AND cancel_requested = 1",
+                (time.time(),)
+            )
+            count = conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, worker_id = NULL, lease_expires_at = NULL "
+                "WHERE status = 'running'"
+            ).rowcount
+        if count:
+            self.logger.warning(f"{count} 个未完成的任务已重新排队")
+        return count
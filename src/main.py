@@ -4,8 +4,9 @@
 
 import argparse
 import os
+import time
+import concurrent.futures
 import shutil # 导入shutil模块
-from dotenv import load_dotenv
 import json
 
 from src.video_processor import VideoProcessor
@@ -13,7 +14,17 @@ from src.audio_transcriber import AudioTranscriber
 from src.visual_extractor import VisualExtractor
 from src.summarizer import Summarizer
 from src.ai_service import AIService
+from src.token_budget import TokenBudgeter, split_sentences
+from src.subtitle_processor import SubtitleProcessor
+from src.stage_scheduler import Stage, StageScheduler, StageCancelledError
+from src.transcript_feed import TranscriptFeed
+from src.sharding import plan_shards, merge_transcripts, merge_subtitles
+from src.artifact_store import ArtifactStore, make_key, remove_outputs
+from src.job_queue import JobQueue
+from src.run_context import RunContext
 from src import config
+from src import profiling
+from src import metrics
 
 
 def clean_output_directory(directory_path):
@@ -32,13 +43,41 @@ def clean_output_directory(directory_path):
     #     print(f"输出目录 {directory_path} 不存在，无需清理。")
 
 
+# 可通过 --force-stage 强制重新计算的阶段
+PIPELINE_STAGES = ('frames', 'audio', 'transcribe', 'vision', 'summary')
+
+
+def add_common_arguments(parser):
+    """添加单视频与批量模式共用的命令行参数"""
+    parser.add_argument('--frame-rate', type=int, default=5, help='每秒提取的帧数')
+    parser.add_argument('--description', '-d', help='可选的视频描述信息')
+    parser.add_argument('--stream-summary', action='store_true', help='使用流式接口生成摘要，边生成边输出')
+    parser.add_argument('--global-dedup', action='store_true', help='对全部字幕做全局近重复抑制 (MinHash/LSH)')
+    parser.add_argument('--raw-format', choices=['json', 'columnar'], default='json', help='逐帧原始分析结果的保存格式')
+    parser.add_argument('--keep-speech-subtitles', action='store_true', help='摘要输入保留与语音重复的字幕 (默认去除)')
+    parser.add_argument('--no-summary-cache', action='store_true', help='不读取也不写入摘要缓存')
+    parser.add_argument('--artifact-cache', action='store_true',
+                        help='启用阶段产物缓存：帧、音频、转录和逐帧视觉结果保存在ARTIFACT_CACHE_DIR (最多ARTIFACT_CACHE_MAX_BYTES字节)，'
+                             '输入未变化的阶段直接恢复；启用后不再清空输出目录')
+    parser.add_argument('--no-artifact-cache', action='store_true', help='不使用阶段产物缓存 (默认)，每次运行前清空输出目录并重新计算所有阶段')
+    parser.add_argument('--force-stage', action='append', default=[], choices=PIPELINE_STAGES,
+                        help='忽略已有产物，强制重新计算该阶段 (可多次指定)')
+    parser.add_argument('--metrics-textfile', default=None,
+                        help='将Prometheus指标写入该文件 (node_exporter textfile collector，常驻进程中定期更新)')
+    parser.add_argument('--summary-mode', choices=['auto', 'single', 'map_reduce'], default=config.SUMMARY_MODE, help='摘要模式 (auto: 超长输入使用分层map-reduce摘要)')
+
+
 def parse_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='AI视频理解与摘要工具')
     parser.add_argument('video_path', help='视频文件路径')
     parser.add_argument('--output', '-o', default='output', help='输出目录')
-    parser.add_argument('--frame-rate', type=int, default=5, help='每秒提取的帧数')
-    parser.add_argument('--description', '-d', help='可选的视频描述信息')
+    parser.add_argument('--shards', type=int, default=None, help='将视频按时间切分为N个分片并行处理')
+    parser.add_argument('--shard-seconds', type=float, default=None, help='按每个分片的时长切分 (优先于 --shards)')
+    parser.add_argument('--shard-queue', default=None, help='将分片提交到该共享任务队列数据库，由 src.worker 节点处理')
+    parser.add_argument('--profile', action='store_true', help='记录各阶段与外部调用的耗时、CPU、内存与I/O，在摘要旁写入JSON剖析报告')
+    parser.add_argument('--profile-cprofile', action='store_true', help='剖析时额外用cProfile剖析各阶段 (隐含 --profile)')
+    add_common_arguments(parser)
     return parser.parse_args()
 
 
@@ -83,7 +122,54 @@ def collect_subtitles(processed_subtitles, subtitles_json_path):
     return subtitles
 
 
-def prepare_summary_input(transcript_txt_path, subtitles, config):
+def remove_speech_overlap(processed_subtitles, transcript_path):
+    """
+    去除与语音转录在时间上重叠且内容重复的字幕，只保留画面独有的文字，并报告节省的token数。
+
+    Args:
+        processed_subtitles (list): analyze_batch 返回的字幕列表 (包含时间信息)。
+        transcript_path (str): 转录JSON文件路径 (包含segments时间分段)。
+
+    Returns:
+        list: 去重后的字幕列表。
+    """
+    if not processed_subtitles or not transcript_path or not os.path.exists(transcript_path):
+        return processed_subtitles
+
+    processor = SubtitleProcessor(transcript_path)
+    kept, report = processor.remove_speech_duplicates(processed_subtitles)
+    print(f"语音/字幕对齐去重: {report['total']} 条字幕中有 {report['removed']} 条与语音重复，"
+          f"去除 {report['removed_chars']} 字符，节省约 {report['tokens_saved']} tokens")
+    return kept
+
+
+def load_transcript_units(transcript_txt_path, transcript_text):
+    """
+    将语音转录拆分为可独立裁剪的单位。
+
+    优先使用同名转录JSON中的Whisper分段 (TXT文件把所有分段连成一行)，不可用时按句拆分TXT文本。
+
+    Args:
+        transcript_txt_path (str): 语音转录文本文件的路径。
+        transcript_text (str): 已读取的转录文本。
+
+    Returns:
+        list: 按时间顺序排列的转录单位 (分段或句子) 列表。
+    """
+    json_path = f"{os.path.splitext(transcript_txt_path)[0]}.json" if transcript_txt_path else None
+    if json_path and os.path.exists(json_path):
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                segments = json.load(f).get('segments', [])
+            units = [segment.get('text', '').strip() for segment in segments]
+            if any(units):
+                return [unit for unit in units if unit]
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"警告: 读取转录分段失败: {e}，改为按句拆分转录文本。")
+    return split_sentences(transcript_text)
+
+
+def prepare_summary_input(transcript_txt_path, subtitles, config, budgeter=None, description=None):
     """
     准备用于生成摘要的最终文本输入。
     根据字幕有效性，结合语音转录、字幕或视频描述。
@@ -92,11 +178,14 @@ def prepare_summary_input(transcript_txt_path, subtitles, config):
         transcript_txt_path (str): 语音转录文本文件的路径。
         subtitles (list): collect_subtitles 返回的字幕字符串列表。
         config: 配置模块对象。
+        budgeter (TokenBudgeter, optional): token预算器，提供时超出预算的转录和字幕会被裁剪。
+        description (str, optional): 视频描述 (RunContext.description)，默认为config.VIDEO_DESCRIPTION。
 
     Returns:
         str: 用于摘要生成的最终文本。
     """
     summary_input_text = ""
+    description = config.VIDEO_DESCRIPTION if description is None else description
 
     # 1. 获取语音转录文本
     transcript_text = ""
@@ -117,7 +206,19 @@ def prepare_summary_input(transcript_txt_path, subtitles, config):
     total_subtitle_length = sum(len(s) for s in subtitles)
     has_valid_subtitles = bool(subtitles) and total_subtitle_length >= config.MIN_VALID_SUBTITLE_LENGTH
 
-    # 3. 根据字幕有效性组合文本
+    # 3. 按token预算裁剪转录和字幕 (去重、显著性、时间位置)
+    if budgeter is not None:
+        sections = {'transcript': load_transcript_units(transcript_txt_path, summary_input_text) if summary_input_text else []}
+        if has_valid_subtitles:
+            sections['subtitles'] = list(subtitles)
+        trimmed, report = budgeter.fit_sections(sections)
+        print(f"摘要输入约 {report['input_tokens']} tokens (预算 {report['budget']} tokens)")
+        if report['output_tokens'] < report['input_tokens']:
+            print(f"已裁剪至约 {report['output_tokens']} tokens: 去除重复 {report['duplicates_removed']} 行，删除低显著性内容 {report['lines_removed']} 行，截断 {report['lines_truncated']} 行")
+            summary_input_text = '\n'.join(trimmed['transcript'])
+            subtitles = trimmed.get('subtitles', subtitles)
+
+    # 4. 根据字幕有效性组合文本
     if has_valid_subtitles:
         print(f"检测到有效字幕 (总长度: {total_subtitle_length})，将用于摘要。")
         # 先将字幕列表用换行符连接成一个字符串
@@ -126,127 +227,561 @@ def prepare_summary_input(transcript_txt_path, subtitles, config):
     else:
         print(f"未检测到有效字幕 (列表为空或总长度 {total_subtitle_length} < {config.MIN_VALID_SUBTITLE_LENGTH})。")
         # 尝试添加视频描述
-        if config.VIDEO_DESCRIPTION:
+        if description:
             print("检测到视频描述，将用于摘要。")
-            summary_input_text += f"\n\n---\n视频描述：\n{config.VIDEO_DESCRIPTION}"
+            summary_input_text += f"\n\n---\n视频描述：\n{description}"
         else:
             print("未提供视频描述，摘要将主要基于语音转录。")
 
     return summary_input_text.strip() # 返回处理后的文本
 
 
-def main():
-    """主程序入口"""
-    # --- 1. 解析命令行参数 ---
-    args = parse_args()
-    output_dir = args.output # 获取输出目录路径
-
-    # --- 2. 清理输出目录 ---
-    clean_output_directory(output_dir)
-    # 即使清理失败，后续的makedirs会尝试创建
+def run_cached_stage(store, stage, key, outputs, compute, load):
+    """
+    执行可缓存的阶段：产物存储中已有相同键的产物时直接恢复，否则计算并保存产物。
 
-    # --- 3. 设置环境变量 (在加载dotenv和config之前) ---
-    if args.description:
-        config.VIDEO_DESCRIPTION = args.description
-        print(f"已将命令行提供的视频描述设置到环境变量 VIDEO_DESCRIPTION")
+    Args:
+        store (ArtifactStore): 产物存储，为None时直接计算。
+        stage (str): 阶段名称 (在config.FORCE_STAGES中时忽略已有产物)。
+        key (str): 由阶段输入与参数计算的产物键。
+        outputs (dict): 输出名称 -> 输出位置 (文件或目录)。
+        compute (callable): 计算阶段，返回 (结果, 元数据)。
+        load (callable): 接收元数据，从已恢复的输出位置读取结果。
 
-    # --- 4. 加载环境变量 ---
-    load_dotenv()
+    Returns:
+        阶段结果。
+    """
+    if store is None:
+        return compute()[0]
+    if stage not in config.FORCE_STAGES:
+        metadata = store.restore(key, outputs)
+        if metadata is not None:
+            print(f"阶段 {stage} 的输入未变化，已从产物缓存恢复")
+            return load(metadata)
+    # 先删除旧输出，避免写入时改动与产物存储共享的硬链接文件
+    remove_outputs(outputs)
+    result, metadata = compute()
+    store.save(key, stage, outputs, metadata)
+    return result
+
+
+def configure_video(video_path, output_dir, summary_output_path=None, frame_rate=None, description=None):
+    """
+    为单个视频创建运行上下文，并创建输出目录。
 
-    # --- 5. 动态配置 ---
-    # 从视频路径提取视频名称
-    video_name = os.path.splitext(os.path.basename(args.video_path))[0]
-    config.VIDEO_NAME = video_name
-    config.OUTPUT_FRAME_RATE = args.frame_rate
+    Args:
+        video_path (str): 视频文件路径。
+        output_dir (str): 该视频的输出目录。
+        summary_output_path (str, optional): 摘要文件路径，默认为config.SUMMARY_OUTPUT_PATH。
+        frame_rate (float, optional): 每秒提取的帧数，默认为config.OUTPUT_FRAME_RATE。
+        description (str, optional): 视频描述，默认为config.VIDEO_DESCRIPTION。
 
-    # 设置依赖于视频名称的路径
-    config.TRANSCRIPT_PATH = os.path.join(output_dir, 'audio', f"{video_name}_transcript.json")
-    config.SUBTITLES_JSON_PATH = os.path.join(output_dir, 'subtitles', f"{video_name}_subtitles.json")
-    config.SUBTITLES_SRT_PATH = os.path.join(output_dir, 'subtitles', f"{video_name}_subtitles.srt")
-    config.SUBTITLES_RESULT_PATH = os.path.join(output_dir, 'subtitles', f"{video_name}_subtitles_combined.txt")
-    # SUMMARY_OUTPUT_PATH 在 config.py 中已设置
-    # VIDEO_DESCRIPTION 会在 config.py 初始化时从环境变量读取
+    Returns:
+        RunContext: 该视频的运行上下文 (不修改config)。
+    """
+    context = RunContext.for_video(video_path, output_dir, frame_rate, description, summary_output_path)
 
-    # --- 6. 创建输出目录 ---
-    # 清理后需要重新创建
+    # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
     os.makedirs(os.path.join(output_dir, 'frames'), exist_ok=True)
     os.makedirs(os.path.join(output_dir, 'audio'), exist_ok=True)
     os.makedirs(os.path.join(output_dir, 'subtitles'), exist_ok=True)
+    return context
 
-    # --- 7. 初始化服务和模块 ---
-    # 初始化AI服务
-    ai_service = AIService({
-        'qwen': os.getenv('QWEN_API_KEY'),
-        'gemini': os.getenv('GEMINI_API_KEY')
-    })
 
-    # 初始化各模块
-    video_processor = VideoProcessor(args.video_path)
-    audio_transcriber = AudioTranscriber()
-    visual_extractor = VisualExtractor(ai_service)
-    summarizer = Summarizer(ai_service)
+def build_analysis_stages(context, audio_transcriber, visual_extractor, artifact_store=None, time_range=None):
+    """
+    创建分析阶段：解码帧、提取音频、转录、提取字幕 (不含摘要)。
 
-    # --- 8. 视频处理流程 ---
-    try:
+    Args:
+        context (RunContext): 运行上下文。
+        audio_transcriber (AudioTranscriber): 音频转录器。
+        visual_extractor (VisualExtractor): 视觉内容提取器。
+        artifact_store (ArtifactStore, optional): 阶段产物存储。
+        time_range (tuple, optional): (起始秒数, 时长秒数)，只处理视频中的这一段 (时间分片)，输出使用片段内的相对时间。
+
+    Returns:
+        list: Stage列表 (frames、audio、transcribe、vision)。
+    """
+    video_processor = VideoProcessor(context.video_path)
+    # 转录阶段逐窗口发布语音分段，视觉阶段边转录边选择和分析帧
+    transcript_feed = TranscriptFeed()
+    frames_dir = context.frames_dir
+    audio_path = context.audio_path
+    transcript_paths = {'json': context.transcript_path, 'txt': context.transcript_txt_path}
+    start_time, duration = time_range or (None, None)
+
+    # 产物键：帧和音频取决于视频内容 (与时间范围)，转录取决于音频和Whisper模型
+    frame_rate = context.frame_rate
+    video_digest = artifact_store.digest(context.video_path) if artifact_store else None
+    source = {'video': video_digest}
+    if time_range is not None:
+        source['range'] = [round(start_time, 3), round(duration, 3)]
+    frames_key = make_key('frames', dict(source, frame_rate=frame_rate))
+    audio_key = make_key('audio', source)
+    transcribe_key = make_key('transcribe', {'audio': audio_key, 'model_size': audio_transcriber.model_size})
+
+    def list_frames():
+        return sorted(
+            os.path.join(frames_dir, name) for name in os.listdir(frames_dir)
+            if name.startswith("frame_") and name.endswith(".png")
+        )
+
+    def extract_frames():
         print("步骤1: 提取视频帧...")
-        frames_dir = os.path.join(output_dir, 'frames', video_name) # 使用 video_name
-        frame_paths = video_processor.decode_video_to_frames(frames_dir, config.OUTPUT_FRAME_RATE) # 使用config中的帧率
+
+        def decode():
+            paths = video_processor.decode_video_to_frames(frames_dir, frame_rate, start_time, duration) # 使用上下文中的帧率
+            return paths, {'frame_rate': frame_rate}
+
+        frame_paths = run_cached_stage(artifact_store, 'frames', frames_key, {'frames': frames_dir}, decode,
+                                       lambda metadata: list_frames())
         print(f"共提取 {len(frame_paths)} 帧")
+        return frame_paths
 
+    def extract_audio():
         print("步骤2: 提取音频...")
-        audio_path = os.path.join(output_dir, 'audio', f"{video_name}.wav") # 使用 video_name
-        video_processor.extract_audio(audio_path)
+        run_cached_stage(artifact_store, 'audio', audio_key, {'audio': audio_path},
+                         lambda: (video_processor.extract_audio(audio_path, start_time, duration), {}),
+                         lambda metadata: None)
         print(f"音频已保存至: {audio_path}")
+        return audio_path
 
-        print("步骤3: 转录音频...")
-        transcript = audio_transcriber.transcribe(audio_path)
-        print(f"转录文本已保存至: {config.TRANSCRIPT_PATH}")
+    def load_transcript(metadata):
+        with open(context.transcript_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
 
+    def transcribe(audio_file):
+        print("步骤3: 转录音频...")
+        try:
+            transcript = run_cached_stage(
+                artifact_store, 'transcribe', transcribe_key, transcript_paths,
+                lambda: (audio_transcriber.transcribe(audio_file, context.transcript_path,
+                                                      on_segments=transcript_feed.publish), {}),
+                load_transcript
+            )
+            # 以保存的转录文件 (文本已去除首尾空白) 作为完整分段，缓存命中时也由此一次发布
+            transcript_feed.finish(load_transcript(None).get('segments', []))
+        except Exception as e:
+            transcript_feed.fail(e)
+            raise
+        print(f"转录文本已保存至: {context.transcript_path}")
+        return transcript
+
+    def extract_subtitles(frame_paths, transcript=None):
+        # 帧选择只等待覆盖当前帧时间戳的语音分段 (transcript_feed)，与转录重叠执行
         print("步骤4: 提取视频字幕...")
-        processed_subtitles = visual_extractor.analyze_batch(
+        return visual_extractor.analyze_batch(
             frames_dir,
-            output_path=config.SUBTITLES_JSON_PATH,
+            output_path=context.subtitles_json_path,
             similarity_threshold=config.SUBTITLE_MERGE_THRESHOLD_SIMILARITY,
             silent_sample_interval=1.0,
-            segment_sample_interval=2.0
+            segment_sample_interval=2.0,
+            context=context,
+            transcript_feed=transcript_feed
         )
 
-        # 收集字幕文本内容
-        subtitles = collect_subtitles(processed_subtitles, config.SUBTITLES_JSON_PATH)
+    def transcript_not_run():
+        transcript_feed.fail(StageCancelledError("转录阶段未执行"))
 
-        print("步骤5: 生成视频内容摘要...")
+    # 解码帧 与 提取音频→转录 互不依赖，可并发执行；字幕提取在帧解码后开始，随转录进度逐段选择帧。
+    # 顺序执行时视觉阶段若先于转录开始会一直等待分段，因此显式依赖转录阶段
+    vision_deps = ('frames',) if config.PIPELINE_CONCURRENT_STAGES else ('frames', 'transcribe')
+    return [
+        Stage('frames', extract_frames),
+        Stage('audio', extract_audio),
+        Stage('transcribe', transcribe, deps=('audio',), on_skip=transcript_not_run),
+        Stage('vision', extract_subtitles, deps=vision_deps),
+    ]
 
-        # 准备摘要输入文本 (调用新函数)
-        transcript_txt_path = config.TRANSCRIPT_PATH.replace('.json', '.txt')
-        summary_input_text = prepare_summary_input(transcript_txt_path, subtitles, config)
 
-        # 生成并保存摘要 (仅当输入文本有效且足够长时)
-        if not summary_input_text or len(summary_input_text) < config.MIN_VALID_SUBTITLE_LENGTH:
-             if not summary_input_text:
-                 print("警告: 没有可用于生成摘要的文本内容。跳过摘要生成。")
-             else:
-                 print(f"警告: 用于摘要的文本内容过短 (长度 {len(summary_input_text)} < 阈值 {config.MIN_VALID_SUBTITLE_LENGTH})。跳过摘要生成。")
-             # summary = "无法生成摘要，缺少足够内容。" # 不再生成占位符
-        else:
-            try:
-                print("调用AI生成摘要...")
-                summary = summarizer.generate_summary(summary_input_text)
+def run_stages(stages, cancel_event=None, profile_prefix=''):
+    """
+    按依赖关系调度执行阶段，结束后 (包括失败时) 打印耗时报告，返回各阶段结果
+
+    启用剖析时各阶段在剖析器中执行，记录名为 <profile_prefix><阶段名>。
+    """
+    profiler = profiling.active()
+    if profiler is not None:
+        stages = [Stage(stage.name, profiler.wrap(profile_prefix + stage.name, stage.func), stage.deps, stage.on_skip)
+                  for stage in stages]
+    scheduler = StageScheduler(stages, max_workers=None if config.PIPELINE_CONCURRENT_STAGES else 1)
+    try:
+        return scheduler.run(cancel_event)
+    finally:
+        print(scheduler.format_report())
+
+
+def process_video(context, ai_service, audio_transcriber, visual_extractor, summarizer, artifact_store=None,
+                  cancel_event=None):
+    """
+    处理单个视频：提取帧和音频、转录、提取字幕并生成摘要。
+
+    视频路径、输出路径和帧率全部来自 configure_video 创建的运行上下文，不读写config中的全局状态，
+    因此同一进程中可以并发处理多个视频。AI服务、转录器、视觉提取器和摘要器
+    由调用方创建，批量处理时在多个视频之间复用 (模型和HTTP连接保持预热)。
+    各阶段由 StageScheduler 按依赖关系调度，结束后打印各阶段的甘特图式耗时报告。
+    提供产物存储时，帧、音频和转录阶段以 (视频内容摘要, 参数) 为键缓存输出，输入未变化时直接恢复；
+    视觉阶段的逐帧结果由 VisualExtractor 缓存，摘要由摘要缓存复用。
+
+    Args:
+        context (RunContext): 该视频的运行上下文。
+        ai_service (AIService): AI服务。
+        audio_transcriber (AudioTranscriber): 音频转录器。
+        visual_extractor (VisualExtractor): 视觉内容提取器。
+        summarizer (Summarizer): 内容摘要器。
+        artifact_store (ArtifactStore, optional): 阶段产物存储。
+        cancel_event (threading.Event, optional): 取消信号，设置后不再启动新阶段并抛出StageCancelledError。
+
+    Returns:
+        str: 生成的摘要，未生成时返回None。
+    """
+    def summarize(processed_subtitles, transcript):
+        return generate_video_summary(processed_subtitles, ai_service, summarizer, context)
+
+    stages = build_analysis_stages(context, audio_transcriber, visual_extractor, artifact_store)
+    stages.append(Stage('summary', summarize, deps=('vision', 'transcribe')))
+    return run_stages(stages, cancel_event)['summary']
+
+
+def shard_context(context, shard):
+    """
+    分片的运行上下文：输出写入 <视频输出目录>/shards/shard_<序号>/，帧率与描述与整个视频相同
+
+    Args:
+        context (RunContext): 整个视频的运行上下文。
+        shard (dict): plan_shards 返回的分片。
+
+    Returns:
+        RunContext: 分片的运行上下文。
+    """
+    output_dir = os.path.join(context.output_dir, 'shards', f"shard_{shard['index']:03d}")
+    return configure_video(context.video_path, output_dir, os.path.join(output_dir, 'final_summary.txt'),
+                           context.frame_rate, context.description)
+
+
+def process_shard(context, shard, audio_transcriber, visual_extractor, artifact_store=None, cancel_event=None):
+    """
+    处理一个时间分片：对分片的时间范围执行分析阶段 (不生成摘要)，可在任意节点上运行。
+
+    Args:
+        context (RunContext): 分片的运行上下文 (shard_context 创建)。
+        shard (dict): plan_shards 返回的分片。
+        audio_transcriber (AudioTranscriber): 音频转录器。
+        visual_extractor (VisualExtractor): 视觉内容提取器。
+        artifact_store (ArtifactStore, optional): 阶段产物存储。
+        cancel_event (threading.Event, optional): 取消信号。
+
+    Returns:
+        dict: 分片结果，包含分片信息以及转录与字幕文件路径 (分片内的相对时间)。
+    """
+    print(f"处理分片 {shard['index']}: {shard['start']:.1f}s ~ {shard['end']:.1f}s")
+    stages = build_analysis_stages(context, audio_transcriber, visual_extractor, artifact_store,
+                                   time_range=(shard['start'], shard['end'] - shard['start']))
+    run_stages(stages, cancel_event, profile_prefix=f"shard_{shard['index']:03d}/")
+    return {
+        'shard': shard,
+        'transcript_path': context.transcript_path,
+        'subtitles_path': context.subtitles_json_path
+    }
+
+
+def run_shards_on_queue(queue, context, shards, cancel_event=None, poll_interval=None):
+    """
+    将分片作为任务提交到共享任务队列，由各节点上的 src.worker 处理，等待全部完成。
+
+    输出目录与视频路径须在所有节点上可访问 (共享文件系统)。
+
+    Args:
+        queue (JobQueue): 共享任务队列。
+        context (RunContext): 整个视频的运行上下文。
+        shards (list): plan_shards 返回的分片。
+        cancel_event (threading.Event, optional): 取消信号，设置后取消所有未完成的分片任务。
+        poll_interval (float, optional): 查询任务状态的间隔（秒），默认为config.SERVER_POLL_INTERVAL。
+
+    Returns:
+        list: 各分片的结果 (与 process_shard 的返回值相同)。
+    """
+    poll_interval = poll_interval or config.SERVER_POLL_INTERVAL
+    jobs = []
+    for shard in shards:
+        output_dir = shard_context(context, shard).output_dir
+        jobs.append(queue.submit(os.path.abspath(context.video_path), os.path.abspath(output_dir), context.description,
+                                 params={'shard': shard, 'frame_rate': context.frame_rate}))
+    print(f"已提交 {len(jobs)} 个分片任务至 {queue.db_path}")
+
+    pending = {job['id'] for job in jobs}
+    while pending:
+        if cancel_event is not None and cancel_event.is_set():
+            for job_id in pending:
+                queue.cancel(job_id)
+            raise StageCancelledError("运行已取消")
+        for job_id in list(pending):
+            job = queue.get(job_id)
+            if job['status'] == 'succeeded':
+                pending.discard(job_id)
+            elif job['status'] in ('failed', 'cancelled'):
+                for other in pending - {job_id}:
+                    queue.cancel(other)
+                raise RuntimeError(f"分片任务 {job_id} {job['status']}: {job['error']}")
+        if pending:
+            time.sleep(poll_interval)
+    return [queue.get(job['id'])['result'] for job in jobs]
+
+
+def merge_shard_results(context, shard_results):
+    """
+    合并各分片的转录与字幕，以全局时间写入整个视频的转录与字幕文件。
+
+    Args:
+        context (RunContext): 整个视频的运行上下文。
+        shard_results (list): process_shard 返回的分片结果。
+
+    Returns:
+        list: 合并后的字幕列表。
+    """
+    def load_json(path, default):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取分片结果 {path} 失败: {e}")
+            return default
+
+    transcripts = [(r['shard'], load_json(r['transcript_path'], {})) for r in shard_results]
+    AudioTranscriber.save_transcription(merge_transcripts(transcripts), context.transcript_path)
+
+    subtitles = [(r['shard'], load_json(r['subtitles_path'], {}).get('subtitles', [])) for r in shard_results]
+    subtitle_processor = SubtitleProcessor(context.transcript_path, output_frame_rate=context.frame_rate)
+    merged = merge_subtitles(subtitles, processor=subtitle_processor)
+    subtitle_processor.save_subtitles(merged, context.subtitles_json_path)
+    subtitle_processor.export_to_srt(merged, context.subtitles_srt_path)
+    with open(context.subtitles_result_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(subtitle['text'] for subtitle in merged))
+    print(f"已合并 {len(shard_results)} 个分片: {len(merged)} 条字幕")
+    return merged
+
+
+def process_video_sharded(context, ai_service, audio_transcriber, visual_extractor, summarizer, artifact_store=None,
+                          shard_queue=None, cancel_event=None):
+    """
+    按时间分片处理单个视频：各分片独立执行分析阶段 (本地并发或分发到多个节点)，
+    再以全局时间合并转录与字幕 (缝合跨越分片边界的字幕)，最后生成摘要。
+
+    Args:
+        context (RunContext): 该视频的运行上下文。
+        ai_service (AIService): AI服务。
+        audio_transcriber (AudioTranscriber): 音频转录器。
+        visual_extractor (VisualExtractor): 视觉内容提取器。
+        summarizer (Summarizer): 内容摘要器。
+        artifact_store (ArtifactStore, optional): 阶段产物存储。
+        shard_queue (JobQueue, optional): 共享任务队列，提供时分片由 src.worker 节点处理，否则在本进程中并发处理
+            (最多config.SHARD_LOCAL_WORKERS个分片同时进行)。
+        cancel_event (threading.Event, optional): 取消信号。
+
+    Returns:
+        str: 生成的摘要，未生成时返回None。
+    """
+    duration = VideoProcessor(context.video_path).get_duration()
+    shards = plan_shards(duration)
+    if len(shards) == 1:
+        print(f"视频时长 {duration:.1f} 秒，不足以分片，按整体处理")
+        return process_video(context, ai_service, audio_transcriber, visual_extractor, summarizer, artifact_store,
+                             cancel_event)
+    print(f"视频时长 {duration:.1f} 秒，切分为 {len(shards)} 个分片")
+
+    def run_shards():
+        if shard_queue is not None:
+            return run_shards_on_queue(shard_queue, context, shards, cancel_event)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=config.SHARD_LOCAL_WORKERS,
+                                                   thread_name_prefix="shard") as executor:
+            futures = [
+                executor.submit(process_shard, shard_context(context, shard), shard, audio_transcriber,
+                                visual_extractor, artifact_store, cancel_event)
+                for shard in shards
+            ]
+            return [future.result() for future in futures]
+
+    def summarize(merged_subtitles):
+        return generate_video_summary(merged_subtitles, ai_service, summarizer, context)
+
+    return run_stages([
+        Stage('shards', run_shards),
+        Stage('merge', lambda shard_results: merge_shard_results(context, shard_results), deps=('shards',)),
+        Stage('summary', summarize, deps=('merge',)),
+    ], cancel_event)['summary']
+
+
+def generate_video_summary(processed_subtitles, ai_service, summarizer, context):
+    """
+    根据字幕和转录生成并保存摘要 (流程中的摘要阶段)。
+
+    Args:
+        processed_subtitles (list): analyze_batch 返回的字幕列表。
+        ai_service (AIService): AI服务。
+        summarizer (Summarizer): 内容摘要器。
+        context (RunContext): 该视频的运行上下文。
+
+    Returns:
+        str: 生成的摘要，未生成时返回None。
+    """
+    summary = None
+
+    # 收集字幕文本内容
+    if config.SUBTITLE_SPEECH_DEDUP and processed_subtitles:
+        # 去除与语音重复的字幕 (只影响摘要输入，不影响已保存的字幕文件)
+        processed_subtitles = remove_speech_overlap(processed_subtitles, context.transcript_path)
+        # 全部字幕都与语音重复时不再回退读取字幕文件
+        subtitles = collect_subtitles(processed_subtitles, context.subtitles_json_path) if processed_subtitles else []
+    else:
+        subtitles = collect_subtitles(processed_subtitles, context.subtitles_json_path)
+
+    print("步骤5: 生成视频内容摘要...")
 
-                # 保存摘要
-                with open(config.SUMMARY_OUTPUT_PATH, 'w', encoding='utf-8') as f:
-                    f.write(summary)
-                print(f"摘要已保存至: {config.SUMMARY_OUTPUT_PATH}")
-            except Exception as summary_error:
-                print(f"生成或保存摘要时出错: {summary_error}")
-                # 即使摘要失败，也继续执行，不中断主流程
+    # 准备摘要输入文本 (调用新函数)
+    budgeter = TokenBudgeter(ai_service.text_models())
+    summary_input_text = prepare_summary_input(context.transcript_txt_path, subtitles, config, budgeter, context.description)
+
+    # 生成并保存摘要 (仅当输入文本有效且足够长时)
+    if not summary_input_text or len(summary_input_text) < config.MIN_VALID_SUBTITLE_LENGTH:
+         if not summary_input_text:
+             print("警告: 没有可用于生成摘要的文本内容。跳过摘要生成。")
+         else:
+             print(f"警告: 用于摘要的文本内容过短 (长度 {len(summary_input_text)} < 阈值 {config.MIN_VALID_SUBTITLE_LENGTH})。跳过摘要生成。")
+         # summary = "无法生成摘要，缺少足够内容。" # 不再生成占位符
+    else:
+        elapsed = metrics.timer()
+        outcome = 'error'
+        try:
+            print("调用AI生成摘要...")
+            if config.SUMMARY_STREAMING:
+                # 流式输出：摘要片段一到达即打印到命令行
+                summary = summarizer.generate_summary(
+                    summary_input_text,
+                    on_chunk=lambda chunk: print(chunk, end='', flush=True),
+                    output_path=context.summary_output_path
+                )
+                stream_metrics = summarizer.last_metrics
+                print()
+                if stream_metrics.get('time_to_first_token') is not None:
+                    print(f"摘要首个token耗时: {stream_metrics['time_to_first_token']:.2f} 秒，总耗时: {stream_metrics['total_time']:.2f} 秒")
+            else:
+                summary = summarizer.generate_summary(summary_input_text, output_path=context.summary_output_path)
+            outcome = 'success'
+            # 摘要文件已由Summarizer写入 (流式模式边生成边写入)，此处不再重复写入
+            print(f"摘要已保存至: {context.summary_output_path}")
+        except Exception as summary_error:
+            print(f"生成或保存摘要时出错: {summary_error}")
+            # 即使摘要失败，也继续执行，不中断主流程
+        finally:
+            metrics.SUMMARY_SECONDS.observe(elapsed(), outcome=outcome)
+    return summary
+
+
+def apply_common_args(args):
+    """将单视频与批量模式共用的命令行参数写入config (启动时执行一次，作为各视频运行上下文的默认值)"""
+    if args.description:
+        config.VIDEO_DESCRIPTION = args.description
+        print(f"已将命令行提供的视频描述设置到环境变量 VIDEO_DESCRIPTION")
+    config.OUTPUT_FRAME_RATE = args.frame_rate
+    if args.global_dedup:
+        config.SUBTITLE_GLOBAL_DEDUP = True
+    config.RAW_RESULT_FORMAT = args.raw_format
+    config.SUMMARY_MODE = args.summary_mode
+    if args.keep_speech_subtitles:
+        config.SUBTITLE_SPEECH_DEDUP = False
+    if args.no_summary_cache:
+        config.SUMMARY_CACHE_ENABLED = False
+    if args.artifact_cache:
+        config.ARTIFACT_CACHE_ENABLED = True
+    if args.no_artifact_cache:
+        config.ARTIFACT_CACHE_ENABLED = False
+    config.FORCE_STAGES = tuple(args.force_stage)
+    if args.stream_summary:
+        config.SUMMARY_STREAMING = True
+    if args.metrics_textfile:
+        config.METRICS_TEXTFILE = args.metrics_textfile
+
+
+def profile_report_path(context):
+    """剖析报告路径：摘要所在目录下的 <视频名><config.PROFILE_REPORT_SUFFIX>"""
+    directory = os.path.dirname(context.summary_output_path) or '.'
+    return os.path.join(directory, f"{context.video_name}{config.PROFILE_REPORT_SUFFIX}")
+
+
+def create_artifact_store():
+    """按配置创建阶段产物存储，未启用时返回None"""
+    return ArtifactStore() if config.ARTIFACT_CACHE_ENABLED else None
+
+
+def create_ai_service():
+    """使用环境变量中的API密钥创建AI服务"""
+    return AIService({
+        'qwen': os.getenv('QWEN_API_KEY'),
+        'gemini': os.getenv('GEMINI_API_KEY')
+    })
 
+
+def main():
+    """主程序入口"""
+    # --- 1. 解析命令行参数 ---
+    args = parse_args()
+    output_dir = args.output # 获取输出目录路径
+
+    # --- 2. 设置命令行配置 ---
+    apply_common_args(args)
+
+    # --- 3. 清理输出目录 ---
+    # 启用产物缓存时不再清空：各阶段只替换自己的输出，输入未变化的阶段直接从缓存恢复
+    if not config.ARTIFACT_CACHE_ENABLED:
+        clean_output_directory(output_dir)
+        # 即使清理失败，后续的makedirs会尝试创建
+
+    # --- 4. 环境变量已在导入config时从 .env 加载 ---
+
+    # --- 5~6. 创建运行上下文和输出目录 ---
+    # SUMMARY_OUTPUT_PATH 在 config.py 中已设置
+    context = configure_video(args.video_path, output_dir)
+
+    # --- 7. 初始化服务和模块 ---
+    ai_service = create_ai_service()
+    artifact_store = create_artifact_store()
+    audio_transcriber = AudioTranscriber()
+    visual_extractor = VisualExtractor(ai_service, artifact_store=artifact_store)
+    summarizer = Summarizer(ai_service)
+
+    # --- 8. 视频处理流程 ---
+    if args.shards:
+        config.VIDEO_SHARDS = args.shards
+    if args.shard_seconds:
+        config.SHARD_SECONDS = args.shard_seconds
+    if args.profile or args.profile_cprofile:
+        config.PROFILE_ENABLED = True
+        config.PROFILE_CPROFILE = config.PROFILE_CPROFILE or args.profile_cprofile
+    if config.PROFILE_ENABLED:
+        profiling.start()
+    try:
+        if config.VIDEO_SHARDS > 1 or config.SHARD_SECONDS or args.shard_queue:
+            shard_queue = JobQueue(args.shard_queue) if args.shard_queue else None
+            process_video_sharded(context, ai_service, audio_transcriber, visual_extractor, summarizer,
+                                  artifact_store, shard_queue)
+        else:
+            process_video(context, ai_service, audio_transcriber, visual_extractor, summarizer, artifact_store)
     except Exception as e:
         print(f"处理过程中出错: {str(e)}")
         raise
+    finally:
+        profiler = profiling.stop()
+        if profiler is not None:
+            report_path = profile_report_path(context)
+            print(profiling.format_report(profiler.save(report_path, context.video_path)))
+            print(f"剖析报告已保存到: {report_path}")
+        if config.METRICS_TEXTFILE:
+            metrics.TextfileWriter().write()
+        ai_service.close()
 
     print("处理完成")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,361 @@
+"""
+运行指标模块：以Prometheus文本格式导出计数器与直方图 (解码帧数、帧选择、视觉调用延迟与结果、token用量、
+Whisper实时率、摘要延迟、任务结果)
+
+指标保存在进程内的注册表中，可通过任务服务的 GET /metrics、工作节点的 --metrics-port 接口抓取，
+或用 --metrics-textfile 写入 node_exporter 的 textfile collector 目录。不依赖 prometheus_client。
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+
+from . import config
+
+logger = logging.getLogger("Metrics")
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 秒级延迟的默认分桶 (视觉与文本生成调用通常在0.5~30秒之间)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """带标签的指标基类"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        增加计数
+
+        Args:
+            amount (float, optional): 增量，不能为负
+            **labels: 标签值
+        """
+        if amount < 0:
+            raise ValueError(f"计数器 {self.name} 的增量不能为负: {amount}")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """
+        记录一个观测值
+
+        Args:
+            value (float): 观测值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def snapshot(self, **labels):
+        """返回 (观测次数, 观测值之和)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return (state['count'], state['sum']) if state else (0, 0.0)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def clear(self):
+        """清空所有指标的取值 (用于测试)"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self):
+        """
+        以Prometheus文本格式导出所有指标
+
+        Returns:
+            str: 文本格式的指标
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """
+        原子地将指标写入文件 (供 node_exporter 的 textfile collector 读取，文件名应以 .prom 结尾)
+
+        Args:
+            path (str): 目标文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+
+REGISTRY = Registry()
+
+FRAMES_DECODED = REGISTRY.counter(
+    'avu_frames_decoded_total', '从视频中解码并写出的帧数')
+FRAMES_SELECTED = REGISTRY.counter(
+    'avu_frames_selected_total', '智能帧选择后送去视觉分析的帧数')
+FRAMES_SKIPPED = REGISTRY.counter(
+    'avu_frames_skipped_total', '未调用视觉服务的帧数 (sampling: 帧选择跳过, cached: 命中逐帧缓存, '
+    'circuit_open: 熔断期间推迟)', ('reason',))
+VISION_CALLS = REGISTRY.histogram(
+    'avu_vision_call_seconds', '视觉 (字幕提取) 调用的延迟，按结果区分 (success/error/rejected)', ('outcome',))
+TEXT_CALLS = REGISTRY.histogram(
+    'avu_text_call_seconds', '文本生成调用的延迟 (流式调用计到最后一个片段)', ('provider', 'outcome'))
+TOKENS = REGISTRY.counter(
+    'avu_tokens_total', '文本生成使用的token数 (服务未返回用量时按字符估算)', ('provider', 'kind'))
+WHISPER_REAL_TIME_FACTOR = REGISTRY.histogram(
+    'avu_whisper_real_time_factor', 'Whisper转录耗时与音频时长之比 (小于1表示快于实时)', (),
+    (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0))
+AUDIO_TRANSCRIBED = REGISTRY.counter(
+    'avu_audio_transcribed_seconds_total', 'Whisper已转录的音频时长（秒）')
+SUMMARY_SECONDS = REGISTRY.histogram(
+    'avu_summary_seconds', '生成摘要的耗时，按结果区分 (success/error)', ('outcome',),
+    (1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+JOBS = REGISTRY.counter(
+    'avu_jobs_total', '工作节点执行完毕的任务数，按最终状态区分', ('status',))
+JOB_SECONDS = REGISTRY.histogram(
+    'avu_job_seconds', '任务从领取到结束的耗时', ('status',),
+    (10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0, 7200.0))
+
+
+def observe_text_call(provider, seconds, ok, prompt_tokens=None, completion_tokens=None):
+    """
+    记录一次文本生成调用
+
+    Args:
+        provider (str): 服务名称 ('qwen' 或 'gemini')
+        seconds (float): 耗时（秒）
+        ok (bool): 是否成功
+        prompt_tokens (int, optional): 输入token数
+        completion_tokens (int, optional): 输出token数
+    """
+    TEXT_CALLS.observe(seconds, provider=provider, outcome='success' if ok else 'error')
+    if prompt_tokens:
+        TOKENS.inc(prompt_tokens, provider=provider, kind='prompt')
+    if completion_tokens:
+        TOKENS.inc(completion_tokens, provider=provider, kind='completion')
+
+
+class MetricsHTTPServer:
+    """只提供 GET /metrics 的HTTP接口 (供不带任务接口的工作节点等进程使用)"""
+
+    def __init__(self, port=None, host=None, registry=None):
+        """
+        Args:
+            port (int, optional): 监听端口，默认为config.METRICS_PORT，0表示自动分配
+            host (str, optional): 监听地址，默认为config.METRICS_HOST
+            registry (Registry, optional): 指标注册表，默认为REGISTRY
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # 只有提供HTTP接口的进程需要
+        registry = registry or REGISTRY
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        port = config.METRICS_PORT if port is None else port
+        self.httpd = ThreadingHTTPServer((host or config.METRICS_HOST, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class TextfileWriter:
+    """后台线程：每隔interval秒将指标写入textfile collector文件，停止时再写一次"""
+
+    def __init__(self, path=None, interval=None, registry=None):
+        """
+        Args:
+            path (str, optional): 目标文件路径，默认为config.METRICS_TEXTFILE
+            interval (float, optional): 写入间隔（秒），默认为config.METRICS_TEXTFILE_INTERVAL
+            registry (Registry, optional): 指标注册表，默认为REGISTRY
+        """
+        self.path = path or config.METRICS_TEXTFILE
+        self.interval = config.METRICS_TEXTFILE_INTERVAL if interval is None else interval
+        self.registry = registry or REGISTRY
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def write(self):
+        try:
+            self.registry.write_textfile(self.path)
+        except OSError as e:
+            logger.warning(f"写入指标文件 {self.path} 失败: {e}")
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.write()
+        self._thread = threading.Thread(target=self._loop, name="metrics-textfile", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write()
+
+
+def start_exporters(port=None, textfile=None):
+    """
+    按参数或配置启动指标导出：HTTP接口 (设置了端口时) 与textfile定期写入 (设置了文件路径时)
+
+    Args:
+        port (int, optional): HTTP接口端口，默认为config.METRICS_PORT
+        textfile (str, optional): textfile collector文件路径，默认为config.METRICS_TEXTFILE
+
+    Returns:
+        list: 已启动的导出器，调用方退出前应逐个调用stop()
+    """
+    port = config.METRICS_PORT if port is None else port
+    textfile = textfile or config.METRICS_TEXTFILE
+    exporters = []
+    if port is not None:
+        exporters.append(MetricsHTTPServer(port).start())
+    if textfile:
+        exporters.append(TextfileWriter(textfile).start())
+    return exporters
+
+
+def timer():
+    """返回一个在调用时给出已耗时（秒）的函数"""
+    started = time.perf_counter()
+    return lambda: time.perf_counter() - started
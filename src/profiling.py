@@ -0,0 +1,384 @@
+"""
+性能剖析模块：记录流程各阶段的墙钟时间、CPU时间、内存峰值与I/O字节数，以及外部调用 (视觉、文本生成、
+FFmpeg、Whisper) 的延迟分布，可选用cProfile剖析各阶段，生成机器可读的JSON报告
+
+未启用剖析时 (默认) 模块级的活动剖析器为None，各埋点只做一次判断，不产生额外开销。
+"""
+
+import os
+import sys
+import math
+import json
+import time
+import logging
+import platform
+import threading
+import tracemalloc
+import contextlib
+
+# resource 仅在类Unix系统上可用，不可用时不记录最大常驻内存与子进程CPU时间
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from . import config
+
+logger = logging.getLogger("Profiling")
+
+_active = None
+
+
+def active():
+    """返回当前活动的剖析器，未启用剖析时返回None"""
+    return _active
+
+
+def start(cprofile=None, trace_memory=None):
+    """
+    创建并激活进程级的剖析器
+
+    Args:
+        cprofile (bool, optional): 是否用cProfile剖析各阶段，默认为config.PROFILE_CPROFILE
+        trace_memory (bool, optional): 是否用tracemalloc跟踪Python内存分配，默认为config.PROFILE_TRACE_MALLOC
+
+    Returns:
+        PipelineProfiler: 已激活的剖析器
+    """
+    global _active
+    _active = PipelineProfiler(cprofile, trace_memory)
+    return _active
+
+
+def stop():
+    """停用当前的剖析器并返回它 (未启用时返回None)"""
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+
+@contextlib.contextmanager
+def external_call(kind):
+    """
+    记录一次外部调用的耗时与成败 (未启用剖析时不做任何事)
+
+    Args:
+        kind (str): 调用类别，如 'vision'、'text'、'ffmpeg'、'whisper'
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        profiler.record_call(kind, time.perf_counter() - started, ok)
+
+
+def track_stream(kind, chunks):
+    """
+    透传流式调用的片段，记录从调用到最后一个片段的耗时 (未启用剖析时原样返回)
+
+    Args:
+        kind (str): 调用类别
+        chunks (iterable): 流式片段
+
+    Returns:
+        iterable: 逐块产出相同片段的可迭代对象
+    """
+    profiler = _active
+    if profiler is None:
+        return chunks
+
+    def generate():
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield from chunks
+            ok = True
+        finally:
+            profiler.record_call(kind, time.perf_counter() - started, ok)
+
+    return generate()
+
+
+def _io_counters():
+    """返回本进程累计读写的字节数 (rchar, wchar)，包括文件与管道；不支持/proc的系统上返回 (None, None)"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            values = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(values['rchar']), int(values['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _max_rss_bytes():
+    """返回本进程的最大常驻内存 (字节)，不可用时返回None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上以KB为单位，macOS上以字节为单位
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _children_cpu_seconds():
+    """返回已结束子进程 (FFmpeg等) 的累计CPU时间，不可用时返回None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _delta(end, begin):
+    return None if end is None or begin is None else end - begin
+
+
+def _percentile(sorted_values, fraction):
+    """最近秩法百分位数"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class PipelineProfiler:
+    """
+    流程剖析器
+
+    stage() 记录一个阶段的资源使用，external_call 类别的调用按类别汇总延迟分布。
+    阶段并发执行时，进程级的计数 (进程CPU时间、I/O字节、子进程CPU时间、内存) 会包含同时运行的其他阶段，
+    只有线程CPU时间严格属于该阶段。
+    """
+
+    def __init__(self, cprofile=None, trace_memory=None):
+        """
+        Args:
+            cprofile (bool, optional): 是否用cProfile剖析各阶段，默认为config.PROFILE_CPROFILE
+            trace_memory (bool, optional): 是否用tracemalloc跟踪Python内存分配，默认为config.PROFILE_TRACE_MALLOC
+        """
+        self.cprofile = config.PROFILE_CPROFILE if cprofile is None else cprofile
+        self.trace_memory = config.PROFILE_TRACE_MALLOC if trace_memory is None else trace_memory
+        self.stages = []
+        self.calls = {}
+        self.profiles = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._started_at = time.time()
+        self._owns_tracemalloc = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def close(self):
+        """停止由本剖析器启动的tracemalloc"""
+        if self._owns_tracemalloc and tracemalloc.is_tracing():
+            self._python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def _traced_memory(self):
+        if not tracemalloc.is_tracing():
+            return None, None
+        return tracemalloc.get_traced_memory()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        记录一个阶段的资源使用
+
+        Args:
+            name (str): 阶段名称 (分片中的阶段带有分片前缀)
+        """
+        wall = time.perf_counter()
+        thread_cpu = time.thread_time()
+        process_cpu = time.process_time()
+        children_cpu = _children_cpu_seconds()
+        io_read, io_write = _io_counters()
+        rss = _max_rss_bytes()
+        traced, _ = self._traced_memory()
+        # 同一线程中嵌套的阶段 (如分片阶段内的各子阶段) 不再单独启用cProfile，计入外层阶段
+        profile = None
+        if self.cprofile and not getattr(self._local, 'profiling', False):
+            import cProfile
+            profile = cProfile.Profile()
+        status = 'failed'
+        if profile is not None:
+            try:
+                profile.enable()
+                self._local.profiling = True
+            except ValueError:
+                # Python 3.12起同一时刻只能有一个cProfile处于启用状态，并发的阶段不再单独剖析
+                profile = None
+        try:
+            yield
+            status = 'completed'
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._local.profiling = False
+            end_read, end_write = _io_counters()
+            end_rss = _max_rss_bytes()
+            end_traced, traced_peak = self._traced_memory()
+            record = {
+                'name': name,
+                'thread': threading.current_thread().name,
+                'status': status,
+                'start_offset_seconds': wall - self._started_wall,
+                'wall_seconds': time.perf_counter() - wall,
+                'cpu_thread_seconds': time.thread_time() - thread_cpu,
+                'cpu_process_seconds': time.process_time() - process_cpu,
+                'cpu_children_seconds': _delta(_children_cpu_seconds(), children_cpu),
+                'io_read_bytes': _delta(end_read, io_read),
+                'io_write_bytes': _delta(end_write, io_write),
+                'max_rss_bytes': end_rss,
+                'max_rss_growth_bytes': _delta(end_rss, rss),
+                'python_alloc_delta_bytes': _delta(end_traced, traced),
+                'python_peak_bytes': traced_peak # 剖析开始以来的进程级峰值 (截至阶段结束)
+            }
+            with self._lock:
+                self.stages.append(record)
+                if profile is not None:
+                    self.profiles[name] = profile
+
+    def wrap(self, name, func):
+        """返回在 stage(name) 中执行func的函数"""
+        def wrapped(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapped
+
+    def record_call(self, kind, seconds, ok=True):
+        """
+        记录一次外部调用
+
+        Args:
+            kind (str): 调用类别
+            seconds (float): 耗时（秒）
+            ok (bool, optional): 是否成功
+        """
+        with self._lock:
+            entry = self.calls.setdefault(kind, {'latencies': [], 'errors': 0})
+            entry['latencies'].append(seconds)
+            if not ok:
+                entry['errors'] += 1
+
+    def call_summary(self):
+        """按类别汇总外部调用的次数、错误数与延迟分布 (秒)"""
+        with self._lock:
+            calls = {kind: (list(entry['latencies']), entry['errors']) for kind, entry in self.calls.items()}
+        summary = {}
+        for kind, (latencies, errors) in sorted(calls.items()):
+            latencies.sort()
+            summary[kind] = {
+                'count': len(latencies),
+                'errors': errors,
+                'total_seconds': sum(latencies),
+                'mean_seconds': sum(latencies) / len(latencies),
+                'p50_seconds': _percentile(latencies, 0.5),
+                'p95_seconds': _percentile(latencies, 0.95),
+                'max_seconds': latencies[-1]
+            }
+        return summary
+
+    def _top_functions(self, profile, limit):
+        """cProfile结果中累计耗时最多的函数"""
+        import pstats
+        stats = pstats.Stats(profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'own_seconds': own,
+            'cumulative_seconds': cumulative
+        } for (filename, line, function), (_, calls, own, cumulative, _) in rows]
+
+    def report(self, video_path=None):
+        """
+        生成剖析报告
+
+        Args:
+            video_path (str, optional): 视频路径 (写入报告)
+
+        Returns:
+            dict: 包含总体资源使用、各阶段记录、外部调用汇总与cProfile热点函数
+        """
+        with self._lock:
+            stages = [dict(stage) for stage in self.stages]
+            profiles = dict(self.profiles)
+        _, python_peak = self._traced_memory()
+        slowest = max(stages, key=lambda stage: stage['wall_seconds'], default=None)
+        report = {
+            'video_path': video_path,
+            'started_at': self._started_at,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'wall_seconds': time.perf_counter() - self._started_wall,
+            'cpu_process_seconds': time.process_time() - self._started_cpu,
+            'max_rss_bytes': _max_rss_bytes(),
+            'python_peak_bytes': python_peak if python_peak is not None else getattr(self, '_python_peak', None),
+            'slowest_stage': slowest['name'] if slowest else None,
+            'stages': stages,
+            'external_calls': self.call_summary()
+        }
+        if profiles:
+            report['cprofile'] = {name: self._top_functions(profile, config.PROFILE_TOP_FUNCTIONS)
+                                  for name, profile in profiles.items()}
+        return report
+
+    def save(self, path, video_path=None):
+        """
+        将剖析报告写入JSON文件；启用cProfile时各阶段的原始数据另存为同目录下 <报告名>_<阶段>.prof
+        (可用 python -m pstats 或 snakeviz 查看)
+
+        Args:
+            path (str): 报告文件路径
+            video_path (str, optional): 视频路径
+
+        Returns:
+            dict: 写入的报告
+        """
+        report = self.report(video_path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        base = os.path.splitext(path)[0]
+        with self._lock:
+            profiles = dict(self.profiles)
+        for name, profile in profiles.items():
+            profile.dump_stats(f"{base}_{name.replace('/', '_')}.prof")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"剖析报告已保存到 {path}")
+        return report
+
+
+def format_report(report):
+    """
+    将剖析报告格式化为便于阅读的文本表格
+
+    Args:
+        report (dict): PipelineProfiler.report 返回的报告
+
+    Returns:
+        str: 文本报告
+    """
+    def mb(value):
+        return '-' if value is None else f"{value / 1024 / 1024:.1f}"
+
+    lines = [f"剖析报告: 总耗时 {report['wall_seconds']:.2f}s，进程CPU {report['cpu_process_seconds']:.2f}s，"
+             f"最大常驻内存 {mb(report['max_rss_bytes'])} MB"]
+    lines.append(f"{'阶段':<24}{'墙钟(s)':>10}{'线程CPU(s)':>12}{'子进程CPU(s)':>14}{'读(MB)':>10}{'写(MB)':>10}")
+    for stage in report['stages']:
+        children = stage['cpu_children_seconds']
+        lines.append(f"{stage['name']:<24}{stage['wall_seconds']:>10.2f}{stage['cpu_thread_seconds']:>12.2f}"
+                     f"{'-' if children is None else format(children, '.2f'):>14}"
+                     f"{mb(stage['io_read_bytes']):>10}{mb(stage['io_write_bytes']):>10}")
+    for kind, calls in report['external_calls'].items():
+        lines.append(f"外部调用 {kind}: {calls['count']} 次 (失败 {calls['errors']})，"
+                     f"p50 {calls['p50_seconds']:.3f}s，p95 {calls['p95_seconds']:.3f}s，"
+                     f"最大 {calls['max_seconds']:.3f}s")
+    return "\n".join(lines)
@@ -0,0 +1,201 @@
+"""
+服务路由模块：根据各文本生成服务的延迟与错误率选择服务，并在请求过慢时发起对冲请求
+"""
+
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+
+from . import config
+
+
+class ProviderStats:
+    """单个服务的运行统计：延迟与错误率的指数加权移动平均 (EWMA)，以及最近延迟的滑动窗口"""
+
+    def __init__(self, name, alpha=None, window=None):
+        """
+        Args:
+            name (str): 服务名称
+            alpha (float, optional): EWMA平滑系数，默认为config.ROUTER_EWMA_ALPHA
+            window (int, optional): 用于估计p95的最近成功延迟样本数，默认为config.ROUTER_LATENCY_WINDOW
+        """
+        self.name = name
+        self.alpha = alpha or config.ROUTER_EWMA_ALPHA
+        self.latency_ewma = None # 成功请求的延迟EWMA（秒），无样本时为None
+        self.error_ewma = 0.0 # 错误率EWMA (0~1)
+        self.latencies = deque(maxlen=window or config.ROUTER_LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, success):
+        """
+        记录一次调用结果
+
+        Args:
+            latency (float): 调用耗时（秒）
+            success (bool): 是否成功
+        """
+        with self._lock:
+            self.calls += 1
+            if success:
+                self.latencies.append(latency)
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+            else:
+                self.errors += 1
+            self.error_ewma = self.alpha * (0.0 if success else 1.0) + (1 - self.alpha) * self.error_ewma
+
+    @property
+    def healthy(self):
+        """错误率EWMA低于阈值时视为健康"""
+        return self.error_ewma < config.ROUTER_ERROR_RATE_THRESHOLD
+
+    def p95_latency(self):
+        """
+        最近成功请求延迟的p95
+
+        Returns:
+            float: p95延迟（秒），样本不足config.ROUTER_HEDGE_MIN_SAMPLES时返回None
+        """
+        with self._lock:
+            if len(self.latencies) < config.ROUTER_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def snapshot(self):
+        """返回统计快照 (用于日志与报告)"""
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_ewma': self.latency_ewma,
+            'error_ewma': self.error_ewma,
+            'p95_latency': self.p95_latency(),
+            'healthy': self.healthy
+        }
+
+
+class ProviderRouter:
+    """
+    延迟感知的服务路由器
+
+    - 按 (是否健康, 延迟EWMA, 配置优先级) 排序，请求发往最快的健康服务；尚无样本的服务按优先级优先尝试
+    - 首个请求超过该服务p95延迟仍未返回时，向下一个服务发起对冲请求，取先成功返回的结果
+    - 某个服务出错时自动切换到下一个服务，所有服务都失败才抛出异常
+    """
+
+    def __init__(self, providers, hedging=None, max_workers=None):
+        """
+        Args:
+            providers (list): (名称, 调用函数) 列表，按优先级排序；调用函数接收prompt并返回文本
+            hedging (bool, optional): 是否启用对冲请求，默认为config.ROUTER_HEDGING
+            max_workers (int, optional): 执行请求的线程数，默认为config.ROUTER_MAX_WORKERS
+        """
+        if not providers:
+            raise ValueError("至少需要一个可用的服务")
+        self.providers = dict(providers)
+        self.priority = {name: index for index, (name, _) in enumerate(providers)}
+        self.stats = {name: ProviderStats(name) for name, _ in providers}
+        self.hedging = config.ROUTER_HEDGING if hedging is None else hedging
+        self.logger = logging.getLogger("ProviderRouter")
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers or config.ROUTER_MAX_WORKERS,
+            thread_name_prefix="provider-router"
+        )
+
+    def ordered_providers(self):
+        """
+        返回按路由优先级排序的服务名称列表
+
+        Returns:
+            list: 服务名称
+        """
+        def sort_key(name):
+            stats = self.stats[name]
+            latency = stats.latency_ewma if stats.latency_ewma is not None else 0.0
+            return (not stats.healthy, latency, self.priority[name])
+        return sorted(self.providers, key=sort_key)
+
+    def hedge_delay(self, name):
+        """发起对冲请求前等待的时间：该服务的p95延迟，样本不足时使用config.ROUTER_DEFAULT_HEDGE_DELAY"""
+        p95 = self.stats[name].p95_latency()
+        return p95 if p95 is not None else config.ROUTER_DEFAULT_HEDGE_DELAY
+
+    def _timed_call(self, name, prompt):
+        """调用服务并记录耗时与结果"""
+        start_time = time.perf_counter()
+        try:
+            result = self.providers[name](prompt)
+        except Exception:
+            self.stats[name].record(time.perf_counter() - start_time, False)
+            raise
+        self.stats[name].record(time.perf_counter() - start_time, True)
+        return result
+
+    def call(self, prompt):
+        """
+        路由一次文本生成请求
+
+        Args:
+            prompt (str): 提示词
+
+        Returns:
+            str: 最先成功返回的生成结果
+        """
+        candidates = self.ordered_providers()
+        pending = {} # future -> 服务名称
+        errors = []
+        hedged = False
+
+        def launch():
+            name = candidates.pop(0)
+            pending[self._executor.submit(self._timed_call, name, prompt)] = name
+            return name
+
+        primary = launch()
+        while pending:
+            timeout = None
+            if self.hedging and not hedged and candidates:
+                timeout = self.hedge_delay(primary)
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            if not done:
+                # 首个请求超过p95仍未返回：向下一个服务发起对冲请求
+                hedged = True
+                hedge = launch()
+                self.logger.info(f"{primary} 超过 {timeout:.2f} 秒未返回，向 {hedge} 发起对冲请求")
+                continue
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.warning(f"服务 {name} 调用失败: {e}")
+                    errors.append(f"{name}: {e}")
+                    continue
+                if len(self.providers) > 1:
+                    self.logger.info(f"使用 {name} 的结果" + (" (对冲请求)" if name != primary else ""))
+                # 未完成的请求在后台结束，其耗时仍会计入统计
+                return result
+
+            # 失败且没有在途请求时，切换到下一个服务
+            if not pending and candidates:
+                primary = launch()
+                hedged = False
+
+        raise RuntimeError(f"所有文本生成服务均调用失败: {'; '.join(errors)}")
+
+    def report(self):
+        """返回各服务的统计快照列表"""
+        return [self.stats[name].snapshot() for name in self.providers]
+
+    def close(self):
+        """关闭请求线程池 (不等待仍在后台运行的对冲请求，取消尚未开始的请求)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,255 @@
+"""
+结果存储模块：以列式格式保存逐帧分析结果，支持内存映射读取和按需导出JSON
+"""
+
+import os
+import json
+import shutil
+import logging
+
+import numpy as np
+
+# 状态码
+STATUS_OK = 0 # 识别到字幕
+STATUS_NO_SUBTITLE = 1 # 无字幕
+STATUS_FAILED = 2 # 分析失败
+
+STORE_VERSION = 1
+NO_TEXT = -1 # 文本ID列中表示"无文本"的值
+
+# 列名 -> numpy数据类型
+FRAME_COLUMNS = {
+    'frame_number': np.int32,
+    'timestamp': np.float64,
+    'frame_name_id': np.int32,
+    'text_id': np.int32,
+    'error_id': np.int32,
+    'status': np.int8,
+    'latency': np.float32,
+}
+
+
+def status_for_subtitle(subtitle, error=None):
+    """
+    根据字幕文本得到状态码
+
+    Args:
+        subtitle (str): 帧分析得到的字幕文本
+        error (str, optional): 错误信息
+
+    Returns:
+        int: 状态码
+    """
+    if error or subtitle == '分析失败':
+        return STATUS_FAILED
+    if not subtitle or subtitle == '无字幕':
+        return STATUS_NO_SUBTITLE
+    return STATUS_OK
+
+
+class StringTable:
+    """字符串表：去重后的UTF-8文本拼接为一个字节块，另存偏移数组"""
+
+    def __init__(self, blob, offsets):
+        """
+        Args:
+            blob: 字节块 (bytes 或 numpy uint8 内存映射数组)
+            offsets: 长度为 n+1 的偏移数组
+        """
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, text_id):
+        if text_id < 0:
+            return None
+        start, end = int(self.offsets[text_id]), int(self.offsets[text_id + 1])
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+    @staticmethod
+    def build(strings):
+        """
+        将字符串列表编码为 (blob, offsets)
+
+        Args:
+            strings (list): 去重后的字符串列表 (按ID顺序)
+
+        Returns:
+            tuple: (bytes, numpy.ndarray)
+        """
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return b''.join(encoded), offsets
+
+
+class FrameResultStore:
+    """
+    逐帧分析结果的列式存储
+
+    一个存储是一个目录，每列保存为一个 .npy 文件，所有文本 (帧名、字幕、错误信息) 去重后放入字符串表。
+    读取时各列以 mmap_mode='r' 打开，只有真正访问到的页才会被读入内存。
+    """
+
+    def __init__(self, path):
+        """
+        打开已有的列式存储 (内存映射)
+
+        Args:
+            path (str): 存储目录路径
+        """
+        self.path = path
+        self.logger = logging.getLogger("FrameResultStore")
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.isfile(meta_path):
+            raise FileNotFoundError(f"列式结果存储不存在: {path}")
+
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"不支持的列式存储版本: {self.meta.get('version')}")
+
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+            for name in FRAME_COLUMNS
+        }
+        offsets = np.load(os.path.join(path, 'string_offsets.npy'), mmap_mode='r')
+        blob_path = os.path.join(path, 'strings.bin')
+        # 空文件无法内存映射
+        blob = np.memmap(blob_path, dtype=np.uint8, mode='r') if os.path.getsize(blob_path) else b''
+        self.strings = StringTable(blob, offsets)
+
+    def __len__(self):
+        return self.meta['count']
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def output_frame_rate(self):
+        return self.meta.get('output_frame_rate')
+
+    @classmethod
+    def write(cls, path, frame_results, output_frame_rate=None):
+        """
+        将逐帧结果写入列式存储并返回以内存映射方式打开的存储
+
+        Args:
+            path (str): 存储目录路径 (已存在则覆盖)
+            frame_results (list): 帧结果列表，每项包含frame_name、subtitle，
+                                  可选frame_number、timestamp、latency、error
+            output_frame_rate (float, optional): 输出帧率，用于在缺少timestamp时由帧号推算时间戳
+
+        Returns:
+            FrameResultStore: 新写入的存储
+        """
+        string_ids = {}
+        strings = []
+
+        def intern(text):
+            if text is None:
+                return NO_TEXT
+            text_id = string_ids.get(text)
+            if text_id is None:
+                text_id = string_ids[text] = len(strings)
+                strings.append(text)
+            return text_id
+
+        count = len(frame_results)
+        arrays = {name: np.empty(count, dtype=dtype) for name, dtype in FRAME_COLUMNS.items()}
+        for i, result in enumerate(frame_results):
+            frame_number = result.get('frame_number') or 0
+            timestamp = result.get('timestamp')
+            if timestamp is None:
+                timestamp = (frame_number - 1) / output_frame_rate if output_frame_rate and frame_number else np.nan
+            subtitle = result.get('subtitle')
+            error = result.get('error')
+
+            arrays['frame_number'][i] = frame_number
+            arrays['timestamp'][i] = timestamp
+            arrays['frame_name_id'][i] = intern(result.get('frame_name'))
+            arrays['text_id'][i] = intern(subtitle)
+            arrays['error_id'][i] = intern(error) if 'error' in result else NO_TEXT
+            arrays['status'][i] = status_for_subtitle(subtitle, error)
+            latency = result.get('latency')
+            arrays['latency'][i] = np.nan if latency is None else latency
+
+        # 先写入临时目录，完成后再替换，避免读者看到写了一半的存储
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        blob, offsets = StringTable.build(strings)
+        np.save(os.path.join(tmp_path, 'string_offsets.npy'), offsets)
+        with open(os.path.join(tmp_path, 'strings.bin'), 'wb') as f:
+            f.write(blob)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': STORE_VERSION,
+                'count': count,
+                'output_frame_rate': output_frame_rate,
+                'columns': {name: np.dtype(dtype).str for name, dtype in FRAME_COLUMNS.items()},
+                'string_count': len(strings)
+            }, f, ensure_ascii=False, indent=2)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def record(self, index):
+        """
+        还原第index帧的结果字典 (与 _raw_analyzed.json 中的条目格式相同)
+
+        Args:
+            index (int): 行号
+
+        Returns:
+            dict: 包含frame_name、subtitle，失败时包含error
+        """
+        record = {
+            'frame_name': self.strings[int(self.columns['frame_name_id'][index])],
+            'subtitle': self.strings[int(self.columns['text_id'][index])]
+        }
+        error_id = int(self.columns['error_id'][index])
+        if error_id != NO_TEXT:
+            record['error'] = self.strings[error_id]
+        return record
+
+    def iter_records(self):
+        """按存储顺序逐条产出结果字典"""
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def export_json(self, output_path):
+        """
+        按需导出为与原 _raw_analyzed.json 相同格式的JSON文件
+
+        Args:
+            output_path (str): JSON输出路径
+        """
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.iter_records()), f, ensure_ascii=False, indent=2)
+        self.logger.info(f"列式结果已导出为JSON: {output_path}")
+
+
+def main():
+    """命令行入口：将列式结果存储导出为JSON"""
+    import argparse
+    parser = argparse.ArgumentParser(description='将列式逐帧结果存储导出为JSON')
+    parser.add_argument('store_path', help='列式存储目录 (*_raw_analyzed.frames)')
+    parser.add_argument('output_path', help='JSON输出路径')
+    args = parser.parse_args()
+    FrameResultStore(args.store_path).export_json(args.output_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+运行上下文模块：单个视频一次处理所需的路径与参数 (不可变)，显式传递给各处理类
+"""
+
+import os
+from dataclasses import dataclass, replace
+
+from . import config
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """
+    单个视频的运行上下文
+
+    取代原先由 main.py 与 VideoProcessor 改写的 config 全局变量 (VIDEO_NAME、TRANSCRIPT_PATH、OUTPUT_FRAME_RATE 等)。
+    实例不可变，可以安全地在线程之间共享，因此同一进程中可以并发处理多个视频；config 只提供默认值。
+    """
+
+    video_path: str
+    output_dir: str
+    video_name: str
+    frame_rate: float # 解码帧时使用的输出帧率 (每秒帧数)，用于帧号与时间戳的换算
+    transcript_path: str
+    subtitles_json_path: str
+    subtitles_srt_path: str
+    subtitles_result_path: str
+    summary_output_path: str
+    description: str = None
+
+    @classmethod
+    def for_video(cls, video_path, output_dir, frame_rate=None, description=None, summary_output_path=None):
+        """
+        按视频文件与输出目录创建上下文 (路径布局与原 configure_video 一致)
+
+        Args:
+            video_path (str): 视频文件路径
+            output_dir (str): 该视频的输出目录
+            frame_rate (float, optional): 输出帧率，默认为config.OUTPUT_FRAME_RATE
+            description (str, optional): 视频描述，默认为config.VIDEO_DESCRIPTION
+            summary_output_path (str, optional): 摘要文件路径，默认为config.SUMMARY_OUTPUT_PATH
+
+        Returns:
+            RunContext: 运行上下文
+        """
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        frame_rate = config.OUTPUT_FRAME_RATE if frame_rate is None else frame_rate
+        return cls(
+            video_path=video_path,
+            output_dir=output_dir,
+            video_name=video_name,
+            frame_rate=float(frame_rate) if frame_rate else None,
+            transcript_path=os.path.join(output_dir, 'audio', f"{video_name}_transcript.json"),
+            subtitles_json_path=os.path.join(output_dir, 'subtitles', f"{video_name}_subtitles.json"),
+            subtitles_srt_path=os.path.join(output_dir, 'subtitles', f"{video_name}_subtitles.srt"),
+            subtitles_result_path=os.path.join(output_dir, 'subtitles', f"{video_name}_subtitles_combined.txt"),
+            summary_output_path=summary_output_path or config.SUMMARY_OUTPUT_PATH,
+            description=config.VIDEO_DESCRIPTION if description is None else description
+        )
+
+    @classmethod
+    def from_config(cls):
+        """
+        由config中的全局默认值创建上下文 (供未显式传入上下文的调用方使用)
+
+        Returns:
+            RunContext: 运行上下文
+        """
+        return cls(
+            video_path=None,
+            output_dir=config.OUTPUT_DIR,
+            video_name=config.VIDEO_NAME,
+            frame_rate=config.OUTPUT_FRAME_RATE,
+            transcript_path=config.TRANSCRIPT_PATH,
+            subtitles_json_path=config.SUBTITLES_JSON_PATH,
+            subtitles_srt_path=config.SUBTITLES_SRT_PATH,
+            subtitles_result_path=config.SUBTITLES_RESULT_PATH,
+            summary_output_path=config.SUMMARY_OUTPUT_PATH,
+            description=config.VIDEO_DESCRIPTION
+        )
+
+    @property
+    def frames_dir(self):
+        """帧图像目录"""
+        return os.path.join(self.output_dir, 'frames', self.video_name)
+
+    @property
+    def audio_path(self):
+        """提取的音频文件路径"""
+        return os.path.join(self.output_dir, 'audio', f"{self.video_name}.wav")
+
+    @property
+    def transcript_txt_path(self):
+        """纯文本转录文件路径"""
+        return self.transcript_path.replace('.json', '.txt') if self.transcript_path else None
+
+    def replace(self, **changes):
+        """
+        返回修改了部分字段的新上下文 (原上下文不变)
+
+        Args:
+            **changes: 要修改的字段
+
+        Returns:
+            RunContext: 新的运行上下文
+        """
+        return replace(self, **changes)
@@ -0,0 +1,330 @@
+"""
+常驻任务服务：在一个进程中保持Whisper模型与AI客户端预热，通过本地HTTP或Unix套接字接口接收任务，
+任务持久化在SQLite队列中 (服务停止时未完成的任务在租约到期后重新排队)
+
+用法:
+    python -m src.server [--host 127.0.0.1] [--port 8780 | --unix-socket /tmp/avu.sock] [--db jobs.sqlite3]
+                         [--output output/jobs] [--workers 1] [其他与 src.main 相同的参数]
+
+接口 (请求与响应均为JSON):
+    POST /jobs                  提交任务 {"video_path": ..., "description": ..., "output_dir": ...}
+    GET  /jobs[?status=queued]  列出任务
+    GET  /jobs/<id>             查询任务状态
+    POST /jobs/<id>/cancel      取消任务 (DELETE /jobs/<id> 等价)
+    GET  /jobs/<id>/result      获取摘要结果 (任务未成功时返回409)
+    GET  /health                服务状态
+    GET  /metrics               Prometheus文本格式的运行指标
+"""
+
+import argparse
+import os
+import json
+import time
+import logging
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from src.job_queue import JobQueue
+from src.worker import JobWorker
+from src.main import add_common_arguments, apply_common_args
+from src import config
+from src import metrics
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """监听Unix套接字的HTTP服务"""
+    daemon_threads = True
+
+
+class JobServer:
+    """
+    常驻任务服务
+
+    由 JobWorker 在本进程中保持模型与客户端预热并执行任务，本类在其上提供本地HTTP接口。
+    队列数据库可与其他主机上的工作节点 (src.worker) 共享：取消请求通过队列传递给持有该任务的节点。
+    """
+
+    def __init__(self, queue, output_root=None, workers=None, runner=None, host=None, port=None,
+                 unix_socket=None, poll_interval=None, worker_id=None):
+        """
+        Args:
+            queue (JobQueue): 任务队列
+            output_root (str, optional): 任务输出根目录，默认为config.SERVER_OUTPUT_DIR
+            workers (int, optional): 同时执行的任务数，默认为config.SERVER_WORKERS，0表示只接收任务、不在本进程执行
+            runner (callable, optional): 任务执行函数 runner(job, output_dir, cancel_event) -> 结果字典；
+                默认使用预热的服务执行完整的视频处理流程
+            host (str, optional): HTTP监听地址，默认为config.SERVER_HOST
+            port (int, optional): HTTP监听端口，默认为config.SERVER_PORT，0表示自动分配
+            unix_socket (str, optional): Unix套接字路径，设置后代替TCP端口监听
+            poll_interval (float, optional): 队列为空时的轮询间隔（秒），默认为config.SERVER_POLL_INTERVAL
+            worker_id (str, optional): 工作者标识，见 JobWorker
+        """
+        self.queue = queue
+        self.unix_socket = unix_socket
+        self.logger = logging.getLogger("JobServer")
+        self.started_at = None
+        self.worker = None
+        if workers != 0:
+            self.worker = JobWorker(queue, output_root, workers, runner, worker_id=worker_id,
+                                    poll_interval=poll_interval)
+        self._http_thread = None
+
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket) # 清理上次退出时遗留的套接字文件
+            self.httpd = _UnixHTTPServer(unix_socket, self._make_handler())
+        else:
+            host = host or config.SERVER_HOST
+            port = config.SERVER_PORT if port is None else port
+            self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+            self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        if self.unix_socket:
+            return f"unix://{self.unix_socket}"
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # --- 任务操作 (供HTTP接口调用) ---
+
+    def submit(self, video_path, description=None, output_dir=None):
+        """
+        提交任务并唤醒空闲的工作线程
+
+        Args:
+            video_path (str): 视频文件路径 (执行任务的主机上可访问的路径)
+            description (str, optional): 视频描述
+            output_dir (str, optional): 输出目录
+
+        Returns:
+            dict: 新建的任务
+        """
+        if not video_path or not os.path.isfile(video_path):
+            raise ValueError(f"视频文件不存在: {video_path}")
+        job = self.queue.submit(os.path.abspath(video_path), output_dir, description)
+        if self.worker is not None:
+            self.worker.notify()
+        return job
+
+    def cancel(self, job_id):
+        """
+        取消任务 (运行中的任务在当前阶段结束后停止；在其他节点上运行的任务由该节点的心跳发现取消请求)
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            dict: 更新后的任务，不存在时返回None
+        """
+        job = self.queue.cancel(job_id)
+        if self.worker is not None:
+            self.worker.cancel_local(job_id)
+        return job
+
+    def result(self, job_id):
+        """
+        读取已成功任务的摘要
+
+        Args:
+            job_id (str): 任务ID
+
+        Returns:
+            dict: 包含任务结果与摘要文本，任务不存在时返回None
+        """
+        job = self.queue.get(job_id)
+        if job is None:
+            return None
+        payload = dict(job['result'] or {}, id=job_id, status=job['status'], summary=None)
+        summary_path = payload.get('summary_path')
+        if summary_path and os.path.exists(summary_path):
+            with open(summary_path, 'r', encoding='utf-8') as f:
+                payload['summary'] = f.read()
+        return payload
+
+    def health(self):
+        """服务状态"""
+        return {
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+            'worker_id': self.worker.worker_id if self.worker is not None else None,
+            'workers': self.worker.workers if self.worker is not None else 0,
+            'running': self.worker.running_jobs if self.worker is not None else [],
+            'queued': self.queue.count('queued')
+        }
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """预热服务，启动工作线程与HTTP接口 (后台线程)，返回自身"""
+        if self.worker is not None:
+            self.worker.start()
+        self.started_at = time.time()
+        self._http_thread = threading.Thread(target=self.httpd.serve_forever, name="job-server-http", daemon=True)
+        self._http_thread.start()
+        return self
+
+    def stop(self):
+        """停止HTTP接口与工作线程 (等待运行中的任务结束)"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._http_thread is not None:
+            self._http_thread.join()
+        if self.worker is not None:
+            self.worker.stop()
+        if self.unix_socket and os.path.exists(self.unix_socket):
+            os.remove(self.unix_socket)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- HTTP接口 ---
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def address_string(self):
+                # Unix套接字的客户端地址不是 (host, port)
+                return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+            def log_message(self, format, *args):
+                server.logger.debug(f"{self.address_string()} {format % args}")
+
+            def _send_json(self, status, payload):
+                self._send_body(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+            def _send_body(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status, message):
+                self._send_json(status, {'error': {'message': message}})
+
+            def _route(self):
+                """返回 (路径片段列表, 查询参数)"""
+                parts = urlsplit(self.path)
+                return [p for p in parts.path.split('/') if p], parse_qs(parts.query)
+
+            def do_GET(self):
+                segments, query = self._route()
+                try:
+                    if segments == ['health']:
+                        self._send_json(200, server.health())
+                    elif segments == ['metrics']:
+                        self._send_body(200, metrics.REGISTRY.render().encode('utf-8'), metrics.CONTENT_TYPE)
+                    elif segments == ['jobs']:
+                        status = query.get('status', [None])[0]
+                        limit = int(query.get('limit', ['100'])[0])
+                        self._send_json(200, {'jobs': server.queue.list(status=status, limit=limit)})
+                    elif len(segments) == 2 and segments[0] == 'jobs':
+                        job = server.queue.get(segments[1])
+                        if job is None:
+                            self._error(404, f"任务不存在: {segments[1]}")
+                        else:
+                            self._send_json(200, job)
+                    elif len(segments) == 3 and segments[0] == 'jobs' and segments[2] == 'result':
+                        payload = server.result(segments[1])
+                        if payload is None:
+                            self._error(404, f"任务不存在: {segments[1]}")
+                        elif payload['status'] != 'succeeded':
+                            self._send_json(409, dict(payload, error={'message': f"任务尚未成功完成: {payload['status']}"}))
+                        else:
+                            self._send_json(200, payload)
+                    else:
+                        self._error(404, f"未知路径: {self.path}")
+                except ValueError as e:
+                    self._error(400, str(e))
+
+            def do_POST(self):
+                segments, _ = self._route()
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._error(400, '请求体不是有效的JSON')
+                    return
+                if not isinstance(body, dict):
+                    self._error(400, '请求体必须是JSON对象')
+                    return
+
+                if segments == ['jobs']:
+                    try:
+                        job = server.submit(body.get('video_path'), body.get('description'), body.get('output_dir'))
+                    except ValueError as e:
+                        self._error(400, str(e))
+                        return
+                    self._send_json(201, job)
+                elif len(segments) == 3 and segments[0] == 'jobs' and segments[2] == 'cancel':
+                    self._cancel(segments[1])
+                else:
+                    self._error(404, f"未知路径: {self.path}")
+
+            def do_DELETE(self):
+                segments, _ = self._route()
+                if len(segments) == 2 and segments[0] == 'jobs':
+                    self._cancel(segments[1])
+                else:
+                    self._error(404, f"未知路径: {self.path}")
+
+            def _cancel(self, job_id):
+                job = server.cancel(job_id)
+                if job is None:
+                    self._error(404, f"任务不存在: {job_id}")
+                else:
+                    self._send_json(200, job)
+
+        return Handler
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='AI视频理解与摘要工具 (常驻任务服务)')
+    parser.add_argument('--host', default=None, help=f'HTTP监听地址 (默认 {config.SERVER_HOST})')
+    parser.add_argument('--port', type=int, default=None, help=f'HTTP监听端口 (默认 {config.SERVER_PORT})')
+    parser.add_argument('--unix-socket', default=None, help='改为监听该Unix套接字')
+    parser.add_argument('--db', default=None, help='任务队列数据库路径')
+    parser.add_argument('--output', '-o', default=None, help='任务输出根目录')
+    parser.add_argument('--workers', type=int, default=None, help='同时执行的任务数 (0表示只接收任务，由 src.worker 节点执行)')
+    parser.add_argument('--worker-id', default=None, help='工作者标识 (默认 <主机名>:<进程号>)')
+    add_common_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    """任务服务入口"""
+    args = parse_args()
+    apply_common_args(args)
+
+    queue = JobQueue(args.db)
+    server = JobServer(queue, args.output, args.workers, host=args.host, port=args.port,
+                       unix_socket=args.unix_socket or config.SERVER_UNIX_SOCKET, worker_id=args.worker_id)
+    print("正在预热模型与客户端...")
+    server.start()
+    workers = server.worker.workers if server.worker is not None else 0
+    print(f"任务服务已启动: {server.url} (队列: {queue.db_path}，工作线程: {workers})")
+    # 指标已由 GET /metrics 提供，这里只按配置启动textfile写入
+    textfile_writer = metrics.TextfileWriter().start() if config.METRICS_TEXTFILE else None
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("正在停止任务服务 (等待运行中的任务结束)...")
+    finally:
+        server.stop()
+        if textfile_writer is not None:
+            textfile_writer.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+时间分片模块：将一个长视频按时间切分为多个分片分别处理 (帧、音频、转录、视觉)，再按全局时间合并转录与字幕
+"""
+
+import math
+import logging
+
+from . import config
+from .subtitle_processor import SubtitleProcessor
+
+logger = logging.getLogger("Sharding")
+
+
+def plan_shards(duration, shard_count=None, shard_seconds=None, overlap=None, min_seconds=None):
+    """
+    规划时间分片
+
+    每个分片拥有 [owned_start, owned_end) 的时间范围，实际处理范围 [start, end) 向两侧各扩展overlap秒，
+    使跨越分片边界的语音分段与字幕在相邻两个分片中都能完整出现，合并时按归属范围取舍。
+
+    Args:
+        duration (float): 视频时长（秒）
+        shard_count (int, optional): 分片数，默认为config.VIDEO_SHARDS
+        shard_seconds (float, optional): 每个分片的时长（秒），设置时优先于shard_count
+        overlap (float, optional): 相邻分片的重叠时长（秒），默认为config.SHARD_OVERLAP_SECONDS
+        min_seconds (float, optional): 分片的最短时长（秒），默认为config.SHARD_MIN_SECONDS，视频较短时减少分片数
+
+    Returns:
+        list: 分片列表，每项包含 index, start, end, owned_start, owned_end (秒)
+    """
+    if duration is None or duration <= 0:
+        raise ValueError(f"无效的视频时长: {duration}")
+    overlap = config.SHARD_OVERLAP_SECONDS if overlap is None else overlap
+    min_seconds = config.SHARD_MIN_SECONDS if min_seconds is None else min_seconds
+    shard_seconds = shard_seconds or config.SHARD_SECONDS
+    if shard_seconds:
+        shard_count = math.ceil(duration / max(shard_seconds, min_seconds or 0, 1e-6))
+    else:
+        shard_count = shard_count or config.VIDEO_SHARDS
+        if min_seconds:
+            shard_count = min(shard_count, max(1, int(duration // min_seconds)))
+    shard_count = max(1, int(shard_count))
+
+    length = duration / shard_count
+    shards = []
+    for index in range(shard_count):
+        owned_start = index * length
+        owned_end = duration if index == shard_count - 1 else (index + 1) * length
+        shards.append({
+            'index': index,
+            'start': max(0.0, owned_start - overlap),
+            'end': min(duration, owned_end + overlap),
+            'owned_start': owned_start,
+            'owned_end': owned_end
+        })
+    return shards
+
+
+def _owns(shard, timestamp, last):
+    """全局时间点是否属于分片的归属范围 (最后一个分片包含终点)"""
+    if timestamp < shard['owned_start'] and shard['index'] > 0:
+        return False
+    return last or timestamp < shard['owned_end']
+
+
+def merge_transcripts(shard_transcripts):
+    """
+    合并各分片的转录结果
+
+    分段时间加上分片起点换算为全局时间；重叠范围内的分段按中点归属于一个分片，避免重复。
+
+    Args:
+        shard_transcripts (list): (分片, 转录结果) 列表，转录结果包含segments (分片内的相对时间)
+
+    Returns:
+        dict: 合并后的转录结果 (text与segments，格式与Whisper结果相同)
+    """
+    ordered = sorted(shard_transcripts, key=lambda item: item[0]['index'])
+    segments = []
+    for position, (shard, transcript) in enumerate(ordered):
+        last = position == len(ordered) - 1
+        for segment in (transcript or {}).get('segments', []):
+            start = segment.get('start', 0) + shard['start']
+            end = segment.get('end', 0) + shard['start']
+            if not _owns(shard, (start + end) / 2, last):
+                continue
+            segments.append({'id': len(segments), 'start': start, 'end': end,
+                             'text': segment.get('text', '').strip()})
+    return {
+        'text': ' '.join(segment['text'] for segment in segments if segment['text']),
+        'segments': segments
+    }
+
+
+def merge_subtitles(shard_subtitles, similarity_threshold=None, gap_tolerance=None, processor=None):
+    """
+    合并各分片的字幕
+
+    1. 时间加上分片起点换算为全局时间 (分片内全局去重产生的occurrences展开为独立字幕)
+    2. 按中点归属取舍：完全位于重叠范围内的字幕只保留一份
+    3. 缝合跨越分片边界的字幕：来自相邻分片、文本相似且时间相接 (间隔不超过gap_tolerance) 的两条合并为一条
+    4. 开启全局近重复抑制时在全片范围内重新聚类
+
+    Args:
+        shard_subtitles (list): (分片, 字幕列表) 列表，字幕包含text, start_time, end_time (分片内的相对时间)
+        similarity_threshold (float, optional): 缝合时的文本相似度阈值，默认为config.SUBTITLE_MERGE_THRESHOLD_SIMILARITY
+        gap_tolerance (float, optional): 缝合时允许的最大时间间隔（秒），默认为config.SHARD_STITCH_GAP_SECONDS
+        processor (SubtitleProcessor, optional): 提供相似度判断与全局去重的字幕处理器
+
+    Returns:
+        list: 按时间排序的全局字幕列表，每项包含text, start_time, end_time
+    """
+    similarity_threshold = config.SUBTITLE_MERGE_THRESHOLD_SIMILARITY if similarity_threshold is None else similarity_threshold
+    gap_tolerance = config.SHARD_STITCH_GAP_SECONDS if gap_tolerance is None else gap_tolerance
+    processor = processor or SubtitleProcessor()
+
+    ordered = sorted(shard_subtitles, key=lambda item: item[0]['index'])
+    candidates = []
+    for position, (shard, subtitles) in enumerate(ordered):
+        last = position == len(ordered) - 1
+        for subtitle in subtitles or []:
+            spans = subtitle.get('occurrences') or [subtitle]
+            for span in spans:
+                start = span['start_time'] + shard['start']
+                end = span['end_time'] + shard['start']
+                if _owns(shard, (start + end) / 2, last):
+                    candidates.append({'text': subtitle['text'], 'start_time': start, 'end_time': end,
+                                       'shard': shard['index']})
+    candidates.sort(key=lambda subtitle: (subtitle['start_time'], subtitle['shard']))
+
+    merged = []
+    stitched = 0
+    for subtitle in candidates:
+        previous = merged[-1] if merged else None
+        if previous is not None and previous['shard'] != subtitle['shard'] \
+                and subtitle['start_time'] <= previous['end_time'] + gap_tolerance \
+                and processor.is_similar_text(subtitle['text'], previous['text'], similarity_threshold):
+            previous['end_time'] = max(previous['end_time'], subtitle['end_time'])
+            previous['shard'] = subtitle['shard']
+            stitched += 1
+            continue
+        merged.append(dict(subtitle))
+    if stitched:
+        logger.info(f"缝合了 {stitched} 条跨越分片边界的字幕")
+
+    for subtitle in merged:
+        del subtitle['shard']
+    if config.SUBTITLE_GLOBAL_DEDUP:
+        merged = processor.suppress_global_duplicates(merged)
+    return merged
@@ -0,0 +1,212 @@
+"""
+阶段调度模块：按依赖关系 (DAG) 并发执行处理流程中的各个阶段，并生成甘特图式的耗时报告
+"""
+
+import time
+import logging
+import threading
+import concurrent.futures
+
+
+class StageCancelledError(RuntimeError):
+    """运行被取消 (已在执行的阶段完成后，未开始的阶段不再执行)"""
+
+
+class Stage:
+    """流程中的一个阶段"""
+
+    def __init__(self, name, func, deps=(), on_skip=None):
+        """
+        Args:
+            name (str): 阶段名称
+            func (callable): 阶段函数，按deps的顺序接收各依赖阶段的返回值作为位置参数
+            deps (tuple, optional): 依赖的阶段名称
+            on_skip (callable, optional): 阶段因依赖失败被跳过或因取消未执行时调用 (无参数)，
+                                          用于唤醒通过旁路通道 (如TranscriptFeed) 等待该阶段输出的其他阶段
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.on_skip = on_skip
+
+
+class StageScheduler:
+    """
+    DAG阶段调度器
+
+    依赖全部完成的阶段立即提交到线程池执行，互不依赖的阶段 (如解码帧与提取音频+转录) 并发运行，
+    因此总耗时接近关键路径的长度。某个阶段失败时，依赖它的阶段被跳过，其余阶段继续执行，最后抛出第一个错误。
+    """
+
+    def __init__(self, stages, max_workers=None):
+        """
+        Args:
+            stages (list): Stage列表 (同时作为max_workers=1时的执行顺序)
+            max_workers (int, optional): 最大并发阶段数，默认为阶段数
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"重复的阶段名称: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {stage.name} 依赖未知阶段: {dep}")
+        self._check_acyclic()
+
+        self.max_workers = max_workers or len(stages) or 1
+        self.logger = logging.getLogger("StageScheduler")
+        self.results = {}
+        self.timings = {} # 阶段名称 -> {'start', 'end', 'status', 'thread'}，时间相对于run开始 (秒)
+
+    def _check_acyclic(self):
+        """检查依赖关系中没有环"""
+        visiting, done = set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖存在环: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name, [])
+
+    def _run_stage(self, stage, origin):
+        """执行单个阶段并记录耗时"""
+        start = time.perf_counter() - origin
+        self.timings[stage.name] = {'start': start, 'end': None, 'status': 'running', 'thread': threading.current_thread().name}
+        try:
+            return stage.func(*[self.results[dep] for dep in stage.deps])
+        finally:
+            self.timings[stage.name]['end'] = time.perf_counter() - origin
+
+    def _notify_skip(self, stage):
+        """调用未执行阶段的on_skip回调 (回调出错只记录日志)"""
+        if stage.on_skip is None:
+            return
+        try:
+            stage.on_skip()
+        except Exception as e:
+            self.logger.error(f"阶段 {stage.name} 的跳过回调失败: {e}")
+
+    def run(self, cancel_event=None):
+        """
+        执行所有阶段
+
+        Args:
+            cancel_event (threading.Event, optional): 取消信号；设置后不再启动新阶段，正在执行的阶段结束后抛出StageCancelledError
+
+        Returns:
+            dict: 阶段名称 -> 返回值
+
+        Raises:
+            StageCancelledError: 运行被取消
+            Exception: 第一个失败阶段的异常 (所有可执行的阶段结束后才抛出)
+        """
+        origin = time.perf_counter()
+        remaining = dict(self.stages)
+        pending = {}
+        failed = set()
+        first_error = None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+            while remaining or pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    for name in remaining:
+                        self.timings[name] = {'start': None, 'end': None, 'status': 'cancelled', 'thread': None}
+                        self._notify_skip(self.stages[name])
+                    remaining = {}
+                    if first_error is None:
+                        first_error = StageCancelledError("运行已取消")
+
+                # 提交依赖已全部完成的阶段；依赖失败或被跳过的阶段直接跳过
+                for name, stage in list(remaining.items()):
+                    if any(dep in failed for dep in stage.deps):
+                        self.timings[name] = {'start': None, 'end': None, 'status': 'skipped', 'thread': None}
+                        failed.add(name)
+                        del remaining[name]
+                        self._notify_skip(stage)
+                    elif all(dep in self.results for dep in stage.deps):
+                        pending[executor.submit(self._run_stage, stage, origin)] = name
+                        del remaining[name]
+                if not pending:
+                    break
+
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                        self.timings[name]['status'] = 'done'
+                    except Exception as e:
+                        self.logger.error(f"阶段 {name} 失败: {e}")
+                        self.timings[name]['status'] = 'failed'
+                        failed.add(name)
+                        if first_error is None:
+                            first_error = e
+
+        self.total_time = time.perf_counter() - origin
+        if first_error is not None:
+            raise first_error
+        return self.results
+
+    def critical_path(self):
+        """
+        返回关键路径 (按实际耗时计算的最长依赖链)
+
+        Returns:
+            tuple: (阶段名称列表, 关键路径总耗时秒数)
+        """
+        memo = {}
+
+        def longest(name):
+            if name not in memo:
+                timing = self.timings.get(name) or {}
+                duration = (timing['end'] - timing['start']) if timing.get('end') is not None else 0.0
+                best_path, best_time = [], 0.0
+                for dep in self.stages[name].deps:
+                    path, total = longest(dep)
+                    if total > best_time:
+                        best_path, best_time = path, total
+                memo[name] = (best_path + [name], best_time + duration)
+            return memo[name]
+
+        return max((longest(name) for name in self.stages), key=lambda item: item[1], default=([], 0.0))
+
+    def format_report(self, width=40):
+        """
+        生成甘特图式的阶段耗时报告
+
+        Args:
+            width (int, optional): 时间轴字符宽度
+
+        Returns:
+            str: 多行报告文本
+        """
+        total = max([t['end'] for t in self.timings.values() if t.get('end') is not None] + [1e-9])
+        name_width = max(len(name) for name in self.stages) if self.stages else 0
+        lines = [f"阶段耗时 (总计 {total:.2f} 秒):"]
+        for name in self.stages:
+            timing = self.timings.get(name)
+            if not timing or timing['start'] is None:
+                label = '取消' if timing and timing['status'] == 'cancelled' else '跳过'
+                lines.append(f"  {name:<{name_width}} |{' ' * width}| {label}")
+                continue
+            begin = int(timing['start'] / total * width)
+            end = max(begin + 1, int(round(timing['end'] / total * width)))
+            bar = ' ' * begin + '█' * (min(end, width) - begin)
+            duration = timing['end'] - timing['start']
+            status = '' if timing['status'] == 'done' else f" ({timing['status']})"
+            lines.append(
+                f"  {name:<{name_width}} |{bar:<{width}}| {timing['start']:7.2f}s → {timing['end']:7.2f}s  {duration:7.2f}s{status}"
+            )
+        path, path_time = self.critical_path()
+        lines.append(f"  关键路径: {' → '.join(path)} ({path_time:.2f} 秒)")
+        return '\n'.join(lines)
@@ -5,23 +5,30 @@
 import os
 import json
 import logging
-from difflib import SequenceMatcher
-
+import threading
+from bisect import bisect_left, bisect_right
 from . import config # 导入配置模块
+from . import text_similarity
+from .token_budget import estimate_tokens
 
 class SubtitleProcessor:
     """字幕处理器：处理、过滤和合并视频字幕"""
 
-    def __init__(self, transcript_path=None):
+    def __init__(self, transcript_path=None, similarity_backend=None, global_dedup=None, output_frame_rate=None):
         """
         初始化字幕处理器
 
         Args:
             transcript_path (str, optional): 语音识别文件路径，默认为None
+            similarity_backend (str, optional): 文本相似度后端 ('auto'/'rapidfuzz'/'difflib')，默认读取config
+            global_dedup (bool, optional): 是否对全部字幕做全局近重复抑制，默认读取config.SUBTITLE_GLOBAL_DEDUP
+            output_frame_rate (float, optional): 输出帧率 (通常为RunContext.frame_rate)，默认读取config.OUTPUT_FRAME_RATE
         """
         self.logger = logging.getLogger("SubtitleProcessor")
+        self.similarity_backend = similarity_backend
+        self.global_dedup = config.SUBTITLE_GLOBAL_DEDUP if global_dedup is None else global_dedup
         self.segments = []
-        self.output_frame_rate = 0  # 会在处理时从config获取
+        self.output_frame_rate = output_frame_rate or 0  # 未提供时在处理时从config获取
 
         # 如果提供了转录文件路径，则加载时间分段信息
         if transcript_path and os.path.exists(transcript_path):
@@ -129,15 +136,8 @@ class SubtitleProcessor:
         Returns:
             bool: 如果相似度高于阈值则返回True
         """
-        if text1 == text2:
-            return True
-
-        if not text1 or not text2:
-            return False
-
-        # 使用SequenceMatcher计算相似度
-        similarity = SequenceMatcher(None, text1, text2).ratio()
-        return similarity >= threshold
+        # 使用text_similarity计算相似度 (优先rapidfuzz，带长度比提前退出)
+        return text_similarity.is_similar(text1, text2, threshold, self.similarity_backend)
 
     def process_subtitles(self, subtitle_results, output_path=None, similarity_threshold=0.85):
         """
@@ -151,8 +151,8 @@ class SubtitleProcessor:
         Returns:
             list: 处理后的字幕列表，每项包含text, start_time, end_time
         """
-        # 从config获取输出帧率
-        self.output_frame_rate = config.OUTPUT_FRAME_RATE
+        # 未在初始化时提供输出帧率时从config获取
+        self.output_frame_rate = self.output_frame_rate or config.OUTPUT_FRAME_RATE
         if not self.output_frame_rate or self.output_frame_rate <= 0:
             self.logger.error("输出帧率(OUTPUT_FRAME_RATE)未在config中设置，无法处理字幕")
             raise ValueError("无法获取有效的输出帧率以处理字幕")
@@ -222,22 +222,129 @@ class SubtitleProcessor:
             if 'frame_end' in subtitle:
                 del subtitle['frame_end']
 
+        # 全局近重复抑制（如果开启）
+        if self.global_dedup:
+            processed_subtitles = self.suppress_global_duplicates(processed_subtitles)
+
         # 保存结果（如果指定了输出路径）
         if output_path:
-            try:
-                output_dir = os.path.dirname(output_path)
-                os.makedirs(output_dir, exist_ok=True)
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'subtitles': processed_subtitles,
-                        'output_frame_rate': self.output_frame_rate # 保存处理时使用的帧率
-                    }, f, ensure_ascii=False, indent=2)
-                self.logger.info(f"处理后的字幕已保存到 {output_path}")
-            except Exception as e:
-                self.logger.error(f"保存处理后的字幕失败: {str(e)}")
+            self.save_subtitles(processed_subtitles, output_path)
 
         return processed_subtitles
 
+    def save_subtitles(self, processed_subtitles, output_path):
+        """
+        将处理后的字幕保存为JSON文件
+
+        Args:
+            processed_subtitles (list): 处理后的字幕列表
+            output_path (str): 输出文件路径
+        """
+        try:
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'subtitles': processed_subtitles,
+                    'output_frame_rate': self.output_frame_rate # 保存处理时使用的帧率
+                }, f, ensure_ascii=False, indent=2)
+            self.logger.info(f"处理后的字幕已保存到 {output_path}")
+        except Exception as e:
+            self.logger.error(f"保存处理后的字幕失败: {str(e)}")
+
+    def suppress_global_duplicates(self, subtitles, threshold=None):
+        """
+        全局近重复抑制：将全片中不相邻的近重复字幕 (如击杀播报、反复出现的提示、常驻横幅) 聚成一簇，
+        每簇只保留最早出现的一条作为代表，并在其occurrences字段中记录所有出现时间
+
+        Args:
+            subtitles (list): 合并后的字幕列表 (按时间排序)
+            threshold (float, optional): n-gram Jaccard相似度阈值，默认为config.SUBTITLE_GLOBAL_DEDUP_THRESHOLD
+
+        Returns:
+            list: 去重后的字幕列表，每项额外包含occurrences (start_time, end_time 列表)
+        """
+        if not subtitles:
+            return subtitles
+        threshold = config.SUBTITLE_GLOBAL_DEDUP_THRESHOLD if threshold is None else threshold
+
+        clusters = text_similarity.find_near_duplicate_clusters(
+            [subtitle['text'] for subtitle in subtitles],
+            threshold=threshold,
+            num_perm=config.SUBTITLE_GLOBAL_DEDUP_NUM_PERM,
+            bands=config.SUBTITLE_GLOBAL_DEDUP_BANDS
+        )
+
+        deduplicated = []
+        for members in clusters:
+            representative = dict(subtitles[members[0]])
+            representative['occurrences'] = [
+                {'start_time': subtitles[i]['start_time'], 'end_time': subtitles[i]['end_time']}
+                for i in members
+            ]
+            deduplicated.append(representative)
+
+        removed = len(subtitles) - len(deduplicated)
+        if removed:
+            self.logger.info(f"全局近重复抑制: {len(subtitles)} 条字幕聚为 {len(deduplicated)} 条，移除 {removed} 条重复")
+        return deduplicated
+
+    def remove_speech_duplicates(self, subtitles, threshold=None, tolerance=None):
+        """
+        去除与语音重复的字幕：将每条字幕与时间上重叠的转录分段对齐，
+        字幕内容基本包含在这些分段的语音中时视为冗余，只保留画面独有的文字
+
+        Args:
+            subtitles (list): 字幕列表，每项包含text、start_time、end_time (可选occurrences)
+            threshold (float, optional): 字幕n-gram被语音包含的比例阈值，默认为config.SUBTITLE_SPEECH_DEDUP_THRESHOLD
+            tolerance (float, optional): 时间对齐容差（秒），默认为config.SUBTITLE_SPEECH_DEDUP_TOLERANCE
+
+        Returns:
+            tuple: (保留的字幕列表, 统计字典 {total, removed, removed_chars, tokens_saved})
+        """
+        threshold = config.SUBTITLE_SPEECH_DEDUP_THRESHOLD if threshold is None else threshold
+        tolerance = config.SUBTITLE_SPEECH_DEDUP_TOLERANCE if tolerance is None else tolerance
+        report = {'total': len(subtitles), 'removed': 0, 'removed_chars': 0, 'tokens_saved': 0}
+
+        segments = sorted(
+            (seg for seg in self.segments if 'start' in seg and 'end' in seg and seg.get('text')),
+            key=lambda seg: seg['start']
+        )
+        if not segments or not subtitles:
+            return list(subtitles), report
+
+        starts = [seg['start'] for seg in segments]
+        # Whisper分段按时间顺序且互不重叠，结束时间同样有序
+        ends = [seg['end'] for seg in segments]
+
+        def speech_between(start_time, end_time):
+            lo = bisect_left(ends, start_time - tolerance)
+            hi = bisect_right(starts, end_time + tolerance)
+            return ''.join(seg['text'] for seg in segments[lo:hi])
+
+        kept = []
+        for subtitle in subtitles:
+            spans = subtitle.get('occurrences') or [subtitle]
+            # 全局去重后的字幕在每次出现时都与语音重复才视为冗余
+            redundant = all(
+                text_similarity.containment(subtitle['text'], speech_between(span['start_time'], span['end_time'])) >= threshold
+                for span in spans
+            )
+            if redundant:
+                report['removed'] += 1
+                report['removed_chars'] += len(subtitle['text'])
+                report['tokens_saved'] += estimate_tokens(subtitle['text'])
+            else:
+                kept.append(subtitle)
+
+        if report['removed']:
+            self.logger.info(
+                f"语音/字幕对齐去重: {report['total']} 条字幕中 {report['removed']} 条与语音重复，"
+                f"节省约 {report['tokens_saved']} tokens"
+            )
+        return kept, report
+
     def adjust_subtitles_with_segments(self, subtitles):
         """
         根据语音识别分段调整字幕时间
@@ -302,4 +409,143 @@ class SubtitleProcessor:
         seconds = seconds % 60
         milliseconds = int((seconds - int(seconds)) * 1000)
 
-        return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
\ No newline at end of file
+        return f"{hours:02d}:{minutes:02d}:{int(seconds):02d},{milliseconds:03d}"
+
+
+class IncrementalSubtitleMerger:
+    """
+    增量字幕合并器：按任意顺序接收帧分析结果，随时给出当前的合并字幕
+
+    合并规则与 SubtitleProcessor.process_subtitles 完全一致 (按帧号排序后，相邻有效帧与当前字幕首条文本相似则合并)。
+    有效帧按帧号保存在有序列表中，各字幕段只记录起始帧号。新帧插入后，
+    只从它前一帧所在的字幕段开始重新合并，直到新的分段边界与原有边界重新对齐为止，
+    因此乱序到达的帧会就地拆分或连接字幕段，最后一帧返回时结果即已就绪，无需再做整体后处理。
+    """
+
+    def __init__(self, processor, similarity_threshold=config.SUBTITLE_MERGE_THRESHOLD_SIMILARITY):
+        """
+        初始化增量字幕合并器
+
+        Args:
+            processor (SubtitleProcessor): 提供相似度判断、时间戳换算与语音分段调整的字幕处理器
+            similarity_threshold (float, optional): 字幕相似度阈值
+        """
+        self.processor = processor
+        self.similarity_threshold = similarity_threshold
+        self.logger = logging.getLogger("IncrementalSubtitleMerger")
+
+        # 与process_subtitles一致：处理器未提供输出帧率时从config获取
+        processor.output_frame_rate = processor.output_frame_rate or config.OUTPUT_FRAME_RATE
+        if not processor.output_frame_rate or processor.output_frame_rate <= 0:
+            self.logger.error("输出帧率(OUTPUT_FRAME_RATE)未在config中设置，无法处理字幕")
+            raise ValueError("无法获取有效的输出帧率以处理字幕")
+        self._lock = threading.Lock()
+        self._frames = [] # 有效帧的帧号 (升序)
+        self._texts = [] # 与 _frames 对应的字幕文本
+        self._span_starts = [] # 每个字幕段起始帧的帧号 (升序)
+        self.received_count = 0 # 已接收的结果数 (包括无字幕和失败帧)
+
+    def add_result(self, result):
+        """
+        加入一条帧分析结果 (可来自任意线程、任意顺序)
+
+        Args:
+            result (dict): 帧分析结果，包含frame_name和subtitle，可选frame_number
+        """
+        subtitle_text = result.get('subtitle')
+        frame_number = result.get('frame_number') or self.processor.extract_frame_number(result.get('frame_name', ''))
+
+        with self._lock:
+            self.received_count += 1
+            # 忽略处理失败或无字幕的情况
+            if not subtitle_text or subtitle_text == '分析失败' or subtitle_text == '无字幕':
+                return
+            if not frame_number:
+                self.logger.warning(f"无法从结果 {result.get('frame_name')} 中确定帧号，跳过此帧。")
+                return
+            self._insert(frame_number, subtitle_text)
+
+    def _insert(self, frame_number, subtitle_text):
+        """插入一帧并局部重新合并受影响的字幕段 (调用方需持有锁)"""
+        pos = bisect_left(self._frames, frame_number)
+        if pos < len(self._frames) and self._frames[pos] == frame_number:
+            # 同一帧重复到达：以最新结果为准
+            self._texts[pos] = subtitle_text
+        else:
+            self._frames.insert(pos, frame_number)
+            self._texts.insert(pos, subtitle_text)
+
+        # 从前一帧所在字幕段的起点开始重新合并
+        if pos == 0:
+            start_index = 0
+        else:
+            span_pos = bisect_right(self._span_starts, self._frames[pos - 1]) - 1
+            start_index = bisect_left(self._frames, self._span_starts[span_pos])
+
+        new_starts = [self._frames[start_index]]
+        stop_frame = None
+        current_text = self._texts[start_index]
+        for index in range(start_index + 1, len(self._frames)):
+            if self.processor.is_similar_text(self._texts[index], current_text, self.similarity_threshold):
+                continue
+            frame = self._frames[index]
+            if index > pos and self._is_span_start(frame):
+                # 新边界与原有边界对齐，其后的分段不受影响
+                stop_frame = frame
+                break
+            new_starts.append(frame)
+            current_text = self._texts[index]
+
+        lo = bisect_left(self._span_starts, self._frames[start_index])
+        hi = len(self._span_starts) if stop_frame is None else bisect_left(self._span_starts, stop_frame)
+        self._span_starts[lo:hi] = new_starts
+
+    def _is_span_start(self, frame):
+        """帧号是否为现有字幕段的起始帧 (在有序的 _span_starts 上二分查找)"""
+        pos = bisect_left(self._span_starts, frame)
+        return pos < len(self._span_starts) and self._span_starts[pos] == frame
+
+    def get_subtitles(self):
+        """
+        获取当前已合并的字幕列表
+
+        Returns:
+            list: 字幕列表，每项包含text, start_time, end_time (格式与process_subtitles相同)
+        """
+        with self._lock:
+            frames = list(self._frames)
+            texts = list(self._texts)
+            span_starts = list(self._span_starts)
+
+        subtitles = []
+        for i, start_frame in enumerate(span_starts):
+            start_index = bisect_left(frames, start_frame)
+            end_index = bisect_left(frames, span_starts[i + 1]) - 1 if i + 1 < len(span_starts) else len(frames) - 1
+            subtitles.append({
+                'text': texts[start_index],
+                'start_time': self.processor.frame_to_timestamp(frames[start_index]),
+                'end_time': self.processor.frame_to_timestamp(frames[end_index])
+            })
+
+        # 根据语音识别分段调整字幕时间（如果有）
+        if self.processor.segments:
+            self.processor.adjust_subtitles_with_segments(subtitles)
+
+        # 全局近重复抑制（如果开启）
+        if self.processor.global_dedup:
+            subtitles = self.processor.suppress_global_duplicates(subtitles)
+        return subtitles
+
+    def save(self, output_path):
+        """
+        将当前合并结果保存为JSON文件 (格式与process_subtitles的输出相同)
+
+        Args:
+            output_path (str): 输出文件路径
+
+        Returns:
+            list: 保存的字幕列表
+        """
+        subtitles = self.get_subtitles()
+        self.processor.save_subtitles(subtitles, output_path)
+        return subtitles
@@ -3,38 +3,208 @@
 """
 
 import os
+import re
+import time
 import logging
+import concurrent.futures
 from . import config
 from .ai_service import AIService
 
+# 切分超长行时优先使用的断句符
+_SENTENCE_BREAK = re.compile(r'(?<=[。！？；，,.!?;])')
+
+
+def split_text_into_chunks(text, chunk_size):
+    """
+    将文本按时间顺序切分为不超过chunk_size个字符的分段
+
+    优先在换行处切分，单行过长时在句读处切分，仍然过长时按长度硬切。
+
+    Args:
+        text (str): 原始文本 (语音转录、字幕等按时间顺序排列)
+        chunk_size (int): 每个分段的最大字符数
+
+    Returns:
+        list: 分段列表 (保持原顺序)
+    """
+    if chunk_size <= 0:
+        raise ValueError("分段大小必须为正数")
+
+    # (片段, 与前一片段的连接符)：新的一行以换行连接，同一行内切出的片段直接拼接
+    pieces = []
+    for line in text.split('\n'):
+        if len(line) <= chunk_size:
+            pieces.append((line, '\n'))
+            continue
+        joiner = '\n'
+        for sentence in _SENTENCE_BREAK.split(line):
+            for start in range(0, len(sentence), chunk_size):
+                pieces.append((sentence[start:start + chunk_size], joiner))
+                joiner = ''
+
+    chunks = []
+    current = ''
+    for piece, joiner in pieces:
+        if current and len(current) + len(joiner) + len(piece) > chunk_size:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{joiner}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
 class Summarizer:
     """内容摘要器，用于生成视频内容的摘要"""
 
-    def __init__(self, ai_service):
+    def __init__(self, ai_service, mode=None):
         """
         初始化内容摘要器
+
+        Args:
+            ai_service: AI服务接口
+            mode (str, optional): 摘要模式 'auto' / 'single' / 'map_reduce'，默认为config.SUMMARY_MODE
         """
         self.ai_service = ai_service
+        self.mode = mode or config.SUMMARY_MODE
         self.logger = logging.getLogger("Summarizer")
+        self.last_metrics = {} # 最近一次摘要的耗时指标 (首token耗时、总耗时等)
+
+    def _use_map_reduce(self, content):
+        """根据模式和输入长度决定是否使用map-reduce摘要"""
+        if self.mode == 'map_reduce':
+            return True
+        if self.mode == 'single':
+            return False
+        return len(content) > config.SUMMARY_MAP_REDUCE_THRESHOLD
+
+    def map_reduce_summary(self, content, chunk_size=None, fan_out=None, max_workers=None, stream=False):
+        """
+        分层map-reduce摘要：按时间顺序切分输入并并行摘要各分段，再逐层合并分段摘要
+
+        Args:
+            content (str): 需要摘要的内容
+            chunk_size (int, optional): 每个分段的最大字符数，默认为config.SUMMARY_CHUNK_SIZE
+            fan_out (int, optional): 每次合并的摘要数，默认为config.SUMMARY_REDUCE_FAN_OUT
+            max_workers (int, optional): 并行调用的最大线程数，默认为config.SUMMARY_MAX_WORKERS
+            stream (bool, optional): 是否流式返回最终合并结果 (map和中间层合并仍为整体调用)
+
+        Returns:
+            str: 最终摘要 (stream为True时返回逐块产出文本的生成器)
+        """
+        chunk_size = chunk_size or config.SUMMARY_CHUNK_SIZE
+        fan_out = max(2, fan_out or config.SUMMARY_REDUCE_FAN_OUT)
+        max_workers = max_workers or config.SUMMARY_MAX_WORKERS
+
+        chunks = split_text_into_chunks(content, chunk_size)
+        if len(chunks) <= 1:
+            return self.ai_service.summarize_text(content, True, stream)
+
+        self.logger.info(f"map-reduce摘要: 输入 {len(content)} 字符切分为 {len(chunks)} 段 (分段大小 {chunk_size}, 合并扇入 {fan_out})")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map: 并行摘要各分段，executor.map 保持时间顺序
+            total = len(chunks)
+            summaries = list(executor.map(
+                lambda item: self.ai_service.summarize_chunk(item[1], item[0], total, True),
+                enumerate(chunks, 1)
+            ))
+
+            # reduce: 每 fan_out 个摘要合并一次，直到只剩一层
+            level = 1
+            while len(summaries) > fan_out:
+                groups = [summaries[i:i + fan_out] for i in range(0, len(summaries), fan_out)]
+                self.logger.info(f"map-reduce摘要: 第 {level} 层合并 {len(summaries)} 个摘要为 {len(groups)} 个")
+                summaries = list(executor.map(
+                    lambda group: self.ai_service.combine_summaries(group, False, True),
+                    groups
+                ))
+                level += 1
+
+        return self.ai_service.combine_summaries(summaries, True, True, stream)
+
+    def _summarize(self, content, stream=False):
+        """按模式调用AI服务生成摘要"""
+        if self._use_map_reduce(content):
+            return self.map_reduce_summary(content, stream=stream)
+        return self.ai_service.summarize_text(content, True, stream)
+
+    def stream_summary(self, content, output_path=None):
+        """
+        流式生成摘要：文本片段一到达即产出，并增量追加写入输出文件
+
+        结束后在 self.last_metrics 中记录首token耗时 (time_to_first_token) 与总耗时 (total_time)。
+
+        Args:
+            content (str): 需要摘要的内容
+            output_path (str, optional): 输出文件路径，默认为config.SUMMARY_OUTPUT_PATH
+
+        Yields:
+            str: 摘要文本片段
+        """
+        output_path = output_path or config.SUMMARY_OUTPUT_PATH
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        start_time = time.perf_counter()
+        first_token_time = None
+        output_chars = 0
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for chunk in self._summarize(content, stream=True):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start_time
+                    self.logger.info(f"摘要首个token耗时: {first_token_time:.2f} 秒")
+                f.write(chunk)
+                f.flush() # 让下游消费者可以立即读到已生成的部分
+                output_chars += len(chunk)
+                yield chunk
+
+        self.last_metrics = {
+            'streaming': True,
+            'time_to_first_token': first_token_time,
+            'total_time': time.perf_counter() - start_time,
+            'output_chars': output_chars
+        }
+        self.logger.info(f"流式摘要完成，总耗时 {self.last_metrics['total_time']:.2f} 秒，共 {output_chars} 字符")
 
-    def generate_summary(self, content):
+    def generate_summary(self, content, on_chunk=None, output_path=None):
         """
-        生成内容摘要并保存到固定路径
+        生成内容摘要并保存到文件
 
         Args:
             content (str): 需要摘要的内容，通常是游戏视频的字幕内容
+            on_chunk (callable, optional): 流式模式下每收到一段文本时的回调 (如实时打印到命令行)。
+                                           提供该回调或开启config.SUMMARY_STREAMING时使用流式接口
+            output_path (str, optional): 摘要文件路径 (通常为RunContext.summary_output_path)，默认为config.SUMMARY_OUTPUT_PATH
 
         Returns:
             str: 生成的摘要
         """
         self.logger.info("开始生成视频内容摘要...")
+        output_path = output_path or config.SUMMARY_OUTPUT_PATH
 
         try:
-            # 调用AI服务生成摘要
-            summary = self.ai_service.summarize_text(content, True)
+            if on_chunk is not None or config.SUMMARY_STREAMING:
+                # 流式生成：边生成边追加写入文件
+                chunks = []
+                for chunk in self.stream_summary(content, output_path):
+                    chunks.append(chunk)
+                    if on_chunk is not None:
+                        on_chunk(chunk)
+                summary = ''.join(chunks)
+                self.logger.info(f"摘要已成功生成并保存到: {output_path}")
+                return summary
 
-            # 使用配置中的固定输出路径
-            output_path = config.SUMMARY_OUTPUT_PATH
+            # 调用AI服务生成摘要 (超长输入使用map-reduce分层摘要)
+            start_time = time.perf_counter()
+            summary = self._summarize(content)
+            self.last_metrics = {
+                'streaming': False,
+                'time_to_first_token': None,
+                'total_time': time.perf_counter() - start_time,
+                'output_chars': len(summary)
+            }
 
             # 确保输出目录存在
             output_dir = os.path.dirname(output_path)
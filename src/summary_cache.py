@@ -0,0 +1,228 @@
+"""
+摘要缓存模块：以规范化提示词、模型名称和温度的摘要值为键，持久化缓存文本生成结果
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from . import config
+
+CACHE_VERSION = 1
+_EVICT_LOW_WATER = 0.9 # 淘汰到上限的90%为止，避免接近上限时每次写入都触发淘汰
+
+
+def normalize_prompt(prompt):
+    """
+    规范化提示词：Unicode NFC、去掉行尾空白、合并连续空行、去掉首尾空白
+
+    只影响格式不影响内容的差异 (如转录文件末尾多一个换行) 不会导致缓存未命中。
+
+    Args:
+        prompt (str): 提示词
+
+    Returns:
+        str: 规范化后的提示词
+    """
+    text = unicodedata.normalize('NFC', prompt).replace('\r\n', '\n')
+    text = '\n'.join(line.rstrip() for line in text.split('\n'))
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def make_key(prompt, models):
+    """
+    计算缓存键
+
+    Args:
+        prompt (str): 提示词
+        models (list): (模型名称, 温度) 列表；启用路由时包含所有可能处理请求的模型
+
+    Returns:
+        str: SHA-256十六进制摘要
+    """
+    material = json.dumps({
+        'version': CACHE_VERSION,
+        'prompt': normalize_prompt(prompt),
+        'models': [[model, temperature] for model, temperature in models]
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """
+    基于文件的摘要缓存
+
+    每个条目保存为 <缓存目录>/<键前两位>/<键>.json。命中时刷新文件修改时间，
+    超过条目数或总大小上限时按修改时间淘汰最久未使用的条目 (LRU)。
+
+    条目数与总大小由进程内的索引增量维护，首次写入时扫描一次缓存目录；只有超过上限时才重新扫描
+    (纳入其他进程的写入、删除过期条目) 并淘汰到上限的90%。
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, max_entries=None, max_bytes=None):
+        """
+        Args:
+            cache_dir (str, optional): 缓存目录，默认为config.SUMMARY_CACHE_DIR
+            ttl (float, optional): 条目有效期（秒），默认为config.SUMMARY_CACHE_TTL，None表示永不过期
+            max_entries (int, optional): 最大条目数，默认为config.SUMMARY_CACHE_MAX_ENTRIES
+            max_bytes (int, optional): 最大总字节数，默认为config.SUMMARY_CACHE_MAX_BYTES
+        """
+        self.cache_dir = cache_dir or config.SUMMARY_CACHE_DIR
+        self.ttl = config.SUMMARY_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or config.SUMMARY_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or config.SUMMARY_CACHE_MAX_BYTES
+        self.logger = logging.getLogger("SummaryCache")
+        self._lock = threading.Lock()
+        self._index = None # 条目路径 -> [最近使用时间, 大小]，首次写入时扫描缓存目录建立
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        读取缓存
+
+        Args:
+            key (str): make_key 计算的缓存键
+
+        Returns:
+            str: 缓存的文本，未命中或已过期时返回None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if self.ttl and time.time() - entry.get('created_at', 0) > self.ttl:
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path, None) # 刷新最近使用时间，供LRU淘汰
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and path in self._index:
+                self._index[path][0] = time.time()
+        self.hits += 1
+        self.logger.info(f"摘要缓存命中: {key[:12]}")
+        return entry.get('text')
+
+    def set(self, key, text, models=None):
+        """
+        写入缓存 (先写临时文件再替换)，并按上限淘汰旧条目
+
+        Args:
+            key (str): 缓存键
+            text (str): 生成的文本
+            models (list, optional): (模型名称, 温度) 列表，仅作为元数据记录
+        """
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created_at': time.time(), 'models': models, 'text': text}, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"写入摘要缓存失败: {e}")
+            return
+        if self._track(path, size):
+            self._evict()
+
+    def _track(self, path, size):
+        """
+        在索引中记录新写入的条目
+
+        Returns:
+            bool: 是否超过条目数或大小上限
+        """
+        with self._lock:
+            if self._index is None:
+                self._load_index() # 扫描结果已包含刚写入的条目
+            else:
+                previous = self._index.get(path)
+                self._total_bytes += size - (previous[1] if previous else 0)
+                self._index[path] = [time.time(), size]
+            return self._over_limit()
+
+    def _load_index(self):
+        """扫描缓存目录重建索引 (调用方须持有锁)"""
+        self._index = {path: [mtime, size] for path, mtime, size in self._entries()}
+        self._total_bytes = sum(size for _, size in self._index.values())
+
+    def _over_limit(self, ratio=1.0):
+        return len(self._index) > self.max_entries * ratio or self._total_bytes > self.max_bytes * ratio
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        with self._lock:
+            entry = self._index.pop(path, None) if self._index is not None else None
+            if entry:
+                self._total_bytes -= entry[1]
+
+    def _entries(self):
+        """列出所有条目 (路径, 修改时间, 大小)"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """删除过期条目，并在超过条目数或大小上限时淘汰最久未使用的条目，直到降到上限的90%"""
+        with self._lock:
+            self._load_index() # 重新扫描，纳入其他进程写入或删除的条目
+            if not self._over_limit():
+                return
+            now = time.time()
+            for path, (mtime, size) in sorted(self._index.items(), key=lambda item: item[1][0]):
+                # 修改时间在命中时会被刷新，只能作为过期的近似判断；精确判断在get中进行
+                expired = self.ttl and now - mtime > self.ttl
+                if not expired and not self._over_limit(_EVICT_LOW_WATER):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                del self._index[path]
+                self._total_bytes -= size
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for path, _, _ in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._index = {}
+            self._total_bytes = 0
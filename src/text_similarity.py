@@ -0,0 +1,262 @@
+"""
+文本相似度模块：为字幕合并与去重提供快速的相似度计算
+"""
+
+import random
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from . import config
+
+# rapidfuzz 为可选依赖：提供C实现的Indel(基于LCS的编辑距离)相似度，未安装时回退到difflib
+try:
+    from rapidfuzz.distance import Indel
+except ImportError:
+    Indel = None
+
+
+def available_backends():
+    """
+    返回当前环境可用的相似度后端
+
+    Returns:
+        list: 后端名称列表，例如 ['rapidfuzz', 'difflib']
+    """
+    backends = ['difflib']
+    if Indel is not None:
+        backends.insert(0, 'rapidfuzz')
+    return backends
+
+
+def resolve_backend(backend=None):
+    """
+    解析要使用的相似度后端
+
+    Args:
+        backend (str, optional): 'auto'、'rapidfuzz' 或 'difflib'，为None时使用config.SUBTITLE_SIMILARITY_BACKEND
+
+    Returns:
+        str: 实际使用的后端名称
+    """
+    backend = backend or config.SUBTITLE_SIMILARITY_BACKEND
+    if backend == 'auto':
+        return 'rapidfuzz' if Indel is not None else 'difflib'
+    if backend == 'rapidfuzz' and Indel is None:
+        raise ValueError("相似度后端 'rapidfuzz' 不可用，请先安装 rapidfuzz")
+    if backend not in ('rapidfuzz', 'difflib'):
+        raise ValueError(f"未知的相似度后端: {backend}")
+    return backend
+
+
+def length_ratio_bound(text1, text2):
+    """
+    相似度的长度上界：2 * min(len) / (len1 + len2)
+
+    SequenceMatcher.ratio() 和 Indel 相似度都不可能超过该值，
+    因此当上界已低于阈值时无需再做逐字符比较。
+    """
+    total = len(text1) + len(text2)
+    if total == 0:
+        return 1.0
+    return 2.0 * min(len(text1), len(text2)) / total
+
+
+def similarity_ratio(text1, text2, score_cutoff=0.0, backend=None):
+    """
+    计算两段文本的相似度 (0~1)
+
+    两种后端都采用 2*M/T 的定义 (M为匹配字符数，T为两段文本总长度)，
+    与 SUBTITLE_MERGE_THRESHOLD_SIMILARITY 的语义一致：
+    - difflib: 与原先的 SequenceMatcher(None, a, b).ratio() 完全相同
+    - rapidfuzz: M取最长公共子序列长度，结果不小于difflib，在高阈值下二者几乎总是一致
+
+    Args:
+        text1 (str): 第一段文本
+        text2 (str): 第二段文本
+        score_cutoff (float, optional): 低于该值时可提前返回0.0
+        backend (str, optional): 相似度后端，默认读取配置
+
+    Returns:
+        float: 相似度
+    """
+    if text1 == text2:
+        return 1.0
+    if not text1 or not text2:
+        return 0.0
+
+    # 长度比提前退出
+    if length_ratio_bound(text1, text2) < score_cutoff:
+        return 0.0
+
+    if resolve_backend(backend) == 'rapidfuzz':
+        return Indel.normalized_similarity(text1, text2, score_cutoff=score_cutoff)
+
+    matcher = SequenceMatcher(None, text1, text2)
+    # real_quick_ratio / quick_ratio 都是 ratio 的上界，计算代价远低于 ratio
+    if matcher.real_quick_ratio() < score_cutoff or matcher.quick_ratio() < score_cutoff:
+        return 0.0
+    return matcher.ratio()
+
+
+def is_similar(text1, text2, threshold, backend=None):
+    """
+    判断两段文本的相似度是否达到阈值
+
+    Args:
+        text1 (str): 第一段文本
+        text2 (str): 第二段文本
+        threshold (float): 相似度阈值
+        backend (str, optional): 相似度后端，默认读取配置
+
+    Returns:
+        bool: 如果相似度高于阈值则返回True
+    """
+    if text1 == text2:
+        return True
+    if not text1 or not text2:
+        return False
+    return similarity_ratio(text1, text2, threshold, backend) >= threshold
+
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def containment(text, reference, ngram=2):
+    """
+    计算text被reference包含的程度：text的字符n-gram中出现在reference里的比例 (忽略标点、空白和大小写)
+
+    与相似度不同，containment不受reference长度影响，适合判断一行字幕是否只是某段较长语音的一部分。
+
+    Args:
+        text (str): 待判断的文本 (如字幕)
+        reference (str): 参考文本 (如时间上重叠的语音转录)
+        ngram (int, optional): n-gram长度
+
+    Returns:
+        float: 0~1
+    """
+    text = _NON_WORD.sub('', text).lower()
+    reference = _NON_WORD.sub('', reference).lower()
+    if not text:
+        return 1.0
+    if not reference:
+        return 0.0
+    if len(text) <= ngram:
+        return 1.0 if text in reference else 0.0
+    grams = char_ngrams(text, ngram)
+    reference_grams = char_ngrams(reference, ngram)
+    return len(grams & reference_grams) / len(grams)
+
+
+# --- MinHash / LSH 近重复检测 ---
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def char_ngrams(text, ngram=2):
+    """
+    将文本切分为字符n-gram集合 (忽略空白)
+
+    Args:
+        text (str): 文本
+        ngram (int, optional): n-gram长度，中文字幕默认取2
+
+    Returns:
+        set: n-gram集合；文本短于ngram时返回整段文本构成的集合
+    """
+    text = ''.join(text.split())
+    if len(text) <= ngram:
+        return {text} if text else set()
+    return {text[i:i + ngram] for i in range(len(text) - ngram + 1)}
+
+
+def jaccard(set1, set2):
+    """计算两个集合的Jaccard相似度"""
+    if not set1 and not set2:
+        return 1.0
+    union = len(set1 | set2)
+    return len(set1 & set2) / union if union else 0.0
+
+
+def _minhash_permutations(num_perm, seed):
+    """生成MinHash使用的 (a, b) 线性哈希参数"""
+    rng = random.Random(seed)
+    return [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+
+def minhash_signature(shingles, permutations):
+    """
+    计算n-gram集合的MinHash签名
+
+    Args:
+        shingles (set): n-gram集合
+        permutations (list): _minhash_permutations 生成的哈希参数
+
+    Returns:
+        tuple: 长度为num_perm的签名
+    """
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    if not hashes:
+        return tuple([_MAX_HASH] * len(permutations))
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in permutations
+    )
+
+
+def find_near_duplicate_clusters(texts, threshold=0.8, num_perm=64, bands=16, ngram=2, seed=1):
+    """
+    使用MinHash/LSH在近线性时间内对文本做全局近重复聚类
+
+    按出现顺序做代表聚类 (leader clustering)：每个簇以最早出现的文本为代表，代表的MinHash签名被切成bands个分带入桶；
+    新文本与任一分带相同的代表成为候选，用n-gram集合的精确Jaccard相似度与代表比较，
+    归入相似度最高且达到阈值的代表所在的簇，否则成为新簇的代表。
+    簇内每个成员都与代表相似，不会因 A≈B≈C≈D 的链式相似把与代表不同的文本 (如模板化的击杀播报) 并入同一簇。
+
+    Args:
+        texts (list): 文本列表
+        threshold (float, optional): n-gram Jaccard相似度阈值
+        num_perm (int, optional): MinHash签名长度
+        bands (int, optional): LSH分带数，需整除num_perm
+        ngram (int, optional): n-gram长度
+        seed (int, optional): 哈希参数随机种子
+
+    Returns:
+        list: 簇列表，每个簇为按原顺序排列的下标列表 (包含单元素簇)
+    """
+    if num_perm % bands != 0:
+        raise ValueError(f"LSH分带数 {bands} 必须整除签名长度 {num_perm}")
+    rows = num_perm // bands
+    permutations = _minhash_permutations(num_perm, seed)
+    shingle_sets = [char_ngrams(text, ngram) for text in texts]
+
+    leader_of = [None] * len(texts) # 下标 -> 所属簇的代表 (簇中最早出现的文本)
+    buckets = {} # (分带, 签名片段) -> 落入该桶的代表下标
+    representatives = {} # n-gram集合 -> 首次出现的下标
+    for index, shingles in enumerate(shingle_sets):
+        # 与已出现文本的n-gram集合完全相同时直接归入同一簇，不再计算签名
+        shingle_key = frozenset(shingles)
+        if shingle_key in representatives:
+            leader_of[index] = leader_of[representatives[shingle_key]]
+            continue
+        representatives[shingle_key] = index
+
+        signature = minhash_signature(shingles, permutations)
+        band_keys = [(band, signature[band * rows:(band + 1) * rows]) for band in range(bands)]
+        candidates = {leader for key in band_keys for leader in buckets.get(key, ())}
+        # 相似度相同时取最早的代表
+        best = max(sorted(candidates), key=lambda leader: jaccard(shingle_sets[leader], shingles), default=None)
+        if best is not None and jaccard(shingle_sets[best], shingles) >= threshold:
+            leader_of[index] = best
+            continue
+        # 没有足够相似的代表：成为新簇的代表并入桶 (桶中只有代表，重复行不会使桶变大)
+        leader_of[index] = index
+        for key in band_keys:
+            buckets.setdefault(key, []).append(index)
+
+    clusters = {}
+    for index in range(len(texts)):
+        clusters.setdefault(leader_of[index], []).append(index)
+    return sorted(clusters.values(), key=lambda members: members[0])
@@ -0,0 +1,276 @@
+"""
+Token预算模块：估算提示词token数，并在超出模型预算时按去重、显著性和时间位置裁剪摘要输入
+"""
+
+import re
+import math
+import logging
+
+from . import config
+
+logger = logging.getLogger("TokenBudget")
+
+
+def estimate_tokens(text):
+    """
+    估算文本的token数
+
+    Qwen与Gemini的分词器对中文大致为每个汉字(及全角标点)一个token，
+    对英文、数字等约为每4个字符一个token；这里按此规则近似估算，不依赖具体分词器。
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def context_limit(model):
+    """
+    获取模型的上下文窗口大小 (按config.MODEL_CONTEXT_TOKENS中的名称前缀匹配)
+
+    Args:
+        model (str): 模型名称
+
+    Returns:
+        int: 上下文token数
+    """
+    best = None
+    for prefix, limit in config.MODEL_CONTEXT_TOKENS.items():
+        if model and model.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+            best = (prefix, limit)
+    return best[1] if best else config.DEFAULT_CONTEXT_TOKENS
+
+
+def model_input_budget(model):
+    """模型可用于输入内容的token数：上下文窗口减去为提示词模板和输出预留的部分"""
+    return max(0, context_limit(model) - config.PROMPT_RESERVED_TOKENS)
+
+
+# 句末标点及转录TXT中连接各语音分段的全角逗号 (见AudioTranscriber.save_transcription)
+_SENTENCE_END = re.compile(r'(?<=[。！？!?；;，])|\n')
+
+
+def split_sentences(text):
+    """
+    将文本拆分为句子级的行，作为裁剪的最小单位
+
+    转录TXT文件只有一行 (各语音分段以"，"连接)，按行裁剪时超出预算会整段丢弃；
+    这里按换行、句末标点和分段分隔符拆分，标点保留在句尾。
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        list: 去掉首尾空白后的非空句子列表
+    """
+    if not text:
+        return []
+    return [part.strip() for part in _SENTENCE_END.split(text) if part and part.strip()]
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    截取文本开头不超过max_tokens (按estimate_tokens估算) 的部分
+
+    Args:
+        text (str): 文本
+        max_tokens (int): token上限
+
+    Returns:
+        str: 截取后的文本
+    """
+    cjk = other = 0
+    for end, ch in enumerate(text):
+        if ord(ch) >= 0x2E80:
+            cjk += 1
+        else:
+            other += 1
+        if cjk + math.ceil(other / 4) > max_tokens:
+            return text[:end]
+    return text
+
+
+def _dedupe(lines):
+    """去掉空行和规范化后完全相同的重复行 (保留首次出现)，返回 (保留的行, 去除的行数)"""
+    seen = set()
+    unique = []
+    for line in lines:
+        key = _normalize(line)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        unique.append(line)
+    return unique, len(lines) - len(unique)
+
+
+def _normalize(line):
+    """去重使用的规范化形式：去掉首尾空白并合并内部空白"""
+    return ' '.join(line.split())
+
+
+def _salience(line):
+    """
+    行的显著性 (0~1)：不同字符越多，包含的信息越多
+
+    "嗯"、"好的" 之类的短语气词得分很低，长句得分高；上限在32个不同字符处饱和。
+    """
+    return min(len(set(_normalize(line).replace(' ', ''))), 32) / 32
+
+
+def trim_lines(lines, max_tokens, recency_weight=None):
+    """
+    将按时间顺序排列的文本行裁剪到token预算以内
+
+    依次应用：
+    1. 去重：去掉空行和规范化后完全相同的重复行 (保留首次出现)
+    2. 显著性与时间位置：按 显著性 * (1 + recency_weight * 相对位置) 从高到低保留，
+       越靠后的行权重越高；保留的行仍按原顺序输出
+    3. 单行超过整个预算时截取其开头部分填满剩余预算，而不是整行丢弃
+
+    未超出预算时原样返回。
+
+    Args:
+        lines (list): 文本行列表
+        max_tokens (int): token预算
+        recency_weight (float, optional): 时间位置权重，默认为config.PROMPT_RECENCY_WEIGHT
+
+    Returns:
+        tuple: (裁剪后的行列表, 统计字典 {input_tokens, output_tokens, duplicates_removed, lines_removed, lines_truncated})
+    """
+    recency_weight = config.PROMPT_RECENCY_WEIGHT if recency_weight is None else recency_weight
+    input_tokens = sum(estimate_tokens(line) for line in lines)
+    stats = {
+        'input_tokens': input_tokens,
+        'output_tokens': input_tokens,
+        'duplicates_removed': 0,
+        'lines_removed': 0,
+        'lines_truncated': 0
+    }
+    if input_tokens <= max_tokens:
+        return list(lines), stats
+
+    # 1. 去重
+    unique, stats['duplicates_removed'] = _dedupe(lines)
+
+    costs = [estimate_tokens(line) for line in unique]
+    total = sum(costs)
+
+    # 2. 按显著性和时间位置保留
+    if total > max_tokens:
+        last = max(1, len(unique) - 1)
+        ranked = sorted(
+            range(len(unique)),
+            key=lambda i: _salience(unique[i]) * (1 + recency_weight * i / last),
+            reverse=True
+        )
+        keep = set()
+        total = 0
+        for i in ranked:
+            if total + costs[i] <= max_tokens:
+                keep.add(i)
+                total += costs[i]
+            elif costs[i] > max_tokens and total < max_tokens:
+                # 3. 过长的单行：截取开头部分
+                unique[i] = truncate_to_tokens(unique[i], max_tokens - total)
+                if unique[i]:
+                    keep.add(i)
+                    total += estimate_tokens(unique[i])
+                    stats['lines_truncated'] += 1
+        stats['lines_removed'] = len(unique) - len(keep)
+        unique = [line for i, line in enumerate(unique) if i in keep]
+
+    stats['output_tokens'] = total
+    return unique, stats
+
+
+class TokenBudgeter:
+    """摘要输入的token预算器：预算取各候选模型输入预算与config.SUMMARY_INPUT_TOKEN_BUDGET中的最小值"""
+
+    def __init__(self, models, max_tokens=None):
+        """
+        Args:
+            models (list): 可能处理该请求的模型名称列表
+            max_tokens (int, optional): 额外的token上限，默认为config.SUMMARY_INPUT_TOKEN_BUDGET (None表示不限制)
+        """
+        self.models = list(models)
+        budgets = [model_input_budget(model) for model in self.models]
+        cap = config.SUMMARY_INPUT_TOKEN_BUDGET if max_tokens is None else max_tokens
+        if cap:
+            budgets.append(cap)
+        self.max_tokens = min(budgets) if budgets else None
+
+    def fit_sections(self, sections):
+        """
+        将多段内容 (如语音转录、字幕) 一起裁剪到预算以内
+
+        预算按各段 (去重前) 的token数按比例分配，保证每段内容都有保留；
+        去重后已能放入份额的段落只占用实际所需，剩余预算继续分给其他段落，
+        裁剪后未用完的预算也顺延给后面的段落。
+
+        Args:
+            sections (dict): 段名 -> 文本行列表
+
+        Returns:
+            tuple: (段名 -> 裁剪后的行列表, 汇总统计字典)
+        """
+        section_tokens = {name: sum(estimate_tokens(line) for line in lines) for name, lines in sections.items()}
+        total_tokens = sum(section_tokens.values())
+        report = {
+            'budget': self.max_tokens,
+            'input_tokens': total_tokens,
+            'output_tokens': total_tokens,
+            'duplicates_removed': 0,
+            'lines_removed': 0,
+            'lines_truncated': 0
+        }
+        if self.max_tokens is None or total_tokens <= self.max_tokens:
+            return {name: list(lines) for name, lines in sections.items()}, report
+
+        shares, satisfied = self._allocate(sections, section_tokens)
+        trimmed = {}
+        report['output_tokens'] = 0
+        carry = 0
+        # 先处理能完整保留的段落，未用完的预算顺延给需要裁剪的段落
+        for name in sorted(sections, key=lambda name: name not in satisfied):
+            share = shares[name] + carry
+            trimmed[name], stats = trim_lines(sections[name], share)
+            carry = share - stats['output_tokens']
+            for key in ('output_tokens', 'duplicates_removed', 'lines_removed', 'lines_truncated'):
+                report[key] += stats[key]
+        trimmed = {name: trimmed[name] for name in sections}
+
+        logger.info(
+            f"摘要输入超出预算 ({total_tokens} > {self.max_tokens} tokens)，裁剪后约 {report['output_tokens']} tokens "
+            f"(去重 {report['duplicates_removed']} 行，按显著性/时间位置删除 {report['lines_removed']} 行，"
+            f"截断 {report['lines_truncated']} 行)"
+        )
+        return trimmed, report
+
+    def _allocate(self, sections, section_tokens):
+        """
+        按去重前的token数比例分配预算 (水位填充)
+
+        去重后所需token数不超过份额的段落只分到所需的部分，剩余预算在其余段落之间重新按比例分配。
+
+        Returns:
+            tuple: (段名 -> 分到的token数, 去重后即可完整保留的段名集合)
+        """
+        demands = {name: sum(estimate_tokens(line) for line in _dedupe(lines)[0]) for name, lines in sections.items()}
+        shares = {name: demands[name] for name in sections}
+        pending = {name for name in sections if demands[name] > 0}
+        budget = self.max_tokens
+        while pending:
+            weight = sum(section_tokens[name] for name in pending)
+            fitting = {name for name in pending if demands[name] <= budget * section_tokens[name] / weight}
+            if not fitting:
+                shares.update({name: int(budget * section_tokens[name] / weight) for name in pending})
+                break
+            budget -= sum(demands[name] for name in fitting)
+            pending -= fitting
+        return shares, set(sections) - pending
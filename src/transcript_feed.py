@@ -0,0 +1,101 @@
+"""
+转录分段发布模块：转录阶段按时间顺序逐窗口发布语音分段，视觉阶段据此边转录边选择帧
+"""
+
+import threading
+
+
+class TranscriptFeed:
+    """
+    语音分段的增量发布通道 (一个生产者，多个消费者)
+
+    转录阶段每完成一个时间窗口就调用 publish 发布该窗口内的分段和已转录到的时间 (水位)；
+    帧选择只需要覆盖当前帧时间戳的分段，因此等到水位越过该时间戳即可决策，不必等待整段转录结束。
+    转录结束 (finish) 后水位视为无穷大；转录失败或未执行 (fail) 时，等待中的消费者抛出异常。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._segments = []
+        self._watermark = 0.0
+        self._done = False
+        self._error = None
+
+    def publish(self, segments, upto):
+        """
+        发布一个时间窗口内的分段
+
+        Args:
+            segments (list): 按时间排序的分段 (包含start、end、text，时间为整段音频中的绝对时间)
+            upto (float): 已转录到的时间（秒），之后发布的分段都不早于该时间开始
+        """
+        with self._condition:
+            self._segments.extend(segments)
+            self._watermark = max(self._watermark, upto)
+            self._condition.notify_all()
+
+    def finish(self, segments=None):
+        """
+        标记转录完成
+
+        Args:
+            segments (list, optional): 完整的分段列表 (如从产物缓存恢复的转录)，提供时替换已发布的分段
+        """
+        with self._condition:
+            if segments is not None:
+                self._segments = list(segments)
+            self._watermark = float('inf')
+            self._done = True
+            self._condition.notify_all()
+
+    def fail(self, error):
+        """
+        标记转录失败，唤醒并中止所有等待中的消费者
+
+        Args:
+            error (Exception): 失败原因
+        """
+        with self._condition:
+            if not self._done:
+                self._error = error
+                self._done = True
+            self._condition.notify_all()
+
+    @property
+    def done(self):
+        """转录是否已结束 (完成或失败)"""
+        with self._condition:
+            return self._done
+
+    def segments(self):
+        """返回当前已发布的分段 (副本)"""
+        with self._condition:
+            return list(self._segments)
+
+    def wait_until(self, timestamp):
+        """
+        阻塞直到水位越过timestamp (或转录完成)，返回此时已发布的分段与水位
+
+        Args:
+            timestamp (float): 需要的时间（秒）
+
+        Returns:
+            tuple: (已发布的分段 (副本)，覆盖水位之前的全部语音, 水位（秒）)
+
+        Raises:
+            RuntimeError: 转录失败或未执行
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._done or self._watermark > timestamp)
+            if self._error is not None:
+                raise RuntimeError(f"转录未完成，无法继续选择帧: {self._error}") from self._error
+            return list(self._segments), self._watermark
+
+    def wait_done(self):
+        """
+        阻塞直到转录完成，返回全部分段
+
+        Raises:
+            RuntimeError: 转录失败或未执行
+        """
+        return self.wait_until(float('inf'))[0]
@@ -8,7 +8,8 @@ import shutil
 from pathlib import Path
 import logging
 
-from . import config  # 导入配置模块
+from . import profiling
+from . import metrics
 
 
 class VideoProcessor:
@@ -29,28 +30,80 @@ class VideoProcessor:
         self.logger = logging.getLogger("VideoProcessor")
         # 不再需要在初始化时获取原始帧率
 
-    def extract_frames(self, output_dir, frame_rate=1):
+    def get_duration(self):
+        """
+        获取视频时长
+
+        Returns:
+            float: 视频时长（秒）
+        """
+        command = [
+            'ffprobe',
+            '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            self.video_path
+        ]
+        try:
+            with profiling.external_call('ffprobe'):
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            return float(output.strip())
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"获取视频时长失败: {e}")
+            raise RuntimeError(f"获取视频时长失败: {e}")
+        except ValueError:
+            raise RuntimeError(f"获取视频时长失败: 无法解析ffprobe输出 {output!r}")
+        except FileNotFoundError:
+            self.logger.error("FFprobe未安装或不在系统路径中")
+            raise RuntimeError("FFprobe未安装或不在系统路径中")
+
+    @staticmethod
+    def _seek_args(start_time=None, duration=None):
+        """
+        构建只处理视频中一段时间范围的FFmpeg输入参数 (放在 -i 之前，快速定位且输出时间戳从0开始)
+
+        Args:
+            start_time (float, optional): 起始时间（秒）
+            duration (float, optional): 时长（秒）
+
+        Returns:
+            list: FFmpeg参数
+        """
+        args = []
+        if start_time:
+            args += ['-ss', f"{start_time:.3f}"]
+        if duration is not None:
+            args += ['-t', f"{duration:.3f}"]
+        return args
+
+    def extract_frames(self, output_dir, frame_rate=1, start_time=None, duration=None):
         """
         从视频中提取帧
 
         Args:
             output_dir (str): 输出目录
             frame_rate (int): 每秒提取的帧数 (输出帧率)
+            start_time (float, optional): 只提取从该时间（秒）开始的片段
+            duration (float, optional): 片段时长（秒）
 
         Returns:
             list: 提取的帧路径列表
         """
         # 调用 decode_video_to_frames 实现帧提取功能
-        return self.decode_video_to_frames(output_dir, frame_rate)
+        return self.decode_video_to_frames(output_dir, frame_rate, start_time, duration)
 
-    def decode_video_to_frames(self, output_folder, frame_rate=1):
+    def decode_video_to_frames(self, output_folder, frame_rate=1, start_time=None, duration=None):
         """
-        将视频解码为帧图像，并将使用的输出帧率存入全局配置。
+        将视频解码为帧图像。
+
+        输出帧率由调用方记录在 RunContext.frame_rate 中 (不再写入全局配置)，供帧号与时间戳换算。
+        指定时间范围时帧号从片段起点开始计数 (时间分片处理)。
 
         Args:
-            video_path (str): 视频文件路径
             output_folder (str): 输出文件夹路径
             frame_rate (int): 每秒提取的帧数 (输出帧率)，默认为1
+            start_time (float, optional): 只解码从该时间（秒）开始的片段
+            duration (float, optional): 片段时长（秒）
 
         Returns:
             list: 提取的帧路径列表
@@ -65,6 +118,7 @@ class VideoProcessor:
         # 构建 FFmpeg 命令 (使用传入的frame_rate作为输出帧率)
         command = [
             'ffmpeg',
+            *self._seek_args(start_time, duration),
             '-i', self.video_path,
             '-vf', f'fps={frame_rate}',
             '-hide_banner',
@@ -74,18 +128,10 @@ class VideoProcessor:
 
         # 执行 FFmpeg 命令
         try:
-            subprocess.run(command, check=True)
+            with profiling.external_call('ffmpeg_frames'):
+                subprocess.run(command, check=True)
             self.logger.info(f"成功从视频中提取帧 (输出速率 {frame_rate} fps)，保存在 {frames_dir}")
 
-            # --- 关键改动：存储实际使用的输出帧率到全局配置 ---
-            if frame_rate is not None and frame_rate > 0:
-                 config.OUTPUT_FRAME_RATE = float(frame_rate)
-                 self.logger.info(f"已将输出帧率 {config.OUTPUT_FRAME_RATE} 存储到全局配置")
-            else:
-                 self.logger.warning(f"尝试存储无效的输出帧率: {frame_rate}")
-                 # 可以考虑是否在此处设置默认值或清空
-                 config.OUTPUT_FRAME_RATE = None
-
         except subprocess.CalledProcessError as e:
             self.logger.error(f"视频帧提取失败: {e}")
             raise RuntimeError(f"视频帧提取失败: {e}")
@@ -99,29 +145,34 @@ class VideoProcessor:
             for f in os.listdir(frames_dir)
             if f.startswith("frame_") and f.endswith(".png")
         ])
+        metrics.FRAMES_DECODED.inc(len(frame_files))
 
         return frame_files
 
-    def extract_audio(self, output_path):
+    def extract_audio(self, output_path, start_time=None, duration=None):
         """
         从视频中提取音频
 
         Args:
             output_path (str): 音频输出路径
+            start_time (float, optional): 只提取从该时间（秒）开始的片段
+            duration (float, optional): 片段时长（秒）
 
         Returns:
             str: 音频文件路径
         """
         # 调用提取音频的具体实现
-        return self._extract_audio(self.video_path, output_path)
+        return self._extract_audio(self.video_path, output_path, start_time, duration)
 
-    def _extract_audio(self, video_path, output_audio_path):
+    def _extract_audio(self, video_path, output_audio_path, start_time=None, duration=None):
         """
         从视频文件中提取音频
 
         Args:
             video_path (str): 视频文件路径
             output_audio_path (str): 音频输出路径
+            start_time (float, optional): 起始时间（秒）
+            duration (float, optional): 时长（秒）
 
         Returns:
             str: 音频文件路径
@@ -134,6 +185,7 @@ class VideoProcessor:
         # 构建 FFmpeg 命令
         command = [
             'ffmpeg',
+            *self._seek_args(start_time, duration),
             '-i', video_path,
             '-vn',               # 不包含视频
             '-acodec', 'pcm_s16le',  # WAV 常用编码
@@ -147,7 +199,8 @@ class VideoProcessor:
 
         # 执行 FFmpeg 命令
         try:
-            subprocess.run(command, check=True)
+            with profiling.external_call('ffmpeg_audio'):
+                subprocess.run(command, check=True)
             self.logger.info(f"成功从视频中提取音频，保存为 {output_audio_path}")
         except subprocess.CalledProcessError as e:
             self.logger.error(f"音频提取失败: {e}")
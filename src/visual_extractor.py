@@ -6,23 +6,33 @@ import os
 import json
 import logging
 import time
+import contextlib
 import concurrent.futures # 引入并发库
-from tqdm import tqdm
 
-from .subtitle_processor import SubtitleProcessor
+from .subtitle_processor import SubtitleProcessor, IncrementalSubtitleMerger
+from .circuit_breaker import CircuitOpenError
+from . import artifact_store as artifacts
+from . import metrics
+from .run_context import RunContext
 from . import config # 导入配置模块
 
 class VisualExtractor:
     """视觉内容提取器，分析视频帧中的内容"""
 
-    def __init__(self, ai_service):
+    def __init__(self, ai_service, executor=None, artifact_store=None):
         """
         初始化视觉内容提取器
 
         Args:
             ai_service: AI服务接口
+            executor (concurrent.futures.Executor, optional): 共享的视觉调用线程池 (批量模式下多个视频共用)，
+                                                              默认每次分析时新建config.VISUAL_EXTRACTION_MAX_WORKERS个线程
+            artifact_store (ArtifactStore, optional): 产物存储，提供时按 (帧图像摘要, 视觉模型, 提示词) 缓存逐帧分析结果
         """
         self.ai_service = ai_service
+        self.executor = executor
+        self.artifact_store = artifact_store
+        self.deferred_frames = [] # 最近一次 analyze_batch 中因熔断未分析的帧 (frame_number, frame_name, frame_path)
         # 设置日志
         logging.basicConfig(
             level=logging.INFO,
@@ -44,8 +54,17 @@ class VisualExtractor:
             if not os.path.exists(frame_path):
                 raise FileNotFoundError(f"帧图像不存在: {frame_path}")
 
-            # 提取字幕
-            subtitle = self.ai_service.describe_image(frame_path)
+            # 提取字幕 (相同图像、模型和提示词的结果直接从产物存储读取，不再调用AI服务)
+            cache_key = self._frame_cache_key(frame_path)
+            # --force-stage vision: 不读取已有结果，重新分析后覆盖写入
+            cached = self.artifact_store.get_value(cache_key) if cache_key and 'vision' not in config.FORCE_STAGES else None
+            if cached is not None:
+                subtitle = cached['subtitle']
+                metrics.FRAMES_SKIPPED.inc(reason='cached')
+            else:
+                subtitle = self.ai_service.describe_image(frame_path)
+                if cache_key:
+                    self.artifact_store.put_value(cache_key, {'subtitle': subtitle})
 
             # 返回结果
             frame_name = os.path.basename(frame_path)
@@ -53,6 +72,16 @@ class VisualExtractor:
                 "frame_name": frame_name,
                 "subtitle": subtitle
             }
+        except CircuitOpenError as e:
+            # 熔断期间不发送请求，该帧留待后续重新分析
+            self.logger.warning(f"跳过帧 {frame_path}: {str(e)}")
+            metrics.FRAMES_SKIPPED.inc(reason='circuit_open')
+            return {
+                "frame_name": os.path.basename(frame_path),
+                "subtitle": "分析失败",
+                "error": str(e),
+                "deferred": True
+            }
         except Exception as e:
             self.logger.error(f"分析帧 {frame_path} 失败: {str(e)}")
             return {
@@ -61,19 +90,30 @@ class VisualExtractor:
                 "error": str(e)
             }
 
+    def _frame_cache_key(self, frame_path):
+        """计算逐帧视觉结果的缓存键，未启用产物存储时返回None"""
+        if self.artifact_store is None:
+            return None
+        signature = self.ai_service.vision_signature()
+        if signature is None:
+            return None
+        return artifacts.make_key('frame', {'image': self.artifact_store.digest(frame_path), 'vision': signature})
+
     def _analyze_frame_task(self, frame_number, frame_path):
         """多线程执行的单个帧分析任务"""
+        start_time = time.perf_counter()
         try:
             self.logger.info(f"开始分析帧 {frame_path} (编号 {frame_number})")
             analysis_result = self.analyze_frame(frame_path)
             # 将原始帧号添加到结果中，用于后续排序
             analysis_result['frame_number'] = frame_number
-            return {'status': 'success', 'data': analysis_result}
+            return {'status': 'success', 'data': analysis_result, 'latency': time.perf_counter() - start_time}
         except Exception as e:
             # analyze_frame内部已经处理了大部分异常并返回字典
             # 此处的except主要捕获analyze_frame调用本身可能出现的意外错误
             self.logger.error(f"执行分析任务时捕获意外错误 (帧 {frame_path}): {e}")
-            return {'status': 'error', 'frame_number': frame_number, 'path': frame_path, 'error': str(e)}
+            return {'status': 'error', 'frame_number': frame_number, 'path': frame_path, 'error': str(e),
+                    'latency': time.perf_counter() - start_time}
 
     def _load_transcript_segments(self, transcript_path):
         """
@@ -108,14 +148,13 @@ class VisualExtractor:
                     return segment
         return None
 
-    def _frame_to_timestamp(self, frame_number):
+    def _frame_to_timestamp(self, frame_number, frame_rate):
         """
-        辅助函数：将帧号转换为时间戳，依赖于config.OUTPUT_FRAME_RATE
+        辅助函数：将帧号转换为时间戳 (frame_rate 通常为 RunContext.frame_rate)
         时间戳代表该帧对应时间区间的起始点。
         """
-        frame_rate = config.OUTPUT_FRAME_RATE
         if not frame_rate or frame_rate <= 0:
-            self.logger.error("输出帧率未在config中设置或无效，无法转换帧号到时间戳")
+            self.logger.error("输出帧率未设置或无效，无法转换帧号到时间戳")
             raise ValueError("无法获取有效的输出帧率")
         # 修正：(帧号 - 1) / 帧率 得到起始时间戳
         return (frame_number - 1) / frame_rate
@@ -136,34 +175,52 @@ class VisualExtractor:
             self.logger.error(f"从文件名 {frame_filename} 提取帧号失败: {str(e)}")
             return 0 # 返回0或其他默认值，或抛出异常
 
-    def analyze_batch(self, frames_dir, output_path=None, similarity_threshold=config.SUBTITLE_MERGE_THRESHOLD_SIMILARITY,
-                      silent_sample_interval=1.0, segment_sample_interval=2.0):
+    def _select_frames_to_analyze(self, frames_dir, silent_sample_interval, segment_sample_interval, context):
         """
-        批量分析视频帧并处理字幕 (基于时间戳智能选择帧, 使用多线程分析)
+        辅助函数：列出帧目录中的有效帧，并基于转录文件中的语音分段做智能帧选择
 
         Args:
             frames_dir (str): 帧图像目录路径
-            output_path (str, optional): 结果输出路径 (JSON格式)。
-            similarity_threshold (float, optional): 字幕相似度阈值，用于SubtitleProcessor合并。
-            silent_sample_interval (float, optional): 静音段（无语音分段）的采样间隔（秒）。
-            segment_sample_interval (float, optional): 语音分段内部的采样间隔（秒）。设为0或负数则只分析边界。
+            silent_sample_interval (float): 静音段（无语音分段）的采样间隔（秒）。
+            segment_sample_interval (float): 语音分段内部的采样间隔（秒）。设为0或负数则只分析边界。
+            context (RunContext): 运行上下文 (提供输出帧率与转录文件路径)
 
         Returns:
-            list: 处理后的字幕列表 (由SubtitleProcessor返回)
+            list: 按帧号排序的 (frame_number, frame_path) 元组列表
+        """
+        return list(self._iter_selected_frames(frames_dir, silent_sample_interval, segment_sample_interval, context))
+
+    def _iter_selected_frames(self, frames_dir, silent_sample_interval, segment_sample_interval, context,
+                              transcript_feed=None):
+        """
+        辅助函数：按帧号顺序逐个产出选中的帧
+
+        提供transcript_feed时不读取转录文件，而是在决策每一帧前等待转录水位越过该帧的时间戳，
+        因此转录进行中即可产出前面时间段的帧，视觉分析与转录重叠执行。
+
+        Args:
+            frames_dir (str): 帧图像目录路径
+            silent_sample_interval (float): 静音段（无语音分段）的采样间隔（秒）。
+            segment_sample_interval (float): 语音分段内部的采样间隔（秒）。设为0或负数则只分析边界。
+            context (RunContext): 运行上下文 (提供输出帧率与转录文件路径)
+            transcript_feed (TranscriptFeed, optional): 转录阶段逐窗口发布的语音分段
+
+        Yields:
+            tuple: (frame_number, frame_path)
         """
-        start_time_batch = time.time()
-        self.logger.info(f"开始优化批量分析 (多线程): {frames_dir}")
         if not os.path.exists(frames_dir):
             raise FileNotFoundError(f"帧图像目录不存在: {frames_dir}")
 
         # 检查帧率
-        if not config.OUTPUT_FRAME_RATE or config.OUTPUT_FRAME_RATE <= 0:
-            self.logger.error("视频输出帧率未在config中设置，无法执行基于时间的优化。")
+        if not context.frame_rate or context.frame_rate <= 0:
+            self.logger.error("视频输出帧率未设置，无法执行基于时间的优化。")
             # 可以选择回退到原始的 analyze_batch 逻辑，或者直接抛出错误
-            raise ValueError("视频输出帧率未设置，无法执行 analyze_batch")
-        transcript_path = config.TRANSCRIPT_PATH
-        # 加载时间分段信息
-        segments = self._load_transcript_segments(transcript_path)
+            raise ValueError("视频输出帧率未设置，无法执行帧分析")
+        # 加载时间分段信息 (逐窗口发布时在选择过程中按需等待)
+        if transcript_feed is None:
+            segments, covered_until = self._load_transcript_segments(context.transcript_path), float('inf')
+        else:
+            segments, covered_until = [], 0.0
 
         # 获取并排序所有有效的帧文件
         valid_extensions = ['.jpg', '.jpeg', '.png']
@@ -178,7 +235,6 @@ class VisualExtractor:
         self.logger.info(f"找到 {len(all_frame_paths)} 个有效帧图像")
 
         # --- 2. 顺序帧选择 ---
-        frames_to_analyze_list = [] # 存储 (frame_number, frame_path) 元组
         last_analyzed_timestamp = -1.0
         last_analyzed_segment = None
         selected_frames_count = 0
@@ -191,7 +247,7 @@ class VisualExtractor:
                 if current_frame_number == 0: # 跳过无法提取帧号的文件
                      self.logger.warning(f"无法从 {os.path.basename(current_frame_path)} 提取有效帧号，跳过此帧。")
                      continue
-                current_timestamp = self._frame_to_timestamp(current_frame_number)
+                current_timestamp = self._frame_to_timestamp(current_frame_number, context.frame_rate)
             except ValueError as e:
                 self.logger.warning(f"无法计算帧 {current_frame_path} 的时间戳: {e}. 跳过此帧.")
                 continue
@@ -199,6 +255,9 @@ class VisualExtractor:
                 self.logger.warning(f"处理帧文件名 {current_frame_path} 出错: {e}. 跳过此帧.")
                 continue
 
+            # _find_segment_for_timestamp 允许0.1秒误差，需要覆盖到 时间戳+0.1 的分段
+            if current_timestamp + 0.1 >= covered_until:
+                segments, covered_until = transcript_feed.wait_until(current_timestamp + 0.1)
             current_segment = self._find_segment_for_timestamp(current_timestamp, segments)
             should_analyze = False
 
@@ -231,42 +290,196 @@ class VisualExtractor:
 
             # 添加到待分析列表，并更新状态
             if should_analyze:
-                frames_to_analyze_list.append((current_frame_number, current_frame_path))
+                yield current_frame_number, current_frame_path
                 selected_frames_count += 1
                 last_analyzed_timestamp = current_timestamp
                 last_analyzed_segment = current_segment
 
         selection_duration = time.time() - start_time_selection
+        metrics.FRAMES_SELECTED.inc(selected_frames_count)
+        metrics.FRAMES_SKIPPED.inc(len(all_frame_paths) - selected_frames_count, reason='sampling')
         self.logger.info(f"智能帧选择完成，耗时 {selection_duration:.2f} 秒，选择了 {selected_frames_count} / {len(all_frame_paths)} 帧进行分析")
 
+    def _iter_frame_tasks(self, frames_to_analyze, reorder_window, on_complete=None):
+        """
+        辅助函数：多线程分析选中的帧，并按帧号顺序逐个产出任务结果
+
+        在 as_completed 之上维护一个重排序缓冲区：已完成但前面仍有帧未返回的结果暂存在缓冲区中，
+        一旦前缀连续即按顺序产出。已提交但尚未产出的任务数不超过 reorder_window，
+        因此内存占用受窗口大小约束，而不是随帧数增长。
+
+        Args:
+            frames_to_analyze (iterable): 按帧号排序的 (frame_number, frame_path) 元组，可以是边转录边选择的生成器
+                                          (按需取出，取出时可能阻塞)
+            reorder_window (int): 同时在途（已提交但未产出）的最大任务数，None表示不限制
+            on_complete (callable, optional): 每个任务完成时 (按完成顺序，而非帧号顺序) 以任务结果调用的回调
+
+        Yields:
+            dict: _analyze_frame_task 的返回结果，顺序与 frames_to_analyze 一致
+        """
+        reorder_window = None if reorder_window is None else max(1, int(reorder_window))
+        frames_iter = iter(frames_to_analyze)
+        exhausted = False
+        pending = {} # future -> (下标, 帧号, 帧路径)
+        reorder_buffer = {} # 下标 -> 已完成但尚未产出的结果
+        next_index = 0 # 下一个应产出的下标
+        next_submit = 0 # 下一个待提交的下标
+
+        # 使用共享线程池时不在此处关闭它
+        if self.executor is not None:
+            executor_context = contextlib.nullcontext(self.executor)
+        else:
+            executor_context = concurrent.futures.ThreadPoolExecutor(max_workers=config.VISUAL_EXTRACTION_MAX_WORKERS)
+        with executor_context as executor:
+            try:
+                while True:
+                    # 在窗口允许的范围内补充提交任务
+                    while not exhausted and (reorder_window is None or next_submit - next_index < reorder_window):
+                        item = next(frames_iter, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        frame_num, frame_path = item
+                        future = executor.submit(self._analyze_frame_task, frame_num, frame_path)
+                        pending[future] = (next_submit, frame_num, frame_path)
+                        next_submit += 1
+                    if exhausted and next_index >= next_submit:
+                        break
+
+                    # 等待至少一个任务完成，将此时已完成的全部任务放入重排序缓冲区
+                    # (每次只等待一轮，避免为每个完成的任务重新在全部在途任务上注册等待者)
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        index, frame_num, frame_path = pending.pop(future)
+                        try:
+                            reorder_buffer[index] = future.result()
+                        except Exception as exc:
+                            # 通常 _analyze_frame_task 内部会处理异常并返回字典
+                            # 这里的捕获是额外的保险
+                            self.logger.error(f'帧 {frame_path} (编号 {frame_num}) 在future执行中产生意外异常: {exc}')
+                            reorder_buffer[index] = {'status': 'error', 'frame_number': frame_num, 'path': frame_path, 'error': str(exc)}
+                        if on_complete is not None:
+                            on_complete(reorder_buffer[index])
+
+                    # 按顺序产出已连续的前缀
+                    while next_index in reorder_buffer:
+                        yield reorder_buffer.pop(next_index)
+                        next_index += 1
+            finally:
+                # 消费者提前停止迭代时，取消尚未开始的任务
+                for future in pending:
+                    future.cancel()
+
+    def analyze_iter(self, frames_dir, silent_sample_interval=1.0, segment_sample_interval=2.0, reorder_window=None,
+                     context=None):
+        """
+        流式分析视频帧：按帧号顺序逐个产出分析结果，无需等待整批帧完成
+
+        帧选择逻辑与 analyze_batch 相同。某一帧的结果会在它之前的所有帧都返回后立即产出，
+        下游（如 SubtitleProcessor、实时SRT写入、监控面板）可以边分析边处理。
+
+        Args:
+            frames_dir (str): 帧图像目录路径
+            silent_sample_interval (float, optional): 静音段（无语音分段）的采样间隔（秒）。
+            segment_sample_interval (float, optional): 语音分段内部的采样间隔（秒）。设为0或负数则只分析边界。
+            reorder_window (int, optional): 重排序窗口大小，默认使用config.VISUAL_EXTRACTION_REORDER_WINDOW
+            context (RunContext, optional): 运行上下文，默认由config中的默认值创建
+
+        Yields:
+            dict: 帧分析结果，包含frame_number、frame_name和subtitle；失败时subtitle为"分析失败"并带有error字段
+        """
+        if reorder_window is None:
+            reorder_window = config.VISUAL_EXTRACTION_REORDER_WINDOW
+        context = context or RunContext.from_config()
+
+        frames_to_analyze_list = self._select_frames_to_analyze(frames_dir, silent_sample_interval, segment_sample_interval, context)
+        if not frames_to_analyze_list:
+            self.logger.warning("没有帧被选择进行分析。")
+            return
+
+        self.logger.info(f"开始流式分析 {len(frames_to_analyze_list)} 帧 (线程数: {config.VISUAL_EXTRACTION_MAX_WORKERS}, 重排序窗口: {reorder_window})")
+        for task_result in self._iter_frame_tasks(frames_to_analyze_list, reorder_window):
+            if task_result['status'] == 'success' and 'data' in task_result:
+                yield task_result['data']
+            else:
+                yield {
+                    "frame_number": task_result.get('frame_number'),
+                    "frame_name": os.path.basename(task_result.get('path', '')),
+                    "subtitle": "分析失败",
+                    "error": task_result.get('error', '')
+                }
+
+    def analyze_batch(self, frames_dir, output_path=None, similarity_threshold=config.SUBTITLE_MERGE_THRESHOLD_SIMILARITY,
+                      silent_sample_interval=1.0, segment_sample_interval=2.0, context=None, transcript_feed=None):
+        """
+        批量分析视频帧并处理字幕 (基于时间戳智能选择帧, 使用多线程分析)
+
+        提供transcript_feed时边转录边选择帧：每一帧只等待覆盖其时间戳的语音分段，选中即提交分析，
+        字幕合并所需的完整分段在分析结束后从transcript_feed取得。
+
+        Args:
+            frames_dir (str): 帧图像目录路径
+            output_path (str, optional): 结果输出路径 (JSON格式)。
+            similarity_threshold (float, optional): 字幕相似度阈值，用于SubtitleProcessor合并。
+            silent_sample_interval (float, optional): 静音段（无语音分段）的采样间隔（秒）。
+            segment_sample_interval (float, optional): 语音分段内部的采样间隔（秒）。设为0或负数则只分析边界。
+            context (RunContext, optional): 运行上下文 (输出帧率、转录与字幕路径)，默认由config中的默认值创建
+            transcript_feed (TranscriptFeed, optional): 转录阶段逐窗口发布的语音分段，默认在开始时读取转录文件
+
+        Returns:
+            list: 处理后的字幕列表 (由SubtitleProcessor返回)
+        """
+        start_time_batch = time.time()
+        self.logger.info(f"开始优化批量分析 (多线程): {frames_dir}")
+        context = context or RunContext.from_config()
+        transcript_path = context.transcript_path
+
+        # --- 1~2. 获取帧文件并进行顺序帧选择 (逐窗口发布分段时与分析交替进行) ---
+        frames_to_analyze = self._iter_selected_frames(frames_dir, silent_sample_interval, segment_sample_interval, context,
+                                                       transcript_feed)
+
+        # 字幕处理器与增量合并器：帧结果一返回 (无论顺序) 即参与合并，分析结束时字幕已就绪
+        subtitle_merger = None
+        try:
+            # 动态设置字幕处理器的转录路径
+            subtitle_processor = SubtitleProcessor(transcript_path, output_frame_rate=context.frame_rate)
+            subtitle_merger = IncrementalSubtitleMerger(subtitle_processor, similarity_threshold)
+        except ValueError as e:
+            self.logger.error(f"字幕处理失败: {e}. 请确保运行上下文中的视频帧率已正确设置.")
+
+        def merge_completed_task(task_result):
+            """任务完成回调：将成功的结果交给增量合并器"""
+            if subtitle_merger is None or task_result['status'] != 'success' or 'data' not in task_result:
+                return
+            try:
+                subtitle_merger.add_result(task_result['data'])
+            except Exception as e:
+                self.logger.error(f"增量合并帧 {task_result['data'].get('frame_name')} 时出错: {e}")
+
         # --- 3. 并行帧分析 ---
         results_for_processor = [] # 存储排序后的成功分析结果
-        if not frames_to_analyze_list:
+        store_records = [] # 列式存储使用的记录 (额外包含帧号、时间戳与耗时)
+        deferred_frames = [] # 局部变量：共享同一提取器并发处理多个视频时互不干扰
+        self.logger.info(f"开始使用最多 {config.VISUAL_EXTRACTION_MAX_WORKERS} 个线程并行分析选中的帧...")
+        start_time_analysis = time.time()
+        raw_thread_results = []
+
+        # 批量模式需要收齐全部结果，窗口不设上限，避免慢帧阻塞后续提交
+        task_iter = self._iter_frame_tasks(frames_to_analyze, None, on_complete=merge_completed_task)
+        # 使用tqdm显示进度 (在此处导入以缩短命令行启动时间)
+        from tqdm import tqdm
+        for result in tqdm(task_iter, desc="并行分析帧"):
+            raw_thread_results.append(result)
+
+        if transcript_feed is not None:
+            # 字幕时间按语音分段调整，需要完整的转录
+            segments = transcript_feed.wait_done()
+            if subtitle_merger is not None:
+                subtitle_processor.segments = segments
+
+        if not raw_thread_results:
             self.logger.warning("没有帧被选择进行分析。")
         else:
-            self.logger.info(f"开始使用最多 {config.VISUAL_EXTRACTION_MAX_WORKERS} 个线程并行分析 {len(frames_to_analyze_list)} 帧...")
-            start_time_analysis = time.time()
-            raw_thread_results = []
-            futures = {} # 用于存储 future 到 (frame_num, frame_path) 的映射
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=config.VISUAL_EXTRACTION_MAX_WORKERS) as executor:
-                # 提交任务
-                for frame_num, frame_path in frames_to_analyze_list:
-                     future = executor.submit(self._analyze_frame_task, frame_num, frame_path)
-                     futures[future] = (frame_num, frame_path)
-
-                # 使用tqdm显示进度
-                for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="并行分析帧"):
-                    frame_num, frame_path = futures[future]
-                    try:
-                        result = future.result()
-                        raw_thread_results.append(result)
-                    except Exception as exc:
-                        # 通常 _analyze_frame_task 内部会处理异常并返回字典
-                        # 这里的捕获是额外的保险
-                        self.logger.error(f'帧 {frame_path} (编号 {frame_num}) 在future执行中产生意外异常: {exc}')
-                        raw_thread_results.append({'status': 'error', 'frame_number': frame_num, 'path': frame_path, 'error': str(exc)})
-
             analysis_duration = time.time() - start_time_analysis
             self.logger.info(f"并行分析完成，耗时 {analysis_duration:.2f} 秒")
 
@@ -275,12 +488,35 @@ class VisualExtractor:
             successful_results_with_num = [res['data'] for res in raw_thread_results if res['status'] == 'success' and 'data' in res]
             successful_results_with_num.sort(key=lambda x: x.get('frame_number', 0)) # 按帧号排序
 
+            # 熔断期间跳过的帧不计入结果，排入待续跑队列
+            deferred_frames = [
+                {
+                    'frame_number': res.get('frame_number'),
+                    'frame_name': res['frame_name'],
+                    'frame_path': os.path.join(frames_dir, res['frame_name'])
+                }
+                for res in successful_results_with_num if res.get('deferred')
+            ]
+            successful_results_with_num = [res for res in successful_results_with_num if not res.get('deferred')]
+            if deferred_frames:
+                self.logger.warning(f"视觉服务熔断，{len(deferred_frames)} 帧未分析，已排入待续跑队列")
+
             # 移除frame_number字段，得到最终用于processor的列表
             results_for_processor = []
             for res in successful_results_with_num:
                 proc_res = {k: v for k, v in res.items() if k != 'frame_number'}
                 results_for_processor.append(proc_res)
 
+            if config.RAW_RESULT_FORMAT == 'columnar':
+                for task_result in raw_thread_results:
+                    # 熔断期间跳过的帧只写入待续跑队列，与JSON格式的原始结果保持一致
+                    if task_result['status'] == 'success' and 'data' in task_result \
+                            and not task_result['data'].get('deferred'):
+                        record = dict(task_result['data'])
+                        record['timestamp'] = self._frame_to_timestamp(record['frame_number'], context.frame_rate)
+                        record['latency'] = task_result.get('latency')
+                        store_records.append(record)
+
             # 记录错误
             errors = [res for res in raw_thread_results if res['status'] == 'error']
             if errors:
@@ -292,36 +528,55 @@ class VisualExtractor:
 
         # --- 5. 保存原始结果 (排序后的成功结果) ---
         if output_path is None:
-            output_dir = os.path.join(config.OUTPUT_DIR, 'subtitles')
+            output_dir = os.path.join(context.output_dir, 'subtitles')
             os.makedirs(output_dir, exist_ok=True)
             # base_name = os.path.basename(os.path.normpath(frames_dir))
-            output_path = os.path.join(output_dir, f'{config.VIDEO_NAME}_subtitles.json')
+            output_path = os.path.join(output_dir, f'{context.video_name}_subtitles.json')
         else:
             output_dir = os.path.dirname(output_path)
             os.makedirs(output_dir, exist_ok=True)
 
-        raw_output_path = output_path.replace('.json', '_raw_analyzed.json')
-        try:
-            with open(raw_output_path, 'w', encoding='utf-8') as f:
-                # 保存的是排序后的、成功处理的、移除了 frame_number 的结果
-                json.dump(results_for_processor, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"已分析帧的原始结果已保存到 {raw_output_path}")
-        except Exception as e:
-             self.logger.error(f"保存原始分析结果失败: {e}")
+        if config.RAW_RESULT_FORMAT == 'columnar':
+            # 列式存储：帧号、时间戳、文本ID、状态码、耗时，可通过 FrameResultStore.export_json 按需导出JSON
+            from .result_store import FrameResultStore # 依赖numpy，只在使用列式格式时导入
+            raw_store_path = output_path.replace('.json', '_raw_analyzed.frames')
+            try:
+                FrameResultStore.write(raw_store_path, store_records, context.frame_rate)
+                self.logger.info(f"已分析帧的原始结果已保存到列式存储 {raw_store_path}")
+            except Exception as e:
+                self.logger.error(f"保存原始分析结果失败: {e}")
+        else:
+            raw_output_path = output_path.replace('.json', '_raw_analyzed.json')
+            try:
+                with open(raw_output_path, 'w', encoding='utf-8') as f:
+                    # 保存的是排序后的、成功处理的、移除了 frame_number 的结果
+                    json.dump(results_for_processor, f, ensure_ascii=False, indent=2)
+                self.logger.info(f"已分析帧的原始结果已保存到 {raw_output_path}")
+            except Exception as e:
+                 self.logger.error(f"保存原始分析结果失败: {e}")
 
-        # --- 6. 使用字幕处理器处理筛选后的结果 ---
+        # 保存待续跑帧队列 (熔断期间跳过的帧)，没有时删除旧队列
+        deferred_path = output_path.replace('.json', '_deferred_frames.json')
+        if deferred_frames:
+            try:
+                with open(deferred_path, 'w', encoding='utf-8') as f:
+                    json.dump(deferred_frames, f, ensure_ascii=False, indent=2)
+                self.logger.info(f"待续跑帧队列已保存到 {deferred_path}")
+            except Exception as e:
+                self.logger.error(f"保存待续跑帧队列失败: {e}")
+        elif os.path.exists(deferred_path):
+            os.remove(deferred_path)
+
+        self.deferred_frames = deferred_frames
+
+        # --- 6. 保存增量合并得到的字幕 ---
         processed_subtitles = []
-        if results_for_processor: # 仅当有成功分析结果时才进行处理
-            self.logger.info("开始使用 SubtitleProcessor 处理字幕...")
+        if results_for_processor and subtitle_merger is not None: # 仅当有成功分析结果时才进行处理
             start_time_processor = time.time()
             try:
-                # 动态设置字幕处理器的转录路径
-                subtitle_processor = SubtitleProcessor(transcript_path)
-                processed_subtitles = subtitle_processor.process_subtitles(results_for_processor, output_path, similarity_threshold)
+                processed_subtitles = subtitle_merger.save(output_path)
                 processor_duration = time.time() - start_time_processor
-                self.logger.info(f"SubtitleProcessor 处理完成，耗时 {processor_duration:.2f} 秒")
-            except ValueError as e:
-                self.logger.error(f"字幕处理失败: {e}. 请确保视频帧率已正确获取并存储在config中.")
+                self.logger.info(f"增量字幕合并结果已保存，共 {len(processed_subtitles)} 条，耗时 {processor_duration:.2f} 秒")
             except Exception as e:
                 self.logger.error(f"字幕处理时发生未知错误: {e}")
         else:
@@ -330,7 +585,7 @@ class VisualExtractor:
             if output_path:
                  try:
                      with open(output_path, 'w', encoding='utf-8') as f:
-                         json.dump({'subtitles': [], 'output_frame_rate': config.OUTPUT_FRAME_RATE}, f, ensure_ascii=False, indent=2)
+                         json.dump({'subtitles': [], 'output_frame_rate': context.frame_rate}, f, ensure_ascii=False, indent=2)
                      self.logger.info(f"已创建空的字幕JSON文件: {output_path}")
                  except Exception as e:
                      self.logger.error(f"创建空字幕JSON文件失败: {e}")
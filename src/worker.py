@@ -0,0 +1,315 @@
+"""
+任务工作节点：从共享的任务队列 (SQLite数据库文件，可位于多台主机共享的文件系统上) 中领取并执行任务
+
+多台主机各自运行一个工作节点、指向同一个数据库与输出根目录，即可按节点数扩展吞吐量。
+领取的任务持有租约并由心跳线程定期续约；节点崩溃或失联时租约到期，任务由其他节点重新领取。
+
+用法:
+    python -m src.worker --db /shared/jobs.sqlite3 [--output /shared/output/jobs] [--workers 1]
+                         [--worker-id host-a] [--exit-when-idle] [其他与 src.main 相同的参数]
+    python -m src.worker --db /shared/jobs.sqlite3 --submit <视频目录或清单>    # 只提交任务后退出
+"""
+
+import argparse
+import os
+import time
+import socket
+import logging
+import threading
+import concurrent.futures
+
+from src.audio_transcriber import AudioTranscriber
+from src.visual_extractor import VisualExtractor
+from src.summarizer import Summarizer
+from src.job_queue import JobQueue
+from src.batch import discover_videos
+from src.stage_scheduler import StageCancelledError
+from src.main import (
+    add_common_arguments, apply_common_args, clean_output_directory,
+    configure_video, create_ai_service, create_artifact_store, process_shard, process_video
+)
+from src import config
+from src import metrics
+
+
+class JobWorker:
+    """
+    任务执行者
+
+    启动时创建一次AI服务 (连接池)、加载Whisper模型并创建共享的视觉调用线程池，之后每个任务只承担实际的处理耗时。
+    每个工作线程循环领取任务，以 <工作者标识>/<线程序号> 作为租约持有者；心跳线程为所有运行中的任务续约，
+    发现任务被请求取消或租约已失效 (已被其他节点重新领取) 时通知任务在当前阶段结束后停止。
+    """
+
+    def __init__(self, queue, output_root=None, workers=None, runner=None, worker_id=None, poll_interval=None,
+                 lease_seconds=None, heartbeat_interval=None, exit_when_idle=False):
+        """
+        Args:
+            queue (JobQueue): 任务队列
+            output_root (str, optional): 任务输出根目录，默认为config.SERVER_OUTPUT_DIR (多节点时应位于共享文件系统上)
+            workers (int, optional): 同时执行的任务数，默认为config.SERVER_WORKERS
+            runner (callable, optional): 任务执行函数 runner(job, output_dir, cancel_event) -> 结果字典；
+                默认使用预热的服务执行完整的视频处理流程
+            worker_id (str, optional): 工作者标识，默认为config.WORKER_ID或 <主机名>:<进程号>
+            poll_interval (float, optional): 队列为空时的轮询间隔（秒），默认为config.SERVER_POLL_INTERVAL
+            lease_seconds (float, optional): 租约时长（秒），默认为config.JOB_LEASE_SECONDS
+            heartbeat_interval (float, optional): 心跳间隔（秒），默认为config.JOB_HEARTBEAT_INTERVAL
+            exit_when_idle (bool, optional): 队列中没有排队任务时工作线程退出 (用于一次性处理完积压任务)
+        """
+        self.queue = queue
+        self.output_root = output_root or config.SERVER_OUTPUT_DIR
+        self.workers = max(1, workers or config.SERVER_WORKERS)
+        self.runner = runner
+        self.worker_id = worker_id or config.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval or config.SERVER_POLL_INTERVAL
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.heartbeat_interval = heartbeat_interval or config.JOB_HEARTBEAT_INTERVAL
+        self.exit_when_idle = exit_when_idle
+        self.logger = logging.getLogger("JobWorker")
+        self.processed = 0
+
+        self._lock = threading.Lock()
+        self._running = {} # 运行中的任务ID -> (租约持有者, 取消信号)
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._heartbeat_thread = None
+        self._vision_pool = None
+        self.ai_service = None
+
+    # --- 预热与任务执行 ---
+
+    def _warm_up(self):
+        """创建在所有任务之间共享的模型与客户端"""
+        self.ai_service = create_ai_service()
+        self.artifact_store = create_artifact_store()
+        self.audio_transcriber = AudioTranscriber()
+        self.audio_transcriber.load_model()
+        self.summarizer = Summarizer(self.ai_service)
+        self._vision_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.SERVER_VISION_MAX_WORKERS, thread_name_prefix="vision"
+        )
+        self.visual_extractor = VisualExtractor(self.ai_service, executor=self._vision_pool,
+                                                artifact_store=self.artifact_store)
+
+    def _process_job(self, job, output_dir, cancel_event):
+        """默认的任务执行函数：使用预热的服务处理一个视频 (或一个时间分片)"""
+        # 启用产物缓存时由各阶段替换自己的输出，否则先清理任务的输出目录
+        if self.artifact_store is None:
+            clean_output_directory(output_dir)
+        params = job.get('params') or {}
+        context = configure_video(job['video_path'], output_dir, os.path.join(output_dir, 'final_summary.txt'),
+                                  frame_rate=params.get('frame_rate'), description=job['description'])
+        if 'shard' in params:
+            # 时间分片任务：只执行分析阶段，由提交分片的进程合并并生成摘要
+            return process_shard(context, params['shard'], self.audio_transcriber, self.visual_extractor,
+                                 self.artifact_store, cancel_event=cancel_event)
+        summary = process_video(context, self.ai_service, self.audio_transcriber, self.visual_extractor,
+                                self.summarizer, self.artifact_store, cancel_event=cancel_event)
+        return {
+            'output_dir': output_dir,
+            'summary_path': context.summary_output_path if summary is not None else None
+        }
+
+    def job_output_dir(self, job):
+        """
+        任务的输出目录 (提交时未指定则为 <输出根目录>/<视频名>_<任务ID前8位>，重试时不变)
+
+        Args:
+            job (dict): 任务
+
+        Returns:
+            str: 输出目录
+        """
+        if job.get('output_dir'):
+            return job['output_dir']
+        video_name = os.path.splitext(os.path.basename(job['video_path']))[0]
+        return os.path.join(self.output_root, f"{video_name}_{job['id'][:8]}")
+
+    def _run_job(self, job, holder):
+        """执行一个已领取的任务并提交结果"""
+        cancel_event = threading.Event()
+        with self._lock:
+            self._running[job['id']] = (holder, cancel_event)
+        # 领取与登记取消信号之间可能已收到取消请求
+        if self.queue.is_cancel_requested(job['id']):
+            cancel_event.set()
+
+        print(f"[{holder}] 开始执行任务 {job['id']} (第 {job['attempts']} 次): {job['video_path']}")
+        job_start = time.perf_counter()
+        status = 'lost' # 结果未能提交 (租约已被其他节点接管)
+        try:
+            if cancel_event.is_set():
+                raise StageCancelledError("运行已取消")
+            result = self.runner(job, self.job_output_dir(job), cancel_event)
+            result = dict(result or {}, seconds=round(time.perf_counter() - job_start, 3), worker_id=holder)
+            if self.queue.complete(job['id'], result, worker_id=holder):
+                status = 'succeeded'
+                print(f"[{holder}] 任务 {job['id']} 完成，耗时 {result['seconds']:.1f} 秒")
+        except StageCancelledError:
+            if self.queue.mark_cancelled(job['id'], worker_id=holder):
+                status = 'cancelled'
+                print(f"[{holder}] 任务 {job['id']} 已取消")
+        except Exception as e:
+            self.logger.error(f"任务 {job['id']} 失败: {e}")
+            if self.queue.fail(job['id'], str(e), worker_id=holder):
+                status = 'failed'
+        finally:
+            metrics.JOBS.inc(status=status)
+            metrics.JOB_SECONDS.observe(time.perf_counter() - job_start, status=status)
+            with self._lock:
+                self._running.pop(job['id'], None)
+                self.processed += 1
+
+    def _worker_loop(self, holder):
+        """工作线程：循环领取并执行任务，队列为空时等待新任务或轮询间隔"""
+        while not self._stop_event.is_set():
+            try:
+                job = self.queue.claim(worker_id=holder, lease_seconds=self.lease_seconds)
+            except Exception as e:
+                self.logger.error(f"领取任务失败: {e}")
+                job = None
+            if job is None:
+                if self.exit_when_idle:
+                    return
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run_job(job, holder)
+
+    def _heartbeat_loop(self):
+        """心跳线程：为运行中的任务续约，并传递取消请求与租约失效"""
+        while not self._stop_event.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def heartbeat(self):
+        """为所有运行中的任务续约一次"""
+        with self._lock:
+            running = list(self._running.items())
+        for job_id, (holder, cancel_event) in running:
+            try:
+                job = self.queue.heartbeat(job_id, worker_id=holder, lease_seconds=self.lease_seconds)
+            except Exception as e:
+                self.logger.warning(f"任务 {job_id} 续约失败: {e}")
+                continue
+            if job is None:
+                self.logger.warning(f"任务 {job_id} 的租约已失效，停止执行")
+                cancel_event.set()
+            elif job['cancel_requested']:
+                cancel_event.set()
+
+    def cancel_local(self, job_id):
+        """
+        通知本节点上运行中的任务停止 (不修改队列，取消请求由 JobQueue.cancel 记录)
+
+        Args:
+            job_id (str): 任务ID
+        """
+        with self._lock:
+            entry = self._running.get(job_id)
+        if entry is not None:
+            entry[1].set()
+
+    def notify(self):
+        """唤醒等待中的工作线程 (有新任务提交时调用)"""
+        self._wakeup.set()
+
+    @property
+    def running_jobs(self):
+        """本节点上运行中的任务ID"""
+        with self._lock:
+            return list(self._running)
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """预热服务并启动工作线程与心跳线程，返回自身"""
+        if self.runner is None:
+            self._warm_up()
+            self.runner = self._process_job
+        self._stop_event.clear()
+        for i in range(self.workers):
+            holder = f"{self.worker_id}/{i}"
+            thread = threading.Thread(target=self._worker_loop, args=(holder,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        return self
+
+    def join(self):
+        """等待所有工作线程退出 (exit_when_idle 时队列处理完毕即返回)"""
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self):
+        """停止工作线程 (等待运行中的任务结束) 与心跳线程"""
+        self._stop_event.set()
+        self._wakeup.set()
+        self.join()
+        self._threads = []
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        if self._vision_pool is not None:
+            self._vision_pool.shutdown(wait=True)
+            self._vision_pool = None
+        if self.ai_service is not None:
+            self.ai_service.close()
+            self.ai_service = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='AI视频理解与摘要工具 (分布式工作节点)')
+    parser.add_argument('--db', default=None, help='共享的任务队列数据库路径')
+    parser.add_argument('--output', '-o', default=None, help='任务输出根目录 (多节点时应位于共享文件系统上)')
+    parser.add_argument('--workers', type=int, default=None, help='本节点同时执行的任务数')
+    parser.add_argument('--worker-id', default=None, help='工作者标识 (默认 <主机名>:<进程号>)')
+    parser.add_argument('--exit-when-idle', action='store_true', help='队列中没有排队任务时退出')
+    parser.add_argument('--submit', metavar='SOURCE', default=None, help='将视频目录或清单中的视频提交为任务后退出')
+    parser.add_argument('--metrics-port', type=int, default=None, help='在该端口提供Prometheus指标接口 GET /metrics')
+    add_common_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    """工作节点入口"""
+    args = parse_args()
+    apply_common_args(args)
+
+    queue = JobQueue(args.db)
+    if args.submit:
+        entries = discover_videos(args.submit)
+        for entry in entries:
+            queue.submit(os.path.abspath(entry['path']), description=entry['description'])
+        print(f"已提交 {len(entries)} 个任务至 {queue.db_path}")
+        return
+
+    worker = JobWorker(queue, args.output, args.workers, worker_id=args.worker_id, exit_when_idle=args.exit_when_idle)
+    print("正在预热模型与客户端...")
+    worker.start()
+    print(f"工作节点 {worker.worker_id} 已启动 (队列: {queue.db_path}，工作线程: {worker.workers})")
+    exporters = metrics.start_exporters(args.metrics_port)
+    for exporter in exporters:
+        if isinstance(exporter, metrics.MetricsHTTPServer):
+            print(f"Prometheus指标接口: {exporter.url}")
+    try:
+        worker.join()
+    except KeyboardInterrupt:
+        print("正在停止工作节点 (等待运行中的任务结束)...")
+    finally:
+        worker.stop()
+        for exporter in exporters:
+            exporter.stop()
+    print(f"工作节点 {worker.worker_id} 已退出，共处理 {worker.processed} 个任务")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,8 @@ import base64
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.ai_service import AIService, QwenAPI
+from src import config, http_transport
+import httpx
 
 
 class TestQwenAPI(unittest.TestCase):
@@ -91,6 +93,9 @@ class TestAIService(unittest.TestCase):
             'gemini': 'test_gemini_key'
         }
         self.ai_service = AIService(self.api_keys)
+        # 不读写用户目录下的摘要缓存，避免测试之间相互影响
+        self.ai_service.summary_cache = None
+        self.ai_service_from_env.summary_cache = None
 
     @patch('src.ai_service.QwenAPI.image_to_base64')
     @patch('src.ai_service.QwenAPI.extract_subtitles')
@@ -124,6 +129,42 @@ class TestAIService(unittest.TestCase):
         mock_to_base64.assert_called_with("test_image.jpg")
         mock_extract.assert_called_with("mock_base64_string")
 
+    @patch('src.ai_service.GeminiAPI.generate_text_stream')
+    def test_summarize_text_stream(self, mock_stream):
+        """测试流式摘要使用provider的流式接口"""
+        mock_stream.return_value = iter(["摘要", "内容"])
+
+        chunks = list(self.ai_service.summarize_text("测试文本", stream=True))
+
+        self.assertEqual(chunks, ["摘要", "内容"])
+        self.assertIn("测试文本", mock_stream.call_args[0][0])
+
+
+
+class TestSharedTransport(unittest.TestCase):
+    """测试所有AI客户端共享HTTP连接池"""
+
+    def test_qwen_clients_share_pool(self):
+        """多个QwenAPI实例使用同一个HTTP客户端"""
+        api_a = QwenAPI("key_a")
+        api_b = QwenAPI("key_b")
+        self.assertIs(api_a.client._client, api_b.client._client)
+        self.assertIs(api_a.client._client, http_transport.get_openai_http_client())
+
+    def test_client_created_on_first_use(self):
+        """构造QwenAPI时不创建SDK客户端，首次访问时创建"""
+        api = QwenAPI("key_lazy")
+        self.assertIsNone(api._client)
+        self.assertIs(api.client, api.client)
+        self.assertIsNotNone(api._client)
+
+    def test_pool_limits_from_config(self):
+        """连接池大小来自config"""
+        with patch.object(config, 'HTTP_MAX_CONNECTIONS', 7), patch.object(config, 'HTTP_ENABLE_HTTP2', False):
+            kwargs = http_transport._client_kwargs(httpx)
+        self.assertEqual(kwargs['limits'].max_connections, 7)
+        self.assertFalse(kwargs['http2'])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
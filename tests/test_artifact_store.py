@@ -0,0 +1,110 @@
+"""
+阶段产物存储模块的测试用例
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.artifact_store import ArtifactStore, make_key, remove_outputs
+
+
+class TestArtifactStore(unittest.TestCase):
+    """测试ArtifactStore的保存、恢复与淘汰"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.store = ArtifactStore(os.path.join(self.root, 'store'))
+
+        self.frames_dir = os.path.join(self.root, 'out', 'frames')
+        os.makedirs(self.frames_dir)
+        for i in range(3):
+            with open(os.path.join(self.frames_dir, f"frame_{i:06d}.png"), 'wb') as f:
+                f.write(b'png' * (i + 1))
+        self.audio_path = os.path.join(self.root, 'out', 'audio.wav')
+        with open(self.audio_path, 'wb') as f:
+            f.write(b'wav')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_depends_on_params(self):
+        self.assertEqual(make_key('frames', {'video': 'abc', 'frame_rate': 5}),
+                         make_key('frames', {'frame_rate': 5, 'video': 'abc'}))
+        self.assertNotEqual(make_key('frames', {'video': 'abc', 'frame_rate': 5}),
+                            make_key('frames', {'video': 'abc', 'frame_rate': 2}))
+        self.assertNotEqual(make_key('frames', {'video': 'abc'}), make_key('audio', {'video': 'abc'}))
+
+    def test_save_and_restore(self):
+        outputs = {'frames': self.frames_dir, 'audio': self.audio_path}
+        key = make_key('frames', {'video': self.store.digest(self.audio_path)})
+        self.assertIsNone(self.store.restore(key, outputs))
+
+        self.store.save(key, 'frames', outputs, {'frame_rate': 5.0})
+        remove_outputs(outputs)
+        self.assertFalse(os.path.exists(self.frames_dir))
+
+        self.assertEqual(self.store.restore(key, outputs), {'frame_rate': 5.0})
+        self.assertEqual(sorted(os.listdir(self.frames_dir)), [f"frame_{i:06d}.png" for i in range(3)])
+        with open(self.audio_path, 'rb') as f:
+            self.assertEqual(f.read(), b'wav')
+        self.assertEqual((self.store.hits, self.store.misses), (1, 1))
+
+        # 输出名称不一致时视为未命中
+        self.assertIsNone(self.store.restore(key, {'audio': self.audio_path}))
+
+    def test_recompute_does_not_modify_saved_artifact(self):
+        outputs = {'audio': self.audio_path}
+        key = make_key('audio', {'video': 'abc'})
+        self.store.save(key, 'audio', outputs)
+
+        # 重新计算前删除旧输出，再写入新内容 (恢复的文件可能是指向产物的硬链接)
+        self.store.restore(key, outputs)
+        remove_outputs(outputs)
+        with open(self.audio_path, 'wb') as f:
+            f.write(b'changed')
+
+        self.store.restore(key, outputs)
+        with open(self.audio_path, 'rb') as f:
+            self.assertEqual(f.read(), b'wav')
+
+    def test_values(self):
+        key = make_key('frame', {'image': 'abc'})
+        self.assertIsNone(self.store.get_value(key))
+        self.store.put_value(key, {'subtitle': '你好'})
+        self.assertEqual(self.store.get_value(key), {'subtitle': '你好'})
+
+    def test_evicts_least_recently_used(self):
+        store = ArtifactStore(os.path.join(self.root, 'small'), max_bytes=1000)
+        keys = []
+        for i in range(3):
+            path = os.path.join(self.root, f"blob{i}")
+            with open(path, 'wb') as f:
+                f.write(b'x' * 400)
+            key = make_key('blob', {'i': i})
+            store.save(key, 'blob', {'blob': path})
+            # 固定修改时间，使淘汰顺序确定
+            os.utime(store._path(key), (1000 + i, 1000 + i))
+            keys.append(key)
+        store._evict()
+
+        self.assertFalse(os.path.exists(store._path(keys[0])))
+        self.assertTrue(os.path.exists(store._path(keys[2])))
+
+    def test_size_tracked_without_rescanning(self):
+        """未超过上限时只在首次写入时扫描一次存储目录"""
+        with patch.object(ArtifactStore, '_entries', wraps=self.store._entries) as entries:
+            for i in range(5):
+                self.store.put_value(make_key('frame', {'i': i}), {'subtitle': i})
+                self.store.save(make_key('audio', {'i': i}), 'audio', {'audio': self.audio_path})
+        self.assertEqual(entries.call_count, 1)
+        self.assertEqual(self.store._total_bytes, sum(size for _, _, size in self.store._entries()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,8 @@
 
 import os
 import json
+import wave
+import tempfile
 import unittest
 import shutil # Import shutil for cleanup
 from pathlib import Path
@@ -40,7 +42,7 @@ class TestAudioTranscriber(unittest.TestCase):
         os.makedirs(self.audio_output_dir, exist_ok=True)
 
         # 保存原始config路径（如果存在），以便 tearDown 恢复
-        self._original_transcript_path = getattr(config, 'TRANSCRIPT_PATH', None)
+        self._original_transcript_path = config.TRANSCRIPT_PATH
 
 
     def tearDown(self):
@@ -77,10 +79,7 @@ class TestAudioTranscriber(unittest.TestCase):
             print("\nSkipping cleanup as CLEANUP_AFTER_TEST is False.")
 
         # 恢复原始config路径 (无论是否清理都应执行)
-        if self._original_transcript_path is not None:
-            config.TRANSCRIPT_PATH = self._original_transcript_path
-        elif hasattr(config, 'TRANSCRIPT_PATH'):
-             delattr(config, 'TRANSCRIPT_PATH') # 如果原本没有，删除它
+        config.TRANSCRIPT_PATH = self._original_transcript_path
 
 
     def test_file_not_found(self):
@@ -205,6 +204,72 @@ class TestAudioTranscriber(unittest.TestCase):
     # 不再需要单独的 test_save_transcription_txt 和 test_save_transcription_json
     # 因为 transcribe_audio 要么不保存，要么同时保存两者
 
+    def test_transcribe_in_windows(self):
+        """逐窗口转录：分段时间换算为绝对时间，每个窗口完成时回调，上一窗口文本作为提示"""
+        class FakeModel:
+            def __init__(self):
+                self.prompts = []
+
+            def transcribe(self, audio, fp16=False, initial_prompt=None):
+                self.prompts.append(initial_prompt)
+                number = len(self.prompts)
+                return {'text': f" 第{number}段", 'language': 'zh',
+                        'segments': [{'id': 0, 'start': 0.5, 'end': 1.0, 'text': f" 第{number}段"}]}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_path = os.path.join(temp_dir, 'audio.wav')
+            with wave.open(audio_path, 'wb') as audio:
+                audio.setnchannels(1)
+                audio.setsampwidth(2)
+                audio.setframerate(16000)
+                audio.writeframes(b'\x00\x00' * 16000 * 5)
+            published = []
+            model = FakeModel()
+            result = AudioTranscriber.transcribe_audio(
+                audio_path, model=model, output_path=os.path.join(temp_dir, 'transcript.json'),
+                on_segments=lambda segments, upto: published.append(([s['start'] for s in segments], upto)),
+                window_seconds=2
+            )
+
+        self.assertEqual(published, [([0.5], 2.0), ([2.5], 4.0), ([4.5], 5.0)])
+        self.assertEqual(model.prompts, [None, '第1段', '第2段'])
+        self.assertEqual([s['id'] for s in result['segments']], [0, 1, 2])
+        self.assertEqual(result['text'], ' 第1段 第2段 第3段')
+
+    def test_window_boundary_segment_retranscribed(self):
+        """跨越窗口边界的语句留到下一窗口完整转录，不被截断也不重复"""
+        utterances = [(0.5, 1.5, '第一句'), (1.6, 2.6, '跨越边界的一句'), (3.0, 3.8, '第三句'), (4.2, 4.8, '最后')]
+
+        class FakeModel:
+            """按采样值 (音频中编码的十分之一秒) 确定窗口的起点，跨越窗口末尾的语句只返回截断的部分"""
+            def transcribe(self, audio, fp16=False, initial_prompt=None):
+                begin = round(float(audio[0]) * 32768) / 10
+                end = begin + len(audio) / 16000
+                segments = []
+                for start, stop, text in utterances:
+                    if begin <= start and stop <= end:
+                        segments.append({'start': start - begin, 'end': stop - begin, 'text': text})
+                    elif begin <= start < end < stop:
+                        segments.append({'start': start - begin, 'end': end - begin, 'text': '截断'})
+                return {'text': ''.join(s['text'] for s in segments), 'segments': segments}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            audio_path = os.path.join(temp_dir, 'audio.wav')
+            with wave.open(audio_path, 'wb') as audio:
+                audio.setnchannels(1)
+                audio.setsampwidth(2)
+                audio.setframerate(16000)
+                audio.writeframes(b''.join((i // 1600).to_bytes(2, 'little') for i in range(16000 * 5)))
+            watermarks = []
+            result = AudioTranscriber.transcribe_audio(
+                audio_path, model=FakeModel(), output_path=os.path.join(temp_dir, 'transcript.json'),
+                on_segments=lambda segments, upto: watermarks.append(upto), window_seconds=2
+            )
+
+        self.assertEqual([s['text'] for s in result['segments']], [u[2] for u in utterances])
+        self.assertEqual([round(s['start'], 3) for s in result['segments']], [u[0] for u in utterances])
+        self.assertEqual(watermarks, [1.6, 3.0, 5.0])
+
     def test_get_text_from_result(self):
         """测试从结果中提取文本功能"""
         mock_result = {"text": "这是一段测试文本"}
@@ -0,0 +1,104 @@
+"""
+批量处理模块的测试用例
+"""
+
+import os
+import json
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import batch, config
+
+
+class TestDiscoverVideos(unittest.TestCase):
+    """测试视频目录与清单解析"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        for name in ('b.mp4', 'a.MKV', 'notes.txt'):
+            open(os.path.join(self.root, name), 'w').close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_directory(self):
+        entries = batch.discover_videos(self.root)
+        self.assertEqual([os.path.basename(e['path']) for e in entries], ['a.MKV', 'b.mp4'])
+
+    def test_text_and_json_manifest(self):
+        manifest = os.path.join(self.root, 'list.txt')
+        with open(manifest, 'w', encoding='utf-8') as f:
+            f.write("# 注释\nb.mp4\n\n/abs/c.mp4\n")
+        entries = batch.discover_videos(manifest)
+        self.assertEqual([e['path'] for e in entries], [os.path.join(self.root, 'b.mp4'), '/abs/c.mp4'])
+
+        manifest = os.path.join(self.root, 'list.json')
+        with open(manifest, 'w', encoding='utf-8') as f:
+            json.dump(['a.MKV', {'path': 'b.mp4', 'description': '演示视频'}], f)
+        entries = batch.discover_videos(manifest)
+        self.assertEqual(entries[1]['description'], '演示视频')
+
+    def test_duplicate_names_get_distinct_dirs(self):
+        entries = [{'path': '/x/game.mp4'}, {'path': '/y/game.mp4'}]
+        self.assertEqual(batch.video_output_dirs(entries, 'out'), [os.path.join('out', 'game'), os.path.join('out', 'game_2')])
+
+
+class TestRunBatch(unittest.TestCase):
+    """测试批量处理复用预热的服务并汇总吞吐量"""
+
+    @patch('src.batch.AudioTranscriber.load_model')
+    @patch('src.batch.create_ai_service')
+    @patch('src.batch.process_video')
+    def test_shared_services_and_report(self, mock_process, mock_service, mock_load):
+        def fake_process(context, ai_service, audio_transcriber, visual_extractor, summarizer, artifact_store=None):
+            if 'broken' in context.video_path:
+                raise RuntimeError("解码失败")
+            return "摘要"
+        mock_process.side_effect = fake_process
+
+        with tempfile.TemporaryDirectory() as output_root:
+            original = (config.SUMMARY_OUTPUT_PATH, config.VIDEO_NAME)
+            entries = [{'path': f'/videos/{name}.mp4', 'description': None} for name in ('one', 'broken', 'two')]
+            report = batch.run_batch(entries, output_root, vision_workers=2)
+
+            self.assertEqual((report['succeeded'], report['failed']), (2, 1))
+            self.assertGreater(report['videos_per_hour'], 0)
+            self.assertEqual(report['videos'][0]['summary_path'], os.path.join(output_root, 'one', 'final_summary.txt'))
+            mock_service.assert_called_once()
+            mock_load.assert_called_once()
+            # 所有视频共用同一组服务实例
+            shared = {tuple(id(arg) for arg in call.args[1:]) for call in mock_process.call_args_list}
+            self.assertEqual(len(shared), 1)
+            # 每个视频使用独立的运行上下文，不改写config中的全局状态
+            contexts = [call.args[0] for call in mock_process.call_args_list]
+            self.assertEqual(sorted(c.video_name for c in contexts), ['broken', 'one', 'two'])
+            self.assertEqual((config.SUMMARY_OUTPUT_PATH, config.VIDEO_NAME), original)
+
+    @patch('src.batch.AudioTranscriber.load_model')
+    @patch('src.batch.create_ai_service')
+    @patch('src.batch.process_video')
+    def test_videos_processed_concurrently(self, mock_process, mock_service, mock_load):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_process(context, *args):
+            barrier.wait() # 三个视频同时在处理中才能通过
+            return context.video_name
+        mock_process.side_effect = fake_process
+
+        with tempfile.TemporaryDirectory() as output_root:
+            entries = [{'path': f'/videos/{name}.mp4', 'description': None} for name in ('a', 'b', 'c')]
+            report = batch.run_batch(entries, output_root, vision_workers=2, video_workers=3)
+
+        self.assertEqual(report['succeeded'], 3)
+        self.assertEqual([v['video'] for v in report['videos']], [e['path'] for e in entries])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+端到端流程基准的测试用例：合成视频命令、模拟AI服务与模拟转录器
+"""
+
+import os
+import json
+import wave
+import shutil
+import argparse
+import tempfile
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.bench_pipeline import (
+    FakeAIService, FakeTranscriber, NO_SUBTITLE, caption_at, make_captions, run_case, synthetic_video_command,
+    synthetic_video_name
+)
+from src import config
+
+
+class TestSyntheticVideo(unittest.TestCase):
+    """测试字幕时间表与ffmpeg命令"""
+
+    def test_captions_deterministic(self):
+        captions = make_captions(12)
+        self.assertEqual(captions, make_captions(12))
+        self.assertEqual([(c['start'], c['end']) for c in captions], [(0.5, 3.5), (4.5, 7.5), (8.5, 11.5)])
+        self.assertEqual(caption_at(captions, 5.0), captions[1]['text'])
+        self.assertIsNone(caption_at(captions, 4.0))
+
+    def test_command(self):
+        captions = make_captions(8)
+        command = synthetic_video_command('out.mp4', 8, fps=10, audio='silence', captions=captions)
+        self.assertIn('testsrc2=size=640x360:rate=10:duration=8', command)
+        self.assertIn('anullsrc=channel_layout=mono:sample_rate=16000', command)
+        video_filter = command[command.index('-vf') + 1]
+        self.assertEqual(video_filter.count('drawtext='), 2)
+        self.assertIn("enable='between(t,0.500,3.500)'", video_filter)
+        self.assertEqual(command[-1], 'out.mp4')
+        with self.assertRaises(ValueError):
+            synthetic_video_command('out.mp4', 8, audio='noise')
+
+    def test_video_name_includes_parameters(self):
+        self.assertEqual(synthetic_video_name(30, 25, '640x360', 'tone'), 'synthetic_30s_25fps_640x360_tone.mp4')
+        names = {synthetic_video_name(30, fps, size, 'tone', font)
+                 for fps, size, font in [(25, '640x360', None), (10, '640x360', None), (25, '320x180', None),
+                                         (25, '640x360', '/fonts/a.ttf'), (25, '640x360', '/fonts/b.ttf')]}
+        self.assertEqual(len(names), 5)
+
+
+class TestFakeBackend(unittest.TestCase):
+    """测试模拟AI服务与模拟转录器"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.captions = make_captions(12)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_describe_image_returns_burned_caption(self):
+        service = FakeAIService(self.captions, frame_rate=2)
+        paths = []
+        for number in (1, 11):  # t=0.0 无字幕, t=5.0 第二条字幕
+            path = os.path.join(self.temp_dir, f"frame_{number:06d}.png")
+            with open(path, 'wb') as f:
+                f.write(b'png')
+            paths.append(path)
+        self.assertEqual(service.describe_image(paths[0]), NO_SUBTITLE)
+        self.assertEqual(service.describe_image(paths[1]), self.captions[1]['text'])
+        self.assertEqual(service.vision_signature()['model'], 'fake-vision')
+        self.assertEqual(service.vision_breaker is None, not config.CIRCUIT_BREAKER_ENABLED)
+
+    def test_generate_text(self):
+        service = FakeAIService(self.captions, frame_rate=1, text_latency='fixed:0.01')
+        self.assertEqual(service.text_router is None, not config.TEXT_PROVIDER_ROUTING)
+        text = service.generate_text('提示词')
+        self.assertIn('合成视频摘要', text)
+        self.assertEqual(''.join(service.generate_text('提示词', stream=True)), text)
+
+    def test_fake_transcriber(self):
+        audio_path = os.path.join(self.temp_dir, 'audio.wav')
+        with wave.open(audio_path, 'wb') as audio:
+            audio.setnchannels(1)
+            audio.setsampwidth(2)
+            audio.setframerate(16000)
+            audio.writeframes(b'\x00\x00' * 16000 * 2)
+        output_path = os.path.join(self.temp_dir, 'transcript.json')
+
+        result = FakeTranscriber(self.captions, 'tone', real_time_factor=0.01).transcribe(audio_path, output_path)
+        self.assertEqual(len(result['segments']), 3)
+        with open(output_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['segments'][0]['text'], self.captions[0]['text'])
+        self.assertEqual(FakeTranscriber(self.captions, 'silence', 0).transcribe(audio_path)['segments'], [])
+
+    @unittest.skipIf(shutil.which('ffmpeg') is None, "需要FFmpeg")
+    def test_run_case(self):
+        args = argparse.Namespace(source_fps=10, size='320x180', audio='tone', font=None,
+                                  vision_latency='fixed:0', text_latency='fixed:0', seed=0,
+                                  transcriber='fake', fake_rtf=0.0)
+        artifact_cache, config.ARTIFACT_CACHE_ENABLED = config.ARTIFACT_CACHE_ENABLED, False
+        try:
+            result = run_case(self.temp_dir, 6, 2, args)
+        finally:
+            config.ARTIFACT_CACHE_ENABLED = artifact_cache
+        self.assertGreater(result['frames_decoded'], 0)
+        self.assertIn('vision', result['stages'])
+        self.assertEqual(result['stages']['frames']['unit'], 'frames/s')
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, '6s_2fps', 'final_summary.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+熔断器模块的测试用例
+"""
+
+import os
+import time
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+
+def _fail():
+    raise RuntimeError("服务不可用")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """测试熔断器的状态转换"""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                breaker.call(_fail)
+        # 成功调用会重置连续失败计数
+        self.assertEqual(breaker.call(lambda: "ok"), "ok")
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                breaker.call(_fail)
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+        called = []
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(lambda: called.append(1))
+        self.assertEqual(called, [])
+        self.assertEqual(breaker.rejected_count, 1)
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+        with self.assertRaises(RuntimeError):
+            breaker.call(_fail)
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, STATE_HALF_OPEN)
+        # 探测失败：重新打开
+        with self.assertRaises(RuntimeError):
+            breaker.call(_fail)
+        self.assertEqual(breaker.state, STATE_OPEN)
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.call(lambda: "恢复"), "恢复")
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_only_one_probe_in_half_open(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+        with self.assertRaises(RuntimeError):
+            breaker.call(_fail)
+        time.sleep(0.02)
+
+        def probe():
+            # 探测进行中，其他调用仍快速失败
+            with self.assertRaises(CircuitOpenError):
+                breaker.call(lambda: None)
+            return "ok"
+
+        self.assertEqual(breaker.call(probe), "ok")
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+    def test_late_success_does_not_close_open_breaker(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+        def slow_success():
+            # 请求进行中服务开始故障，熔断器被其他请求打开
+            with self.assertRaises(RuntimeError):
+                breaker.call(_fail)
+            return "迟到的结果"
+
+        self.assertEqual(breaker.call(slow_success), "迟到的结果")
+        self.assertEqual(breaker.state, STATE_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.call(lambda: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
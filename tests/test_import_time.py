@@ -0,0 +1,32 @@
+"""
+命令行冷启动的测试用例：入口模块导入时不加载重量级依赖
+"""
+
+import os
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.bench_import_time import ENTRY_MODULES, measure_import, parse_importtime
+
+
+class TestImportTime(unittest.TestCase):
+    """在全新的解释器中导入各入口模块"""
+
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   src.config\n"
+                  "import time:       800 |     105000 | src.main\n")
+        self.assertEqual(parse_importtime(stderr), {'src.config': 120, 'src.main': 105000})
+
+    def test_entry_modules_defer_heavy_imports(self):
+        for module in ENTRY_MODULES:
+            with self.subTest(module=module):
+                result = measure_import(module, repeat=1)
+                self.assertEqual(result['heavy_imports'], [])
+                self.assertGreater(result['import_ms'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+任务队列模块的测试用例
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.job_queue import JobQueue
+from src import config
+
+
+class TestJobQueue(unittest.TestCase):
+    """测试JobQueue的持久化、领取、取消与恢复"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'jobs.sqlite3')
+        self.queue = JobQueue(self.db_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_submit_claim_complete(self):
+        first = self.queue.submit('a.mp4', description='演示')
+        second = self.queue.submit('b.mp4')
+        self.assertEqual(first['status'], 'queued')
+
+        claimed = self.queue.claim()
+        self.assertEqual(claimed['id'], first['id'])
+        self.assertEqual(claimed['status'], 'running')
+        self.assertEqual(claimed['description'], '演示')
+
+        self.queue.complete(first['id'], {'summary_path': 'out/final_summary.txt'})
+        job = JobQueue(self.db_path).get(first['id']) # 重新打开数据库，结果仍然保留
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result'], {'summary_path': 'out/final_summary.txt'})
+
+        self.assertEqual(self.queue.claim()['id'], second['id'])
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual([j['id'] for j in self.queue.list(status='running')], [second['id']])
+        self.assertEqual(self.queue.count('succeeded'), 1)
+
+    def test_concurrent_claims_are_exclusive(self):
+        for i in range(20):
+            self.queue.submit(f"{i}.mp4")
+        claimed, lock = [], threading.Lock()
+
+        def worker():
+            while True:
+                job = self.queue.claim()
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job['id'])
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(claimed), 20)
+        self.assertEqual(len(set(claimed)), 20)
+
+    def test_cancel(self):
+        queued = self.queue.submit('a.mp4')
+        running = self.queue.submit('b.mp4')
+        self.queue.cancel(queued['id'])
+        self.assertEqual(self.queue.get(queued['id'])['status'], 'cancelled')
+
+        self.assertEqual(self.queue.claim()['id'], running['id'])
+        self.assertFalse(self.queue.is_cancel_requested(running['id']))
+        self.assertEqual(self.queue.cancel(running['id'])['status'], 'running')
+        self.assertTrue(self.queue.is_cancel_requested(running['id']))
+        self.queue.mark_cancelled(running['id'])
+        self.assertEqual(self.queue.get(running['id'])['status'], 'cancelled')
+        self.assertIsNone(self.queue.cancel('missing'))
+
+    def test_recover_running(self):
+        job = self.queue.submit('a.mp4')
+        self.queue.claim()
+        self.assertEqual(JobQueue(self.db_path).recover_running(), 1)
+        self.assertEqual(self.queue.get(job['id'])['status'], 'queued')
+        self.assertEqual(self.queue.claim()['id'], job['id'])
+
+    def _expire(self, job_id):
+        """将任务的租约改为已到期"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET lease_expires_at = 0 WHERE id = ?", (job_id,))
+
+    def test_lease_expiry_requeues_job(self):
+        job = self.queue.submit('a.mp4')
+        self.assertEqual(self.queue.claim(worker_id='host-a')['worker_id'], 'host-a')
+        self.assertIsNone(self.queue.claim(worker_id='host-b'))
+
+        self._expire(job['id'])
+        retried = self.queue.claim(worker_id='host-b')
+        self.assertEqual((retried['id'], retried['worker_id'], retried['attempts']), (job['id'], 'host-b', 2))
+
+        # 失去租约的节点不能续约或提交结果
+        self.assertIsNone(self.queue.heartbeat(job['id'], worker_id='host-a'))
+        self.assertFalse(self.queue.complete(job['id'], {'summary_path': 'a'}, worker_id='host-a'))
+        self.assertIsNotNone(self.queue.heartbeat(job['id'], worker_id='host-b'))
+        self.assertTrue(self.queue.complete(job['id'], {'summary_path': 'b'}, worker_id='host-b'))
+        self.assertEqual(self.queue.get(job['id'])['result'], {'summary_path': 'b'})
+
+    def test_lease_expiry_gives_up_after_max_attempts(self):
+        job = self.queue.submit('a.mp4')
+        with patch.object(config, 'JOB_MAX_ATTEMPTS', 2):
+            for attempt in range(2):
+                self.assertEqual(self.queue.claim(worker_id=f"host-{attempt}")['id'], job['id'])
+                self._expire(job['id'])
+            self.assertIsNone(self.queue.claim(worker_id='host-x'))
+        job = self.queue.get(job['id'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('租约到期', job['error'])
+
+    def test_heartbeat_reports_cancel_request(self):
+        job = self.queue.submit('a.mp4')
+        self.queue.claim(worker_id='host-a')
+        self.assertFalse(self.queue.heartbeat(job['id'], worker_id='host-a')['cancel_requested'])
+        self.queue.cancel(job['id'])
+        self.assertTrue(self.queue.heartbeat(job['id'], worker_id='host-a')['cancel_requested'])
+
+    def test_migrates_existing_database(self):
+        legacy_path = os.path.join(self.temp_dir.name, 'legacy.sqlite3')
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute(
+                "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, video_path TEXT NOT NULL, "
+                "output_dir TEXT, description TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+                "result TEXT, error TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("INSERT INTO jobs (id, status, video_path, created_at) VALUES ('old', 'queued', 'a.mp4', 1)")
+        queue = JobQueue(legacy_path)
+        job = queue.claim(worker_id='host-a')
+        self.assertEqual((job['id'], job['attempts'], job['worker_id']), ('old', 1, 'host-a'))
+
+    def test_invalid_status(self):
+        with self.assertRaises(ValueError):
+            self.queue.list(status='unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
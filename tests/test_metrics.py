@@ -0,0 +1,88 @@
+"""
+运行指标模块的测试用例
+"""
+
+import os
+import tempfile
+import unittest
+import urllib.request
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src import metrics
+from src.metrics import Registry
+
+
+class TestRegistry(unittest.TestCase):
+    """测试计数器、直方图与Prometheus文本格式"""
+
+    def setUp(self):
+        self.registry = Registry()
+        self.frames = self.registry.counter('test_frames_total', '帧数', ('reason',))
+        self.latency = self.registry.histogram('test_latency_seconds', '延迟', ('outcome',), buckets=(0.5, 1.0))
+
+    def test_counter(self):
+        self.frames.inc(3, reason='sampling')
+        self.frames.inc(reason='sampling')
+        self.frames.inc(reason='cached')
+        self.assertEqual(self.frames.value(reason='sampling'), 4)
+        with self.assertRaises(ValueError):
+            self.frames.inc(-1, reason='cached')
+        with self.assertRaises(ValueError):
+            self.frames.inc(kind='cached')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE test_frames_total counter', text)
+        self.assertIn('test_frames_total{reason="cached"} 1', text)
+        self.assertIn('test_frames_total{reason="sampling"} 4', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.2, 0.7, 0.9, 3.0):
+            self.latency.observe(value, outcome='success')
+        self.assertEqual(self.latency.snapshot(outcome='success'), (4, 4.8))
+
+        text = self.registry.render()
+        self.assertIn('# TYPE test_latency_seconds histogram', text)
+        self.assertIn('test_latency_seconds_bucket{outcome="success",le="0.5"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{outcome="success",le="1.0"} 3', text)
+        self.assertIn('test_latency_seconds_bucket{outcome="success",le="+Inf"} 4', text)
+        self.assertIn('test_latency_seconds_count{outcome="success"} 4', text)
+
+    def test_label_escaping_and_duplicate_registration(self):
+        self.frames.inc(reason='a"b\\c')
+        self.assertIn('reason="a\\"b\\\\c"', self.registry.render())
+        with self.assertRaises(ValueError):
+            self.registry.counter('test_frames_total', '重复')
+
+    def test_textfile_writer(self):
+        self.frames.inc(reason='cached')
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'textfile', 'avu.prom')
+            writer = metrics.TextfileWriter(path, interval=60, registry=self.registry).start()
+            self.frames.inc(reason='cached')
+            writer.stop()
+            with open(path, 'r', encoding='utf-8') as f:
+                self.assertIn('test_frames_total{reason="cached"} 2', f.read())
+            self.assertEqual(os.listdir(os.path.dirname(path)), ['avu.prom'])
+
+    def test_http_endpoint(self):
+        self.latency.observe(0.3, outcome='error')
+        server = metrics.MetricsHTTPServer(port=0, host='127.0.0.1', registry=self.registry).start()
+        try:
+            with urllib.request.urlopen(server.url, timeout=10) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertIn('test_latency_seconds_count{outcome="error"} 1', response.read().decode('utf-8'))
+        finally:
+            server.stop()
+
+    def test_observe_text_call(self):
+        before = metrics.TOKENS.value(provider='qwen', kind='prompt')
+        metrics.observe_text_call('qwen', 1.5, True, prompt_tokens=120, completion_tokens=30)
+        metrics.observe_text_call('qwen', 0.2, False)
+        self.assertEqual(metrics.TOKENS.value(provider='qwen', kind='prompt') - before, 120)
+        self.assertGreaterEqual(metrics.TEXT_CALLS.snapshot(provider='qwen', outcome='error')[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
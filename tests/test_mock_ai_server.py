@@ -0,0 +1,87 @@
+"""
+本地AI服务模拟器的测试用例：使用真实的QwenAPI / GeminiAPI客户端访问模拟器
+"""
+
+import os
+import time
+import random
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.mock_ai_server import MockAIServer, parse_latency
+from src.ai_service import QwenAPI, GeminiAPI
+from src import http_transport
+from openai import OpenAI
+
+
+class TestParseLatency(unittest.TestCase):
+    """测试延迟分布解析"""
+
+    def test_distributions(self):
+        rng = random.Random(0)
+        self.assertEqual(parse_latency('fixed:0.2')(rng), 0.2)
+        self.assertTrue(0.1 <= parse_latency('uniform:0.1,0.5')(rng) <= 0.5)
+        self.assertGreaterEqual(parse_latency('normal:0.0,1.0')(rng), 0.0)
+        self.assertGreater(parse_latency('lognormal:-1,0.5')(rng), 0.0)
+        with self.assertRaises(ValueError):
+            parse_latency('pareto:1')
+
+
+class TestMockAIServer(unittest.TestCase):
+    """测试模拟器的OpenAI兼容与Gemini接口"""
+
+    def setUp(self):
+        self.server = MockAIServer(response='echo', canned_subtitle='模拟字幕', seed=1).start()
+        self.env = patch.dict(os.environ, {
+            'QWEN_BASE_URL': self.server.openai_base_url,
+            'GEMINI_BASE_URL': self.server.url
+        })
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.server.stop()
+
+    def test_qwen_text_and_vision(self):
+        qwen = QwenAPI('test_key')
+        self.assertEqual(qwen.generate_text("你好"), "你好")
+        self.assertEqual(''.join(qwen.generate_text_stream("流式回显")), "流式回显")
+        self.assertEqual(qwen.extract_subtitles("ZmFrZQ=="), "模拟字幕")
+        self.assertEqual(self.server.stats['vision'], 1)
+        self.assertEqual(self.server.stats['stream'], 1)
+
+    def test_shared_openai_client_without_request_timeout(self):
+        """共享HTTP客户端的默认超时与SDK的HTTP库一致：不指定单次超时的请求也能完成"""
+        client = OpenAI(api_key='test_key', base_url=self.server.openai_base_url,
+                        http_client=http_transport.get_openai_http_client())
+        self.assertIn('Timeout', repr(client._client.timeout))
+        response = client.chat.completions.create(model='qwen-plus', messages=[{'role': 'user', 'content': '你好'}])
+        self.assertEqual(response.choices[0].message.content, '你好')
+
+    def test_gemini_text_and_stream(self):
+        gemini = GeminiAPI('test_key')
+        self.assertEqual(gemini.generate_text("总结一下"), "总结一下")
+        self.assertEqual(''.join(gemini.generate_text_stream("分段输出的内容")), "分段输出的内容")
+        self.assertEqual(self.server.stats['gemini'], 2)
+
+    def test_429_injection(self):
+        self.server.rate_429 = 1.0
+        qwen = QwenAPI('test_key')
+        qwen.client = qwen.client.with_options(max_retries=0)
+        with self.assertRaises(RuntimeError):
+            qwen.generate_text("限流")
+        self.assertEqual(self.server.stats['throttled'], 1)
+
+    def test_latency(self):
+        self.server.sample_latency = parse_latency('fixed:0.2')
+        qwen = QwenAPI('test_key')
+        start = time.perf_counter()
+        qwen.generate_text("延迟")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
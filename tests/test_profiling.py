@@ -0,0 +1,109 @@
+"""
+性能剖析模块的测试用例
+"""
+
+import os
+import json
+import glob
+import shutil
+import tempfile
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src import profiling
+from src.profiling import PipelineProfiler
+from src.stage_scheduler import Stage
+
+# 较早的版本中 src.main 在导入时加载 audio_transcriber -> whisper；导入失败时跳过而不是收集报错
+try:
+    from src.main import run_stages
+except ImportError as e:
+    if getattr(e, 'name', None) != 'whisper':
+        raise
+    raise unittest.SkipTest("未安装whisper，跳过性能剖析测试")
+
+
+class TestPipelineProfiler(unittest.TestCase):
+    """测试阶段记录、外部调用汇总与报告输出"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_stage_records_resources(self):
+        profiler = PipelineProfiler(cprofile=False, trace_memory=True)
+        with profiler.stage('frames'):
+            data = [bytes(1024) for _ in range(100)]
+            sum(i * i for i in range(20000))
+        with self.assertRaises(ValueError):
+            with profiler.stage('vision'):
+                raise ValueError('失败')
+        profiler.close()
+
+        frames, vision = profiler.stages
+        self.assertEqual((frames['name'], frames['status']), ('frames', 'completed'))
+        self.assertEqual(vision['status'], 'failed')
+        self.assertGreater(frames['wall_seconds'], 0)
+        self.assertGreaterEqual(frames['cpu_thread_seconds'], 0)
+        self.assertGreater(frames['python_alloc_delta_bytes'], 50 * 1024)
+        self.assertGreaterEqual(frames['python_peak_bytes'], frames['python_alloc_delta_bytes'])
+        self.assertEqual(len(data), 100)
+
+    def test_external_call_summary(self):
+        profiler = profiling.start(cprofile=False, trace_memory=False)
+        for seconds in (0.1, 0.2, 0.3, 0.4, 1.0):
+            profiler.record_call('vision', seconds)
+        with self.assertRaises(RuntimeError):
+            with profiling.external_call('text'):
+                raise RuntimeError('超时')
+        self.assertEqual(list(profiling.track_stream('text', iter(['a', 'b']))), ['a', 'b'])
+
+        summary = profiler.call_summary()
+        self.assertEqual(summary['vision']['count'], 5)
+        self.assertAlmostEqual(summary['vision']['p50_seconds'], 0.3)
+        self.assertAlmostEqual(summary['vision']['p95_seconds'], 1.0)
+        self.assertAlmostEqual(summary['vision']['total_seconds'], 2.0)
+        self.assertEqual((summary['text']['count'], summary['text']['errors']), (2, 1))
+
+    def test_inactive_is_noop(self):
+        chunks = iter(['a'])
+        self.assertIsNone(profiling.active())
+        self.assertIs(profiling.track_stream('text', chunks), chunks)
+        with profiling.external_call('vision'):
+            pass
+
+    def test_run_stages_profiled_with_cprofile(self):
+        profiler = profiling.start(cprofile=True, trace_memory=False)
+        results = run_stages([
+            Stage('frames', lambda: sorted(range(1000), reverse=True)),
+            Stage('vision', lambda frames: len(frames), deps=('frames',)),
+        ], profile_prefix='shard_000/')
+        self.assertEqual(results['vision'], 1000)
+
+        path = os.path.join(self.temp_dir, 'game_profile.json')
+        profiling.stop()
+        profiler.save(path, 'game.mp4')
+        with open(path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual([stage['name'] for stage in report['stages']], ['shard_000/frames', 'shard_000/vision'])
+        self.assertEqual(report['video_path'], 'game.mp4')
+        self.assertIn('shard_000/frames', report['cprofile'])
+        self.assertEqual(len(glob.glob(os.path.join(self.temp_dir, 'game_profile_shard_000_*.prof'))), 2)
+        self.assertIn('shard_000/vision', profiling.format_report(report))
+
+    def test_nested_stage_not_profiled_twice(self):
+        profiler = PipelineProfiler(cprofile=True, trace_memory=False)
+        with profiler.stage('shards'):
+            with profiler.stage('shard_000/frames'):
+                pass
+        self.assertEqual(list(profiler.profiles), ['shards'])
+        self.assertEqual(len(profiler.stages), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+服务路由模块的测试用例
+"""
+
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.provider_router import ProviderRouter, ProviderStats
+from src.ai_service import AIService
+from src import config
+
+
+class _FakeProvider:
+    """按预设延迟返回或抛出异常的假服务"""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"{self.name}: {prompt}"
+
+
+class TestProviderStats(unittest.TestCase):
+    """测试ProviderStats的EWMA与p95统计"""
+
+    def test_ewma_and_health(self):
+        stats = ProviderStats('gemini', alpha=0.5)
+        stats.record(1.0, True)
+        stats.record(3.0, True)
+        self.assertAlmostEqual(stats.latency_ewma, 2.0)
+        self.assertTrue(stats.healthy)
+
+        stats.record(0.1, False)
+        stats.record(0.1, False)
+        self.assertAlmostEqual(stats.error_ewma, 0.75)
+        self.assertFalse(stats.healthy)
+        self.assertEqual((stats.calls, stats.errors), (4, 2))
+
+    def test_p95_requires_min_samples(self):
+        stats = ProviderStats('qwen')
+        for _ in range(config.ROUTER_HEDGE_MIN_SAMPLES - 1):
+            stats.record(1.0, True)
+        self.assertIsNone(stats.p95_latency())
+        for latency in range(1, 101):
+            stats.record(latency / 100, True)
+        self.assertGreaterEqual(stats.p95_latency(), 0.9)
+
+
+class TestProviderRouter(unittest.TestCase):
+    """测试ProviderRouter的选择、故障切换和对冲请求"""
+
+    def test_routes_to_fastest_healthy_provider(self):
+        slow, fast = _FakeProvider('gemini'), _FakeProvider('qwen')
+        router = ProviderRouter([('gemini', slow), ('qwen', fast)], hedging=False)
+        self.assertEqual(router.ordered_providers(), ['gemini', 'qwen'])
+
+        router.stats['gemini'].record(2.0, True)
+        router.stats['qwen'].record(0.5, True)
+        self.assertEqual(router.ordered_providers(), ['qwen', 'gemini'])
+        self.assertEqual(router.call("你好"), "qwen: 你好")
+
+        # 不健康的服务即使更快也排在最后
+        for _ in range(5):
+            router.stats['qwen'].record(0.1, False)
+        self.assertEqual(router.ordered_providers(), ['gemini', 'qwen'])
+
+    def test_failover_on_error(self):
+        broken = _FakeProvider('gemini', error=RuntimeError("503"))
+        backup = _FakeProvider('qwen')
+        router = ProviderRouter([('gemini', broken), ('qwen', backup)], hedging=False)
+
+        self.assertEqual(router.call("测试"), "qwen: 测试")
+        self.assertEqual(router.stats['gemini'].errors, 1)
+        self.assertEqual(backup.calls, 1)
+
+    def test_all_providers_fail(self):
+        router = ProviderRouter([
+            ('gemini', _FakeProvider('gemini', error=RuntimeError("a"))),
+            ('qwen', _FakeProvider('qwen', error=RuntimeError("b")))
+        ])
+        with self.assertRaises(RuntimeError):
+            router.call("测试")
+
+    def test_hedges_when_primary_exceeds_p95(self):
+        slow = _FakeProvider('gemini', delay=0.5)
+        fast = _FakeProvider('qwen', delay=0.01)
+        router = ProviderRouter([('gemini', slow), ('qwen', fast)], hedging=True)
+        # 让gemini历史延迟很低 (p95≈0.05秒)，但本次请求很慢
+        for _ in range(config.ROUTER_HEDGE_MIN_SAMPLES):
+            router.stats['gemini'].record(0.05, True)
+            router.stats['qwen'].record(0.2, True)
+
+        start = time.perf_counter()
+        result = router.call("测试")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result, "qwen: 测试")
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(slow.calls, 1)
+        self.assertEqual(fast.calls, 1)
+
+    def test_close_releases_threads(self):
+        router = ProviderRouter([('gemini', _FakeProvider('gemini')), ('qwen', _FakeProvider('qwen'))])
+        self.assertEqual(router.call("测试"), "gemini: 测试")
+        threads = list(router._executor._threads)
+        router.close()
+        for thread in threads:
+            thread.join(timeout=1)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        with self.assertRaises(RuntimeError):
+            router.call("测试")
+
+
+@patch.object(config, 'SUMMARY_CACHE_ENABLED', False)
+class TestAIServiceRouting(unittest.TestCase):
+    """测试AIService通过路由器生成文本"""
+
+    @patch('src.ai_service.QwenAPI.generate_text', return_value="qwen结果")
+    @patch('src.ai_service.GeminiAPI.generate_text', side_effect=RuntimeError("Gemini不可用"))
+    def test_generate_text_fails_over_to_qwen(self, mock_gemini, mock_qwen):
+        ai_service = AIService({'qwen': 'test_qwen_key', 'gemini': 'test_gemini_key'})
+        self.assertIsNotNone(ai_service.text_router)
+
+        self.assertEqual(ai_service.generate_text("测试"), "qwen结果")
+        mock_gemini.assert_called_once_with("测试")
+        mock_qwen.assert_called_once_with("测试")
+
+    @patch('src.ai_service.QwenAPI.generate_text', return_value="qwen结果")
+    def test_use_gemini_false_bypasses_router(self, mock_qwen):
+        ai_service = AIService({'qwen': 'test_qwen_key', 'gemini': 'test_gemini_key'})
+        self.assertEqual(ai_service.generate_text("测试", use_gemini=False), "qwen结果")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+列式结果存储模块的测试用例
+"""
+
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.result_store import FrameResultStore, STATUS_OK, STATUS_NO_SUBTITLE, STATUS_FAILED
+
+
+class TestFrameResultStore(unittest.TestCase):
+    """测试FrameResultStore的写入、内存映射读取与JSON导出"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.temp_dir.name, 'video_subtitles_raw_analyzed.frames')
+        self.results = [
+            {'frame_name': 'frame_000001.png', 'subtitle': '欢迎来到游戏', 'frame_number': 1, 'latency': 0.5},
+            {'frame_name': 'frame_000006.png', 'subtitle': '欢迎来到游戏', 'frame_number': 6, 'latency': 0.7},
+            {'frame_name': 'frame_000011.png', 'subtitle': '无字幕', 'frame_number': 11},
+            {'frame_name': 'frame_000016.png', 'subtitle': '分析失败', 'frame_number': 16, 'error': '超时'},
+        ]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        """写入后以内存映射方式读取，列与记录均正确"""
+        FrameResultStore.write(self.store_path, self.results, output_frame_rate=5.0)
+        store = FrameResultStore(self.store_path)
+
+        self.assertEqual(len(store), 4)
+        self.assertIsInstance(store['frame_number'], np.memmap)
+        self.assertEqual(store['frame_number'].tolist(), [1, 6, 11, 16])
+        self.assertEqual(store['timestamp'].tolist(), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(store['status'].tolist(), [STATUS_OK, STATUS_OK, STATUS_NO_SUBTITLE, STATUS_FAILED])
+        # 重复的字幕文本共享同一个文本ID
+        self.assertEqual(store['text_id'][0], store['text_id'][1])
+        self.assertAlmostEqual(float(store['latency'][1]), 0.7, places=5)
+        self.assertTrue(np.isnan(store['latency'][2]))
+        self.assertEqual(store.output_frame_rate, 5.0)
+
+    def test_export_json_matches_raw_format(self):
+        """导出的JSON与原 _raw_analyzed.json 格式一致"""
+        store = FrameResultStore.write(self.store_path, self.results, output_frame_rate=5.0)
+        json_path = os.path.join(self.temp_dir.name, 'export.json')
+        store.export_json(json_path)
+
+        with open(json_path, 'r', encoding='utf-8') as f:
+            exported = json.load(f)
+        expected = [
+            {k: v for k, v in r.items() if k not in ('frame_number', 'latency')}
+            for r in self.results
+        ]
+        self.assertEqual(exported, expected)
+
+    def test_empty_store(self):
+        """空结果也能写入和读取"""
+        store = FrameResultStore.write(self.store_path, [], output_frame_rate=1.0)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(list(store.iter_records()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
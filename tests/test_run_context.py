@@ -0,0 +1,48 @@
+"""
+运行上下文模块的测试用例
+"""
+
+import os
+import dataclasses
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.run_context import RunContext
+from src import config
+
+
+class TestRunContext(unittest.TestCase):
+    """测试RunContext的路径布局与不可变性"""
+
+    def test_for_video_paths(self):
+        context = RunContext.for_video(os.path.join('videos', 'game.mp4'), 'out', frame_rate=5, description='演示')
+
+        self.assertEqual(context.video_name, 'game')
+        self.assertEqual(context.frame_rate, 5.0)
+        self.assertEqual(context.frames_dir, os.path.join('out', 'frames', 'game'))
+        self.assertEqual(context.audio_path, os.path.join('out', 'audio', 'game.wav'))
+        self.assertEqual(context.transcript_path, os.path.join('out', 'audio', 'game_transcript.json'))
+        self.assertEqual(context.transcript_txt_path, os.path.join('out', 'audio', 'game_transcript.txt'))
+        self.assertEqual(context.subtitles_json_path, os.path.join('out', 'subtitles', 'game_subtitles.json'))
+        self.assertEqual(context.summary_output_path, config.SUMMARY_OUTPUT_PATH)
+        self.assertEqual(context.description, '演示')
+
+    def test_defaults_from_config(self):
+        context = RunContext.for_video('game.mp4', 'out')
+        self.assertEqual(context.frame_rate, float(config.OUTPUT_FRAME_RATE))
+        self.assertEqual(context.description, config.VIDEO_DESCRIPTION)
+
+    def test_immutable(self):
+        context = RunContext.for_video('game.mp4', 'out', frame_rate=2)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            context.frame_rate = 5
+
+        changed = context.replace(frame_rate=5.0)
+        self.assertEqual((context.frame_rate, changed.frame_rate), (2.0, 5.0))
+        self.assertEqual(changed.transcript_path, context.transcript_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
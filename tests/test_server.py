@@ -0,0 +1,167 @@
+"""
+常驻任务服务的测试用例
+"""
+
+import os
+import json
+import time
+import socket
+import tempfile
+import threading
+import http.client
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.server import JobServer
+from src.job_queue import JobQueue
+from src.stage_scheduler import StageCancelledError
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """通过Unix套接字发送HTTP请求"""
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class TestJobServer(unittest.TestCase):
+    """使用模拟的任务执行函数测试HTTP接口、任务状态与取消"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.video_path = os.path.join(self.root, 'game.mp4')
+        open(self.video_path, 'w').close()
+        self.queue = JobQueue(os.path.join(self.root, 'jobs.sqlite3'))
+        self.release = threading.Event()
+        self.runs = []
+
+    def tearDown(self):
+        self.release.set()
+        self.temp_dir.cleanup()
+
+    def _runner(self, job, output_dir, cancel_event):
+        """模拟处理：等待释放信号 (或取消)，然后写出摘要"""
+        self.runs.append(job['id'])
+        while not self.release.wait(0.01):
+            if cancel_event.is_set():
+                raise StageCancelledError("运行已取消")
+        if job['description'] == 'fail':
+            raise RuntimeError("处理失败")
+        os.makedirs(output_dir, exist_ok=True)
+        summary_path = os.path.join(output_dir, 'final_summary.txt')
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(f"摘要: {os.path.basename(job['video_path'])}")
+        return {'output_dir': output_dir, 'summary_path': summary_path}
+
+    def _server(self, **kwargs):
+        return JobServer(self.queue, os.path.join(self.root, 'out'), runner=self._runner, port=0,
+                         poll_interval=0.05, **kwargs)
+
+    def _request(self, server, method, path, body=None):
+        if server.unix_socket:
+            conn = _UnixHTTPConnection(server.unix_socket)
+        else:
+            host, port = server.httpd.server_address[:2]
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+        try:
+            payload = json.dumps(body).encode('utf-8') if body is not None else None
+            conn.request(method, path, body=payload, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def _wait_status(self, server, job_id, status, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.queue.get(job_id)
+            if job['status'] == status:
+                return job
+            time.sleep(0.02)
+        self.fail(f"任务 {job_id} 未进入状态 {status}: {self.queue.get(job_id)['status']}")
+
+    def test_submit_and_fetch_result(self):
+        with self._server() as server:
+            status, job = self._request(server, 'POST', '/jobs', {'video_path': self.video_path})
+            self.assertEqual(status, 201)
+
+            self._wait_status(server, job['id'], 'running')
+            status, payload = self._request(server, 'GET', f"/jobs/{job['id']}/result")
+            self.assertEqual(status, 409)
+
+            self.release.set()
+            self._wait_status(server, job['id'], 'succeeded')
+            status, payload = self._request(server, 'GET', f"/jobs/{job['id']}/result")
+            self.assertEqual(status, 200)
+            self.assertEqual(payload['summary'], '摘要: game.mp4')
+            self.assertTrue(payload['output_dir'].endswith(f"game_{job['id'][:8]}"))
+
+            status, listing = self._request(server, 'GET', '/jobs?status=succeeded')
+            self.assertEqual([j['id'] for j in listing['jobs']], [job['id']])
+            status, health = self._request(server, 'GET', '/health')
+            self.assertEqual((health['status'], health['queued']), ('ok', 0))
+
+    def test_invalid_requests(self):
+        with self._server() as server:
+            self.assertEqual(self._request(server, 'POST', '/jobs', {'video_path': 'missing.mp4'})[0], 400)
+            self.assertEqual(self._request(server, 'POST', '/jobs', [])[0], 400)
+            self.assertEqual(self._request(server, 'POST', '/jobs', "game.mp4")[0], 400)
+            self.assertEqual(self._request(server, 'GET', '/jobs/unknown')[0], 404)
+            self.assertEqual(self._request(server, 'GET', '/jobs?status=bogus')[0], 400)
+            self.assertEqual(self._request(server, 'GET', '/nothing')[0], 404)
+
+    def test_cancel_running_and_queued(self):
+        with self._server() as server:
+            _, running = self._request(server, 'POST', '/jobs', {'video_path': self.video_path})
+            self._wait_status(server, running['id'], 'running')
+            _, queued = self._request(server, 'POST', '/jobs', {'video_path': self.video_path})
+
+            status, job = self._request(server, 'DELETE', f"/jobs/{queued['id']}")
+            self.assertEqual((status, job['status']), (200, 'cancelled'))
+            self._request(server, 'POST', f"/jobs/{running['id']}/cancel")
+            self._wait_status(server, running['id'], 'cancelled')
+
+        # 排队中被取消的任务不会执行
+        self.assertEqual(self.runs, [running['id']])
+
+    def test_failure_recorded(self):
+        self.release.set()
+        with self._server() as server:
+            _, job = self._request(server, 'POST', '/jobs', {'video_path': self.video_path, 'description': 'fail'})
+            job = self._wait_status(server, job['id'], 'failed')
+            self.assertIn('处理失败', job['error'])
+
+            host, port = server.httpd.server_address[:2]
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            try:
+                conn.request('GET', '/metrics')
+                response = conn.getresponse()
+                body = response.read().decode('utf-8')
+            finally:
+                conn.close()
+            self.assertEqual(response.status, 200)
+            self.assertTrue(response.getheader('Content-Type').startswith('text/plain'))
+            self.assertIn('avu_jobs_total{status="failed"}', body)
+
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "平台不支持Unix套接字")
+    def test_unix_socket(self):
+        self.release.set()
+        socket_path = os.path.join(self.root, 'server.sock')
+        with self._server(unix_socket=socket_path) as server:
+            status, job = self._request(server, 'POST', '/jobs', {'video_path': self.video_path})
+            self.assertEqual(status, 201)
+            self._wait_status(server, job['id'], 'succeeded')
+        self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
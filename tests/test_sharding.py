@@ -0,0 +1,199 @@
+"""
+时间分片模块的测试用例
+"""
+
+import os
+import json
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.sharding import plan_shards, merge_transcripts, merge_subtitles
+from src import config
+
+
+class TestPlanShards(unittest.TestCase):
+    """测试分片规划"""
+
+    def test_even_split_with_overlap(self):
+        shards = plan_shards(600, shard_count=3, overlap=5, min_seconds=60)
+        self.assertEqual([(s['owned_start'], s['owned_end']) for s in shards], [(0, 200), (200, 400), (400, 600)])
+        self.assertEqual([(s['start'], s['end']) for s in shards], [(0, 205), (195, 405), (395, 600)])
+
+    def test_shard_seconds_and_min_length(self):
+        self.assertEqual(len(plan_shards(3600, shard_seconds=900, overlap=0)), 4)
+        # 视频较短时减少分片数
+        self.assertEqual(len(plan_shards(150, shard_count=8, overlap=0, min_seconds=60)), 2)
+        self.assertEqual(len(plan_shards(30, shard_count=8, overlap=0, min_seconds=60)), 1)
+        with self.assertRaises(ValueError):
+            plan_shards(0)
+
+
+class TestMergeShards(unittest.TestCase):
+    """测试按全局时间合并转录与字幕"""
+
+    def setUp(self):
+        # 两个分片，边界在100秒，各向两侧重叠5秒
+        self.shards = plan_shards(200, shard_count=2, overlap=5, min_seconds=0)
+
+    def test_merge_transcripts_offsets_and_deduplicates_overlap(self):
+        first = {'segments': [
+            {'start': 10, 'end': 20, 'text': '开场'},
+            {'start': 97, 'end': 102, 'text': '跨越边界的一句话'}, # 全局 97~102，中点 99.5，属于第一个分片
+        ]}
+        second = {'segments': [
+            {'start': 2, 'end': 7, 'text': '跨越边界的一句话'}, # 全局 97~102，与第一个分片重复
+            {'start': 20, 'end': 30, 'text': '第二段'},
+        ]}
+        merged = merge_transcripts([(self.shards[1], second), (self.shards[0], first)])
+
+        self.assertEqual([s['text'] for s in merged['segments']], ['开场', '跨越边界的一句话', '第二段'])
+        self.assertEqual([s['id'] for s in merged['segments']], [0, 1, 2])
+        self.assertEqual((merged['segments'][2]['start'], merged['segments'][2]['end']), (115, 125))
+
+    def test_merge_subtitles_stitches_boundary_caption(self):
+        first = [
+            {'text': '欢迎来到本期游戏解说', 'start_time': 10, 'end_time': 20},
+            {'text': '击败守卫获得太阳之眼', 'start_time': 90, 'end_time': 105}, # 被第一个分片的终点截断
+        ]
+        second = [
+            {'text': '击败守卫获得太阳之眼', 'start_time': 0, 'end_time': 17}, # 被第二个分片的起点截断，全局 95~112
+            {'text': '接下来我们需要前往沼泽地带', 'start_time': 30, 'end_time': 40},
+        ]
+        merged = merge_subtitles([(self.shards[0], first), (self.shards[1], second)], similarity_threshold=0.85,
+                                 gap_tolerance=2)
+
+        self.assertEqual([s['text'] for s in merged],
+                         ['欢迎来到本期游戏解说', '击败守卫获得太阳之眼', '接下来我们需要前往沼泽地带'])
+        self.assertEqual((merged[1]['start_time'], merged[1]['end_time']), (90, 112))
+        self.assertEqual((merged[2]['start_time'], merged[2]['end_time']), (125, 135))
+        self.assertNotIn('shard', merged[0])
+
+    def test_truncated_copy_dropped(self):
+        # 第一个分片中被截断的副本中点落在第二个分片的归属范围内，只保留第二个分片中完整的字幕
+        first = [{'text': '击败守卫获得太阳之眼', 'start_time': 96, 'end_time': 105}]
+        second = [{'text': '击败守卫获得太阳之眼', 'start_time': 0, 'end_time': 12}] # 全局 95~107
+        merged = merge_subtitles([(self.shards[0], first), (self.shards[1], second)])
+        self.assertEqual([(s['start_time'], s['end_time']) for s in merged], [(95, 107)])
+
+    def test_caption_inside_overlap_kept_once(self):
+        first = [{'text': '第一条', 'start_time': 96, 'end_time': 98}]
+        second = [{'text': '第一条', 'start_time': 1, 'end_time': 3}] # 全局 96~98
+        merged = merge_subtitles([(self.shards[0], first), (self.shards[1], second)])
+        self.assertEqual(len(merged), 1)
+
+    def test_different_captions_not_stitched(self):
+        first = [{'text': '击败守卫获得太阳之眼', 'start_time': 95, 'end_time': 99}]
+        second = [{'text': '接下来我们需要前往沼泽地带', 'start_time': 6, 'end_time': 10}] # 全局 101~105
+        merged = merge_subtitles([(self.shards[0], first), (self.shards[1], second)])
+        self.assertEqual(len(merged), 2)
+
+    def test_global_dedup_across_shards(self):
+        first = [{'text': '玩家一 击杀了 玩家二', 'start_time': 10, 'end_time': 12,
+                  'occurrences': [{'start_time': 10, 'end_time': 12}, {'start_time': 40, 'end_time': 42}]}]
+        second = [{'text': '玩家一 击杀了 玩家二', 'start_time': 50, 'end_time': 52}]
+        with patch.object(config, 'SUBTITLE_GLOBAL_DEDUP', True):
+            merged = merge_subtitles([(self.shards[0], first), (self.shards[1], second)])
+        self.assertEqual(len(merged), 1)
+        self.assertEqual([o['start_time'] for o in merged[0]['occurrences']], [10, 40, 145])
+
+
+
+class TestShardedPipeline(unittest.TestCase):
+    """使用模拟的分片处理测试分片调度、合并与队列分发"""
+
+    def setUp(self):
+        from src import main
+        from src.job_queue import JobQueue
+        self.main = main
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.video_path = os.path.join(self.root, 'vod.mp4')
+        open(self.video_path, 'w').close()
+        self.context = main.configure_video(self.video_path, os.path.join(self.root, 'out'),
+                                            os.path.join(self.root, 'out', 'final_summary.txt'), frame_rate=1)
+        self.queue = JobQueue(os.path.join(self.root, 'jobs.sqlite3'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _fake_shard(self, context, shard, *args, **kwargs):
+        """模拟分片处理：写出分片内相对时间的转录与字幕"""
+        with open(context.transcript_path, 'w', encoding='utf-8') as f:
+            json.dump({'segments': [{'start': 10, 'end': 20, 'text': f"第{shard['index']}段语音"}]}, f, ensure_ascii=False)
+        with open(context.subtitles_json_path, 'w', encoding='utf-8') as f:
+            json.dump({'subtitles': [{'text': f"第{shard['index']}段字幕", 'start_time': 10, 'end_time': 20}]},
+                      f, ensure_ascii=False)
+        return {'shard': shard, 'transcript_path': context.transcript_path, 'subtitles_path': context.subtitles_json_path}
+
+    def test_local_shards_merged_before_summary(self):
+        summaries = []
+
+        def fake_summary(subtitles, ai_service, summarizer, context):
+            summaries.append(subtitles)
+            return '摘要'
+
+        with patch.object(config, 'VIDEO_SHARDS', 3), patch.object(config, 'SHARD_MIN_SECONDS', 60), \
+                patch.object(config, 'SHARD_OVERLAP_SECONDS', 0), \
+                patch.object(self.main.VideoProcessor, 'get_duration', return_value=300.0), \
+                patch.object(self.main, 'process_shard', side_effect=self._fake_shard), \
+                patch.object(self.main, 'generate_video_summary', side_effect=fake_summary):
+            summary = self.main.process_video_sharded(self.context, None, None, None, None)
+
+        self.assertEqual(summary, '摘要')
+        self.assertEqual([(s['text'], s['start_time']) for s in summaries[0]],
+                         [('第0段字幕', 10), ('第1段字幕', 110), ('第2段字幕', 210)])
+        with open(self.context.transcript_path, 'r', encoding='utf-8') as f:
+            transcript = json.load(f)
+        self.assertEqual([s['start'] for s in transcript['segments']], [10, 110, 210])
+        self.assertTrue(os.path.exists(self.context.subtitles_srt_path))
+
+    def test_shards_dispatched_to_queue(self):
+        shards = plan_shards(200, shard_count=2, overlap=0, min_seconds=0)
+
+        def fake_worker():
+            # 模拟其他节点上的工作者领取并完成分片任务
+            done = 0
+            while done < len(shards):
+                job = self.queue.claim(worker_id='node-b')
+                if job is None:
+                    continue
+                context = self.main.configure_video(job['video_path'], job['output_dir'],
+                                                    frame_rate=job['params']['frame_rate'])
+                self.queue.complete(job['id'], self._fake_shard(context, job['params']['shard']), worker_id='node-b')
+                done += 1
+
+        worker = threading.Thread(target=fake_worker)
+        worker.start()
+        results = self.main.run_shards_on_queue(self.queue, self.context, shards, poll_interval=0.02)
+        worker.join()
+
+        self.assertEqual([r['shard']['index'] for r in results], [0, 1])
+        self.assertTrue(results[1]['transcript_path'].startswith(os.path.join(self.context.output_dir, 'shards')))
+        merged = self.main.merge_shard_results(self.context, results)
+        self.assertEqual([s['start_time'] for s in merged], [10, 110])
+
+    def test_failed_shard_job_raises(self):
+        shards = plan_shards(200, shard_count=2, overlap=0, min_seconds=0)
+
+        def failing_worker():
+            job = None
+            while job is None:
+                job = self.queue.claim(worker_id='node-b')
+            self.queue.fail(job['id'], '解码失败', worker_id='node-b')
+
+        worker = threading.Thread(target=failing_worker)
+        worker.start()
+        with self.assertRaises(RuntimeError):
+            self.main.run_shards_on_queue(self.queue, self.context, shards, poll_interval=0.02)
+        worker.join()
+        # 其余分片任务被取消
+        self.assertEqual(self.queue.count('queued'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
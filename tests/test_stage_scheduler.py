@@ -0,0 +1,110 @@
+"""
+阶段调度模块的测试用例
+"""
+
+import os
+import time
+import threading
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.stage_scheduler import Stage, StageScheduler, StageCancelledError
+
+
+def _sleeper(seconds, value):
+    """返回一个等待指定时间后返回value的阶段函数"""
+    def func(*deps):
+        time.sleep(seconds)
+        return value
+    return func
+
+
+class TestStageScheduler(unittest.TestCase):
+    """测试StageScheduler的并发、依赖顺序和失败处理"""
+
+    def _pipeline(self):
+        return [
+            Stage('frames', _sleeper(0.3, 'frames')),
+            Stage('audio', _sleeper(0.1, 'audio')),
+            Stage('transcribe', _sleeper(0.2, 'transcript'), deps=('audio',)),
+            Stage('vision', lambda frames, transcript: f"{frames}+{transcript}", deps=('frames', 'transcribe')),
+        ]
+
+    def test_independent_stages_overlap(self):
+        scheduler = StageScheduler(self._pipeline())
+        start = time.perf_counter()
+        results = scheduler.run()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(results['vision'], 'frames+transcript')
+        # 串行需要0.6秒，并发时总耗时接近关键路径 (0.3秒)
+        self.assertLess(elapsed, 0.5)
+        self.assertLess(scheduler.timings['audio']['start'], scheduler.timings['frames']['end'])
+
+        path, seconds = scheduler.critical_path()
+        self.assertEqual(path[-1], 'vision')
+        self.assertGreaterEqual(seconds, 0.3)
+        self.assertIn('关键路径', scheduler.format_report())
+
+    def test_single_worker_runs_in_order(self):
+        scheduler = StageScheduler(self._pipeline(), max_workers=1)
+        scheduler.run()
+        order = sorted(scheduler.timings, key=lambda name: scheduler.timings[name]['start'])
+        self.assertEqual(order, ['frames', 'audio', 'transcribe', 'vision'])
+        self.assertGreaterEqual(scheduler.total_time, 0.6)
+
+    def test_failure_skips_dependents(self):
+        calls = []
+
+        def broken():
+            raise RuntimeError("音频提取失败")
+
+        scheduler = StageScheduler([
+            Stage('frames', lambda: calls.append('frames') or 'frames'),
+            Stage('audio', broken),
+            Stage('transcribe', lambda audio: calls.append('transcribe'), deps=('audio',),
+                  on_skip=lambda: calls.append('transcribe skipped')),
+        ])
+        with self.assertRaises(RuntimeError):
+            scheduler.run()
+
+        self.assertEqual(sorted(calls), ['frames', 'transcribe skipped'])
+        self.assertEqual(scheduler.timings['audio']['status'], 'failed')
+        self.assertEqual(scheduler.timings['transcribe']['status'], 'skipped')
+        self.assertIn('跳过', scheduler.format_report())
+
+    def test_cancel_stops_before_next_stage(self):
+        cancel_event = threading.Event()
+        calls = []
+
+        def first():
+            calls.append('first')
+            cancel_event.set()
+            return 'first'
+
+        scheduler = StageScheduler([
+            Stage('first', first),
+            Stage('second', lambda value: calls.append('second'), deps=('first',),
+                  on_skip=lambda: calls.append('second cancelled')),
+        ])
+        with self.assertRaises(StageCancelledError):
+            scheduler.run(cancel_event)
+
+        self.assertEqual(calls, ['first', 'second cancelled'])
+        self.assertEqual(scheduler.timings['first']['status'], 'done')
+        self.assertEqual(scheduler.timings['second']['status'], 'cancelled')
+        self.assertIn('取消', scheduler.format_report())
+
+    def test_invalid_graph(self):
+        with self.assertRaises(ValueError):
+            StageScheduler([Stage('a', lambda b: b, deps=('b',)), Stage('b', lambda a: a, deps=('a',))])
+        with self.assertRaises(ValueError):
+            StageScheduler([Stage('a', lambda x: x, deps=('missing',))])
+        with self.assertRaises(ValueError):
+            StageScheduler([Stage('a', lambda: 1), Stage('a', lambda: 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
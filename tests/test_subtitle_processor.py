@@ -0,0 +1,220 @@
+"""
+字幕处理模块的测试用例
+"""
+
+import os
+import random
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.subtitle_processor import SubtitleProcessor, IncrementalSubtitleMerger
+from src import text_similarity
+from src import config
+
+
+class TestTextSimilarity(unittest.TestCase):
+    """测试字幕相似度后端"""
+
+    PAIRS = [
+        ("欢迎来到本期游戏解说，今天我们来玩一款新游戏", "欢迎来到本期游戏解说，今天我们来玩一款新游戏！"),
+        ("欢迎来到本期游戏解说", "接下来我们需要前往沼泽地带"),
+        ("击败守卫获得太阳之眼", "击败守卫获得太阳之眼"),
+        ("短", "这是一条长得多的字幕文本"),
+        ("", "无字幕"),
+    ]
+
+    def test_difflib_backend_matches_sequence_matcher(self):
+        """difflib后端与原SequenceMatcher判定完全一致"""
+        from difflib import SequenceMatcher
+        for a, b in self.PAIRS:
+            for threshold in (0.5, 0.85, 0.95):
+                expected = a == b or (bool(a) and bool(b) and SequenceMatcher(None, a, b).ratio() >= threshold)
+                self.assertEqual(text_similarity.is_similar(a, b, threshold, 'difflib'), expected, (a, b, threshold))
+
+    def test_backends_agree(self):
+        """所有可用后端的判定一致"""
+        for backend in text_similarity.available_backends():
+            for a, b in self.PAIRS:
+                self.assertEqual(
+                    text_similarity.is_similar(a, b, 0.9, backend),
+                    text_similarity.is_similar(a, b, 0.9, 'difflib'),
+                    (backend, a, b)
+                )
+
+    def test_unknown_backend(self):
+        """未知后端抛出ValueError"""
+        with self.assertRaises(ValueError):
+            text_similarity.is_similar("甲", "乙", 0.9, 'unknown')
+
+    def test_processor_uses_backend(self):
+        """SubtitleProcessor.is_similar_text 使用指定后端"""
+        processor = SubtitleProcessor(similarity_backend='difflib')
+        self.assertTrue(processor.is_similar_text(*self.PAIRS[0], threshold=0.9))
+        self.assertFalse(processor.is_similar_text(*self.PAIRS[1], threshold=0.9))
+
+
+class TestIncrementalSubtitleMerger(unittest.TestCase):
+    """测试增量字幕合并器与process_subtitles结果一致"""
+
+    def setUp(self):
+        self._original_frame_rate = config.OUTPUT_FRAME_RATE
+        config.OUTPUT_FRAME_RATE = 2.0
+
+    def tearDown(self):
+        config.OUTPUT_FRAME_RATE = self._original_frame_rate
+
+    def _make_results(self, rng, count):
+        """生成带有重复、近重复、无字幕和失败帧的结果序列"""
+        lines = ["第一关开始了", "第一关开始了！", "我们击败了守卫", "获得了太阳之眼", "无字幕", "分析失败"]
+        return [
+            {'frame_name': f"frame_{i:06d}.png", 'subtitle': rng.choice(lines)}
+            for i in range(1, count + 1)
+        ]
+
+    def test_matches_batch_for_any_order(self):
+        """任意到达顺序下，增量结果与批量处理结果相同"""
+        rng = random.Random(7)
+        for _ in range(30):
+            results = self._make_results(rng, rng.randint(1, 40))
+            expected = SubtitleProcessor().process_subtitles([dict(r) for r in results], similarity_threshold=0.8)
+
+            merger = IncrementalSubtitleMerger(SubtitleProcessor(), similarity_threshold=0.8)
+            shuffled = list(results)
+            rng.shuffle(shuffled)
+            for result in shuffled:
+                merger.add_result(result)
+            self.assertEqual(merger.get_subtitles(), expected)
+            self.assertEqual(merger.received_count, len(results))
+
+    def test_gap_fill_splits_span(self):
+        """后到达的中间帧会拆分已有的字幕段"""
+        merger = IncrementalSubtitleMerger(SubtitleProcessor(), similarity_threshold=0.9)
+        merger.add_result({'frame_name': 'frame_000001.png', 'subtitle': '甲乙丙丁'})
+        merger.add_result({'frame_name': 'frame_000003.png', 'subtitle': '甲乙丙丁'})
+        self.assertEqual(len(merger.get_subtitles()), 1)
+
+        merger.add_result({'frame_name': 'frame_000002.png', 'subtitle': '完全不同的字幕'})
+        self.assertEqual([s['text'] for s in merger.get_subtitles()], ['甲乙丙丁', '完全不同的字幕', '甲乙丙丁'])
+
+
+class TestGlobalDedup(unittest.TestCase):
+    """测试全局近重复字幕抑制"""
+
+    def _subtitle(self, text, start):
+        return {'text': text, 'start_time': start, 'end_time': start + 1.0}
+
+    def test_clusters_non_adjacent_duplicates(self):
+        """不相邻的近重复字幕被聚为一条，并保留所有出现时间"""
+        subtitles = [
+            self._subtitle("玩家一号击杀了玩家二号", 0.0),
+            self._subtitle("我们现在前往沼泽地带", 5.0),
+            self._subtitle("玩家一号击杀了玩家二号！", 10.0),
+            self._subtitle("收集三件神器才能开启大门", 15.0),
+            self._subtitle("玩家一号击杀了玩家二号", 20.0),
+        ]
+        processor = SubtitleProcessor(global_dedup=True)
+        result = processor.suppress_global_duplicates(subtitles, threshold=0.8)
+
+        self.assertEqual([s['text'] for s in result], [
+            "玩家一号击杀了玩家二号", "我们现在前往沼泽地带", "收集三件神器才能开启大门"
+        ])
+        self.assertEqual([o['start_time'] for o in result[0]['occurrences']], [0.0, 10.0, 20.0])
+        self.assertEqual(len(result[1]['occurrences']), 1)
+
+    def test_toggle_in_process_subtitles(self):
+        """global_dedup开关控制process_subtitles是否去重"""
+        original_frame_rate = config.OUTPUT_FRAME_RATE
+        config.OUTPUT_FRAME_RATE = 1.0
+        try:
+            results = [
+                {'frame_name': 'frame_000001.png', 'subtitle': '常驻横幅：欢迎收看'},
+                {'frame_name': 'frame_000002.png', 'subtitle': '第一关开始了'},
+                {'frame_name': 'frame_000003.png', 'subtitle': '常驻横幅：欢迎收看'},
+            ]
+            self.assertEqual(len(SubtitleProcessor(global_dedup=False).process_subtitles(list(results))), 3)
+            self.assertEqual(len(SubtitleProcessor(global_dedup=True).process_subtitles(list(results))), 2)
+        finally:
+            config.OUTPUT_FRAME_RATE = original_frame_rate
+
+    def test_lsh_finds_same_clusters_as_brute_force(self):
+        """LSH聚类结果与逐对精确比较一致"""
+        rng = random.Random(3)
+        bases = ["击杀播报玩家甲击败玩家乙", "按下空格键跳跃", "欢迎来到新手教程第一课", "前往地图中心的古老神庙"]
+        texts = []
+        for _ in range(60):
+            text = list(rng.choice(bases))
+            if rng.random() < 0.3:
+                text.append("！")
+            texts.append(''.join(text))
+
+        clusters = text_similarity.find_near_duplicate_clusters(texts, threshold=0.8)
+        for members in clusters:
+            self.assertEqual(len({texts[i].rstrip("！") for i in members}), 1)
+        self.assertEqual(len(clusters), len({t.rstrip("！") for t in texts}))
+
+    def test_lsh_chain_does_not_merge_dissimilar_texts(self):
+        """A≈B、B≈C、C≈D 的链式相似不会把与代表A不相似的D并入A的簇，簇内成员都与代表相似"""
+        texts = ["欢迎来到新手教程第一课请先熟悉移动和跳跃操作", "欢迎来到新手教程第一课请先熟悉移动和跳请操作",
+                 "欢迎来到新手教程第一课请先熟悉移动和跳请操一", "欢迎来到新手教程第一课请先熟悉移动和请请操一"]
+        shingles = [text_similarity.char_ngrams(text) for text in texts]
+        for i in range(3):
+            self.assertGreaterEqual(text_similarity.jaccard(shingles[i], shingles[i + 1]), 0.8)
+        self.assertLess(text_similarity.jaccard(shingles[0], shingles[3]), 0.8)
+
+        clusters = text_similarity.find_near_duplicate_clusters(texts + texts[:2], threshold=0.8)
+        cluster_of = {index: members for members in clusters for index in members}
+        self.assertNotIn(3, cluster_of[0])
+        self.assertEqual(cluster_of[4], cluster_of[0]) # 完全相同的文本归入同一簇
+        for members in clusters:
+            for index in members:
+                self.assertGreaterEqual(text_similarity.jaccard(shingles[members[0]], shingles[index % 4]), 0.8)
+
+
+class TestSpeechDedup(unittest.TestCase):
+    """测试语音/字幕对齐去重"""
+
+    def setUp(self):
+        self.processor = SubtitleProcessor()
+        self.processor.segments = [
+            {'start': 0.0, 'end': 3.0, 'text': '大家好，欢迎来到今天的游戏实况'},
+            {'start': 3.0, 'end': 6.0, 'text': '我们先去左边的洞穴看看'},
+            {'start': 20.0, 'end': 24.0, 'text': '这个首领的攻击力非常高'},
+        ]
+
+    def _subtitle(self, text, start, end):
+        return {'text': text, 'start_time': start, 'end_time': end}
+
+    def test_removes_time_aligned_duplicates(self):
+        subtitles = [
+            self._subtitle("大家好 欢迎来到今天的游戏实况", 0.5, 2.5), # 与语音重复
+            self._subtitle("我们先去左边的洞窟看看", 3.2, 5.8), # ASR有个别错字，仍视为重复
+            self._subtitle("获得道具：生命药水×3", 4.0, 5.0), # 画面独有
+            self._subtitle("这个首领的攻击力非常高", 10.0, 11.0), # 内容相同但时间不重叠
+        ]
+        kept, report = self.processor.remove_speech_duplicates(subtitles)
+
+        self.assertEqual([s['text'] for s in kept], ["获得道具：生命药水×3", "这个首领的攻击力非常高"])
+        self.assertEqual(report['removed'], 2)
+        self.assertGreater(report['tokens_saved'], 0)
+
+    def test_requires_all_occurrences_redundant(self):
+        subtitle = self._subtitle("这个首领的攻击力非常高", 20.0, 22.0)
+        subtitle['occurrences'] = [
+            {'start_time': 20.0, 'end_time': 22.0},
+            {'start_time': 40.0, 'end_time': 41.0}
+        ]
+        kept, report = self.processor.remove_speech_duplicates([subtitle])
+        self.assertEqual(len(kept), 1)
+        self.assertEqual(report['removed'], 0)
+
+    def test_no_transcript_keeps_everything(self):
+        subtitles = [self._subtitle("任意字幕", 0.0, 1.0)]
+        kept, report = SubtitleProcessor().remove_speech_duplicates(subtitles)
+        self.assertEqual(kept, subtitles)
+        self.assertEqual(report['removed'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,11 +6,14 @@ import os
 import unittest
 import shutil
 import logging
+import tempfile
+import threading
+from unittest.mock import Mock, patch
 
 # 导入要测试的模块
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.summarizer import Summarizer
+from src.summarizer import Summarizer, split_text_into_chunks
 from src.ai_service import AIService # 导入AIService
 from src import config
 
@@ -122,5 +125,115 @@ class TestSummarizer(unittest.TestCase):
             logger.error(f"测试生成摘要失败: {e}", exc_info=True)
             self.fail(f"测试生成摘要失败: {e}")
 
+
+class _FakeSummaryService:
+    """模拟AI服务：记录map/reduce调用，返回可追踪的摘要"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chunk_calls = []
+        self.combine_calls = []
+
+    def summarize_text(self, text, use_gemini=True, stream=False):
+        result = f"单次摘要({len(text)})"
+        return iter([result[:2], result[2:]]) if stream else result
+
+    def summarize_chunk(self, text, index, total, use_gemini=True):
+        with self.lock:
+            self.chunk_calls.append((index, total))
+        return f"S{index}"
+
+    def combine_summaries(self, summaries, final=True, use_gemini=True, stream=False):
+        with self.lock:
+            self.combine_calls.append((list(summaries), final))
+        result = ("最终:" if final else "") + "+".join(summaries)
+        return iter([result[:3], result[3:]]) if stream else result
+
+
+class TestMapReduceSummary(unittest.TestCase):
+    """测试分层map-reduce摘要 (不依赖真实AI服务)"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self._original_output_path = config.SUMMARY_OUTPUT_PATH
+        config.SUMMARY_OUTPUT_PATH = os.path.join(self.temp_dir.name, 'summary.txt')
+
+    def tearDown(self):
+        config.SUMMARY_OUTPUT_PATH = self._original_output_path
+        self.temp_dir.cleanup()
+
+    def test_split_preserves_order_and_size(self):
+        """切分后的分段保持顺序且不超过分段大小"""
+        text = "\n".join(f"第{i}句字幕内容。" for i in range(200))
+        chunks = split_text_into_chunks(text, 100)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertEqual("\n".join(chunks), text)
+
+    def test_hierarchical_reduce(self):
+        """分段摘要按时间顺序逐层合并"""
+        service = _FakeSummaryService()
+        summarizer = Summarizer(service, mode='map_reduce')
+        content = "\n".join("字" * 9 for _ in range(10)) # 10行，每段一行
+
+        summary = summarizer.map_reduce_summary(content, chunk_size=10, fan_out=3)
+
+        self.assertEqual(sorted(service.chunk_calls), [(i, 10) for i in range(1, 11)])
+        # 10 -> 4 -> 2 -> 最终
+        self.assertEqual(summary, "最终:S1+S2+S3+S4+S5+S6+S7+S8+S9+S10")
+        self.assertEqual(sum(1 for _, final in service.combine_calls if final), 1)
+
+    def test_streaming_writes_incrementally(self):
+        """流式摘要逐块回调，文件内容随之增长，并记录首token耗时"""
+        service = _FakeSummaryService()
+        summarizer = Summarizer(service, mode='single')
+        sizes = []
+
+        def on_chunk(chunk):
+            sizes.append(os.path.getsize(config.SUMMARY_OUTPUT_PATH))
+
+        summary = summarizer.generate_summary("流式摘要的输入内容", on_chunk=on_chunk)
+
+        self.assertEqual(summary, "单次摘要(9)")
+        self.assertEqual(len(sizes), 2)
+        self.assertLess(sizes[0], sizes[1])
+        self.assertIsNotNone(summarizer.last_metrics['time_to_first_token'])
+        with open(config.SUMMARY_OUTPUT_PATH, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), summary)
+
+    def test_video_summary_file_written_once(self):
+        """流程摘要阶段只由Summarizer写入一次摘要文件，不再重复覆盖"""
+        from src import main
+        from src.run_context import RunContext
+        context = RunContext.for_video(os.path.join(self.temp_dir.name, 'vod.mp4'), self.temp_dir.name)
+        summarizer = Summarizer(_FakeSummaryService(), mode='single')
+        real_open = open
+        writes = []
+
+        def counting_open(path, mode='r', *args, **kwargs):
+            if path == context.summary_output_path and 'w' in mode:
+                writes.append(mode)
+            return real_open(path, mode, *args, **kwargs)
+
+        with patch.object(config, 'SUMMARY_STREAMING', True), patch.object(config, 'SUBTITLE_SPEECH_DEDUP', False), \
+                patch.object(main, 'collect_subtitles', return_value=[]), \
+                patch.object(main, 'TokenBudgeter'), \
+                patch.object(main, 'prepare_summary_input', return_value="足够长的摘要输入" * 20), \
+                patch('builtins.open', side_effect=counting_open):
+            summary = main.generate_video_summary([], Mock(), summarizer, context)
+
+        self.assertEqual(summary, "单次摘要(160)")
+        self.assertEqual(len(writes), 1)
+        with open(context.summary_output_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), summary)
+
+    def test_auto_mode_uses_single_call_for_short_input(self):
+        """auto模式下短输入仍使用单次摘要，并写入输出文件"""
+        service = _FakeSummaryService()
+        summary = Summarizer(service, mode='auto').generate_summary("很短的内容")
+        self.assertEqual(summary, "单次摘要(5)")
+        self.assertEqual(service.chunk_calls, [])
+        with open(config.SUMMARY_OUTPUT_PATH, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), summary)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""
+摘要缓存模块的测试用例
+"""
+
+import os
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.summary_cache import SummaryCache, make_key, normalize_prompt
+from src.ai_service import AIService
+
+
+class TestSummaryCache(unittest.TestCase):
+    """测试缓存键、TTL与容量淘汰"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = SummaryCache(self.temp_dir.name, ttl=60, max_entries=3, max_bytes=1024 * 1024)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_normalization(self):
+        models = [('gemini-2.5-pro', 0.7)]
+        self.assertEqual(normalize_prompt("第一行  \r\n\n\n\n第二行\n"), "第一行\n\n第二行")
+        self.assertEqual(make_key("摘要内容\n", models), make_key("摘要内容  ", models))
+        self.assertNotEqual(make_key("摘要内容", models), make_key("摘要内容", [('gemini-2.5-pro', 0.2)]))
+        self.assertNotEqual(make_key("摘要内容", models), make_key("摘要内容", [('qwen-plus', None)]))
+
+    def test_hit_and_miss(self):
+        key = make_key("提示词", [('qwen-plus', None)])
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, "摘要结果")
+        self.assertEqual(self.cache.get(key), "摘要结果")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_ttl_expiry(self):
+        key = make_key("提示词", [])
+        self.cache.set(key, "旧结果")
+        with patch('src.summary_cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(self.cache.get(key))
+        self.assertIsNone(self.cache.get(key)) # 过期条目已被删除
+
+    def test_lru_eviction(self):
+        keys = [make_key(f"提示词{i}", []) for i in range(4)]
+        base = time.time() - 30
+        for i, key in enumerate(keys[:3]):
+            self.cache.set(key, f"结果{i}")
+            os.utime(self.cache._path(key), (base + i, base + i))
+        self.cache.get(keys[0]) # 刷新最近使用时间
+        self.cache.set(keys[3], "结果3")
+
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertEqual(self.cache.get(keys[0]), "结果0")
+        self.assertEqual(self.cache.get(keys[3]), "结果3")
+
+    def test_set_does_not_rescan_below_limit(self):
+        cache = SummaryCache(self.temp_dir.name, ttl=60, max_entries=100, max_bytes=1024 * 1024)
+        with patch.object(SummaryCache, '_entries', wraps=cache._entries) as entries:
+            for i in range(10):
+                cache.set(make_key(f"提示词{i}", []), f"结果{i}")
+        self.assertEqual(entries.call_count, 1)
+        self.assertEqual((len(cache._index), cache._total_bytes),
+                         (10, sum(size for _, _, size in cache._entries())))
+
+
+class TestAIServiceCache(unittest.TestCase):
+    """测试AIService.generate_text的缓存命中、写回与绕过"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ai_service = AIService({'qwen': 'test_qwen_key', 'gemini': 'test_gemini_key'})
+        self.ai_service.summary_cache = SummaryCache(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @patch('src.ai_service.GeminiAPI.generate_text', return_value="新摘要")
+    def test_generate_text_cached(self, mock_generate):
+        self.assertEqual(self.ai_service.generate_text("相同的输入"), "新摘要")
+        self.assertEqual(self.ai_service.generate_text("相同的输入\n"), "新摘要")
+        mock_generate.assert_called_once()
+
+        self.ai_service.generate_text("相同的输入", use_cache=False)
+        self.assertEqual(mock_generate.call_count, 2)
+
+    @patch('src.ai_service.GeminiAPI.generate_text_stream')
+    def test_stream_written_back(self, mock_stream):
+        mock_stream.return_value = iter(["流式", "摘要"])
+        self.assertEqual(list(self.ai_service.generate_text("流式输入", stream=True)), ["流式", "摘要"])
+        self.assertEqual(list(self.ai_service.generate_text("流式输入", stream=True)), ["流式摘要"])
+        mock_stream.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
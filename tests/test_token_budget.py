@@ -0,0 +1,110 @@
+"""
+Token预算模块的测试用例
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.token_budget import estimate_tokens, context_limit, trim_lines, split_sentences, truncate_to_tokens, TokenBudgeter
+from src import config
+
+
+class TestEstimateTokens(unittest.TestCase):
+    """测试token估算与模型上下文查找"""
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("你好世界"), 4)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("击败boss"), 3)
+
+    def test_context_limit_prefix_match(self):
+        self.assertEqual(context_limit("qwen-plus"), config.MODEL_CONTEXT_TOKENS['qwen-plus'])
+        self.assertEqual(context_limit("gemini-2.5-pro-exp-03-25"), config.MODEL_CONTEXT_TOKENS['gemini-2.5'])
+        self.assertEqual(context_limit("unknown-model"), config.DEFAULT_CONTEXT_TOKENS)
+
+
+class TestTrimLines(unittest.TestCase):
+    """测试去重、显著性与时间位置裁剪规则"""
+
+    def test_within_budget_unchanged(self):
+        lines = ["第一行", "第一行", "第二行"]
+        trimmed, stats = trim_lines(lines, 100)
+        self.assertEqual(trimmed, lines)
+        self.assertEqual(stats['duplicates_removed'], 0)
+
+    def test_dedup_first(self):
+        lines = ["欢迎来到游戏世界", "欢迎来到游戏世界", "  欢迎来到游戏世界 ", "开始战斗"]
+        trimmed, stats = trim_lines(lines, 12)
+        self.assertEqual(trimmed, ["欢迎来到游戏世界", "开始战斗"])
+        self.assertEqual(stats['duplicates_removed'], 2)
+        self.assertEqual(stats['lines_removed'], 0)
+
+    def test_salience_and_recency(self):
+        filler = ["嗯嗯嗯嗯"]
+        informative = ["玩家在第三关使用火焰法术击败了最终首领"]
+        lines = informative + filler + ["然后进入隐藏关卡获得传说武器奖励"]
+        budget = estimate_tokens(lines[0]) + estimate_tokens(lines[2])
+        trimmed, stats = trim_lines(lines, budget)
+        # 低显著性的语气词被删除，保留的行保持原顺序
+        self.assertEqual(trimmed, [lines[0], lines[2]])
+        self.assertEqual(stats['lines_removed'], 1)
+        self.assertLessEqual(stats['output_tokens'], budget)
+
+        # 显著性相同时优先保留靠后的内容
+        same = ["第一段剧情内容", "第二段剧情内容"]
+        trimmed, _ = trim_lines(same, estimate_tokens(same[0]))
+        self.assertEqual(trimmed, ["第二段剧情内容"])
+
+    def test_split_and_truncate_long_line(self):
+        text = "玩家进入第一关，遇到了巨龙。然后战斗开始！\nGame over"
+        self.assertEqual(split_sentences(text), ["玩家进入第一关，", "遇到了巨龙。", "然后战斗开始！", "Game over"])
+        self.assertEqual(truncate_to_tokens("击败boss获胜", 3), "击败boss")
+
+        # 单行超过整个预算时截取开头部分，而不是整行丢弃
+        line = "这是一段没有任何标点的很长的转录文本" * 10
+        trimmed, stats = trim_lines([line], 20)
+        self.assertEqual(trimmed, [line[:20]])
+        self.assertEqual((stats['output_tokens'], stats['lines_truncated']), (20, 1))
+
+
+class TestTokenBudgeter(unittest.TestCase):
+    """测试TokenBudgeter的预算计算与分段裁剪"""
+
+    def test_budget_is_min_of_models_and_cap(self):
+        with patch.object(config, 'SUMMARY_INPUT_TOKEN_BUDGET', None):
+            budgeter = TokenBudgeter(['gemini-2.5-pro', 'qwen-plus'])
+            self.assertEqual(budgeter.max_tokens, config.MODEL_CONTEXT_TOKENS['qwen-plus'] - config.PROMPT_RESERVED_TOKENS)
+        self.assertEqual(TokenBudgeter(['qwen-plus'], max_tokens=500).max_tokens, 500)
+
+    def test_fit_sections_proportional(self):
+        sections = {
+            'transcript': [f"转录第{i}句内容" for i in range(100)],
+            'subtitles': [f"字幕第{i}条" for i in range(50)]
+        }
+        budgeter = TokenBudgeter([], max_tokens=300)
+        trimmed, report = budgeter.fit_sections(sections)
+        self.assertLessEqual(report['output_tokens'], 300)
+        self.assertTrue(trimmed['transcript'])
+        self.assertTrue(trimmed['subtitles'])
+        self.assertGreater(report['lines_removed'], 0)
+
+    def test_fit_sections_redistributes_unused_budget(self):
+        # 字幕大多是重复行，去重后所需远小于按比例分到的份额，剩余预算分给转录
+        sections = {
+            'transcript': [f"转录第{i}句内容" for i in range(100)],
+            'subtitles': ["同一条字幕"] * 100 + ["另一条字幕"]
+        }
+        budgeter = TokenBudgeter([], max_tokens=500)
+        trimmed, report = budgeter.fit_sections(sections)
+        self.assertEqual(trimmed['subtitles'], ["同一条字幕", "另一条字幕"])
+        self.assertEqual(report['output_tokens'], 500)
+        self.assertEqual(report['duplicates_removed'], 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+转录分段发布通道的测试用例
+"""
+
+import os
+import threading
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.transcript_feed import TranscriptFeed
+
+
+class TestTranscriptFeed(unittest.TestCase):
+    """测试TranscriptFeed的水位等待、完成与失败"""
+
+    def test_wait_until_watermark(self):
+        feed = TranscriptFeed()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(feed.wait_until(30.0)))
+        waiter.start()
+
+        feed.publish([{'start': 1.0, 'end': 2.0, 'text': '第一段'}], 30.0)
+        waiter.join(0.2)
+        self.assertTrue(waiter.is_alive()) # 水位需要越过30秒
+
+        feed.publish([{'start': 31.0, 'end': 33.0, 'text': '第二段'}], 60.0)
+        waiter.join(5)
+        segments, watermark = results[0]
+        self.assertEqual([s['text'] for s in segments], ['第一段', '第二段'])
+        self.assertEqual(watermark, 60.0)
+
+    def test_finish_replaces_segments(self):
+        feed = TranscriptFeed()
+        feed.publish([{'start': 0.0, 'end': 1.0, 'text': ' 原始 '}], 10.0)
+        feed.finish([{'start': 0.0, 'end': 1.0, 'text': '原始'}])
+        self.assertTrue(feed.done)
+        self.assertEqual(feed.wait_until(1e9)[1], float('inf'))
+        self.assertEqual(feed.wait_done(), [{'start': 0.0, 'end': 1.0, 'text': '原始'}])
+
+    def test_fail_wakes_waiters(self):
+        feed = TranscriptFeed()
+        errors = []
+
+        def wait():
+            try:
+                feed.wait_done()
+            except RuntimeError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        feed.fail(ValueError("音频提取失败"))
+        waiter.join(5)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0].__cause__, ValueError)
+        # 完成后的失败不会覆盖结果
+        finished = TranscriptFeed()
+        finished.finish([])
+        finished.fail(ValueError("迟到的失败"))
+        self.assertEqual(finished.wait_done(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
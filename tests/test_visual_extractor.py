@@ -9,6 +9,10 @@ import unittest
 from pathlib import Path
 import glob
 import logging # 添加日志记录
+import random
+import tempfile
+import threading
+import time
 
 # 导入要测试的模块
 import sys
@@ -16,6 +20,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.visual_extractor import VisualExtractor
 from src.ai_service import AIService
 from src.subtitle_processor import SubtitleProcessor
+from src.circuit_breaker import CircuitBreaker
+from src.artifact_store import ArtifactStore
+from src.run_context import RunContext
+from src.transcript_feed import TranscriptFeed
 from src import config # 导入配置模块
 
 # 配置基本日志
@@ -289,6 +297,187 @@ class TestVisualExtractor(unittest.TestCase):
             logger.error(f"测试批量分析失败: {e}", exc_info=True)
             self.fail(f"测试批量分析失败: {e}")
 
+class _FakeAIService:
+    """模拟AI服务：随机延迟返回，使帧的完成顺序被打乱"""
+
+    def __init__(self, fail_names=()):
+        self.fail_names = set(fail_names)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    def vision_signature(self):
+        return {'model': 'fake-vl', 'prompt': '提取字幕'}
+
+    def describe_image(self, image_path):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(random.uniform(0, 0.02))
+            name = os.path.basename(image_path)
+            if name in self.fail_names:
+                raise RuntimeError("模拟调用失败")
+            return f"字幕 {name}"
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestAnalyzeIter(unittest.TestCase):
+    """测试VisualExtractor.analyze_iter的流式有序输出 (不依赖真实AI服务)"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.frames_dir = self.temp_dir.name
+        for i in range(1, 41):
+            Path(self.frames_dir, f"frame_{i:06d}.png").write_bytes(f"frame {i}".encode())
+        # 转录文件不存在：每秒采样一帧，全部40帧都会被选中
+        self.context = RunContext.for_video('game_video.mp4', os.path.join(self.frames_dir, 'out'), frame_rate=1.0)
+        self._original_workers = config.VISUAL_EXTRACTION_MAX_WORKERS
+        config.VISUAL_EXTRACTION_MAX_WORKERS = 8
+
+    def tearDown(self):
+        config.VISUAL_EXTRACTION_MAX_WORKERS = self._original_workers
+        self.temp_dir.cleanup()
+
+    def test_yields_in_frame_order(self):
+        """结果按帧号顺序产出，失败帧以"分析失败"占位"""
+        ai_service = _FakeAIService(fail_names={"frame_000007.png"})
+        extractor = VisualExtractor(ai_service)
+
+        results = list(extractor.analyze_iter(self.frames_dir, context=self.context, reorder_window=16))
+
+        self.assertEqual([r['frame_number'] for r in results], list(range(1, 41)))
+        self.assertEqual(results[0]['subtitle'], "字幕 frame_000001.png")
+        self.assertEqual(results[6]['subtitle'], "分析失败")
+        self.assertIn('error', results[6])
+
+    def test_in_flight_bounded_by_window(self):
+        """在途任务数不超过重排序窗口"""
+        ai_service = _FakeAIService()
+        extractor = VisualExtractor(ai_service)
+
+        results = list(extractor.analyze_iter(self.frames_dir, context=self.context, reorder_window=3))
+
+        self.assertEqual(len(results), 40)
+        self.assertLessEqual(ai_service.max_in_flight, 3)
+
+    def test_frame_results_cached_in_artifact_store(self):
+        """相同帧图像的分析结果从产物存储读取，--force-stage vision 时重新分析"""
+        store = ArtifactStore(os.path.join(self.frames_dir, 'store'))
+        ai_service = _FakeAIService()
+        first = list(VisualExtractor(ai_service, artifact_store=store).analyze_iter(self.frames_dir, context=self.context))
+        self.assertEqual(ai_service.calls, 40)
+
+        second = list(VisualExtractor(ai_service, artifact_store=store).analyze_iter(self.frames_dir, context=self.context))
+        self.assertEqual(ai_service.calls, 40)
+        self.assertEqual([r['subtitle'] for r in second], [r['subtitle'] for r in first])
+
+        original = config.FORCE_STAGES
+        config.FORCE_STAGES = ('vision',)
+        try:
+            list(VisualExtractor(ai_service, artifact_store=store).analyze_iter(self.frames_dir, context=self.context))
+        finally:
+            config.FORCE_STAGES = original
+        self.assertEqual(ai_service.calls, 80)
+
+    def test_circuit_breaker_defers_frames(self):
+        """视觉服务持续失败时熔断，其余帧快速失败并写入待续跑队列"""
+        ai_service = _BrokenVisionService()
+        extractor = VisualExtractor(ai_service)
+        output_path = os.path.join(self.frames_dir, 'out', 'subtitles.json')
+
+        extractor.analyze_batch(self.frames_dir, output_path=output_path, context=self.context)
+
+        self.assertLess(ai_service.calls, 40)
+        self.assertEqual(len(extractor.deferred_frames) + ai_service.calls, 40)
+        with open(output_path.replace('.json', '_deferred_frames.json'), encoding='utf-8') as f:
+            deferred = json.load(f)
+        self.assertEqual(deferred, extractor.deferred_frames)
+        self.assertTrue(all(os.path.exists(item['frame_path']) for item in deferred))
+
+    def test_circuit_breaker_deferred_frames_not_in_columnar_store(self):
+        """列式存储与JSON结果一致：熔断期间跳过的帧只出现在待续跑队列中"""
+        from src.result_store import FrameResultStore
+        ai_service = _BrokenVisionService()
+        extractor = VisualExtractor(ai_service)
+        output_path = os.path.join(self.frames_dir, 'out', 'subtitles.json')
+
+        original = config.RAW_RESULT_FORMAT
+        config.RAW_RESULT_FORMAT = 'columnar'
+        try:
+            extractor.analyze_batch(self.frames_dir, output_path=output_path, context=self.context)
+        finally:
+            config.RAW_RESULT_FORMAT = original
+
+        records = list(FrameResultStore(output_path.replace('.json', '_raw_analyzed.frames')).iter_records())
+        self.assertGreater(len(extractor.deferred_frames), 0)
+        self.assertEqual(len(records), ai_service.calls)
+        deferred_names = {item['frame_name'] for item in extractor.deferred_frames}
+        self.assertFalse(deferred_names & {record['frame_name'] for record in records})
+
+
+    def _wait_for_calls(self, ai_service, expected, timeout=5):
+        deadline = time.monotonic() + timeout
+        while ai_service.calls < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1) # 确认不会继续选择后面的帧
+        self.assertEqual(ai_service.calls, expected)
+
+    def test_selection_follows_transcript_feed(self):
+        """逐窗口发布分段时，只分析转录已覆盖的帧，转录完成后再分析其余帧"""
+        ai_service = _FakeAIService()
+        extractor = VisualExtractor(ai_service)
+        feed = TranscriptFeed()
+        segment = {'id': 0, 'start': 5.0, 'end': 12.0, 'text': '语音'}
+        output_path = os.path.join(self.frames_dir, 'out', 'subtitles.json')
+        worker = threading.Thread(target=extractor.analyze_batch, args=(self.frames_dir,),
+                                  kwargs={'output_path': output_path, 'context': self.context, 'transcript_feed': feed})
+        worker.start()
+        try:
+            self._wait_for_calls(ai_service, 0)
+            # 转录到20秒：0~19秒中，静音每秒1帧、语音段内每2秒1帧及进出边界各1帧，共16帧
+            feed.publish([segment], 20.0)
+            self._wait_for_calls(ai_service, 16)
+            self.assertTrue(worker.is_alive())
+        finally:
+            feed.finish([segment])
+            worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(ai_service.calls, 36)
+        self.assertTrue(os.path.exists(output_path))
+
+    def test_transcript_feed_failure_stops_selection(self):
+        """转录失败时视觉分析随之失败，而不是一直等待"""
+        feed = TranscriptFeed()
+        feed.fail(RuntimeError("模拟转录失败"))
+        with self.assertRaises(RuntimeError):
+            VisualExtractor(_FakeAIService()).analyze_batch(
+                self.frames_dir, output_path=os.path.join(self.frames_dir, 'out', 'subtitles.json'),
+                context=self.context, transcript_feed=feed)
+
+
+class _BrokenVisionService:
+    """模拟视觉服务故障：每次调用都失败，通过熔断器调用"""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.vision_breaker = CircuitBreaker("vision", failure_threshold=3, reset_timeout=60)
+
+    def _extract(self, image_path):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.01)
+        raise RuntimeError("模拟服务故障")
+
+    def describe_image(self, image_path):
+        return self.vision_breaker.call(self._extract, image_path)
+
+
 if __name__ == '__main__':
     # 可以增加更详细的日志级别用于调试
     # logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -0,0 +1,119 @@
+"""
+分布式工作节点的测试用例
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+# 导入要测试的模块
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.worker import JobWorker
+from src.job_queue import JobQueue
+from src.stage_scheduler import StageCancelledError
+
+
+class TestJobWorker(unittest.TestCase):
+    """使用共享的数据库文件与模拟的任务执行函数测试多个节点的协同"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.db_path = os.path.join(self.root, 'jobs.sqlite3')
+        self.queue = JobQueue(self.db_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _worker(self, worker_id, runner, **kwargs):
+        # 每个节点使用独立的JobQueue实例，模拟不同主机打开同一个数据库文件
+        return JobWorker(JobQueue(self.db_path), os.path.join(self.root, 'out'), runner=runner, worker_id=worker_id,
+                         poll_interval=0.02, **kwargs)
+
+    def _wait(self, predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return
+            time.sleep(0.02)
+        self.fail("等待超时")
+
+    def test_jobs_spread_across_workers(self):
+        def runner(job, output_dir, cancel_event):
+            time.sleep(0.2)
+            return {'output_dir': output_dir}
+
+        jobs = [self.queue.submit(f"{i}.mp4") for i in range(8)]
+        start = time.perf_counter()
+        workers = [self._worker(f"host-{n}", runner, workers=2, exit_when_idle=True).start() for n in range(2)]
+        for worker in workers:
+            worker.join()
+            worker.stop()
+        elapsed = time.perf_counter() - start
+
+        finished = [self.queue.get(job['id']) for job in jobs]
+        self.assertEqual({job['status'] for job in finished}, {'succeeded'})
+        self.assertEqual({job['result']['worker_id'].split('/')[0] for job in finished}, {'host-0', 'host-1'})
+        self.assertEqual(sum(worker.processed for worker in workers), 8)
+        # 串行需要1.6秒，4个工作线程约0.4秒
+        self.assertLess(elapsed, 1.0)
+
+    def test_crashed_worker_job_is_retried(self):
+        job = self.queue.submit('a.mp4')
+        # 模拟崩溃的节点：领取任务后不再续约
+        self.queue.claim(worker_id='crashed/0', lease_seconds=0.1)
+
+        worker = self._worker('host-b', lambda job, output_dir, cancel_event: {'output_dir': output_dir})
+        with worker:
+            self._wait(lambda: self.queue.get(job['id'])['status'] == 'succeeded')
+        job = self.queue.get(job['id'])
+        self.assertEqual((job['attempts'], job['result']['worker_id']), (2, 'host-b/0'))
+
+    def test_heartbeat_keeps_lease_and_delivers_cancel(self):
+        started = threading.Event()
+
+        def runner(job, output_dir, cancel_event):
+            started.set()
+            while not cancel_event.wait(0.02):
+                pass
+            raise StageCancelledError("运行已取消")
+
+        job = self.queue.submit('a.mp4')
+        worker = self._worker('host-a', runner, lease_seconds=0.3, heartbeat_interval=0.05)
+        with worker:
+            started.wait(5)
+            time.sleep(0.5) # 超过租约时长，心跳续约后其他节点不能领取
+            self.assertIsNone(JobQueue(self.db_path).claim(worker_id='host-b'))
+            # 取消请求由其他进程 (如任务服务) 写入队列，经心跳传递到运行中的任务
+            JobQueue(self.db_path).cancel(job['id'])
+            self._wait(lambda: self.queue.get(job['id'])['status'] == 'cancelled')
+
+    def test_lost_lease_stops_job(self):
+        started = threading.Event()
+        stopped = threading.Event()
+
+        def runner(job, output_dir, cancel_event):
+            started.set()
+            cancel_event.wait(5)
+            stopped.set()
+            raise StageCancelledError("运行已取消")
+
+        job = self.queue.submit('a.mp4')
+        worker = self._worker('host-a', runner, heartbeat_interval=0.05)
+        with worker:
+            started.wait(5)
+            # 模拟租约被其他节点接管
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("UPDATE jobs SET worker_id = 'host-b/0' WHERE id = ?", (job['id'],))
+            self.assertTrue(stopped.wait(5))
+        # 失去租约的节点不会改写任务状态
+        self.assertEqual(self.queue.get(job['id'])['status'], 'running')
+
+
+if __name__ == '__main__':
+    unittest.main()